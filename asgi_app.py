@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+GraphRAG ASGI Application - حالت سرویس‌دهی async برای endpointهای پرسش
+
+همان سرویس‌ها و قراردادهای JSON فایل web_app را با Starlette ارائه می‌دهد:
+- مراحل CPU-bound (بازیابی، ساخت متن زمینه، تبدیل متن به گراف، مقایسه متن) در یک
+  ThreadPoolExecutor محدود اجرا می‌شوند تا event loop آزاد بماند
+- فراخوانی‌های OpenAI/Anthropic با کلاینت‌های async انجام می‌شوند و در حین انتظار
+  برای پاسخ مدل هیچ thread ای اشغال نمی‌شود
+- بقیه مسیرها (صفحات HTML، مدیریت گراف و ...) از طریق WSGIMiddleware به همان برنامه
+  Flask سپرده می‌شوند
+
+اجرا:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+تعداد thread های CPU با متغیر محیطی GRAPHRAG_CPU_WORKERS تنظیم می‌شود.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import web_app
+from web_app import graphrag_service
+from llm_gateway import get_llm_gateway
+
+CPU_WORKERS = int(os.environ.get("GRAPHRAG_CPU_WORKERS", os.cpu_count() or 4))
+
+executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="graphrag-cpu")
+
+# همان header های CORS برنامه Flask
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,PUT,POST,DELETE,OPTIONS',
+}
+
+
+def _json(payload, status=200):
+    return JSONResponse(payload, status_code=status, headers=CORS_HEADERS)
+
+
+async def _request_json(request):
+    """بدنه JSON درخواست (None در صورت نامعتبر بودن، مانند request.get_json در Flask)"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def _run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def process_query(request):
+    """پردازش سوال و برگرداندن نتیجه (async)"""
+    try:
+        data = await _request_json(request)
+        query_args, advanced_settings = web_app.process_query_request(data)
+        result = await graphrag_service.aprocess_query(executor=executor, **query_args)
+        return _json(web_app.process_query_response(result, advanced_settings))
+    except Exception as e:
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, 500)
+
+
+async def process_query_stream(request):
+    """پردازش سوال با پاسخ جریانی SSE (تکه‌ها در thread pool تولید می‌شوند)"""
+    data = await _request_json(request)
+    try:
+        query_args, advanced_settings = web_app.process_query_request(data)
+    except Exception as e:
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, 400)
+    return StreamingResponse(web_app.process_query_events(query_args, advanced_settings),
+                             media_type='text/event-stream', headers={**CORS_HEADERS, **web_app.SSE_HEADERS})
+
+
+async def enhanced_process_query(request):
+    """پردازش سوال با سرویس پیشرفته GraphRAG (async)"""
+    data = await _request_json(request)
+    return _json(*await _run_cpu(web_app.enhanced_process_query_payload, data))
+
+
+async def text_to_graph(request):
+    """تبدیل متن به گراف دانش (async)"""
+    data = await _request_json(request)
+    return _json(*await _run_cpu(web_app.text_to_graph_payload, data))
+
+
+async def compare_texts(request):
+    data = await _request_json(request)
+    return _json(*await _run_cpu(web_app.compare_texts_payload, data))
+
+
+async def compare_with_gpt(request):
+    try:
+        data = await _request_json(request)
+        chat_args, comparison, error = web_app.gpt_comparison_request(data)
+        if error:
+            return _json(*error)
+
+        try:
+            gpt_response = await get_llm_gateway().aopenai_chat(web_app.OPENAI_API_KEY, chat_args)
+            return _json(web_app.gpt_comparison_response(gpt_response, comparison))
+        except Exception as e:
+            return _json({'error': f'خطا در ارتباط با {comparison["gpt_model"]}: {str(e)}'}, 500)
+
+    except Exception as e:
+        return _json({'error': f'خطا در مقایسه: {str(e)}'}, 500)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/process_query', process_query, methods=['POST']),
+        Route('/api/process_query_stream', process_query_stream, methods=['POST']),
+        Route('/api/enhanced_process_query', enhanced_process_query, methods=['POST']),
+        Route('/api/text_to_graph', text_to_graph, methods=['POST']),
+        Route('/api/compare_texts', compare_texts, methods=['POST']),
+        Route('/api/compare_with_gpt', compare_with_gpt, methods=['POST']),
+        # سایر مسیرها همان برنامه Flask (در thread های جداگانه a2wsgi)
+        Mount('/', app=WSGIMiddleware(web_app.app, workers=CPU_WORKERS)),
+    ],
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    print("🚀 راه‌اندازی GraphRAG (ASGI)...")
+    print(f"🧵 thread های CPU: {CPU_WORKERS}")
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded Cache - کش‌های محدود (LRU + TTL) با شمارنده‌های hit/miss/eviction
+
+BoundedCache تعداد مدخل‌ها و (به‌صورت تقریبی) حجم بایتی را محدود می‌کند، مدخل‌های
+منقضی را در زمان خواندن دور می‌ریزد و قدیمی‌ترین مدخل استفاده‌نشده را هنگام پر شدن
+بیرون می‌کند. CacheGroup چند کش یک سرویس را با هم نگه می‌دارد تا با عوض شدن
+گراف همه با هم خالی شوند و آمار آن‌ها یک‌جا گزارش شود.
+"""
+
+import fnmatch
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+def approx_sizeof(value: Any, _depth: int = 0) -> int:
+    """تخمین حجم یک مقدار (رشته‌ها، اعداد و ظرف‌های تو در تو) به بایت"""
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(approx_sizeof(k, _depth + 1) + approx_sizeof(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_sizeof(item, _depth + 1) for item in value)
+    return size
+
+
+class BoundedCache:
+    """کش LRU امن در برابر thread با سقف تعداد، سقف حجم و TTL اختیاری"""
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, sizeof: Callable[[Any], int] = approx_sizeof):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # مقدار بزرگ‌تر از کل کش: نگهداری نمی‌شود
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._drop(key)
+            return True
+
+    def keys(self, pattern: str = "*") -> list:
+        """کلیدهای رشته‌ای مطابق الگو (مانند KEYS در Redis)"""
+        with self._lock:
+            return [key for key in self._entries if isinstance(key, str) and fnmatch.fnmatchcase(key, pattern)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class CacheGroup:
+    """مجموعه کش‌های یک سرویس که با تغییر گراف با هم باطل می‌شوند"""
+
+    def __init__(self):
+        self.caches: Dict[str, BoundedCache] = {}
+        self.invalidations = 0
+        self._token = None
+
+    def add(self, name: str, **options) -> BoundedCache:
+        cache = BoundedCache(name, **options)
+        self.caches[name] = cache
+        return cache
+
+    def validate(self, token: Hashable):
+        """در صورت تغییر token گراف، همه کش‌ها خالی می‌شوند"""
+        if token != self._token:
+            if self._token is not None:
+                self.clear()
+            self._token = token
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: cache.stats() for name, cache in self.caches.items()}
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Chunk Executor - استخراج موازی chunkهای متن طولانی
+
+extract_long_text و extract_incremental هر chunk را با TextToGraphService.extract
+پردازش می‌کنند. ChunkExtractionExecutor این کار را موازی انجام می‌دهد:
+- روش‌های مبتنی بر LLM (llm، llm_multipass، edc، autoregressive و hybrid شامل LLM) در
+  یک thread pool محدود اجرا می‌شوند؛ زمان این روش‌ها صرف انتظار شبکه است و محدودیت
+  هم‌زمانی هر سرویس‌دهنده را llm_gateway اعمال می‌کند.
+- روش‌های CPU-bound (spaCy و rule-based) در یک process pool مشترک فرایند اجرا می‌شوند.
+  pool یک‌بار و با forkserver (در نبود آن spawn) ساخته می‌شود: fork مستقیم از فرایند
+  چندنخی سرور وب قفل‌های گرفته‌شده را به فرزند می‌برد. هر worker سرویس معادل (همان مدل
+  spaCy و فایل کش استخراج) را یک‌بار می‌سازد و نگه می‌دارد.
+
+نتایج به ترتیب chunkها و به محض آماده شدن chunk بعدی برگردانده می‌شوند تا ادغام
+(HierarchicalMerger.add_chunk_result) تدریجی انجام شود. زمان استخراج هر chunk در
+ChunkOutcome ثبت می‌شود.
+
+تعداد worker ها:
+    GRAPHRAG_CPU_WORKERS            process pool (پیش‌فرض: تعداد هسته‌ها)
+    GRAPHRAG_LLM_CHUNK_CONCURRENCY  chunk های هم‌زمان روش‌های LLM (پیش‌فرض: 8)
+    GRAPHRAG_CHUNK_TIMEOUT          حداکثر انتظار برای هر chunk به ثانیه (پیش‌فرض: 600)
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+LLM_METHODS = ("llm", "llm_multipass", "edc", "autoregressive")
+SPACY_METHODS = ("spacy", "spacy_svo_enhanced", "joint_er")
+DEFAULT_LLM_CONCURRENCY = 8
+DEFAULT_CHUNK_TIMEOUT = 600
+
+
+def uses_llm(method: str, kwargs: Dict[str, Any]) -> bool:
+    """آیا استخراج با method (و kwargs آن) به LLM درخواست می‌فرستد؟"""
+    if method in LLM_METHODS:
+        return True
+    if method == "hybrid":
+        methods = kwargs.get("hybrid_methods", kwargs.get("methods", ["spacy", "llm"]))
+        return any(m in LLM_METHODS for m in methods)
+    if method in ("long_text", "with_coreference"):
+        return kwargs.get("base_method", kwargs.get("method", "")) in LLM_METHODS
+    return False
+
+
+def uses_spacy(method: str, kwargs: Dict[str, Any]) -> bool:
+    """آیا استخراج با method متن را با pipeline کامل spaCy پردازش می‌کند؟"""
+    if method in SPACY_METHODS:
+        return True
+    if method == "hybrid":
+        methods = kwargs.get("hybrid_methods", kwargs.get("methods", ["spacy", "llm"]))
+        return any(m in SPACY_METHODS for m in methods)
+    if method in ("long_text", "with_coreference"):
+        return kwargs.get("base_method", kwargs.get("method", "")) in SPACY_METHODS
+    return False
+
+
+@dataclass
+class ChunkOutcome:
+    """نتیجه استخراج یک chunk"""
+    index: int
+    chunk: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        """آیا استخراج chunk ناموفق یا ناقص بوده است (استثنا، کلید error یا partial در نتیجه)"""
+        if self.error is not None:
+            return True
+        return bool(self.result and (self.result.get("error") or self.result.get("partial")))
+
+    def timing(self) -> Dict[str, Any]:
+        result = self.result or {}
+        return {
+            "chunk": self.index,
+            "seconds": round(self.seconds, 4),
+            "chars": len(self.chunk.get("text", "")),
+            "num_entities": len(result.get("entities", [])),
+            "num_relationships": len(result.get("relationships", [])),
+            "error": self.error,
+        }
+
+
+def _extract_chunk(service, text: str, method: str, kwargs: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
+    started = time.perf_counter()
+    try:
+        return service.extract(text, method=method, **kwargs), time.perf_counter() - started, None
+    except Exception as e:
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+# سرویس هر worker process pool به ازای تنظیمات سرویس فرایند اصلی (یک‌بار ساخته می‌شود)
+_worker_services: Dict[Tuple, Any] = {}
+
+# process pool های مشترک فرایند به ازای تعداد worker
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+_process_pools_lock = threading.Lock()
+
+
+def _service_spec(service) -> Tuple:
+    """تنظیمات قابل pickle برای ساخت سرویس معادل در worker (مدل spaCy و کش استخراج)"""
+    cache = getattr(service, "extraction_cache", None)
+    cache_spec = (cache.path, cache.max_bytes) if cache is not None and cache.path != ":memory:" else None
+    return getattr(service, "spacy_model", None), getattr(service, "_hf_token_param", None), cache_spec
+
+
+def _worker_service(spec: Tuple):
+    service = _worker_services.get(spec)
+    if service is None:
+        from extraction_cache import ExtractionCache
+        from text_to_graph_service import TextToGraphService
+
+        spacy_model, hf_token, cache_spec = spec
+        service = TextToGraphService(spacy_model=spacy_model or "en_core_web_sm", hf_token=hf_token)
+        service.extraction_cache = ExtractionCache(*cache_spec) if cache_spec else None
+        _worker_services[spec] = service
+    return service
+
+
+def _extract_chunk_in_worker(spec: Tuple, text: str, method: str, kwargs: Dict[str, Any]):
+    return _extract_chunk(_worker_service(spec), text, method, kwargs)
+
+
+def _mp_context():
+    # fork از فرایند چندنخی سرور قفل‌های گرفته‌شده (کش‌ها، logging) را به فرزند می‌برد و ممکن است
+    # آن را قفل کند؛ فرزندان forkserver از یک فرایند تک‌نخی تمیز ساخته می‌شوند
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """process pool مشترک فرایند (یک‌بار ساخته و بین درخواست‌ها استفاده می‌شود)"""
+    with _process_pools_lock:
+        pool = _process_pools.get(workers)
+        if pool is None:
+            pool = _process_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        return pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """کنار گذاشتن pool خراب (مثلاً worker کشته شده) تا فراخوانی بعدی pool تازه بسازد"""
+    with _process_pools_lock:
+        for workers, existing in list(_process_pools.items()):
+            if existing is pool:
+                del _process_pools[workers]
+    pool.shutdown(wait=False)
+
+
+class ChunkExtractionExecutor:
+    """اجرای موازی service.extract روی chunkها با حفظ ترتیب"""
+
+    def __init__(self, service, max_workers: Optional[int] = None, llm_concurrency: Optional[int] = None,
+                 chunk_timeout: Optional[float] = None):
+        """
+        Args:
+            service: TextToGraphService
+            max_workers: تعداد فرایندهای روش‌های CPU-bound (1 = پردازش ترتیبی در همین فرایند)
+            llm_concurrency: تعداد chunk های هم‌زمان روش‌های LLM
+            chunk_timeout: حداکثر انتظار (ثانیه) برای نتیجه هر chunk؛ پس از آن chunk ناموفق ثبت می‌شود
+        """
+        self.service = service
+        self.max_workers = max_workers or int(os.environ.get("GRAPHRAG_CPU_WORKERS", os.cpu_count() or 1))
+        self.llm_concurrency = llm_concurrency or int(os.environ.get("GRAPHRAG_LLM_CHUNK_CONCURRENCY",
+                                                                     DEFAULT_LLM_CONCURRENCY))
+        self.chunk_timeout = chunk_timeout or float(os.environ.get("GRAPHRAG_CHUNK_TIMEOUT", DEFAULT_CHUNK_TIMEOUT))
+
+    def in_process(self, method: str, kwargs: Dict[str, Any], num_chunks: int) -> bool:
+        """آیا chunk ها در همین فرایند (ترتیبی یا در thread pool) استخراج می‌شوند"""
+        return uses_llm(method, kwargs) or min(self.max_workers, num_chunks) <= 1
+
+    def _pool(self, method: str, kwargs: Dict[str, Any], num_chunks: int) -> Optional[Executor]:
+        """pool مناسب روش؛ None برای اجرای ترتیبی"""
+        if uses_llm(method, kwargs):
+            workers = min(self.llm_concurrency, num_chunks)
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk-llm") if workers > 1 else None
+        if self.in_process(method, kwargs, num_chunks):
+            return None
+        return _process_pool(self.max_workers)
+
+    def map(self, chunks: Iterable[Dict[str, Any]], method: str, **kwargs) -> Iterator[ChunkOutcome]:
+        """
+        استخراج همه chunkها (دیکشنری‌های دارای کلید text) با method
+
+        Yields:
+            ChunkOutcome هر chunk غیرخالی به ترتیب ورودی؛ خطای یک chunk در outcome.error ثبت می‌شود
+        """
+        items = [(index, chunk) for index, chunk in enumerate(chunks) if chunk.get("text")]
+        pool = self._pool(method, kwargs, len(items))
+        if pool is None:
+            for index, chunk in items:
+                yield ChunkOutcome(index, chunk, *_extract_chunk(self.service, chunk["text"], method, kwargs))
+            return
+
+        shared = isinstance(pool, ProcessPoolExecutor)
+        if shared:
+            spec = _service_spec(self.service)
+            submit = lambda text: pool.submit(_extract_chunk_in_worker, spec, text, method, kwargs)
+        else:
+            submit = lambda text: pool.submit(_extract_chunk, self.service, text, method, kwargs)
+        futures = []
+        try:
+            try:
+                for index, chunk in items:
+                    futures.append((index, chunk, submit(chunk["text"])))
+            except BrokenProcessPool:
+                _discard_process_pool(pool)
+                raise
+            for index, chunk, future in futures:
+                yield ChunkOutcome(index, chunk, *self._result(pool, future))
+        finally:
+            # در صورت رها شدن iterator، chunk های شروع‌نشده لغو می‌شوند
+            # (shutdown(cancel_futures=True) در Python 3.8 وجود ندارد)
+            for _, _, future in futures:
+                future.cancel()
+            if not shared:
+                pool.shutdown(wait=True)
+
+    def _result(self, pool: Executor, future) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
+        try:
+            return future.result(timeout=self.chunk_timeout)
+        except FuturesTimeoutError:
+            logging.warning(f"Chunk extraction timed out after {self.chunk_timeout}s")
+            return None, self.chunk_timeout, f"TimeoutError: no result after {self.chunk_timeout}s"
+        except BrokenProcessPool as e:
+            _discard_process_pool(pool)
+            return None, 0.0, f"{type(e).__name__}: {e}"
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled Graph - نسخه فشرده (CSR) گراف برای پیمایش‌های سریع
+نودها به شناسه‌های عددی نگاشت می‌شوند و همسایه‌ها به‌همراه کد metaedge
+در آرایه‌های NumPy نگهداری می‌شوند.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class CompiledGraph:
+    """نمایش CSR فقط‌خواندنی از یک گراف NetworkX (Graph یا DiGraph)"""
+
+    def __init__(self, G):
+        """
+        ساخت آرایه‌های CSR از گراف
+
+        Args:
+            G: گراف NetworkX؛ ترتیب همسایه‌ها همان ترتیب G.neighbors حفظ می‌شود
+        """
+        if G.is_multigraph():
+            raise ValueError("CompiledGraph از MultiGraph پشتیبانی نمی‌کند")
+        self.graph = G
+        self.node_ids: List[str] = list(G.nodes())
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+        # دیکشنری برچسب‌ها (metaedge/relation) و انواع نود
+        self.labels: List[Any] = []
+        self._label_codes: Dict[Any, int] = {}
+        self.kinds: List[Any] = []
+        self._kind_codes: Dict[Any, int] = {}
+
+        index = self.index
+        offsets = [0]
+        targets: List[int] = []
+        metaedge_codes: List[int] = []
+        relation_codes: List[int] = []
+        for node_id in self.node_ids:
+            for neighbor, edge_data in G.adj[node_id].items():
+                targets.append(index[neighbor])
+                relation = edge_data.get('relation')
+                metaedge_codes.append(self._label_code(edge_data.get('metaedge') or relation))
+                relation_codes.append(self._label_code(relation))
+            offsets.append(len(targets))
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        # کد «metaedge یا relation» (همان برچسبی که پیمایش‌ها استفاده می‌کنند)؛ -1 یعنی بدون برچسب
+        self.metaedge_codes = np.asarray(metaedge_codes, dtype=np.int32)
+        # کد ویژگی relation به‌تنهایی (برای جستجوی الگو)
+        self.relation_codes = np.asarray(relation_codes, dtype=np.int32)
+        self.kind_codes = np.asarray(
+            [self._kind_code(attrs.get('kind')) for _, attrs in G.nodes(data=True)],
+            dtype=np.int32,
+        )
+
+    @classmethod
+    def from_arrays(cls, graph, node_ids: List[str], offsets: np.ndarray, targets: np.ndarray,
+                    metaedge_codes: np.ndarray, relation_codes: np.ndarray, labels: List[Any],
+                    kind_codes: np.ndarray, kinds: List[Any]) -> 'CompiledGraph':
+        """
+        ساخت مستقیم از آرایه‌های آماده (مثلاً نماهای mmap یک snapshot) بدون کپی
+
+        کد -1 در kind_codes به معنی نود بدون نوع است.
+        """
+        compiled = cls.__new__(cls)
+        compiled.graph = graph
+        compiled.node_ids = node_ids
+        compiled.index = {node_id: i for i, node_id in enumerate(node_ids)}
+        compiled.labels = list(labels)
+        compiled._label_codes = {label: code for code, label in enumerate(compiled.labels)}
+        compiled.kinds = list(kinds)
+        if kind_codes.size and int(kind_codes.min()) < 0:
+            compiled.kinds.append(None)
+            kind_codes = np.where(kind_codes < 0, len(compiled.kinds) - 1, kind_codes).astype(np.int32)
+        compiled._kind_codes = {kind: code for code, kind in enumerate(compiled.kinds)}
+        compiled.offsets = offsets
+        compiled.targets = targets
+        compiled.metaedge_codes = metaedge_codes
+        compiled.relation_codes = relation_codes
+        compiled.kind_codes = kind_codes
+        return compiled
+
+    def _label_code(self, label: Any) -> int:
+        if not label:
+            return -1
+        code = self._label_codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._label_codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def _kind_code(self, kind: Any) -> int:
+        code = self._kind_codes.get(kind)
+        if code is None:
+            code = len(self.kinds)
+            self._kind_codes[kind] = code
+            self.kinds.append(kind)
+        return code
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        return int(self.targets.shape[0])
+
+    def is_compiled_from(self, G) -> bool:
+        """آیا این نسخه از همین شیء گراف ساخته شده است؟"""
+        return self.graph is G
+
+    def has_node(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def out_degree_sum(self, node_ids: Iterable[str]) -> int:
+        """مجموع درجه خروجی نودها (تعداد یال‌هایی که گسترش آن‌ها بررسی می‌کند)"""
+        index = self.index
+        positions = np.fromiter((index[node_id] for node_id in node_ids if node_id in index), dtype=np.int64)
+        return int((self.offsets[positions + 1] - self.offsets[positions]).sum())
+
+    # ------------------------------------------------------------------
+    # ماسک‌های برچسب: یک خانه اضافه در انتها تا کد -1 به False نگاشت شود
+    # ------------------------------------------------------------------
+    def _label_mask(self, predicate: Callable[[Any], bool]) -> np.ndarray:
+        mask = np.zeros(len(self.labels) + 1, dtype=bool)
+        for code, label in enumerate(self.labels):
+            mask[code] = bool(predicate(label))
+        return mask
+
+    def _kind_mask(self, accepted_kinds: Iterable[Any]) -> np.ndarray:
+        accepted = set(accepted_kinds)
+        return np.array([kind in accepted for kind in self.kinds], dtype=bool)
+
+    def _expand(self, frontier: np.ndarray) -> np.ndarray:
+        """اندیس یال‌های خروجی همه نودهای frontier به ترتیب پیمایش"""
+        starts = self.offsets[frontier]
+        lengths = self.offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        shifts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return np.arange(total, dtype=np.int64) + shifts
+
+    # ------------------------------------------------------------------
+    # پیمایش‌ها
+    # ------------------------------------------------------------------
+    def bfs(self, start_node: str, max_depth: int = 2) -> List[Tuple[str, int]]:
+        """BFS سطح‌به‌سطح برداری؛ خروجی هم‌ارز GraphRAGService.bfs_search"""
+        start = self.index[start_node]
+        if max_depth < 0:
+            return []
+        discovered = np.zeros(len(self.node_ids), dtype=bool)
+        discovered[start] = True
+        result = [(start_node, 0)]
+        frontier = np.array([start], dtype=np.int64)
+        depth = 0
+        while depth < max_depth and frontier.size:
+            edges = self._expand(frontier)
+            edges = edges[self.metaedge_codes[edges] >= 0]
+            neighbors = self.targets[edges]
+            neighbors = neighbors[~discovered[neighbors]]
+            if not neighbors.size:
+                break
+            # حذف تکراری‌ها با حفظ ترتیب اولین مشاهده
+            _, first_seen = np.unique(neighbors, return_index=True)
+            frontier = neighbors[np.sort(first_seen)].astype(np.int64)
+            discovered[frontier] = True
+            depth += 1
+            node_ids = self.node_ids
+            result.extend((node_ids[i], depth) for i in frontier.tolist())
+        return result
+
+    def dfs(self, start_node: str, max_depth: int = 2, relation_filter: str = None) -> List[Tuple[str, int]]:
+        """DFS بازگشتی؛ خروجی هم‌ارز GraphRAGService.dfs_search"""
+        if relation_filter:
+            # برچسب مؤثر فیلتر: relation و در نبود آن metaedge
+            codes = np.where(self.relation_codes >= 0, self.relation_codes, self.metaedge_codes)
+            needle = relation_filter.lower()
+            label_ok = self._label_mask(lambda label: needle in str(label).lower())
+        else:
+            codes = self.metaedge_codes
+            label_ok = self._label_mask(lambda label: True)
+        edge_ok = label_ok[codes] & (self.metaedge_codes >= 0)
+
+        offsets = self.offsets
+        targets = self.targets
+        node_ids = self.node_ids
+        visited = set()
+        result: List[Tuple[str, int]] = []
+
+        def visit(node: int, depth: int):
+            if depth > max_depth or node in visited:
+                return
+            visited.add(node)
+            result.append((node_ids[node], depth))
+            lo, hi = offsets[node], offsets[node + 1]
+            for neighbor in targets[lo:hi][edge_ok[lo:hi]].tolist():
+                if neighbor not in visited:
+                    visit(neighbor, depth + 1)
+
+        visit(self.index[start_node], 0)
+        return result
+
+    def find_paths_allowlist(
+        self,
+        start_nodes: List[str],
+        allow_metaedges: Iterable[Any],
+        deny_metaedges: Iterable[Any],
+        end_kind: Optional[Any],
+        hop_limit: int,
+        max_results_per_hop: int,
+        require_unique_nodes: bool,
+        accept_path: Optional[Callable[[List[str]], bool]] = None,
+    ) -> List[Tuple[List[str], List[Any]]]:
+        """
+        DFS محدود با allowlist/denylist متا‌یال‌ها؛ معادل حلقه اصلی _find_paths_allowlist
+
+        Returns:
+            لیست (مسیر نودها، metaedgeهای مسیر)
+        """
+        allow_set = set(allow_metaedges or [])
+        deny_set = set(deny_metaedges or [])
+        label_ok = self._label_mask(
+            lambda label: label not in deny_set and (not allow_set or label in allow_set)
+        )
+        if end_kind:
+            accepted_kinds = {end_kind}
+            if isinstance(end_kind, str):
+                accepted_kinds.update(et.strip() for et in end_kind.split("|"))
+            kind_ok = self._kind_mask(accepted_kinds)[self.kind_codes]
+        else:
+            kind_ok = None
+
+        offsets = self.offsets
+        targets = self.targets
+        metaedge_codes = self.metaedge_codes
+        labels = self.labels
+        node_ids = self.node_ids
+
+        results: List[Tuple[List[str], List[Any]]] = []
+        seen_paths: set = set()
+        for start_node in start_nodes:
+            start = self.index.get(start_node)
+            if start is None:
+                continue
+            stack: List[Tuple[int, List[int], List[int]]] = [(start, [start], [])]
+            per_hop_counts = [0] * (hop_limit + 1)
+            while stack:
+                node, path, path_codes = stack.pop()
+                depth = len(path) - 1
+                if depth > hop_limit:
+                    continue
+                if depth >= 1 and kind_ok is not None and kind_ok[path[-1]]:
+                    key = tuple(path)
+                    if key not in seen_paths:
+                        path_ids = [node_ids[i] for i in path]
+                        if accept_path is None or accept_path(path_ids):
+                            seen_paths.add(key)
+                            results.append((path_ids, [labels[c] for c in path_codes]))
+                if depth == hop_limit:
+                    continue
+                if per_hop_counts[depth] >= max_results_per_hop:
+                    continue
+                per_hop_counts[depth] += 1
+
+                lo, hi = offsets[node], offsets[node + 1]
+                codes = metaedge_codes[lo:hi]
+                ok = label_ok[codes]
+                final_hop = depth + 1 == hop_limit
+                for neighbor, code in zip(targets[lo:hi][ok].tolist(), codes[ok].tolist()):
+                    if require_unique_nodes and neighbor in path:
+                        continue
+                    if final_hop and kind_ok is not None and not kind_ok[neighbor]:
+                        continue
+                    stack.append((neighbor, path + [neighbor], path_codes + [code]))
+        return results
+
+    def find_paths_with_pattern(self, start_node: str, pattern: List[Any], max_depth: int) -> List[Tuple[List[str], List[Any]]]:
+        """DFS روی یال‌هایی که relation آن‌ها در الگو است؛ معادل dfs_with_pattern"""
+        pattern_set = set(pattern)
+        label_ok = self._label_mask(lambda label: label in pattern_set)
+        edge_ok = label_ok[self.relation_codes]
+
+        offsets = self.offsets
+        targets = self.targets
+        relation_codes = self.relation_codes
+        labels = self.labels
+        node_ids = self.node_ids
+        pattern_len = len(pattern)
+        paths: List[Tuple[List[str], List[Any]]] = []
+
+        def visit(node: int, path: List[int], path_codes: List[int], depth: int):
+            if depth >= max_depth:
+                return
+            path.append(node)
+            if len(path_codes) == pattern_len:
+                paths.append(([node_ids[i] for i in path], [labels[c] for c in path_codes]))
+            lo, hi = offsets[node], offsets[node + 1]
+            ok = edge_ok[lo:hi]
+            for neighbor, code in zip(targets[lo:hi][ok].tolist(), relation_codes[lo:hi][ok].tolist()):
+                if neighbor not in path:
+                    visit(neighbor, path, path_codes + [code], depth + 1)
+            path.pop()
+
+        visit(self.index[start_node], [], [], 0)
+        return paths
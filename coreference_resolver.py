@@ -15,12 +15,9 @@
     NEURALCOREF_AVAILABLE = False
     logging.warning("neuralcoref not available for English. Install with: pip install neuralcoref")
 
-# Try to import spacy
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
+# spacy (only checked for availability; models come from the caller / nlp_models)
+from nlp_models import spacy_available
+SPACY_AVAILABLE = spacy_available()
 
 
 class CoreferenceResolver:
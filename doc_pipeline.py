@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Doc Pipeline - مرحله مشترک پردازش سند با spaCy
+
+پیش از این، استخراج متن طولانی یک متن را دست‌کم دو بار با کل pipeline پردازش می‌کرد:
+یک بار SmartChunker برای جدا کردن جملات و بار دیگر extract_spacy برای هر chunk.
+DocPipeline برای هر مدل spaCy یک مرحله مشترک فراهم می‌کند:
+
+- parse / doc: پردازش کامل دسته‌ای متن‌ها با nlp.pipe (batch_size و n_process) و
+  نگهداری Doc ها در یک کش LRU؛ extract_spacy، extract_spacy_svo_enhanced و
+  extract_joint_er همان Doc را دوباره استفاده می‌کنند.
+- sentences: جداسازی جملات با کمترین مؤلفه لازم؛ senter (حتی اگر در مدل غیرفعال
+  باشد) یا sentencizer، و در غیر این صورت parser با غیرفعال بودن ner، tagger و
+  lemmatizer. اگر Doc کامل متن از قبل در کش باشد از همان استفاده می‌شود.
+
+تنظیمات:
+    GRAPHRAG_SPACY_BATCH_SIZE   اندازه دسته nlp.pipe (پیش‌فرض: 64)
+    GRAPHRAG_SPACY_PROCESSES    n_process در nlp.pipe (پیش‌فرض: 1)
+    GRAPHRAG_SPACY_DOC_CACHE    تعداد Doc های نگهداری شده (پیش‌فرض: 1024)
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from bounded_cache import BoundedCache
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_DOC_CACHE = 1024
+
+# مؤلفه‌هایی که parser برای تعیین مرز جملات به آن‌ها نیاز دارد
+PARSER_COMPONENTS = ("tok2vec", "transformer", "parser")
+
+
+class DocPipeline:
+    """پردازش دسته‌ای و کش Doc های یک مدل spaCy برای chunker و استخراج‌کننده‌ها"""
+
+    def __init__(self, nlp, batch_size: Optional[int] = None, n_process: Optional[int] = None,
+                 cache_entries: Optional[int] = None):
+        """
+        Args:
+            nlp: مدل spaCy (از nlp_models.get_spacy_model)
+            batch_size: اندازه دسته nlp.pipe
+            n_process: تعداد فرایندهای nlp.pipe
+            cache_entries: تعداد Doc های کامل نگهداری شده
+        """
+        self.nlp = nlp
+        self.batch_size = batch_size or int(os.environ.get("GRAPHRAG_SPACY_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.n_process = n_process or int(os.environ.get("GRAPHRAG_SPACY_PROCESSES", 1))
+        self.docs = BoundedCache("spacy_docs", max_entries=cache_entries or int(
+            os.environ.get("GRAPHRAG_SPACY_DOC_CACHE", DEFAULT_DOC_CACHE)))
+        # تعداد متن‌های پردازش شده در هر مرحله
+        self.parsed = {"full": 0, "sentences": 0}
+
+    def parse(self, texts: Iterable[str]) -> List[Any]:
+        """Doc کامل هر متن (به همان ترتیب)؛ متن‌های جدید در یک nlp.pipe دسته‌ای پردازش می‌شوند"""
+        texts = list(texts)
+        docs: Dict[str, Any] = {}
+        for text in texts:
+            if text not in docs:
+                docs[text] = self.docs.get(text)
+        missing = [text for text, doc in docs.items() if doc is None]
+        if missing:
+            for text, doc in zip(missing, self.nlp.pipe(missing, batch_size=self.batch_size,
+                                                        n_process=self.n_process)):
+                self.docs.set(text, doc)
+                docs[text] = doc
+            self.parsed["full"] += len(missing)
+        return [docs[text] for text in texts]
+
+    def doc(self, text: str) -> Any:
+        """Doc کامل یک متن (از کش در صورت وجود)"""
+        return self.parse([text])[0]
+
+    def sentence_docs(self, texts: Iterable[str]) -> Optional[List[Any]]:
+        """Doc های دارای مرز جمله با کمترین مؤلفه لازم (None اگر مدل مرز جمله تعیین نکند)"""
+        texts = list(texts)
+        cached = [self.docs.get(text, count=False) for text in texts]
+        missing = [text for text, doc in zip(texts, cached) if doc is None]
+        parsed = iter(self._segment(missing) if missing else [])
+        if missing:
+            self.parsed["sentences"] += len(missing)
+        docs = [doc if doc is not None else next(parsed) for doc in cached]
+        return None if any(doc is None for doc in docs) else docs
+
+    def sentences(self, text: str) -> Optional[List[str]]:
+        """جملات متن؛ پاراگراف‌ها به صورت دسته‌ای پردازش می‌شوند (None اگر مدل مرز جمله تعیین نکند)"""
+        paragraphs = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
+        docs = self.sentence_docs(paragraphs)
+        if docs is None:
+            return None
+        return [sent.text.strip() for doc in docs for sent in doc.sents if sent.text.strip()]
+
+    def _segment(self, texts: List[str]) -> List[Optional[Any]]:
+        names = self.nlp.component_names  # شامل مؤلفه‌های غیرفعال
+        for name in ("senter", "sentencizer"):
+            if name in names:
+                # مؤلفه مستقیماً روی خروجی tokenizer اجرا می‌شود (senter در مدل‌های spaCy پیش‌فرض غیرفعال است)
+                component = self.nlp.get_pipe(name)
+                return list(component.pipe((self.nlp.make_doc(text) for text in texts),
+                                           batch_size=self.batch_size))
+        if "parser" in self.nlp.pipe_names:
+            disable = [name for name in self.nlp.pipe_names if name not in PARSER_COMPONENTS]
+            return list(self.nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process,
+                                      disable=disable))
+        logging.debug("spaCy model has no sentence boundary component")
+        return [None] * len(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"parsed": dict(self.parsed), "batch_size": self.batch_size, "n_process": self.n_process,
+                "docs": self.docs.stats()}
+
+
+_pipelines: Dict[int, tuple] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_doc_pipeline(nlp) -> Optional[DocPipeline]:
+    """DocPipeline مشترک فرایند برای مدل nlp (None اگر مدلی نباشد)"""
+    if nlp is None:
+        return None
+    with _pipelines_lock:
+        entry = _pipelines.get(id(nlp))
+        if entry is None or entry[0] is not nlp:
+            entry = _pipelines[id(nlp)] = (nlp, DocPipeline(nlp))
+        return entry[1]
@@ -15,7 +15,7 @@
 # اضافه کردن مسیر پروژه
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from node_lookup_system import NodeLookupSystem
+from node_lookup_system import NodeLookupSystem, get_node_lookup_system
 from graphrag_service import GraphNode, GraphEdge, RetrievalResult
 
 def remove_emojis(text: str) -> str:
@@ -104,7 +104,8 @@ class EnhancedContextGenerator:
     
     def __init__(self):
         """راه‌اندازی سیستم"""
-        self.lookup_system = NodeLookupSystem()
+        # نمونه مشترک: TSV نودها در هر فرایند یک‌بار خوانده می‌شود
+        self.lookup_system = get_node_lookup_system()
         print("✅ سیستم تولید متن زمینه بهبود یافته راه‌اندازی شد")
     
     def enhance_retrieval_result(self, retrieval_result: RetrievalResult) -> Dict[str, Any]:
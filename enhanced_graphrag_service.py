@@ -8,18 +8,18 @@
 import networkx as nx
 import numpy as np
 from enum import Enum
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 from collections import defaultdict
 import time
 import re
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, replace
 
-# Import new GraphRAG components
-from graphrag_new.search import KGSearch
-from graphrag_new.utils import get_entity_type2sampels, get_llm_cache, set_llm_cache
-from graphrag_new.query_analyze_prompt import PROMPTS
-from rag_new.nlp.search import Dealer, index_name
-from rag_new.utils.doc_store_conn import OrderByExpr
+from graph_snapshot import SNAPSHOT_EXTENSION, load_graph_snapshot, resolve_graph_path
+from graph_registry import GraphBoundAttribute, pins_graph
+from graph_centrality import CentralityService, centrality_cache_dir_for, personalized_pagerank
+from metaedge_weights import metaedge_edge_weight
+from bounded_cache import BoundedCache
 
 class TokenExtractionMethod(Enum):
     """روش‌های استخراج توکن"""
@@ -38,6 +38,7 @@ class RetrievalAlgorithm(Enum):
     HYBRID = "hybrid"
     SEMANTIC_SIMILARITY = "semantic_similarity"
     N_HOP = "n_hop"
+    PERSONALIZED_PAGERANK = "personalized_pagerank"
 
 
 class CommunityDetectionMethod(Enum):
@@ -62,24 +63,78 @@ class RetrievalConfig:
     enable_semantic_search: bool = True
     enable_community_detection: bool = True
     enable_n_hop_search: bool = True
+    ppr_epsilon: float = 1e-6
+    ppr_metaedge_weighting: bool = False
 
 class EnhancedGraphRAGService:
     """سرویس پیشرفته GraphRAG با قابلیت‌های جدید"""
+
+    # در طول یک درخواست پین‌شده، گراف از handle مشترک خوانده می‌شود
+    G = GraphBoundAttribute(lambda h: h.G)
+    graph_snapshot = GraphBoundAttribute(lambda h: h.snapshot)
+    centrality = GraphBoundAttribute(lambda h: h.centrality)
     
-    def __init__(self, graph_data_path: Optional[str] = None):
-        """راه‌اندازی سرویس"""
+    def __init__(self, graph_data_path: Optional[str] = None, graph_registry=None):
+        """راه‌اندازی سرویس
+
+        Args:
+            graph_data_path: مسیر فایل گراف
+            graph_registry: رجیستری گراف مشترک (GraphRegistry)؛ در صورت وجود جایگزین بارگذاری جداگانه می‌شود
+        """
+        self._graph_local = threading.local()
+        self._graph_handle = None
+        self.graph_registry = graph_registry
         self.G = None
+        self.graph_snapshot = None
+        # معیارهای مرکزیت کش‌شده (PageRank، درجه، closeness)
+        self.centrality = None
+        self._centrality_cache_dir = None
         self.kg_search = None
-        self.config = RetrievalConfig()
-        self.llm_cache = {}
-        
-        if graph_data_path:
+        # تنظیمات پایه و نسخه مخصوص درخواست در حال اجرا (به ازای هر thread)
+        self._config = RetrievalConfig()
+        self._options_local = threading.local()
+        # پاسخ‌های LLM به گراف فعلی وابسته‌اند: کش محدود که با تغییر گراف خالی می‌شود
+        self.llm_cache = BoundedCache('llm', max_entries=512, max_bytes=32 << 20, ttl=3600)
+        
+        if graph_registry is not None and graph_registry.current() is not None:
+            graph_registry.subscribe(self)
+        elif graph_data_path:
             self.load_graph(graph_data_path)
+
+    def attach_graph(self, handle):
+        """اتصال به handle گراف مشترک (فراخوانی توسط GraphRegistry)"""
+        self.G = handle.G
+        self.graph_snapshot = handle.snapshot
+        self.centrality = handle.centrality
+        self._graph_handle = handle
+        self.llm_cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """آمار hit/miss/eviction کش‌های سرویس"""
+        return {'caches': {'llm': self.llm_cache.stats()}}
+    
+    def _get_centrality(self) -> CentralityService:
+        """سرویس مرکزیت هماهنگ با گراف فعلی (در صورت تغییر گراف بازسازی می‌شود)"""
+        if self.centrality is None or not self.centrality.is_built_from(self.G):
+            self.centrality = CentralityService(self.G, cache_dir=self._centrality_cache_dir)
+        return self.centrality
+
+    def _pagerank_scores(self) -> Dict[str, float]:
+        """PageRank گراف با alpha پیکربندی (کش‌شده؛ در گراف مشترک بین سرویس‌ها مشترک است)"""
+        return self._get_centrality().pagerank(self.config.pagerank_alpha)
+
+    def _closeness(self, node: str) -> float:
+        """closeness نود؛ برای گراف ناهم‌بند صفر"""
+        return self._get_centrality().closeness().get(node, 0)
     
     def load_graph(self, graph_path: str):
         """بارگذاری گراف"""
         try:
-            if graph_path.endswith('.pkl'):
+            self._graph_handle = None
+            graph_path = resolve_graph_path(graph_path)
+            if graph_path.endswith(SNAPSHOT_EXTENSION):
+                self.G, self.graph_snapshot = load_graph_snapshot(graph_path)
+            elif graph_path.endswith('.pkl'):
                 import pickle
                 with open(graph_path, 'rb') as f:
                     self.G = pickle.load(f)
@@ -89,6 +144,11 @@ def load_graph(self, graph_path: str):
                 raise ValueError(f"فرمت فایل {graph_path} پشتیبانی نمی‌شود")
             
             logging.info(f"گراف با {self.G.number_of_nodes()} نود و {self.G.number_of_edges()} یال بارگذاری شد")
+            # محاسبه (یا بارگذاری از کش دیسک) معیارهای مرکزیت هنگام بارگذاری، نه در مسیر درخواست
+            self.centrality = None
+            self.llm_cache.clear()
+            self._centrality_cache_dir = centrality_cache_dir_for(graph_path)
+            self._get_centrality().warm(closeness=True)
             
         except Exception as e:
             logging.error(f"خطا در بارگذاری گراف: {e}")
@@ -117,38 +177,56 @@ def _load_sif_graph(self, sif_path: str) -> nx.Graph:
         
         return G
     
+    @property
+    def config(self) -> RetrievalConfig:
+        """تنظیمات مؤثر: نسخه مخصوص درخواست جاری (process_query با options) یا تنظیمات پایه"""
+        config = getattr(self._options_local, 'config', None)
+        return config if config is not None else self._config
+
+    @config.setter
+    def config(self, config: RetrievalConfig):
+        self._config = config
+
+    def request_config(self, **overrides) -> RetrievalConfig:
+        """نسخه جدید تنظیمات پایه با override‌های یک درخواست (تنظیمات پایه تغییر نمی‌کند)"""
+        values = {}
+        for key, value in overrides.items():
+            if not hasattr(self._config, key):
+                continue
+            if isinstance(value, str):
+                # تبدیل رشته به enum
+                if key == 'token_extraction_method':
+                    value = TokenExtractionMethod(value)
+                elif key == 'retrieval_algorithm':
+                    value = RetrievalAlgorithm(value)
+                elif key == 'community_detection_method':
+                    value = CommunityDetectionMethod(value)
+            values[key] = value
+        return replace(self._config, **values)
+
     def set_config(self, **kwargs):
-        """تنظیم پیکربندی"""
-        for key, value in kwargs.items():
-            if hasattr(self.config, key):
-                if isinstance(value, str):
-                    # تبدیل رشته به enum
-                    if key == 'token_extraction_method':
-                        setattr(self.config, key, TokenExtractionMethod(value))
-                    elif key == 'retrieval_algorithm':
-                        setattr(self.config, key, RetrievalAlgorithm(value))
-                    elif key == 'community_detection_method':
-                        setattr(self.config, key, CommunityDetectionMethod(value))
-                    else:
-                        setattr(self.config, key, value)
-                else:
-                    setattr(self.config, key, value)
+        """تنظیم پیکربندی پایه (برای همه درخواست‌های بعدی)"""
+        # جایگزینی کامل (copy-on-write) تا درخواست‌های در حال اجرا حالت نیمه‌کاره نبینند
+        self._config = self.request_config(**kwargs)
     
-    def get_config(self) -> Dict:
-        """دریافت پیکربندی فعلی"""
+    def get_config(self, options: Optional[Mapping[str, Any]] = None) -> Dict:
+        """دریافت پیکربندی فعلی (یا پیکربندی مؤثر یک درخواست با options)"""
+        config = self.request_config(**options) if options else self.config
         return {
-            'token_extraction_method': self.config.token_extraction_method.value,
-            'retrieval_algorithm': self.config.retrieval_algorithm.value,
-            'community_detection_method': self.config.community_detection_method.value,
-            'max_depth': self.config.max_depth,
-            'max_nodes': self.config.max_nodes,
-            'max_edges': self.config.max_edges,
-            'similarity_threshold': self.config.similarity_threshold,
-            'pagerank_alpha': self.config.pagerank_alpha,
-            'community_resolution': self.config.community_resolution,
-            'enable_semantic_search': self.config.enable_semantic_search,
-            'enable_community_detection': self.config.enable_community_detection,
-            'enable_n_hop_search': self.config.enable_n_hop_search
+            'token_extraction_method': config.token_extraction_method.value,
+            'retrieval_algorithm': config.retrieval_algorithm.value,
+            'community_detection_method': config.community_detection_method.value,
+            'max_depth': config.max_depth,
+            'max_nodes': config.max_nodes,
+            'max_edges': config.max_edges,
+            'similarity_threshold': config.similarity_threshold,
+            'pagerank_alpha': config.pagerank_alpha,
+            'community_resolution': config.community_resolution,
+            'enable_semantic_search': config.enable_semantic_search,
+            'enable_community_detection': config.enable_community_detection,
+            'enable_n_hop_search': config.enable_n_hop_search,
+            'ppr_epsilon': config.ppr_epsilon,
+            'ppr_metaedge_weighting': config.ppr_metaedge_weighting
         }
     
     def extract_tokens_llm(self, query: str) -> Tuple[List[str], List[str]]:
@@ -362,7 +440,7 @@ def pagerank_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
             return {}
         
         # محاسبه PageRank با تنظیمات بهینه
-        pagerank_scores = nx.pagerank(self.G, alpha=self.config.pagerank_alpha)
+        pagerank_scores = self._pagerank_scores()
         
         # فیلتر کردن نودهای ژن برای تمرکز بیشتر
         gene_nodes = {node: score for node, score in pagerank_scores.items() 
@@ -396,7 +474,7 @@ def pagerank_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
         # انتخاب نودهای برتر
         for node, score in sorted_nodes[:self.config.max_nodes]:
             node_type = 'gene' if self._is_gene_node(node) else 'other'
-            centrality = nx.closeness_centrality(self.G, node) if nx.is_connected(self.G) else 0
+            centrality = self._closeness(node)
             
             results['nodes'].append({
                 'id': node,
@@ -445,6 +523,57 @@ def pagerank_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
         
         return results
     
+    def personalized_pagerank_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
+        """بازیابی با PageRank شخصی‌سازی‌شده (random walk with restart) از نودهای شروع"""
+        if not self.G:
+            return {}
+        
+        seeds = [node for node in start_nodes if self.G.has_node(node)]
+        if not seeds:
+            # بدون نود شروع معتبر، رتبه‌بندی سراسری
+            return self.pagerank_retrieval(query, start_nodes)
+        
+        edge_weight = metaedge_edge_weight() if self.config.ppr_metaedge_weighting else None
+        scores, hops = personalized_pagerank(
+            self.G, seeds,
+            alpha=self.config.pagerank_alpha,
+            epsilon=self.config.ppr_epsilon,
+            edge_weight=edge_weight,
+        )
+        sorted_nodes = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:self.config.max_nodes]
+        
+        results = {
+            'nodes': [],
+            'edges': [],
+            'paths': [],
+            'seeds': seeds
+        }
+        
+        for node, score in sorted_nodes:
+            results['nodes'].append({
+                'id': node,
+                'pagerank': score,
+                'depth': hops[node],
+                'type': 'gene' if self._is_gene_node(node) else 'other',
+                'degree': self.G.degree(node),
+                'attributes': dict(self.G.nodes[node])
+            })
+        
+        # اضافه کردن یال‌های بین نودهای انتخاب‌شده
+        selected = {node for node, _ in sorted_nodes}
+        for node, _ in sorted_nodes:
+            for neighbor in self.G.neighbors(node):
+                if neighbor in selected:
+                    edge_data = self.G.get_edge_data(node, neighbor)
+                    results['edges'].append({
+                        'source': node,
+                        'target': neighbor,
+                        'relation': edge_data.get('relation', edge_data.get('metaedge', '')),
+                        'weight': edge_data.get('weight', 1.0)
+                    })
+        
+        return results
+    
     def community_detection_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
         """بازیابی با تشخیص جامعه"""
         if not self.G:
@@ -629,7 +758,7 @@ def n_hop_retrieval(self, query: str, start_nodes: List[str]) -> Dict:
                     'node': node_id,
                     'importance': importance,
                     'degree': self.G.degree(node_id),
-                    'centrality': nx.closeness_centrality(self.G, node_id) if nx.is_connected(self.G) else 0
+                    'centrality': self._closeness(node_id)
                 })
             
             # مرتب‌سازی بر اساس اهمیت
@@ -691,7 +820,7 @@ def _calculate_node_importance(self, node: str) -> float:
         
         # عوامل مختلف
         degree = self.G.degree(node)
-        centrality = nx.closeness_centrality(self.G, node) if nx.is_connected(self.G) else 0
+        centrality = self._closeness(node)
         
         # اهمیت زیستی
         biological_importance = 1.0 if self._is_gene_node(node) else 0.5
@@ -808,8 +937,26 @@ def _calculate_node_score(self, node_info: Dict) -> float:
         
         return score
     
-    def process_query(self, query: str, start_nodes: Optional[List[str]] = None) -> Dict:
-        """پردازش سوال و بازیابی نتایج"""
+    def process_query(self, query: str, start_nodes: Optional[List[str]] = None,
+                      options: Optional[Mapping[str, Any]] = None) -> Dict:
+        """پردازش سوال و بازیابی نتایج
+
+        Args:
+            options: override‌های تنظیمات فقط برای همین درخواست (مثلاً retrieval_algorithm و
+                max_nodes)؛ تنظیمات مشترک سرویس تغییر نمی‌کند
+        """
+        if options is None:
+            return self._process_query(query, start_nodes)
+        local = self._options_local
+        previous = getattr(local, 'config', None)
+        local.config = self.request_config(**options)
+        try:
+            return self._process_query(query, start_nodes)
+        finally:
+            local.config = previous
+
+    @pins_graph
+    def _process_query(self, query: str, start_nodes: Optional[List[str]] = None) -> Dict:
         if not self.G:
             return {'error': 'گراف بارگذاری نشده است'}
         
@@ -827,6 +974,8 @@ def process_query(self, query: str, start_nodes: Optional[List[str]] = None) ->
             results = self.dfs_retrieval(query, start_nodes)
         elif self.config.retrieval_algorithm == RetrievalAlgorithm.PAGERANK:
             results = self.pagerank_retrieval(query, start_nodes)
+        elif self.config.retrieval_algorithm == RetrievalAlgorithm.PERSONALIZED_PAGERANK:
+            results = self.personalized_pagerank_retrieval(query, start_nodes)
         elif self.config.retrieval_algorithm == RetrievalAlgorithm.COMMUNITY_DETECTION:
             results = self.community_detection_retrieval(query, start_nodes)
         elif self.config.retrieval_algorithm == RetrievalAlgorithm.SEMANTIC_SIMILARITY:
@@ -852,6 +1001,7 @@ def process_query(self, query: str, start_nodes: Optional[List[str]] = None) ->
         
         return results
     
+    @pins_graph
     def get_graph_statistics(self) -> Dict:
         """دریافت آمار گراف"""
         if not self.G:
@@ -864,7 +1014,7 @@ def get_graph_statistics(self) -> Dict:
             'edge_types': self._get_edge_type_distribution(),
             'density': nx.density(self.G),
             'average_clustering': nx.average_clustering(self.G),
-            'average_shortest_path': nx.average_shortest_path_length(self.G) if nx.is_connected(self.G) else None
+            'average_shortest_path': nx.average_shortest_path_length(self.G) if self._get_centrality().is_connected() else None
         }
     
     def _get_node_type_distribution(self) -> Dict:
@@ -1426,7 +1576,7 @@ def _rank_nodes_by_importance(self, nodes: List[str]) -> List[str]:
             
             # امتیاز بر اساس مرکزیت
             try:
-                centrality = nx.degree_centrality(self.G)[node]
+                centrality = self._get_centrality().degree_centrality()[node]
                 score += centrality * 5.0
             except:
                 pass
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction Cache - کش پایدار و content-addressed نتایج استخراج گراف
+
+بارگذاری دوباره همان متن (یا همان URL در process_url_to_graph) کل پایپ‌لاین استخراج،
+از جمله درخواست‌های پولی LLM در extract_llm، extract_llm_multipass، extract_edc و
+extract_autoregressive را دوباره اجرا می‌کرد. TextToGraphService.extract اکنون نتیجه
+هر استخراج را با کلیدی از این اجزا ذخیره می‌کند:
+
+    hash متن نرمال‌شده (NFC، پایان خط یکسان، بدون فاصله انتهای خطوط و دو سر متن)
+    روش استخراج، نام مدل‌ها (spaCy و LLM)، پرچم‌های پیش‌پردازش و زبان
+    سایر پارامترها از جمله max_entities و max_relationships
+
+کش در دو سطح کار می‌کند چون extract_long_text و extract_incremental هر chunk را با
+همان extract استخراج می‌کنند: کل سند یک مدخل دارد و هر chunk مدخل خودش را؛ با
+ویرایش یک پاراگراف فقط chunk های تغییرکرده دوباره استخراج می‌شوند.
+
+backend یک فایل SQLite (حالت WAL، قابل اشتراک بین فرایندها و workerهای fork شده)
+است. حجم کل نتایج محدود است و هنگام پر شدن، مدخل‌هایی که دیرتر از همه استفاده
+شده‌اند حذف می‌شوند.
+
+تنظیم با متغیرهای محیطی:
+    GRAPHRAG_EXTRACTION_CACHE          مسیر فایل SQLite یا off (پیش‌فرض: .extraction_cache/extractions.sqlite)
+    GRAPHRAG_EXTRACTION_CACHE_MAX_MB   سقف حجم نتایج ذخیره‌شده (پیش‌فرض: 512)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+EXTRACTION_CACHE_DIRNAME = ".extraction_cache"
+DEFAULT_MAX_MB = 512
+# با تغییر قالب خروجی استخراج‌کننده‌ها افزایش یابد تا مدخل‌های قدیمی استفاده نشوند
+EXTRACTION_CACHE_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """نرمال‌سازی متن برای کلید کش (تغییرات بی‌اثر بر استخراج مثل CRLF و فاصله انتهای خط)"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def extraction_key(text: str, method: str, params: Dict[str, Any]) -> str:
+    """کلید content-addressed یک استخراج"""
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    payload = json.dumps([EXTRACTION_CACHE_VERSION, text_hash, method, params],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _jsonable(value: Any) -> Any:
+    # اعداد numpy (مثلاً confidence مدل‌های HuggingFace) و مجموعه‌ها
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ExtractionCache:
+    """کش SQLite نتایج استخراج با حذف LRU بر اساس حجم"""
+
+    def __init__(self, path: str = ":memory:", max_bytes: Optional[int] = DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            path: فایل SQLite
+            max_bytes: سقف حجم کل نتایج (JSON)؛ None = بدون سقف
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = None
+        self._pid = None
+        self._connect()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._pid = os.getpid()
+        if self.path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY, method TEXT, result TEXT, size INTEGER,
+                created REAL, last_used REAL, hits INTEGER DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used);
+        """)
+        self._db.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # اتصال SQLite نباید بین فرایندهای fork شده مشترک باشد
+        if self._pid != os.getpid() and self.path != ":memory:":
+            self._connect()
+        return self._db
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """نتیجه ذخیره‌شده (نسخه جدید از JSON) یا None"""
+        try:
+            with self._lock:
+                db = self._conn()
+                row = db.execute("SELECT result FROM extractions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE extractions SET hits = hits + 1, last_used = ? WHERE key = ?",
+                               (time.time(), key))
+                    db.commit()
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در خواندن کش استخراج: {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, result: Dict[str, Any], method: str = ""):
+        try:
+            payload = json.dumps(result, ensure_ascii=False, default=_jsonable)
+        except (TypeError, ValueError) as e:
+            logging.debug(f"Extraction result not cached ({method}): {e}")
+            return
+        size = len(payload.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._conn()
+                db.execute("INSERT OR REPLACE INTO extractions (key, method, result, size, created, last_used) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", (key, method, payload, size, now, now))
+                self._evict(db)
+                db.commit()
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در نوشتن کش استخراج: {e}")
+
+    def _evict(self, db: sqlite3.Connection):
+        if self.max_bytes is None:
+            return
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in db.execute("SELECT key, size FROM extractions ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        db.executemany("DELETE FROM extractions WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM extractions")
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, total = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'errors': self.errors,
+        }
+
+
+_default_cache: Optional[ExtractionCache] = None
+_default_cache_lock = threading.Lock()
+_default_cache_disabled = False
+
+
+def default_extraction_cache_path() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), EXTRACTION_CACHE_DIRNAME, "extractions.sqlite")
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """کش مشترک فرایند بر اساس متغیرهای محیطی (None اگر GRAPHRAG_EXTRACTION_CACHE=off)"""
+    global _default_cache, _default_cache_disabled
+    if _default_cache is None and not _default_cache_disabled:
+        with _default_cache_lock:
+            if _default_cache is None and not _default_cache_disabled:
+                path = os.environ.get("GRAPHRAG_EXTRACTION_CACHE") or default_extraction_cache_path()
+                if path.lower() == "off":
+                    _default_cache_disabled = True
+                    return None
+                max_mb = float(os.environ.get("GRAPHRAG_EXTRACTION_CACHE_MAX_MB", DEFAULT_MAX_MB))
+                _default_cache = ExtractionCache(path, max_bytes=int(max_mb * 1024 * 1024))
+    return _default_cache
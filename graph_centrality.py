@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Graph Centrality - محاسبه و کش معیارهای مرکزیت گراف روی ماتریس‌های اسپارس SciPy
+
+CentralityService برای یک گراف ماتریس مجاورت CSR را یک‌بار می‌سازد و PageRank،
+درجه و نزدیکی (closeness؛ دقیق برای گراف‌های کوچک و تقریبی با نمونه‌گیری pivot
+برای گراف‌های بزرگ) را به‌صورت برداری محاسبه می‌کند. نتایج با کلید هش محتوای
+گراف روی دیسک ذخیره می‌شوند تا بارگذاری بعدی همان گراف هزینه محاسبه نداشته باشد.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+# scipy.sparse (~0.3s import) تنها هنگام ساخت ماتریس‌ها یا فراخوانی توابع csgraph زیر import می‌شود
+
+# پوشه کش در کنار فایل گراف ساخته می‌شود
+CENTRALITY_CACHE_DIRNAME = ".centrality_cache"
+# تا این اندازه closeness دقیق (همه جفت‌ها) محاسبه می‌شود
+EXACT_CLOSENESS_MAX_NODES = 2000
+# تعداد pivotها برای تخمین closeness در گراف‌های بزرگ
+CLOSENESS_PIVOTS = 64
+# سقف تعداد push در PageRank شخصی‌سازی‌شده محلی
+PPR_MAX_PUSHES = 200000
+
+
+def connected_components(*args, **kwargs):
+    from scipy.sparse.csgraph import connected_components as _connected_components
+    return _connected_components(*args, **kwargs)
+
+
+def shortest_path(*args, **kwargs):
+    from scipy.sparse.csgraph import shortest_path as _shortest_path
+    return _shortest_path(*args, **kwargs)
+
+
+def centrality_cache_dir_for(graph_path: str) -> str:
+    """مسیر پوشه کش مرکزیت برای یک فایل گراف"""
+    return os.path.join(os.path.dirname(os.path.abspath(graph_path)), CENTRALITY_CACHE_DIRNAME)
+
+
+class CentralityService:
+    """معیارهای مرکزیت یک گراف با کش حافظه و دیسک"""
+
+    def __init__(self, G, cache_dir: Optional[str] = None):
+        self.graph = G
+        self.cache_dir = cache_dir
+        self.node_ids: List[str] = list(G.nodes())
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self._number_of_edges = G.number_of_edges()
+        self.directed = G.is_directed()
+        # مجموع وزن یال‌های موازی (مانند nx.pagerank)
+        self.adjacency = nx.to_scipy_sparse_array(G, nodelist=self.node_ids, weight='weight', dtype=float, format='csr')
+        self.fingerprint = self._fingerprint()
+        self._lock = threading.Lock()
+        self._arrays: Dict[str, np.ndarray] = self._load_cache()
+        self._dicts: Dict[str, Dict[str, float]] = {}
+        self._is_connected = None
+        self._transition = None
+
+    def _fingerprint(self) -> str:
+        """هش محتوای گراف (شناسه نودها به ترتیب، ساختار و وزن یال‌ها)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(b"D" if self.directed else b"U")
+        h.update("\0".join(map(str, self.node_ids)).encode("utf-8"))
+        for array in (self.adjacency.indptr, self.adjacency.indices, self.adjacency.data):
+            h.update(np.ascontiguousarray(array).tobytes())
+        return h.hexdigest()
+
+    def is_built_from(self, G) -> bool:
+        return (self.graph is G and len(self.node_ids) == G.number_of_nodes()
+                and self._number_of_edges == G.number_of_edges())
+
+    # ---- کش دیسک ----
+
+    def _cache_path(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{self.fingerprint}.npz")
+
+    def _load_cache(self) -> Dict[str, np.ndarray]:
+        path = self._cache_path()
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+            if any(len(array) != len(self.node_ids) for array in arrays.values()):
+                return {}
+            return arrays
+        except Exception as e:
+            logging.warning(f"خطا در خواندن کش مرکزیت {path}: {e}")
+            return {}
+
+    def _save_cache(self):
+        path = self._cache_path()
+        if not path:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **self._arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"خطا در ذخیره کش مرکزیت {path}: {e}")
+
+    def _metric(self, key: str, compute) -> np.ndarray:
+        array = self._arrays.get(key)
+        if array is not None:
+            return array
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is None:
+                array = compute()
+                self._arrays[key] = array
+                self._save_cache()
+        return array
+
+    def _as_dict(self, key: str, array: np.ndarray) -> Dict[str, float]:
+        result = self._dicts.get(key)
+        if result is None:
+            result = dict(zip(self.node_ids, array.tolist()))
+            self._dicts[key] = result
+        return result
+
+    # ---- PageRank ----
+
+    def _transition_matrix(self):
+        """ماتریس انتقال سطری‌نرمال‌شده و نودهای بدون یال خروجی"""
+        if self._transition is None:
+            out_weight = np.asarray(self.adjacency.sum(axis=1)).ravel()
+            inverse = np.zeros_like(out_weight)
+            nonzero = out_weight != 0
+            inverse[nonzero] = 1.0 / out_weight[nonzero]
+            import scipy.sparse as sp
+            Q = sp.diags_array(inverse, format='csr') @ self.adjacency
+            self._transition = (Q.T.tocsr(), np.flatnonzero(~nonzero))
+        return self._transition
+
+    def power_iteration(self, alpha: float = 0.85, personalization: Optional[np.ndarray] = None,
+                        max_iter: int = 100, tol: float = 1.0e-6) -> np.ndarray:
+        """
+        تکرار توانی PageRank (همان روش nx.pagerank) با بردار شخصی‌سازی اختیاری
+
+        Args:
+            personalization: بردار احتمال پرش (جمع 1)؛ None = یکنواخت
+        """
+        n = len(self.node_ids)
+        if n == 0:
+            return np.zeros(0)
+        QT, dangling = self._transition_matrix()
+        p = np.full(n, 1.0 / n) if personalization is None else personalization
+        x = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            x_last = x
+            x = alpha * (QT @ x + x[dangling].sum() * p) + (1 - alpha) * p
+            if np.abs(x - x_last).sum() < n * tol:
+                break
+        return x
+
+    def pagerank_array(self, alpha: float = 0.85) -> np.ndarray:
+        return self._metric(f"pagerank_{alpha:g}", lambda: self.power_iteration(alpha))
+
+    def pagerank(self, alpha: float = 0.85) -> Dict[str, float]:
+        """PageRank سراسری {node_id: score}"""
+        return self._as_dict(f"pagerank_{alpha:g}", self.pagerank_array(alpha))
+
+    # ---- درجه ----
+
+    def degree(self) -> Dict[str, int]:
+        array = self._metric("degree", lambda: np.array([d for _, d in self.graph.degree(self.node_ids)], dtype=np.int64))
+        return self._as_dict("degree", array)
+
+    def degree_centrality(self) -> Dict[str, float]:
+        """مانند nx.degree_centrality"""
+        n = len(self.node_ids)
+        if n <= 1:
+            return {node_id: 1.0 for node_id in self.node_ids}
+        degree = self._metric("degree", lambda: np.array([d for _, d in self.graph.degree(self.node_ids)], dtype=np.int64))
+        return self._as_dict("degree_centrality", degree * (1.0 / (n - 1)))
+
+    # ---- نزدیکی ----
+
+    def is_connected(self) -> bool:
+        """هم‌بندی گراف بدون جهت (برای گراف جهت‌دار همیشه False)"""
+        if self._is_connected is None:
+            self._is_connected = (not self.directed and len(self.node_ids) > 0
+                                  and connected_components(self.adjacency, directed=False)[0] == 1)
+        return self._is_connected
+
+    def _compute_closeness(self) -> np.ndarray:
+        n = len(self.node_ids)
+        if n <= EXACT_CLOSENESS_MAX_NODES:
+            pivots = np.arange(n)
+        else:
+            pivots = np.random.default_rng(0).choice(n, size=CLOSENESS_PIVOTS, replace=False)
+        distances = shortest_path(self.adjacency, directed=self.directed, unweighted=True, indices=pivots)
+        distances[np.isinf(distances)] = 0
+        totals = distances.sum(axis=0)
+        # pivotهای غیر از خود نود؛ با همه نودها به عنوان pivot برابر (n-1)/Σd است
+        others = np.full(n, len(pivots), dtype=float)
+        others[pivots] -= 1
+        closeness = np.zeros(n)
+        positive = totals > 0
+        closeness[positive] = others[positive] / totals[positive]
+        return closeness
+
+    def closeness(self) -> Dict[str, float]:
+        """
+        closeness برای گراف هم‌بند بدون جهت (دقیق تا EXACT_CLOSENESS_MAX_NODES نود، سپس تقریبی)
+
+        برای گراف ناهم‌بند یا جهت‌دار صفر برمی‌گرداند، همان قراردادی که سرویس‌ها پیش‌تر
+        با بررسی nx.is_connected داشتند.
+        """
+        if not self.is_connected():
+            return self._as_dict("closeness_zero", np.zeros(len(self.node_ids)))
+        return self._as_dict("closeness", self._metric("closeness", self._compute_closeness))
+
+    def betweenness(self, k: int = 64) -> Dict[str, float]:
+        """betweenness تقریبی با نمونه‌گیری k نود منبع (nx) - کش‌شده"""
+        k = min(k, len(self.node_ids))
+        compute = lambda: np.array([value for value in nx.betweenness_centrality(self.graph, k=k, seed=0).values()])
+        return self._as_dict(f"betweenness_{k}", self._metric(f"betweenness_{k}", compute))
+
+    def warm(self, closeness: bool = False):
+        """محاسبه/بارگذاری پیشاپیش معیارها هنگام بارگذاری گراف (نه در مسیر درخواست)"""
+        self.pagerank()
+        self.degree()
+        if closeness:
+            self.closeness()
+        return self
+
+
+def personalized_pagerank(G, seeds: Iterable[str], alpha: float = 0.85, epsilon: float = 1.0e-6,
+                          edge_weight: Optional[Callable[[Dict[str, Any]], float]] = None,
+                          max_pushes: int = PPR_MAX_PUSHES) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    PageRank شخصی‌سازی‌شده (random walk with restart) با روش push محلی (Andersen-Chung-Lang)
+
+    فقط نودهایی لمس می‌شوند که جرم باقی‌مانده آن‌ها از epsilon × درجه بیشتر شود، بنابراین
+    هزینه به همسایگی محلی نودهای seed بستگی دارد نه به اندازه کل گراف. احتمال ادامه
+    قدم زدن alpha و احتمال بازگشت به seedها 1 - alpha است.
+
+    Args:
+        seeds: نودهای شروع (توزیع بازگشت یکنواخت روی آن‌ها)
+        edge_weight: وزن یال از روی داده یال (None = ویژگی weight با پیش‌فرض 1)
+
+    Returns:
+        (امتیاز PPR هر نود لمس‌شده، فاصله گامی هنگام کشف نود از نزدیک‌ترین seed)
+    """
+    seeds = [seed for seed in dict.fromkeys(seeds) if seed in G]
+    if not seeds:
+        return {}, {}
+    weight_of = edge_weight or (lambda data: data.get('weight', 1.0))
+    multigraph = G.is_multigraph()
+    restart = 1.0 / len(seeds)
+    scores: Dict[str, float] = {}
+    residual: Dict[str, float] = {seed: restart for seed in seeds}
+    hops: Dict[str, int] = {seed: 0 for seed in seeds}
+    out_edges_cache: Dict[str, Tuple[List[Tuple[str, float]], float]] = {}
+
+    def out_edges(node):
+        cached = out_edges_cache.get(node)
+        if cached is None:
+            edges = []
+            for neighbor, data in G.adj[node].items():
+                w = sum(weight_of(d) for d in data.values()) if multigraph else weight_of(data)
+                if w > 0:
+                    edges.append((neighbor, w))
+            cached = out_edges_cache[node] = (edges, sum(w for _, w in edges))
+        return cached
+
+    queue = deque(seeds)
+    queued = set(seeds)
+    pushes = 0
+    while queue and pushes < max_pushes:
+        node = queue.popleft()
+        queued.discard(node)
+        mass = residual.get(node, 0.0)
+        edges, total = out_edges(node)
+        if mass <= epsilon * max(len(edges), 1):
+            continue
+        pushes += 1
+        residual[node] = 0.0
+        scores[node] = scores.get(node, 0.0) + (1 - alpha) * mass
+        # نود بدون یال خروجی: قدم زن به seedها برمی‌گردد
+        targets = [(neighbor, w / total) for neighbor, w in edges] if total > 0 else [(seed, restart) for seed in seeds]
+        for neighbor, share in targets:
+            residual[neighbor] = residual.get(neighbor, 0.0) + alpha * mass * share
+            if neighbor not in hops:
+                hops[neighbor] = hops[node] + 1
+            if neighbor not in queued and residual[neighbor] > epsilon * max(len(G.adj[neighbor]), 1):
+                queue.append(neighbor)
+                queued.add(neighbor)
+    return scores, {node: hops[node] for node in scores}
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Graph Indices - ایندکس‌های کمکی گراف برای تطبیق سریع نام‌ها و جستجوهای معکوس
+"""
+
+import heapq
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# نگاشت ژن‌های مشهور و نام‌های مختلف آنها
+FAMOUS_GENE_SYNONYMS: Dict[str, List[str]] = {
+    'tp53': ['TP53', 'P53', 'p53', 'Tumor Protein P53', 'Tumor Suppressor P53'],
+    'brca1': ['BRCA1', 'Breast Cancer 1', 'BRCA1 Gene'],
+    'brca2': ['BRCA2', 'Breast Cancer 2', 'BRCA2 Gene'],
+    'apoe': ['APOE', 'Apolipoprotein E', 'APOE Gene'],
+    'cftr': ['CFTR', 'Cystic Fibrosis Transmembrane Conductance Regulator'],
+    'mmp9': ['MMP9', 'Matrix Metallopeptidase 9'],
+    'bid': ['BID', 'BH3 Interacting Domain Death Agonist'],
+    'kcnq2': ['KCNQ2', 'Potassium Voltage-Gated Channel Subfamily Q Member 2'],
+    'hmgb3': ['HMGB3', 'High Mobility Group Box 3']
+}
+
+class AhoCorasick:
+    """خودکاره Aho-Corasick برای یافتن هم‌زمان همه الگوها در یک گذر روی متن"""
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            self.add(pattern)
+        self.build()
+
+    def add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if pattern not in self._output[state]:
+            self._output[state].append(pattern)
+
+    def build(self):
+        """محاسبه پیوندهای شکست (BFS روی trie)"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, str]]:
+        """(اندیس پایان، الگو) برای همه رخدادهای الگوها در متن"""
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield i, pattern
+
+
+class NodeIndex:
+    """
+    ایندکس‌های نام و نوع نودها برای تطبیق سریع توکن‌ها با نودها
+
+    علاوه بر نگاشت‌های نام/نوع، یک ایندکس سه‌حرفی (trigram) روی نام‌های کوچک‌شده
+    نگه می‌دارد تا پرسش «اولین نود (به ترتیب گراف) که نامش شامل رشته است» بدون
+    پیمایش همه نودها پاسخ داده شود، و مترادف‌های ژن‌های مشهور را با یک خودکاره
+    Aho-Corasick روی نام ژن‌ها حل می‌کند.
+    """
+
+    def __init__(self, G=None, synonyms: Optional[Dict[str, List[str]]] = None):
+        self.graph = G
+        self.name_to_ids: Dict[str, List[str]] = {}
+        self.id_to_name: Dict[str, str] = {}
+        self.kind_to_ids: Dict[str, List[str]] = {}
+        self.name_entries: List[Tuple[str, str]] = []  # [(lower_name, node_id)] برای fallback فازی سبک
+        # به ترتیب نودهای گراف؛ «موقعیت» یک نود اندیس آن در node_ids است
+        self.node_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        # مقدار خام attrs.get('name', '') (بدون جایگزینی با شناسه نود)
+        self._raw_names: List[str] = []
+        self._kinds: List[str] = []
+        self._is_gene = bytearray()
+        self._gene_upper_to_position: Dict[str, int] = {}
+        self._raw_lower_to_positions: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, array] = {}
+        self.synonyms = FAMOUS_GENE_SYNONYMS if synonyms is None else synonyms
+        self._synonym_patterns = {variant.upper() for variants in self.synonyms.values() for variant in variants}
+        self._synonym_automaton = AhoCorasick(self._synonym_patterns)
+        self._first_gene_containing: Dict[str, int] = {}
+        # خودکاره نام‌های خام هر نوع برای first_named_within (ساخت در اولین استفاده)
+        self._name_automata: Dict[Optional[str], Tuple[AhoCorasick, Dict[str, int]]] = {}
+        if G is not None:
+            for node_id, attrs in G.nodes(data=True):
+                self.add_node(node_id, attrs)
+
+    def add_node(self, node_id: str, attrs: Dict[str, Any]):
+        """افزودن یک نود به ایندکس‌های نام و نوع"""
+        name = str(attrs.get('name', node_id))
+        kind = str(attrs.get('kind', 'Unknown'))
+        self.id_to_name[node_id] = name
+        lower_name = name.lower()
+        self.name_to_ids.setdefault(lower_name, []).append(node_id)
+        self.kind_to_ids.setdefault(kind, []).append(node_id)
+        # ورودی برای جستجوی شامل ساده
+        self.name_entries.append((lower_name, node_id))
+
+        position = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.positions.setdefault(node_id, position)
+        raw_name = attrs.get('name', '')
+        raw_name = raw_name if isinstance(raw_name, str) else str(raw_name)
+        self._raw_names.append(raw_name.lower())
+        self._kinds.append(kind)
+        is_gene = attrs.get('kind') == 'Gene'
+        self._is_gene.append(is_gene)
+        if raw_name:
+            self._raw_lower_to_positions.setdefault(raw_name.lower(), []).append(position)
+            self._name_automata.pop(kind, None)
+            self._name_automata.pop(None, None)
+        if is_gene and raw_name:
+            upper_name = raw_name.upper()
+            self._gene_upper_to_position.setdefault(upper_name, position)
+            for _, pattern in self._synonym_automaton.iter_matches(upper_name):
+                self._first_gene_containing.setdefault(pattern, position)
+        for trigram in {lower_name[i:i + 3] for i in range(len(lower_name) - 2)}:
+            postings = self._trigrams.get(trigram)
+            if postings is None:
+                postings = self._trigrams[trigram] = array('i')
+            postings.append(position)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def is_built_from(self, G) -> bool:
+        return self.graph is G and len(self.node_ids) == G.number_of_nodes()
+
+    def raw_name(self, position: int) -> str:
+        """نام کوچک‌شده خام نود (رشته خالی برای نود بدون نام)"""
+        return self._raw_names[position]
+
+    def kind(self, position: int) -> str:
+        return self._kinds[position]
+
+    def is_gene(self, position: int) -> bool:
+        """آیا kind خام نود دقیقاً 'Gene' است"""
+        return bool(self._is_gene[position])
+
+    def _candidate_positions(self, subs: List[str], limit: int) -> Iterable[int]:
+        """موقعیت‌های کاندید (صعودی) برای نودهایی که ممکن است شامل همه زیررشته‌ها باشند"""
+        best = None
+        for sub in subs:
+            for i in range(len(sub) - 2):
+                postings = self._trigrams.get(sub[i:i + 3])
+                if postings is None:
+                    return ()
+                if best is None or len(postings) < len(best):
+                    best = postings
+        if best is None:
+            # زیررشته‌های کوتاه‌تر از سه حرف: پیمایش خطی
+            return range(limit)
+        return best
+
+    def first_containing(self, subs: List[str], raw: bool = True, limit: Optional[int] = None,
+                         predicate: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """
+        موقعیت اولین نود (به ترتیب گراف) که نام کوچک‌شده‌اش شامل همه زیررشته‌های subs است
+
+        Args:
+            subs: زیررشته‌های کوچک‌شده
+            raw: مقایسه با نام خام (attrs.get('name', '')) به جای نام ایندکس‌شده
+            limit: فقط موقعیت‌های کوچک‌تر از limit
+            predicate: شرط اضافه روی موقعیت نود
+        """
+        limit = len(self.node_ids) if limit is None else min(limit, len(self.node_ids))
+        for position in self._candidate_positions(subs, limit):
+            if position >= limit:
+                break
+            name = self._raw_names[position] if raw else self.name_entries[position][0]
+            if all(sub in name for sub in subs) and (predicate is None or predicate(position)):
+                return position
+        return None
+
+    def gene_by_exact_name(self, name: str) -> Optional[int]:
+        """موقعیت اولین ژن با نام دقیق (بدون حساسیت به حروف بزرگ/کوچک)"""
+        return self._gene_upper_to_position.get(name.upper())
+
+    def gene_containing_synonym(self, variant: str) -> Optional[int]:
+        """موقعیت اولین ژنی که نامش شامل مترادف variant است"""
+        variant = variant.upper()
+        if variant in self._synonym_patterns:
+            return self._first_gene_containing.get(variant)
+        return self.first_containing([variant.lower()], predicate=self.is_gene)
+
+    def first_named_within(self, text: str, kind: Optional[str] = None, limit: Optional[int] = None) -> Optional[int]:
+        """
+        موقعیت اولین نود (به ترتیب گراف) که نام خام غیرخالی آن زیررشته‌ای از text است
+
+        نام‌ها با یک گذر خودکاره Aho-Corasick روی text پیدا می‌شوند؛ خودکاره هر نوع
+        در اولین استفاده ساخته و با افزودن نود هم‌نوع باطل می‌شود.
+
+        Args:
+            text: متن کوچک‌شده
+            kind: فقط نودهای این نوع (None = همه نودها)
+            limit: فقط موقعیت‌های کوچک‌تر از limit
+        """
+        automaton, first_positions = self._name_automaton(kind)
+        best = None
+        for _, name in automaton.iter_matches(text):
+            position = first_positions[name]
+            if best is None or position < best:
+                best = position
+        if best is None or (limit is not None and best >= limit):
+            return None
+        return best
+
+    def _name_automaton(self, kind: Optional[str]) -> Tuple[AhoCorasick, Dict[str, int]]:
+        entry = self._name_automata.get(kind)
+        if entry is None:
+            first_positions = {}
+            for name, positions in self._raw_lower_to_positions.items():
+                for position in positions:
+                    if kind is None or self._kinds[position] == kind:
+                        first_positions[name] = position
+                        break
+            entry = self._name_automata[kind] = (AhoCorasick(first_positions), first_positions)
+        return entry
+
+
+class ReverseEdgeIndex:
+    """
+    ایندکس یال‌های ورودی با کلید (نود مقصد، metaedge)
+
+    برای هر کلید، نودهای مبدأ به ترتیب نودهای گراف نگهداری می‌شوند تا خروجی
+    همان ترتیبی را داشته باشد که پیمایش کامل G.nodes() تولید می‌کرد.
+    """
+
+    def __init__(self, G=None):
+        self.graph = None
+        self._incoming: Dict[Tuple[str, Any], List[str]] = {}
+        self._positions: Dict[str, int] = {}
+        if G is not None:
+            self.build(G)
+
+    def build(self, G):
+        """ساخت کامل ایندکس از روی گراف"""
+        self.graph = G
+        self._incoming = {}
+        self._positions = {node_id: i for i, node_id in enumerate(G.nodes())}
+        for source, neighbors in G.adj.items():
+            for target, edge_data in neighbors.items():
+                for data in self._edge_data_items(G, edge_data):
+                    metaedge = data.get('metaedge')
+                    if not metaedge:
+                        continue
+                    sources = self._incoming.setdefault((target, metaedge), [])
+                    if not sources or sources[-1] != source:
+                        sources.append(source)
+
+    @staticmethod
+    def _edge_data_items(G, edge_data: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        # در MultiGraph هر جفت نود چند یال (کلیددار) دارد
+        return edge_data.values() if G.is_multigraph() else (edge_data,)
+
+    def is_built_from(self, G) -> bool:
+        return self.graph is G
+
+    def _position(self, node_id: str) -> int:
+        position = self._positions.get(node_id)
+        if position is None:
+            position = len(self._positions)
+            self._positions[node_id] = position
+        return position
+
+    def _insert(self, key: Tuple[str, Any], source: str):
+        sources = self._incoming.setdefault(key, [])
+        if source in sources:
+            return
+        position = self._position(source)
+        # حفظ ترتیب نودها؛ افزودن در انتها حالت رایج است
+        if not sources or self._positions[sources[-1]] < position:
+            sources.append(source)
+            return
+        for i, existing in enumerate(sources):
+            if self._positions[existing] > position:
+                sources.insert(i, source)
+                return
+        sources.append(source)
+
+    def _discard(self, key: Tuple[str, Any], source: str):
+        sources = self._incoming.get(key)
+        if not sources or source not in sources:
+            return
+        sources.remove(source)
+        if not sources:
+            del self._incoming[key]
+
+    def add_edge(self, source: str, target: str, metaedge: Any):
+        """ثبت یال جدید source → target (برای گراف بدون جهت در هر دو جهت)"""
+        if not metaedge:
+            return
+        self._insert((target, metaedge), source)
+        if self.graph is not None and not self.graph.is_directed():
+            self._insert((source, metaedge), target)
+
+    def remove_edge(self, source: str, target: str, metaedge: Any):
+        """حذف یال source → target از ایندکس"""
+        if not metaedge:
+            return
+        self._discard((target, metaedge), source)
+        if self.graph is not None and not self.graph.is_directed():
+            self._discard((source, metaedge), target)
+
+    def sources(self, target: str, metaedge: Any) -> List[str]:
+        """نودهایی که با metaedge مشخص به target یال دارند"""
+        return self._incoming.get((target, metaedge), [])
+
+    def sources_any(self, target: str, metaedges: Iterable[Any]) -> List[Tuple[str, Any]]:
+        """
+        نودهایی که با هر یک از metaedgeها به target یال دارند
+
+        Returns:
+            لیست (نود مبدأ، metaedge) به ترتیب نودهای گراف
+        """
+        streams = []
+        for metaedge in dict.fromkeys(metaedges):
+            sources = self._incoming.get((target, metaedge))
+            if sources:
+                streams.append([(self._positions[s], s, metaedge) for s in sources])
+        if len(streams) == 1:
+            return [(s, metaedge) for _, s, metaedge in streams[0]]
+        return [(s, metaedge) for _, s, metaedge in heapq.merge(*streams, key=lambda item: item[0])]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Graph Registry - نگهداری یک نسخه مشترک از گراف برای همه سرویس‌ها
+
+GraphHandle گراف بارگذاری‌شده و ایندکس‌های پیش‌محاسبه‌شده آن (ایندکس نام و نوع،
+نسخه CSR، ایندکس یال‌های معکوس و معیارهای مرکزیت) را نگه می‌دارد. GraphRegistry یک
+handle جاری دارد و با swap آن را به‌صورت اتمیک برای همه سرویس‌های مشترک عوض
+می‌کند. درخواست‌های در حال اجرا handle خود را پین می‌کنند و تا پایان درخواست
+با همان گراف کار می‌کنند؛ handle قدیمی پس از آزاد شدن آخرین ارجاع بسته می‌شود.
+"""
+
+import functools
+import logging
+import os
+import pickle
+import threading
+import weakref
+from typing import Any, Callable, Dict, Optional
+
+from graph_centrality import CentralityService, centrality_cache_dir_for
+from graph_indices import NodeIndex, ReverseEdgeIndex
+
+
+class GraphHandle:
+    """گراف فقط‌خواندنی به‌همراه ایندکس‌های مشترک و شمارنده ارجاع"""
+
+    def __init__(self, G, path: Optional[str] = None, snapshot=None, cache_dir: Optional[str] = None):
+        self.G = G
+        self.path = path
+        self.snapshot = snapshot
+        self.node_index = NodeIndex(G)
+        self.reverse_index = ReverseEdgeIndex(G)
+        self.compiled_graph = self._compile(G, snapshot)
+        # معیارهای مرکزیت یک‌بار هنگام بارگذاری (یا از کش دیسک) و مشترک برای همه سرویس‌ها
+        self.centrality = CentralityService(G, cache_dir=cache_dir).warm(closeness=True)
+        self.pagerank: Dict[str, float] = self.centrality.pagerank()
+        self._refcount = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _compile(G, snapshot):
+        if G.is_multigraph():
+            return None
+        try:
+            # در صورت خطا پیمایش‌ها روی NetworkX انجام می‌شوند
+            from compiled_graph import CompiledGraph
+            if snapshot is not None:
+                return snapshot.compiled_graph(G)
+            return CompiledGraph(G)
+        except Exception as e:  # شامل ImportError
+            logging.warning(f"خطا در ساخت گراف فشرده: {e}")
+            return None
+
+    @classmethod
+    def load(cls, graph_path: str) -> 'GraphHandle':
+        """بارگذاری گراف از .graphsnap، .pkl یا .sif"""
+        from graph_snapshot import SNAPSHOT_EXTENSION, load_graph_snapshot, read_sif_graph, resolve_graph_path
+        path = resolve_graph_path(graph_path)
+        snapshot = None
+        if path.endswith(SNAPSHOT_EXTENSION):
+            G, snapshot = load_graph_snapshot(path)
+        elif path.endswith('.pkl') or path.endswith('.pickle'):
+            with open(path, 'rb') as f:
+                G = pickle.load(f)
+        elif path.endswith('.sif') or path.endswith('.sif.gz'):
+            G = read_sif_graph(path)
+        else:
+            raise ValueError(f"فرمت فایل {graph_path} پشتیبانی نمی‌شود")
+        logging.info(f"گراف مشترک بارگذاری شد: {path} ({G.number_of_nodes()} نود، {G.number_of_edges()} یال)")
+        return cls(G, path=os.path.abspath(graph_path), snapshot=snapshot, cache_dir=centrality_cache_dir_for(path))
+
+    def ensure_pagerank(self) -> Dict[str, float]:
+        """PageRank مشترک (هنگام ساخت handle محاسبه شده است)"""
+        return self.pagerank
+
+    @property
+    def refcount(self) -> int:
+        return self._refcount
+
+    @property
+    def closed(self) -> bool:
+        return self.G is None
+
+    def acquire(self) -> 'GraphHandle':
+        with self._lock:
+            if self.G is None:
+                raise RuntimeError("handle گراف بسته شده است")
+            self._refcount += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refcount -= 1
+            should_close = self._retired and self._refcount <= 0
+        if should_close:
+            self._close()
+
+    def retire(self):
+        """علامت‌گذاری برای بستن پس از آزاد شدن آخرین ارجاع"""
+        with self._lock:
+            self._retired = True
+            should_close = self._refcount <= 0
+        if should_close:
+            self._close()
+
+    def _close(self):
+        snapshot = self.snapshot
+        self.G = None
+        self.node_index = None
+        self.reverse_index = None
+        self.compiled_graph = None
+        self.centrality = None
+        self.snapshot = None
+        if snapshot is not None:
+            snapshot.close()
+
+
+class GraphRegistry:
+    """رجیستری handle جاری گراف و سرویس‌های مشترک آن"""
+
+    def __init__(self):
+        self._current: Optional[GraphHandle] = None
+        self._lock = threading.Lock()
+        # بارگذاری‌های هم‌زمان را سریالی می‌کند بدون اینکه خواندن handle جاری را مسدود کند
+        self._swap_lock = threading.Lock()
+        self._subscribers = weakref.WeakSet()
+
+    def current(self) -> Optional[GraphHandle]:
+        return self._current
+
+    def acquire(self) -> Optional[GraphHandle]:
+        """handle جاری با یک ارجاع اضافه (باید release شود)"""
+        with self._lock:
+            handle = self._current
+            if handle is not None:
+                handle.acquire()
+            return handle
+
+    def subscribe(self, service):
+        """ثبت سرویسی که attach_graph(handle) دارد؛ handle جاری بلافاصله وصل می‌شود"""
+        with self._lock:
+            self._subscribers.add(service)
+            handle = self._current
+        if handle is not None:
+            service.attach_graph(handle)
+
+    def swap(self, graph_path: str) -> GraphHandle:
+        """بارگذاری گراف جدید و جایگزینی اتمیک آن برای همه سرویس‌ها"""
+        with self._swap_lock:
+            new_handle = GraphHandle.load(graph_path)
+            return self.install(new_handle)
+
+    def install(self, handle: GraphHandle) -> GraphHandle:
+        """نصب یک handle آماده به‌عنوان handle جاری"""
+        handle.acquire()  # ارجاع خود رجیستری
+        with self._lock:
+            old_handle = self._current
+            self._current = handle
+            subscribers = list(self._subscribers)
+        for service in subscribers:
+            service.attach_graph(handle)
+        if old_handle is not None:
+            old_handle.release()
+            old_handle.retire()
+        return handle
+
+
+class GraphBoundAttribute:
+    """
+    ویژگی وابسته به گراف در یک سرویس
+
+    اگر درخواست جاری (در همین thread) یک handle را پین کرده باشد، مقدار از همان
+    handle خوانده می‌شود تا swap هم‌زمان گراف وسط درخواست اثری نداشته باشد.
+    """
+
+    def __init__(self, from_handle: Callable[[GraphHandle], Any]):
+        self.from_handle = from_handle
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        local = obj.__dict__.get('_graph_local')
+        handle = getattr(local, 'handle', None) if local is not None else None
+        if handle is not None:
+            return self.from_handle(handle)
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+
+def pins_graph(method):
+    """
+    دکوراتور متدهای ورودی سرویس: handle متصل را برای مدت فراخوانی پین می‌کند
+
+    سرویس باید ویژگی‌های _graph_local (threading.local) و _graph_handle داشته باشد.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        local = self._graph_local
+        handle = self._graph_handle
+        if handle is None or getattr(local, 'handle', None) is not None:
+            return method(self, *args, **kwargs)
+        try:
+            handle.acquire()
+        except RuntimeError:
+            # handle در همین لحظه جایگزین و بسته شده؛ با handle جدید متصل ادامه بده
+            return wrapper(self, *args, **kwargs)
+        local.handle = handle
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            local.handle = None
+            handle.release()
+    return wrapper
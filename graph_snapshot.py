@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Graph Snapshot - فرمت باینری نسخه‌دار گراف با قابلیت mmap
+
+ساختار فایل:
+    MAGIC (8 بایت) | نسخه (uint32) | طول هدر (uint32) | هدر JSON | بخش‌های داده
+هدر JSON شامل دیکشنری metaedgeها، انواع نود و محل هر بخش (offset/dtype/count) است.
+بخش‌ها: جدول ستونی نودها (استخر رشته شناسه و نام، کد نوع)، یال‌های CSR
+(offsets/targets) و کدهای metaedge/relation/وزن هر یال.
+
+بخش‌های عددی مستقیماً روی صفحات mmap شده خوانده می‌شوند؛ بنابراین چند سرویس
+یا چند پروسه worker که یک snapshot را باز کنند صفحات مشترک سیستم‌عامل را
+استفاده می‌کنند.
+
+تبدیل از فرمت‌های موجود:
+    python graph_snapshot.py --pkl hetionet_graph.pkl -o hetionet_graph.graphsnap
+    python graph_snapshot.py --sif hetionet-v1.0-edges.sif.gz --nodes hetionet-v1.0-nodes.tsv -o hetionet.graphsnap
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import pickle
+import struct
+from typing import Any, Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+
+from compiled_graph import CompiledGraph
+
+SNAPSHOT_MAGIC = b"GRAPHSNP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".graphsnap"
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 64
+
+
+def snapshot_path_for(graph_path: str) -> str:
+    """مسیر snapshot هم‌نام با یک فایل گراف (مثلاً x.pkl → x.graphsnap)"""
+    if graph_path.endswith(SNAPSHOT_EXTENSION):
+        return graph_path
+    base = graph_path[:-3] if graph_path.endswith('.gz') else graph_path
+    return os.path.splitext(base)[0] + SNAPSHOT_EXTENSION
+
+
+def resolve_graph_path(graph_path: str) -> str:
+    """
+    اگر snapshot به‌روزی کنار فایل گراف وجود داشته باشد، مسیر آن را برمی‌گرداند
+
+    Args:
+        graph_path: مسیر فایل گراف (.pkl/.sif/.graphsnap)
+
+    Returns:
+        مسیر snapshot یا همان مسیر ورودی
+    """
+    snapshot_path = snapshot_path_for(graph_path)
+    if snapshot_path == graph_path or not os.path.exists(snapshot_path):
+        return graph_path
+    if os.path.exists(graph_path) and os.path.getmtime(snapshot_path) < os.path.getmtime(graph_path):
+        return graph_path
+    return snapshot_path
+
+
+def _encode_strings(values: List[str]):
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _codes(values: List[Any], dictionary: Dict[Any, int], labels: List[str]) -> np.ndarray:
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        value = str(value)
+        code = dictionary.get(value)
+        if code is None:
+            code = len(labels)
+            dictionary[value] = code
+            labels.append(value)
+        codes[i] = code
+    return codes
+
+
+def write_snapshot(G, output_path: str, source: Optional[str] = None) -> str:
+    """
+    ذخیره گراف NetworkX در قالب snapshot
+
+    فقط ویژگی‌های name/kind نودها و metaedge/relation/weight یال‌ها ذخیره می‌شوند.
+
+    Args:
+        G: گراف Graph یا DiGraph
+        output_path: مسیر فایل خروجی
+        source: توضیح منبع (برای هدر)
+
+    Returns:
+        مسیر فایل نوشته شده
+    """
+    if G.is_multigraph():
+        raise ValueError("snapshot از MultiGraph پشتیبانی نمی‌کند")
+
+    node_ids = list(G.nodes())
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    names, has_name, kinds = [], np.zeros(len(node_ids), dtype=np.uint8), []
+    for i, (node_id, attrs) in enumerate(G.nodes(data=True)):
+        if 'name' in attrs:
+            has_name[i] = 1
+        names.append(str(attrs.get('name', '')))
+        kinds.append(attrs.get('kind'))
+
+    offsets = [0]
+    targets, metaedges, relations, weights = [], [], [], []
+    for node_id in node_ids:
+        for neighbor, edge_data in G.adj[node_id].items():
+            targets.append(index[neighbor])
+            metaedges.append(edge_data.get('metaedge') or None)
+            relations.append(edge_data.get('relation') or None)
+            weights.append(edge_data.get('weight', np.nan))
+        offsets.append(len(targets))
+
+    label_codes: Dict[Any, int] = {}
+    labels: List[str] = []
+    kind_codes: Dict[Any, int] = {}
+    kind_labels: List[str] = []
+    id_offsets, id_bytes = _encode_strings([str(n) for n in node_ids])
+    name_offsets, name_bytes = _encode_strings(names)
+    sections = {
+        'node_id_offsets': id_offsets,
+        'node_id_bytes': id_bytes,
+        'node_name_offsets': name_offsets,
+        'node_name_bytes': name_bytes,
+        'node_has_name': has_name,
+        'node_kind_codes': _codes(kinds, kind_codes, kind_labels),
+        'csr_offsets': np.asarray(offsets, dtype=np.int64),
+        'csr_targets': np.asarray(targets, dtype=np.int32),
+        'edge_metaedge_codes': _codes(metaedges, label_codes, labels),
+        'edge_relation_codes': _codes(relations, label_codes, labels),
+        'edge_weights': np.asarray(weights, dtype=np.float64),
+    }
+
+    header: Dict[str, Any] = {
+        'directed': G.is_directed(),
+        'num_nodes': len(node_ids),
+        'num_edges': G.number_of_edges(),
+        'metaedges': labels,
+        'kinds': kind_labels,
+        'source': source,
+        'sections': {},
+    }
+    # محل بخش‌ها پس از هدر محاسبه می‌شود؛ هدر با فضای کافی برای offsetها رزرو می‌شود
+    layout = {}
+    for name, array in sections.items():
+        layout[name] = {'dtype': array.dtype.str, 'count': int(array.size), 'offset': 0}
+    header['sections'] = layout
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_size = len(header_bytes) + 32 * len(sections)  # فضای رزرو برای ارقام offset
+
+    position = _align(_PREAMBLE.size + header_size)
+    for name, array in sections.items():
+        layout[name]['offset'] = position
+        position = _align(position + array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8').ljust(header_size, b' ')
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(position)
+    # جایگزینی اتمیک تا خواننده‌های هم‌زمان فایل نیمه‌کاره نبینند
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def _align(position: int) -> int:
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class GraphSnapshot:
+    """snapshot باز شده با mmap؛ آرایه‌ها نمای مستقیم روی فایل هستند"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"فایل {path} یک snapshot گراف نیست")
+        if version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"نسخه snapshot {version} پشتیبانی نمی‌شود (نسخه مورد انتظار: {SNAPSHOT_VERSION})")
+        header_start = _PREAMBLE.size
+        self.header = json.loads(bytes(self._mmap[header_start:header_start + header_len]).decode('utf-8'))
+        self.directed: bool = self.header['directed']
+        self.metaedges: List[str] = self.header['metaedges']
+        self.kinds: List[str] = self.header['kinds']
+
+        self.csr_offsets = self._section('csr_offsets')
+        self.csr_targets = self._section('csr_targets')
+        self.edge_metaedge_codes = self._section('edge_metaedge_codes')
+        self.edge_relation_codes = self._section('edge_relation_codes')
+        self.edge_weights = self._section('edge_weights')
+        self.node_kind_codes = self._section('node_kind_codes')
+        self.node_has_name = self._section('node_has_name')
+        self.node_ids = self._strings('node_id')
+        self._node_names: Optional[List[str]] = None
+        self._compiled: Optional[CompiledGraph] = None
+
+    @classmethod
+    def open(cls, path: str) -> 'GraphSnapshot':
+        return cls(path)
+
+    def _section(self, name: str) -> np.ndarray:
+        spec = self.header['sections'][name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(spec['dtype']), count=spec['count'], offset=spec['offset'])
+
+    def _strings(self, prefix: str) -> List[str]:
+        offsets = self._section(f'{prefix}_offsets').tolist()
+        raw = self._section(f'{prefix}_bytes').tobytes()
+        if raw.isascii():
+            # در متن ASCII اندیس بایت و کاراکتر یکی است؛ یک بار decode کافی است
+            blob = raw.decode('ascii')
+            return [blob[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    @property
+    def node_names(self) -> List[str]:
+        if self._node_names is None:
+            self._node_names = self._strings('node_name')
+        return self._node_names
+
+    @property
+    def number_of_nodes(self) -> int:
+        return self.header['num_nodes']
+
+    @property
+    def number_of_edges(self) -> int:
+        return self.header['num_edges']
+
+    def close(self):
+        """بستن mmap (آرایه‌های استخراج‌شده نباید پس از آن استفاده شوند)"""
+        self._compiled = None
+        for attr in ('csr_offsets', 'csr_targets', 'edge_metaedge_codes', 'edge_relation_codes',
+                     'edge_weights', 'node_kind_codes', 'node_has_name'):
+            self.__dict__.pop(attr, None)
+        try:
+            self._mmap.close()
+        except BufferError:
+            # هنوز نمایی روی mmap زنده است؛ بستن به GC سپرده می‌شود
+            pass
+        finally:
+            self._file.close()
+
+    def to_networkx(self):
+        """
+        ساخت گراف NetworkX با همان ترتیب همسایه‌ها که هنگام ذخیره وجود داشت
+        """
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        names = self.node_names
+        kinds = self.kinds
+        for i, (node_id, kind_code, has_name) in enumerate(zip(
+                self.node_ids, self.node_kind_codes.tolist(), self.node_has_name.tolist())):
+            attrs = {}
+            if has_name:
+                attrs['name'] = names[i]
+            if kind_code >= 0:
+                attrs['kind'] = kinds[kind_code]
+            G.add_node(node_id, **attrs)
+
+        # ساختار مجاورت مستقیماً پر می‌شود تا ترتیب همسایه‌ها دقیقاً حفظ شود
+        adj = G._adj
+        node_ids = self.node_ids
+        offsets = self.csr_offsets.tolist()
+        targets = self.csr_targets.tolist()
+        for u, node_id in enumerate(node_ids):
+            adj[node_id] = dict.fromkeys(node_ids[v] for v in targets[offsets[u]:offsets[u + 1]])
+        metaedges = self.edge_metaedge_codes.tolist()
+        relations = self.edge_relation_codes.tolist()
+        weights = self.edge_weights.tolist()
+        labels = self.metaedges
+        pred = G._pred if self.directed else None
+        if pred is not None:
+            for node_id in node_ids:
+                pred[node_id] = {}
+        for u, node_id in enumerate(node_ids):
+            neighbors = adj[node_id]
+            for e in range(offsets[u], offsets[u + 1]):
+                neighbor = node_ids[targets[e]]
+                if neighbors[neighbor] is not None:
+                    continue
+                data = {}
+                if metaedges[e] >= 0:
+                    data['metaedge'] = labels[metaedges[e]]
+                if relations[e] >= 0:
+                    data['relation'] = labels[relations[e]]
+                if weights[e] == weights[e]:  # NaN یعنی بدون وزن
+                    data['weight'] = weights[e]
+                neighbors[neighbor] = data
+                if pred is not None:
+                    pred[neighbor][node_id] = data
+                else:
+                    # در گراف بدون جهت هر دو جهت یک دیکشنری مشترک دارند
+                    adj[neighbor][node_id] = data
+        return G
+
+    def compiled_graph(self, G=None) -> CompiledGraph:
+        """CompiledGraph با آرایه‌های CSR همین snapshot (بدون کپی)"""
+        if self._compiled is None or (G is not None and not self._compiled.is_compiled_from(G)):
+            metaedge_codes = np.where(self.edge_metaedge_codes >= 0, self.edge_metaedge_codes, self.edge_relation_codes)
+            self._compiled = CompiledGraph.from_arrays(
+                graph=G,
+                node_ids=self.node_ids,
+                offsets=self.csr_offsets,
+                targets=self.csr_targets,
+                metaedge_codes=metaedge_codes.astype(np.int32, copy=False),
+                relation_codes=self.edge_relation_codes,
+                labels=list(self.metaedges),
+                kind_codes=self.node_kind_codes,
+                kinds=list(self.kinds),
+            )
+        return self._compiled
+
+
+def load_graph_snapshot(path: str):
+    """
+    بارگذاری snapshot و ساخت گراف NetworkX
+
+    Returns:
+        (گراف، GraphSnapshot باز)
+    """
+    snapshot = GraphSnapshot.open(path)
+    return snapshot.to_networkx(), snapshot
+
+
+def read_sif_graph(sif_path: str, nodes_path: Optional[str] = None):
+    """
+    خواندن یال‌های SIF (source, metaedge, target) و در صورت وجود فایل نودهای TSV
+
+    مانند rebuild_graph.py گراف بدون جهت با ویژگی metaedge ساخته می‌شود و اگر
+    فایل نودها داده شده باشد، یال‌های با نود ناشناخته کنار گذاشته می‌شوند.
+    """
+    G = nx.Graph()
+    if nodes_path:
+        with open(nodes_path, 'r', encoding='utf-8-sig') as f:
+            columns = f.readline().rstrip('\n').split('\t')
+            id_col, name_col, kind_col = columns.index('id'), columns.index('name'), columns.index('kind')
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) > max(id_col, name_col, kind_col):
+                    G.add_node(parts[id_col], name=parts[name_col], kind=parts[kind_col])
+
+    opener = gzip.open if sif_path.endswith('.gz') else open
+    with opener(sif_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) < 3 or parts[:3] == ['source', 'metaedge', 'target']:
+                continue
+            source, metaedge, target = parts[0], parts[1], parts[2]
+            if nodes_path:
+                if source not in G or target not in G:
+                    continue
+            else:
+                for node_id in (source, target):
+                    if node_id not in G:
+                        G.add_node(node_id, name=node_id, kind=node_id.split('::', 1)[0] if '::' in node_id else 'entity')
+            G.add_edge(source, target, metaedge=metaedge)
+    return G
+
+
+def convert_to_snapshot(output_path: str, pkl_path: Optional[str] = None,
+                        sif_path: Optional[str] = None, nodes_path: Optional[str] = None) -> str:
+    """تبدیل .pkl یا .sif (+ nodes.tsv) به snapshot"""
+    if pkl_path:
+        with open(pkl_path, 'rb') as f:
+            G = pickle.load(f)
+        source = os.path.basename(pkl_path)
+    elif sif_path:
+        G = read_sif_graph(sif_path, nodes_path)
+        source = os.path.basename(sif_path)
+    else:
+        raise ValueError("یکی از pkl_path یا sif_path لازم است")
+    return write_snapshot(G, output_path, source=source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تبدیل گراف به snapshot باینری قابل mmap")
+    parser.add_argument('--pkl', help="فایل pickle گراف NetworkX")
+    parser.add_argument('--sif', help="فایل یال‌های SIF (می‌تواند .gz باشد)")
+    parser.add_argument('--nodes', help="فایل نودهای TSV (مثل hetionet-v1.0-nodes.tsv)")
+    parser.add_argument('-o', '--output', help="مسیر خروجی (پیش‌فرض: هم‌نام ورودی با پسوند .graphsnap)")
+    args = parser.parse_args()
+    if not args.pkl and not args.sif:
+        parser.error("--pkl یا --sif لازم است")
+
+    output = args.output or snapshot_path_for(args.pkl or args.sif)
+    convert_to_snapshot(output, pkl_path=args.pkl, sif_path=args.sif, nodes_path=args.nodes)
+    snapshot = GraphSnapshot.open(output)
+    print(f"✅ snapshot ذخیره شد: {output} ({snapshot.number_of_nodes} نود، {snapshot.number_of_edges} یال)")
+    snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
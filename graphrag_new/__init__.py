@@ -1,16 +1,32 @@
 # -*- coding: utf-8 -*-
 """
 GraphRAG New - سیستم جدید GraphRAG
+
+زیرماژول‌ها در اولین دسترسی به هر نام import می‌شوند (PEP 562) تا import بسته
+وابستگی‌های سنگین (SDK های LLM، Redis و ...) را بی‌دلیل بارگذاری نکند.
 """
-from .search import KGSearch
-from .utils import get_entity_type2sampels, get_llm_cache, set_llm_cache, get_relation
-from .query_analyze_prompt import PROMPTS
+import importlib
+
+_LAZY_ATTRS = {
+    "KGSearch": ".search",
+    "get_entity_type2sampels": ".utils",
+    "get_llm_cache": ".utils",
+    "set_llm_cache": ".utils",
+    "get_relation": ".utils",
+    "PROMPTS": ".query_analyze_prompt",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    "KGSearch",
-    "get_entity_type2sampels",
-    "get_llm_cache", 
-    "set_llm_cache",
-    "get_relation",
-    "PROMPTS"
-] 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
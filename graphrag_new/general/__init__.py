@@ -1,15 +1,30 @@
 # -*- coding: utf-8 -*-
 """
 GraphRAG General - بخش عمومی GraphRAG
+
+زیرماژول‌ها در اولین دسترسی به هر نام import می‌شوند (PEP 562) تا import بسته
+وابستگی‌های سنگین (SDK های LLM، Redis و ...) را بی‌دلیل بارگذاری نکند.
 """
-from .extractor import BaseExtractor
-from .graph_extractor import GraphExtractor
-from .graph_prompt import GRAPH_PROMPTS
-from .index import GraphIndex
-
-__all__ = [
-    "BaseExtractor",
-    "GraphExtractor", 
-    "GRAPH_PROMPTS",
-    "GraphIndex"
-] 
\ No newline at end of file
+import importlib
+
+_LAZY_ATTRS = {
+    "BaseExtractor": ".extractor",
+    "GraphExtractor": ".graph_extractor",
+    "GRAPH_PROMPTS": ".graph_prompt",
+    "GraphIndex": ".index",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -27,6 +27,7 @@
 from rag_new.utils.doc_store_conn import OrderByExpr
 
 from rag_new.nlp.search import Dealer, index_name
+from bounded_cache import BoundedCache
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -44,7 +45,7 @@ class KGSearch(Dealer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._cfg = KGSearchConfig()
-        self._ty2ents_cache: Dict[Tuple[str, str], Any] = {}
+        self._ty2ents_cache = BoundedCache('ty2ents', max_entries=256, ttl=3600)
     def _chat(self, llm_bdl, system, history, gen_conf):
         response = get_llm_cache(llm_bdl.llm_name, system, history, gen_conf)
         if response:
@@ -59,11 +60,8 @@ def query_rewrite(self, llm, question, idxnms, kb_ids):
         """استخراج توکن‌ها و تحلیل سوال با استفاده از LLM"""
         # کش نمونه‌ها برای کاهش هزینه trio.run
         cache_key = ("|".join(sorted(map(str, idxnms or []))), "|".join(sorted(map(str, kb_ids or []))))
-        if cache_key in self._ty2ents_cache:
-            ty2ents = self._ty2ents_cache[cache_key]
-        else:
-            ty2ents = trio.run(lambda: get_entity_type2sampels(idxnms, kb_ids))
-            self._ty2ents_cache[cache_key] = ty2ents
+        ty2ents = self._ty2ents_cache.get_or_compute(
+            cache_key, lambda: trio.run(lambda: get_entity_type2sampels(idxnms, kb_ids)))
         hint_prompt = PROMPTS["minirag_query2kwd"].format(query=question,
                                                           TYPE_POOL=json.dumps(ty2ents, ensure_ascii=False, indent=2))
         result = self._chat(llm, hint_prompt, [{"role": "user", "content": "Output:"}], {})
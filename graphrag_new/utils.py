@@ -11,6 +11,7 @@
 
 # Import from rag_new
 from rag_new.utils import REDIS_CONN, num_tokens_from_string, get_float
+import llm_cache
 
 def make_llm_cache_key(llm_name: str, system: Any, history: Any, gen_conf: Any) -> str:
     """تبدیل پارامترهای LLM به کلید یکتا برای کش."""
@@ -26,20 +27,26 @@ def make_llm_cache_key(llm_name: str, system: Any, history: Any, gen_conf: Any)
     return f"llm_cache:{xxhash.xxh64(payload.encode()).hexdigest()}"
 
 
+def _llm_store():
+    """کش مشترک پاسخ‌های LLM (llm_cache) یا در صورت غیرفعال بودن آن Redis"""
+    return llm_cache.get_llm_cache() or REDIS_CONN
+
+
 def get_llm_cache(llm_name_or_key: str, system: Any = None, history: Any = None, gen_conf: Any = None) -> Optional[str]:
-    """دریافت کش LLM از Redis (سازگار با دو امضا)."""
+    """دریافت کش LLM از کش مشترک پاسخ‌ها (سازگار با دو امضا)."""
     try:
         if system is None and history is None and gen_conf is None:
             key = llm_name_or_key if str(llm_name_or_key).startswith("llm_cache:") else f"llm_cache:{llm_name_or_key}"
         else:
             key = make_llm_cache_key(llm_name_or_key, system, history, gen_conf)
-        return REDIS_CONN.get(key)
+        store = _llm_store()
+        return store.get(key) if store is REDIS_CONN else store.get_text(key)
     except Exception as e:
         logging.warning(f"Failed to get LLM cache: {e}")
         return None
 
 def set_llm_cache(*args, **kwargs) -> bool:
-    """ذخیره کش LLM در Redis (سازگار با دو امضا)."""
+    """ذخیره کش LLM در کش مشترک پاسخ‌ها (سازگار با دو امضا)."""
     try:
         expire = kwargs.get("expire", 3600)
         if len(args) == 2 or (len(args) == 3 and isinstance(args[2], int)):
@@ -48,13 +55,13 @@ def set_llm_cache(*args, **kwargs) -> bool:
             if len(args) == 3 and isinstance(args[2], int):
                 expire = args[2]
             full_key = key if str(key).startswith("llm_cache:") else f"llm_cache:{key}"
-            return REDIS_CONN.set(full_key, value, expire)
+            return _set_llm_value(full_key, value, expire)
         elif len(args) >= 5:
             llm_name, system, value, history, gen_conf = args[:5]
             if len(args) >= 6 and isinstance(args[5], int):
                 expire = args[5]
             cache_key = make_llm_cache_key(llm_name, system, history, gen_conf)
-            return REDIS_CONN.set(cache_key, value, expire)
+            return _set_llm_value(cache_key, value, expire)
         else:
             logging.warning("set_llm_cache called with unsupported signature")
             return False
@@ -62,6 +69,13 @@ def set_llm_cache(*args, **kwargs) -> bool:
         logging.warning(f"Failed to set LLM cache: {e}")
         return False
 
+def _set_llm_value(key: str, value: Any, expire: int) -> bool:
+    store = _llm_store()
+    if store is REDIS_CONN:
+        return REDIS_CONN.set(key, value, expire)
+    store.set_text(key, value, expire)
+    return True
+
 def get_entity_type2samples(idxnms: Any = None, kb_ids: Any = None) -> Dict[str, List[str]]:
     """نمونه‌های انواع موجودیت‌ها بر اساس متانودهای Hetionet."""
     return {
@@ -4,32 +4,64 @@
 این سرویس تمام قابلیت‌های GraphRAG را فراهم می‌کند
 """
 
-import pandas as pd
 import networkx as nx
-import spacy
-from spacy.lang.en.stop_words import STOP_WORDS
 from collections import deque
 import pickle
+import copy
 import os
 import json
 import re
-from typing import Dict, List, Tuple, Optional, Any
+import asyncio
+import functools
+import importlib.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Dict, Iterator, List, Tuple, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 
-# Import new modules
+# پیام‌های سرویس؛ ردگیری مراحل هر پرسش در سطح DEBUG و فقط با enable_verbose_logging ساخته می‌شود
+logger = logging.getLogger(__name__)
+
+# ماژول‌های graphrag_new/rag_new سنگین‌اند (SDK های LLM، Redis)؛ EntityResolution در اولین
+# استفاده import می‌شود
 try:
-    from graphrag_new.search import KGSearch
-    from graphrag_new.utils import get_entity_type2sampels, get_llm_cache, set_llm_cache, get_relation
-    from graphrag_new.query_analyze_prompt import PROMPTS
-    from graphrag_new.entity_resolution import EntityResolution
-    from rag_new.llm.chat_model import GptTurbo, MoonshotChat, AzureChat, QWenChat, ZhipuChat, OllamaChat, GeminiChat, AnthropicChat
-    from rag_new.utils import REDIS_CONN
     from enhanced_context_generator import EnhancedContextGenerator
-    NEW_MODULES_AVAILABLE = True
+    NEW_MODULES_AVAILABLE = importlib.util.find_spec("graphrag_new") is not None
 except ImportError:
     NEW_MODULES_AVAILABLE = False
-    print("Warning: New GraphRAG modules not available. Using classic methods only.")
+    logger.warning("Warning: New GraphRAG modules not available. Using classic methods only.")
+
+try:
+    from compiled_graph import CompiledGraph
+    COMPILED_GRAPH_AVAILABLE = True
+except ImportError:
+    COMPILED_GRAPH_AVAILABLE = False
+
+from graph_centrality import CentralityService, centrality_cache_dir_for, personalized_pagerank
+from graph_indices import FAMOUS_GENE_SYNONYMS, NodeIndex, ReverseEdgeIndex
+from metaedge_weights import calculate_metaedge_score, metaedge_edge_weight
+from graph_registry import GraphBoundAttribute, pins_graph
+from query_context import QueryBatch, QueryContext, active_query_context, uses_query_context
+from bounded_cache import CacheGroup
+from retrieval_cache import RetrievalResultCache
+from request_options import RequestOptions, applies_request_options
+from hf_model_pool import get_hf_model_pool
+from llm_gateway import get_llm_gateway
+from nlp_models import DEFAULT_SPACY_MODEL, get_spacy_model
+from doc_pipeline import get_doc_pipeline
+from pipeline_metrics import get_pipeline_metrics
+
+try:
+    from graph_snapshot import SNAPSHOT_EXTENSION, load_graph_snapshot, resolve_graph_path
+    GRAPH_SNAPSHOT_AVAILABLE = True
+except ImportError:
+    GRAPH_SNAPSHOT_AVAILABLE = False
+
+# نشانگر منابعی که هنوز (به صورت lazy) بارگذاری نشده‌اند
+_NOT_LOADED = object()
 
 def remove_emojis(text: str) -> str:
     """حذف ایموجی‌ها از متن"""
@@ -216,6 +248,7 @@ class RetrievalMethod(Enum):
     KG_SEARCH = "KGSearch (الگوریتم اصلی جدید)"
     N_HOP_RETRIEVAL = "N-Hop Retrieval (بازیابی چندمرحله‌ای)"
     PAGERANK_BASED = "PageRank-Based (بر اساس اهمیت)"
+    PERSONALIZED_PAGERANK = "Personalized PageRank (RWR از نودهای پرسش)"
     SEMANTIC_SIMILARITY = "Semantic Similarity (شباهت معنایی)"
     COMMUNITY_DETECTION = "Community Detection (تشخیص جامعه‌ها)"
     ENTITY_RESOLUTION = "Entity Resolution (حل موجودیت‌ها)"
@@ -322,6 +355,30 @@ class RetrievalResult:
     method: str
     query: str
 
+def _encode_retrieval_result(result: RetrievalResult) -> Dict[str, Any]:
+    """شکل فشرده نتیجه بازیابی برای کش نتایج"""
+    return {
+        'n': [[n.id, n.name, n.kind, n.depth, n.score] for n in result.nodes],
+        'e': [[e.source, e.target, e.relation, e.weight] for e in result.edges],
+        'p': result.paths,
+        'c': result.context_text,
+        'm': result.method,
+    }
+
+def _decode_retrieval_result(payload: Dict[str, Any], query: str) -> RetrievalResult:
+    return RetrievalResult(
+        nodes=[GraphNode(*n) for n in payload['n']],
+        edges=[GraphEdge(*e) for e in payload['e']],
+        paths=payload['p'],
+        context_text=payload['c'],
+        method=payload['m'],
+        query=query
+    )
+
+def _answer_chunks(answer: str) -> List[str]:
+    """تکه‌های خط به خط پاسخ‌های قالبی برای ارسال جریانی"""
+    return answer.splitlines(keepends=True)
+
 @dataclass
 class GenerationResult:
     """نتیجه تولید متن"""
@@ -332,28 +389,96 @@ class GenerationResult:
 
 class GraphRAGService:
     """سرویس اصلی GraphRAG"""
+
+    # ویژگی‌های وابسته به گراف: در طول یک درخواست پین‌شده از handle مشترک خوانده می‌شوند
+    G = GraphBoundAttribute(lambda h: h.G)
+    _node_index = GraphBoundAttribute(lambda h: h.node_index)
+    _name_to_ids = GraphBoundAttribute(lambda h: h.node_index.name_to_ids)
+    _id_to_name = GraphBoundAttribute(lambda h: h.node_index.id_to_name)
+    _kind_to_ids = GraphBoundAttribute(lambda h: h.node_index.kind_to_ids)
+    _name_entries = GraphBoundAttribute(lambda h: h.node_index.name_entries)
+    _pagerank = GraphBoundAttribute(lambda h: h.pagerank)
+    _centrality = GraphBoundAttribute(lambda h: h.centrality)
+    _compiled_graph = GraphBoundAttribute(lambda h: h.compiled_graph)
+    _reverse_index = GraphBoundAttribute(lambda h: h.reverse_index)
+    _graph_snapshot = GraphBoundAttribute(lambda h: h.snapshot)
+    _graph_snapshot_graph = GraphBoundAttribute(lambda h: h.G)
+
+    # نام مدل API برای مدل‌های راه دور (مدل‌های قدیمی برای سازگاری به جدیدترین مدل نگاشت می‌شوند)
+    OPENAI_MODEL_NAMES = {
+        GenerationModel.OPENAI_GPT_4O: "gpt-4o",
+        GenerationModel.OPENAI_GPT_4O_MINI: "gpt-4o-mini",
+        GenerationModel.OPENAI_GPT_4_TURBO: "gpt-4-turbo",
+        GenerationModel.OPENAI_GPT_4: "gpt-4",
+        GenerationModel.OPENAI_GPT_3_5_TURBO: "gpt-3.5-turbo",
+        GenerationModel.OPENAI_GPT_3_5_TURBO_16K: "gpt-3.5-turbo-16k",
+        GenerationModel.OPENAI_GPT: "gpt-4o",
+    }
+    ANTHROPIC_MODEL_NAMES = {
+        GenerationModel.ANTHROPIC_CLAUDE_3_5_SONNET: "claude-3-5-sonnet-20241022",
+        GenerationModel.ANTHROPIC_CLAUDE_3_5_HAIKU: "claude-3-5-haiku-20241022",
+        GenerationModel.ANTHROPIC_CLAUDE_3_OPUS: "claude-3-opus-20240229",
+        GenerationModel.ANTHROPIC_CLAUDE_3_SONNET: "claude-3-sonnet-20240229",
+        GenerationModel.ANTHROPIC_CLAUDE_3_HAIKU: "claude-3-haiku-20240307",
+        GenerationModel.ANTHROPIC_CLAUDE: "claude-3-5-sonnet-20241022",
+    }
+    # اطمینان پاسخ مدل‌های راه دور: (SIMPLE, INTELLIGENT)
+    REMOTE_MODEL_CONFIDENCE = {'openai': (0.95, 0.97), 'anthropic': (0.94, 0.96)}
     
-    def __init__(self, graph_data_path: str = None):
-        """راه‌اندازی سرویس GraphRAG"""
+    def __init__(self, graph_data_path: str = None, graph_registry=None, result_cache: Optional[RetrievalResultCache] = None):
+        """راه‌اندازی سرویس GraphRAG
+
+        Args:
+            graph_data_path: مسیر فایل گراف
+            graph_registry: رجیستری گراف مشترک (GraphRegistry)؛ در صورت وجود، گراف و
+                ایندکس‌ها از handle جاری آن گرفته می‌شوند و با swap به‌روز می‌شوند
+            result_cache: کش نتایج بازیابی (مثلاً با backend Redis)؛ پیش‌فرض کش محلی فرایند
+        """
+        # handle مشترک متصل و handle پین‌شده درخواست جاری (به ازای هر thread)
+        self._graph_local = threading.local()
+        self._graph_handle = None
+        # زمینه پرسش در حال پردازش و override‌های تنظیمات درخواست (به ازای هر thread)
+        self._query_local = threading.local()
+        self._options_local = threading.local()
+        self.graph_registry = graph_registry
         self.graph_data_path = graph_data_path or "hetionet_graph.pkl"
         self.G = None
         self.nlp = None
         # ایندکس‌ها و کش‌ها
+        self._node_index = NodeIndex()
         self._name_to_ids = {}
         self._id_to_name = {}
         self._kind_to_ids = {}
         self._name_entries = []  # [(lower_name, node_id)] برای fallback فازی سبک
         self._pagerank = {}
-        self._keyword_cache = {}
+        # معیارهای مرکزیت (PageRank/درجه) روی ماتریس اسپارس با کش دیسک
+        self._centrality = None
+        self._centrality_cache_dir = None
+        # کش‌های محدود بین درخواست‌ها (با تغییر گراف خالی می‌شوند)
+        self._caches = CacheGroup()
+        self._keyword_cache = self._caches.add('keywords', max_entries=4096, max_bytes=8 << 20, ttl=3600)
+        self._intent_cache = self._caches.add('intent', max_entries=4096, max_bytes=16 << 20, ttl=3600)
+        self._match_cache = self._caches.add('matches', max_entries=4096, max_bytes=8 << 20, ttl=3600)
+        self._schema_map_cache = self._caches.add('schema_map', max_entries=1024, ttl=3600)
+        # کش نتایج کامل بازیابی (کلید شامل اثرانگشت گراف است)
+        self.result_cache = result_cache if result_cache is not None else RetrievalResultCache()
         self._last_intent = None
+        # نسخه CSR گراف برای پیمایش‌های سریع (در _post_graph_loaded ساخته می‌شود)
+        self._compiled_graph = None
+        self._compiled_graph_stale = False
+        # snapshot باز شده (mmap) در صورت بارگذاری گراف از فایل .graphsnap
+        self._graph_snapshot = None
+        self._graph_snapshot_graph = None
+        # ایندکس یال‌های ورودی (نود مقصد، metaedge) برای جستجوهای معکوس
+        self._reverse_index = ReverseEdgeIndex()
         # ژنراتور متن زمینه بهبود یافته
         try:
             self.context_generator = EnhancedContextGenerator()
         except Exception:
             self.context_generator = None
         
-        # تنظیمات قابل تغییر برای محدودیت‌ها
-        self.config = {
+        # تنظیمات پایه قابل تغییر برای محدودیت‌ها (هر درخواست می‌تواند با options آن‌ها را override کند)
+        self._config = {
             'max_nodes': 10,           # حداکثر تعداد نودهای بازیابی شده
             'max_edges': 20,           # حداکثر تعداد یال‌های بازیابی شده
             'max_depth': 3,            # حداکثر عمق جستجو
@@ -361,9 +486,17 @@ def __init__(self, graph_data_path: str = None):
             'max_context_length': 2000, # حداکثر طول متن زمینه (کاراکتر)
             'max_answer_tokens': 1000,  # حداکثر توکن‌های پاسخ
             'max_prompt_tokens': 4000,  # حداکثر توکن‌های ورودی
-            'enable_verbose_logging': True,  # نمایش جزئیات
+            'enable_verbose_logging': False,  # ردگیری مراحل پرسش در لاگ DEBUG
             'enable_biological_enrichment': True,  # غنی‌سازی زیستی
             'enable_smart_filtering': True,  # فیلتر هوشمند
+            'use_compiled_graph': True,  # پیمایش روی نسخه CSR گراف (False = NetworkX)
+            'ppr_alpha': 0.85,  # احتمال ادامه قدم در PageRank شخصی‌سازی‌شده
+            'ppr_epsilon': 1e-6,  # آستانه push محلی (کوچک‌تر = دقیق‌تر و پرهزینه‌تر)
+            'ppr_metaedge_weighting': False,  # وزن‌دهی یال‌ها با امتیاز metaedge
+            'enable_result_cache': True,  # کش نتایج retrieve_information و kgsearch_traceable
+            'batch_max_workers': 4,  # تعداد پرسش‌های هم‌زمان در process_queries
+            'nlp_batch_size': 64,  # اندازه دسته nlp.pipe در process_queries
+            'hf_generation_timeout': 120,  # حداکثر انتظار (ثانیه) برای پاسخ pool مدل HuggingFace
         }
         
         # API Keys
@@ -373,65 +506,210 @@ def __init__(self, graph_data_path: str = None):
         
         self.initialize()
     
+    @property
+    def config(self):
+        """تنظیمات مؤثر: تنظیمات پایه با override‌های درخواست جاری (در طول درخواست فقط‌خواندنی)"""
+        options = getattr(self._options_local, 'options', None)
+        return options.apply_to(self._config) if options is not None else self._config
+
     def set_config(self, **kwargs):
-        """تغییر تنظیمات سیستم"""
+        """تغییر تنظیمات پایه سیستم (برای همه درخواست‌های بعدی)"""
+        config = dict(self._config)
         for key, value in kwargs.items():
-            if key in self.config:
-                self.config[key] = value
-                print(f" تنظیم {key} = {value}")
+            if key in config:
+                config[key] = value
+                logger.info(f" تنظیم {key} = {value}")
             else:
-                print(f" تنظیم نامعتبر: {key}")
+                logger.warning(f" تنظیم نامعتبر: {key}")
+        # جایگزینی کامل (copy-on-write) تا درخواست‌های در حال اجرا حالت نیمه‌کاره نبینند
+        self._config = config
     
     def get_config(self):
         """دریافت تنظیمات فعلی"""
-        return self.config.copy()
+        return dict(self.config)
+
+    def request_options(self, **overrides) -> RequestOptions:
+        """ساخت options یک درخواست از کلیدهای معتبر config (کلیدهای نامعتبر نادیده گرفته می‌شوند)"""
+        valid = {}
+        for key, value in overrides.items():
+            if key in self._config:
+                valid[key] = value
+            else:
+                logger.warning(f" تنظیم نامعتبر: {key}")
+        return RequestOptions(valid)
     
+    @property
+    def _verbose(self) -> bool:
+        """آیا پیام‌های ردگیری پرسش ساخته شوند (لاگر در سطح DEBUG و enable_verbose_logging روشن)"""
+        return logger.isEnabledFor(logging.DEBUG) and self.config.get('enable_verbose_logging', False)
+
+    @property
+    def nlp(self):
+        """مدل spaCy انگلیسی مشترک فرایند (None اگر در دسترس نباشد)"""
+        if self._nlp is _NOT_LOADED:
+            self._nlp = get_spacy_model(DEFAULT_SPACY_MODEL)
+            if self._nlp is None:
+                logger.warning(" خطا در بارگذاری مدل spaCy - استفاده از استخراج کلیدواژه ساده")
+        return self._nlp
+
+    @nlp.setter
+    def nlp(self, value):
+        self._nlp = value
+
     def initialize(self):
         """راه‌اندازی سرویس"""
-        print(" راه‌اندازی GraphRAG Service...")
+        logger.info(" راه‌اندازی GraphRAG Service...")
         
-        # بارگذاری مدل spaCy
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-            print(" مدل spaCy بارگذاری شد")
-        except:
-            print(" خطا در بارگذاری مدل spaCy - استفاده از استخراج کلیدواژه ساده")
-            self.nlp = None
+        # مدل spaCy در اولین استفاده از رجیستری مشترک nlp_models بارگذاری می‌شود (property nlp)
+        self._nlp = _NOT_LOADED
         
         # بارگذاری یا ایجاد گراف
+        if self.graph_registry is not None and self.graph_registry.current() is not None:
+            # گراف مشترک قبلاً بارگذاری شده است؛ فقط متصل می‌شویم
+            self.graph_registry.subscribe(self)
+            return
         if self.graph_data_path and os.path.exists(self.graph_data_path):
             self.load_graph_from_file()
         else:
             self.create_sample_graph()
+        if self.graph_registry is not None:
+            self.graph_registry.subscribe(self)
+
+    def attach_graph(self, handle):
+        """اتصال به handle گراف مشترک (فراخوانی توسط GraphRegistry هنگام subscribe/swap)"""
+        self.G = handle.G
+        self._node_index = handle.node_index
+        self._name_to_ids = handle.node_index.name_to_ids
+        self._id_to_name = handle.node_index.id_to_name
+        self._kind_to_ids = handle.node_index.kind_to_ids
+        self._name_entries = handle.node_index.name_entries
+        self._pagerank = handle.pagerank
+        self._centrality = handle.centrality
+        self._compiled_graph = handle.compiled_graph
+        self._compiled_graph_stale = False
+        self._reverse_index = handle.reverse_index
+        self._graph_snapshot = handle.snapshot
+        self._graph_snapshot_graph = handle.G
+        self._graph_handle = handle
+
+    def _current_graph_handle(self):
+        """handle پین‌شده درخواست جاری یا handle متصل"""
+        return getattr(self._graph_local, 'handle', None) or self._graph_handle
+
+    def _post_graph_loaded(self, source_path: Optional[str] = None):
+        """اقدامات پس از بارگذاری/ایجاد گراف: ساخت ایندکس‌ها و معیارهای مرکزیت
 
-    def _post_graph_loaded(self):
-        """اقدامات پس از بارگذاری/ایجاد گراف: ساخت ایندکس‌ها و محاسبه PageRank تنبل"""
+        Args:
+            source_path: فایل گراف؛ در صورت وجود، معیارهای مرکزیت در کنار آن کش می‌شوند
+        """
+        # گراف محلی جایگزین گراف مشترک می‌شود
+        self._graph_handle = None
+        self._reverse_index = ReverseEdgeIndex()
+        self._pagerank = {}
+        self._centrality = None
+        self._centrality_cache_dir = centrality_cache_dir_for(source_path) if source_path else None
+        self._caches.clear()
         self._build_node_indices()
-        # PageRank را به‌صورت تنبل نگه می‌داریم؛ اینجا اگر گراف کوچک باشد حساب می‌کنیم
+        self._build_compiled_graph()
+        if self.G is not None:
+            self._reverse_index.build(self.G)
+        # PageRank هنگام بارگذاری (یا از کش دیسک) محاسبه می‌شود، نه در مسیر درخواست
         try:
-            if self.G and self.G.number_of_nodes() <= 5000:
-                import networkx as nx
-                self._pagerank = nx.pagerank(self.G, alpha=0.85)
+            self._ensure_pagerank()
         except Exception as e:
-            print(f"⚠️ خطا در محاسبه اولیه PageRank: {e}")
+            logger.warning(f"⚠️ خطا در محاسبه اولیه PageRank: {e}")
 
     def _build_node_indices(self):
         """ساخت ایندکس‌های کم‌حجم برای تطبیق سریع توکن‌ها با نودها"""
-        self._name_to_ids.clear()
-        self._id_to_name.clear()
-        self._kind_to_ids.clear()
-        self._name_entries.clear()
-        if not self.G:
+        self._node_index = NodeIndex(self.G)
+        self._name_to_ids = self._node_index.name_to_ids
+        self._id_to_name = self._node_index.id_to_name
+        self._kind_to_ids = self._node_index.kind_to_ids
+        self._name_entries = self._node_index.name_entries
+
+    def _get_node_index(self) -> NodeIndex:
+        """ایندکس نام‌ها هماهنگ با گراف فعلی (در صورت تغییر مستقیم self.G بازسازی می‌شود)"""
+        if self.G is not None and not self._node_index.is_built_from(self.G):
+            self._build_node_indices()
+        return self._node_index
+
+    def _index_node(self, node_id: str, attrs: Dict[str, Any]):
+        """افزودن یک نود به ایندکس‌های نام و نوع"""
+        self._node_index.add_node(node_id, attrs)
+
+    def _build_compiled_graph(self):
+        """ساخت نسخه CSR گراف؛ برای MultiGraph یا در نبود NumPy به NetworkX برمی‌گردیم"""
+        self._compiled_graph = None
+        self._compiled_graph_stale = False
+        if not self.G or not COMPILED_GRAPH_AVAILABLE or self.G.is_multigraph():
+            return
+        try:
+            if self._graph_snapshot is not None and self._graph_snapshot_graph is self.G:
+                # آرایه‌های CSR مستقیماً از صفحات mmap شده snapshot
+                self._compiled_graph = self._graph_snapshot.compiled_graph(self.G)
+                return
+            self._compiled_graph = CompiledGraph(self.G)
+        except Exception as e:
+            logger.warning(f"⚠️ خطا در ساخت گراف فشرده: {e}")
+
+    def _get_compiled_graph(self):
+        """نسخه CSR معتبر برای گراف فعلی یا None (غیرفعال یا قدیمی)"""
+        if not self.config.get('use_compiled_graph', True):
+            return None
+        if self._compiled_graph_stale:
+            # گراف پس از ساخت تغییر کرده است؛ ساخت مجدد تنبل
+            self._build_compiled_graph()
+        compiled = self._compiled_graph
+        if compiled is None:
+            return None
+        if not compiled.is_compiled_from(self.G):
+            return None
+        return compiled
+
+    def _get_reverse_index(self) -> ReverseEdgeIndex:
+        """ایندکس یال‌های ورودی هماهنگ با گراف فعلی"""
+        if not self._reverse_index.is_built_from(self.G):
+            self._reverse_index.build(self.G)
+        return self._reverse_index
+
+    def _check_graph_mutable(self):
+        if self._current_graph_handle() is not None:
+            raise RuntimeError("گراف مشترک فقط‌خواندنی است؛ برای تغییر، گراف جدید را با GraphRegistry.swap بارگذاری کنید")
+
+    def add_graph_edge(self, source: str, target: str, **attrs):
+        """افزودن یال به گراف و به‌روزرسانی ایندکس‌های وابسته"""
+        self._check_graph_mutable()
+        reverse_index = self._get_reverse_index()
+        if not self.G.is_multigraph() and self.G.has_edge(source, target):
+            reverse_index.remove_edge(source, target, self.G.edges[source, target].get('metaedge'))
+        for node_id in (source, target):
+            if not self.G.has_node(node_id):
+                self.G.add_node(node_id, name=node_id, kind='Unknown')
+                self._index_node(node_id, self.G.nodes[node_id])
+        self.G.add_edge(source, target, **attrs)
+        edge_data = self.G.get_edge_data(source, target) if not self.G.is_multigraph() else attrs
+        reverse_index.add_edge(source, target, edge_data.get('metaedge'))
+        self._compiled_graph_stale = True
+
+    def remove_graph_edge(self, source: str, target: str):
+        """حذف یال از گراف و به‌روزرسانی ایندکس‌های وابسته"""
+        self._check_graph_mutable()
+        if not self.G.has_edge(source, target):
             return
-        for node_id, attrs in self.G.nodes(data=True):
-            name = str(attrs.get('name', node_id))
-            kind = str(attrs.get('kind', 'Unknown'))
-            self._id_to_name[node_id] = name
-            lower_name = name.lower()
-            self._name_to_ids.setdefault(lower_name, []).append(node_id)
-            self._kind_to_ids.setdefault(kind, []).append(node_id)
-            # ورودی برای جستجوی شامل ساده
-            self._name_entries.append((lower_name, node_id))
+        reverse_index = self._get_reverse_index()
+        if self.G.is_multigraph():
+            removed = [d.get('metaedge') for d in self.G.get_edge_data(source, target).values()]
+            self.G.remove_edge(source, target)
+            remaining = self.G.get_edge_data(source, target) or {}
+            still_present = {d.get('metaedge') for d in remaining.values()}
+            for metaedge in removed:
+                if metaedge not in still_present:
+                    reverse_index.remove_edge(source, target, metaedge)
+        else:
+            metaedge = self.G.edges[source, target].get('metaedge')
+            self.G.remove_edge(source, target)
+            reverse_index.remove_edge(source, target, metaedge)
+        self._compiled_graph_stale = True
 
     def _display_node(self, node_id: str) -> str:
         """نمایش انسانی یک نود بر اساس نام و نوع (در صورت وجود)"""
@@ -442,17 +720,32 @@ def _display_node(self, node_id: str) -> str:
         except Exception:
             return str(node_id)
 
+    def _get_centrality(self) -> Optional[CentralityService]:
+        """سرویس مرکزیت هماهنگ با گراف فعلی (پس از تغییر گراف بازسازی می‌شود)"""
+        if not self.G:
+            return None
+        if self._centrality is None or not self._centrality.is_built_from(self.G):
+            self._centrality = CentralityService(self.G, cache_dir=self._centrality_cache_dir)
+        return self._centrality
+
     def _ensure_pagerank(self):
-        if not self._pagerank and self.G:
-            try:
-                import networkx as nx
-                self._pagerank = nx.pagerank(self.G, alpha=0.85)
-            except Exception:
-                self._pagerank = {}
+        handle = self._current_graph_handle()
+        if handle is not None:
+            # PageRank مشترک یک‌بار برای همه سرویس‌ها محاسبه می‌شود
+            handle.ensure_pagerank()
+            return
+        centrality = self._get_centrality()
+        if centrality is None:
+            self._pagerank = {}
+            return
+        try:
+            self._pagerank = centrality.pagerank()
+        except Exception:
+            self._pagerank = {}
     
     def create_sample_graph(self):
         """ایجاد گراف نمونه بر اساس ساختار واقعی Hetionet"""
-        print(" ایجاد گراف نمونه بر اساس Hetionet...")
+        logger.info(" ایجاد گراف نمونه بر اساس Hetionet...")
         
         self.G = nx.DiGraph()
         
@@ -748,36 +1041,128 @@ def create_sample_graph(self):
         for source, target, metaedge in reverse_edges_data:
             self.G.add_edge(source, target, metaedge=metaedge, relation=metaedge)
         
-        print(f" گراف نمونه بر اساس Hetionet ایجاد شد: {self.G.number_of_nodes()} نود، {self.G.number_of_edges()} یال")
-        print(f" شامل {len([n for n, d in self.G.nodes(data=True) if d.get('metanode') == 'Gene'])} ژن، {len([n for n, d in self.G.nodes(data=True) if d.get('metanode') == 'Anatomy'])} آناتومی")
-        print(f" شامل {len([e for e in self.G.edges(data=True) if e[2].get('metaedge') == 'AeG'])} یال AeG (Anatomy-expresses-Gene)")
-        print(f" شامل {len([e for e in self.G.edges(data=True) if e[2].get('metaedge') == 'GeA'])} یال GeA (Gene-expressed_in-Anatomy) - معکوس")
+        logger.info(f" گراف نمونه بر اساس Hetionet ایجاد شد: {self.G.number_of_nodes()} نود، {self.G.number_of_edges()} یال")
+        if self._verbose:
+            logger.debug(f" شامل {len([n for n, d in self.G.nodes(data=True) if d.get('metanode') == 'Gene'])} ژن، {len([n for n, d in self.G.nodes(data=True) if d.get('metanode') == 'Anatomy'])} آناتومی")
+            logger.debug(f" شامل {len([e for e in self.G.edges(data=True) if e[2].get('metaedge') == 'AeG'])} یال AeG (Anatomy-expresses-Gene)")
+            logger.debug(f" شامل {len([e for e in self.G.edges(data=True) if e[2].get('metaedge') == 'GeA'])} یال GeA (Gene-expressed_in-Anatomy) - معکوس")
         self._post_graph_loaded()
     
     def load_graph_from_file(self):
-        """بارگذاری گراف از فایل"""
+        """بارگذاری گراف از فایل (snapshot باینری در صورت وجود، در غیر این صورت pickle)"""
         try:
-            with open(self.graph_data_path, 'rb') as f:
-                self.G = pickle.load(f)
-            print(f" گراف از فایل بارگذاری شد: {self.G.number_of_nodes()} نود، {self.G.number_of_edges()} یال")
-            self._post_graph_loaded()
+            graph_path = resolve_graph_path(self.graph_data_path) if GRAPH_SNAPSHOT_AVAILABLE else self.graph_data_path
+            if GRAPH_SNAPSHOT_AVAILABLE and graph_path.endswith(SNAPSHOT_EXTENSION):
+                self.G, self._graph_snapshot = load_graph_snapshot(graph_path)
+                self._graph_snapshot_graph = self.G
+            else:
+                with open(graph_path, 'rb') as f:
+                    self.G = pickle.load(f)
+                self._graph_snapshot = None
+                self._graph_snapshot_graph = None
+            logger.info(f" گراف از فایل بارگذاری شد: {self.G.number_of_nodes()} نود، {self.G.number_of_edges()} یال")
+            self._post_graph_loaded(source_path=graph_path)
         except Exception as e:
-            print(f" خطا در بارگذاری گراف: {e}")
+            logger.warning(f" خطا در بارگذاری گراف: {e}")
             self.create_sample_graph()
     
+    def current_query_context(self, query: Optional[str] = None) -> Optional[QueryContext]:
+        """زمینه پرسشی که thread جاری در حال پردازش آن است (یا None)"""
+        return active_query_context(self._query_local, query)
+
+    def _query_memo(self, stage: str, query: Optional[str], compute, key=None):
+        """محاسبه یک‌باره مرحله در زمینه پرسش فعال (بدون زمینه: محاسبه مستقیم)"""
+        context = self.current_query_context(query)
+        if context is None:
+            return compute()
+        return context.memo(stage, compute, key)
+
+    def _query_batch(self) -> Optional[QueryBatch]:
+        """دسته‌ای که پرسش جاری بخشی از آن است (یا None)"""
+        context = self.current_query_context()
+        return context.batch if context is not None else None
+
+    def _query_stage(self, name: str):
+        """زمان‌بندی یک مرحله روی زمینه پرسش فعال"""
+        context = self.current_query_context()
+        return context.stage(name) if context is not None else nullcontext()
+
+    def _label_query(self, method: str):
+        """برچسب روش بازیابی پرسش فعال در pipeline_metrics (اولین برچسب می‌ماند)"""
+        context = self.current_query_context()
+        if context is not None and context.method is None:
+            context.method = method
+
+    def _touch_traversal(self, result: List[Tuple[str, int]], max_depth: Optional[int] = None):
+        """ثبت نودهای بازگشتی یک پیمایش و یال‌های بررسی‌شده (یال‌های خروجی نودهای گسترش‌یافته)
+
+        نودهای عمق max_depth گسترش نمی‌یابند (BFS)؛ با max_depth=None همه نودها گسترش یافته‌اند (DFS).
+        """
+        context = self.current_query_context()
+        if context is None or not result:
+            return
+        expanded = [node for node, depth in result if max_depth is None or depth < max_depth]
+        compiled = self._get_compiled_graph()
+        if compiled is not None:
+            edges = compiled.out_degree_sum(expanded)
+        else:
+            degree = self.G.out_degree if self.G.is_directed() else self.G.degree
+            edges = sum(d for _, d in degree(expanded))
+        context.touch(len(result), edges)
+
+    def _touch_paths(self, paths: List[Dict[str, Any]]):
+        """ثبت نودها و یال‌های مسیرهای کاندید جستجوی مسیر"""
+        context = self.current_query_context()
+        if context is not None:
+            context.touch(len({node for path in paths for node in path['path_nodes']}),
+                          sum(max(len(path['path_nodes']) - 1, 0) for path in paths))
+
+    def _graph_cache_token(self):
+        """شناسه گراف فعلی برای باطل کردن کش‌ها (گراف دیگر یا تغییر تعداد نودها)"""
+        G = self.G
+        return (id(G), len(G)) if G is not None else None
+
+    def _cached(self, cache, key, compute):
+        """خواندن از کش محدود؛ در صورت عوض شدن گراف ابتدا همه کش‌ها خالی می‌شوند"""
+        self._caches.validate(self._graph_cache_token())
+        return cache.get_or_compute(key, compute)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """آمار hit/miss/eviction کش‌های سرویس"""
+        return {'caches': self._caches.stats(), 'invalidations': self._caches.invalidations,
+                'results': self.result_cache.stats()}
+
+    # تنظیماتی که روی نتیجه بازیابی اثری ندارند و در کلید کش نتایج نمی‌آیند
+    _RESULT_CACHE_IGNORED_CONFIG = ('enable_verbose_logging', 'use_compiled_graph', 'enable_result_cache',
+                                    'batch_max_workers', 'nlp_batch_size', 'hf_generation_timeout')
+
+    def _cached_result(self, kind: str, query: str, params: Dict[str, Any], compute, encode, decode):
+        """نتیجه از کش نتایج (کلید: پرسش نرمال‌شده، پارامترها، تنظیمات و اثرانگشت گراف)"""
+        centrality = self._get_centrality()
+        if not self.config.get('enable_result_cache') or centrality is None:
+            return compute()
+        params = dict(params)
+        params['config'] = {k: v for k, v in self.config.items() if k not in self._RESULT_CACHE_IGNORED_CONFIG}
+        key = self.result_cache.key(kind, query, params, centrality.fingerprint)
+        return self.result_cache.get_or_compute(key, compute, encode, decode)
+
+    def invalidate_result_cache(self, query: Optional[str] = None) -> int:
+        """حذف نتایج کش‌شده یک پرسش (همه روش‌ها) یا در صورت None همه نتایج"""
+        return self.result_cache.invalidate(query)
+
     def extract_keywords(self, text: str) -> List[str]:
         """استخراج کلمات کلیدی از متن با بهبود برای ژن‌ها و اصطلاحات تخصصی"""
-        # کش ساده برای سرعت
-        if text in self._keyword_cache:
-            return self._keyword_cache[text]
+        return self._query_memo('keywords', text,
+                                lambda: self._cached(self._keyword_cache, text, lambda: self._extract_keywords(text)))
+
+    def _extract_keywords(self, text: str) -> List[str]:
         if self.nlp is None:
             # fallback ساده بدون spaCy
             import re as _re
             tokens = _re.sub(r"[^\w\s]", " ", text.lower()).split()
-            keywords = sorted(set(t for t in tokens if len(t) >= 2))
-            self._keyword_cache[text] = keywords
-            return keywords
-        doc = self.nlp(text)
+            return sorted(set(t for t in tokens if len(t) >= 2))
+        docs = get_doc_pipeline(self.nlp)
+        doc = self._query_memo('doc', text, lambda: docs.doc(text))
         keywords = set()
         
         # نگاشت فارسی به انگلیسی برای کلمات کلیدی مهم
@@ -883,7 +1268,8 @@ def extract_keywords(self, text: str) -> List[str]:
         for persian_word, english_word in persian_to_english.items():
             if persian_word in text:
                 keywords.add(english_word)
-                print(f"🔄 تبدیل فارسی به انگلیسی: '{persian_word}' -> '{english_word}'")
+                if self._verbose:
+                    logger.debug(f"🔄 تبدیل فارسی به انگلیسی: '{persian_word}' -> '{english_word}'")
         
         # موجودیت‌های نام‌دار
         for ent in doc.ents:
@@ -896,7 +1282,7 @@ def extract_keywords(self, text: str) -> List[str]:
         # اسم‌ها و اسم خاص‌ها
         for token in doc:
             if (token.pos_ in {"NOUN", "PROPN"} and 
-                token.text.lower() not in STOP_WORDS and 
+                token.text.lower() not in nlp.Defaults.stop_words and 
                 token.is_alpha and len(token.text) > 2):
                 # حذف علائم نگارشی
                 clean_text = ''.join(c for c in token.text.lower() if c.isalnum() or c.isspace())
@@ -921,15 +1307,14 @@ def extract_keywords(self, text: str) -> List[str]:
             if len(keyword) >= 2 and keyword not in ['the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by']:
                 filtered_keywords.add(keyword)
         
-        result = sorted(filtered_keywords)
-        # محدود کردن اندازه کش
-        if len(self._keyword_cache) > 1024:
-            self._keyword_cache.clear()
-        self._keyword_cache[text] = result
-        return result
+        return sorted(filtered_keywords)
     
     def analyze_question_intent(self, query: str) -> Dict[str, Any]:
         """تحلیل مفهومی سوال و استخراج قصد کاربر بر اساس جدول نگاشت Hetionet"""
+        return dict(self._query_memo(
+            'intent', query, lambda: self._cached(self._intent_cache, query, lambda: self._analyze_question_intent(query))))
+
+    def _analyze_question_intent(self, query: str) -> Dict[str, Any]:
         query_lower = query.lower()
         
         # 1. تشخیص نوع سوال بر اساس جدول نگاشت
@@ -1091,98 +1476,121 @@ def analyze_question_intent(self, query: str) -> Dict[str, Any]:
             'description': question_patterns.get(detected_type, {}).get('description', 'سوال عمومی')
         }
     
+    @uses_query_context
     def intelligent_semantic_search(self, query: str, max_depth: int = 3) -> List[Tuple[str, int, float, str]]:
         """جستجوی معنایی هوشمند بر اساس جدول نگاشت Hetionet"""
         if not self.G:
             return []
+        self._label_query(RetrievalMethod.INTELLIGENT.name)
         
         # تحلیل مفهومی سوال
         intent = self.analyze_question_intent(query)
-        print(f"🔍 تحلیل مفهومی سوال: {intent['question_type']}")
-        print(f"📊 موجودیت‌ها: {intent['entity_types']}")
-        print(f"🔗 metaedges: {intent['metaedges']}")
-        print(f"📝 توضیح: {intent['description']}")
+        if self._verbose:
+            logger.debug(f"🔍 تحلیل مفهومی سوال: {intent['question_type']}")
+            logger.debug(f"📊 موجودیت‌ها: {intent['entity_types']}")
+            logger.debug(f"🔗 metaedges: {intent['metaedges']}")
+            logger.debug(f"📝 توضیح: {intent['description']}")
         
         # استخراج کلمات کلیدی
         keywords = intent['keywords']
-        print(f"🔑 کلمات کلیدی: {keywords}")
+        if self._verbose:
+            logger.debug(f"🔑 کلمات کلیدی: {keywords}")
         
         # تطبیق توکن‌ها با نودها
         matched_nodes = self.match_tokens_to_nodes(keywords)
-        print(f"🎯 نودهای تطبیق یافته: {matched_nodes}")
+        if self._verbose:
+            logger.debug(f"🎯 نودهای تطبیق یافته: {matched_nodes}")
         
         # اگر هیچ نودی تطبیق نکرد، سعی کن همه توکن‌ها را تطبیق دهی
         if not matched_nodes:
-            print("⚠️ هیچ نودی تطبیق نکرد، تلاش برای تطبیق همه توکن‌ها")
+            if self._verbose:
+                logger.debug("⚠️ هیچ نودی تطبیق نکرد، تلاش برای تطبیق همه توکن‌ها")
             all_tokens = query.lower().split()
             matched_nodes = self.match_tokens_to_nodes(all_tokens)
-            print(f"🎯 نودهای تطبیق یافته (تلاش دوم): {matched_nodes}")
+            if self._verbose:
+                logger.debug(f"🎯 نودهای تطبیق یافته (تلاش دوم): {matched_nodes}")
         
         results = []
         
         # تشخیص سوالات خاص ژن-سرطان
         if self._is_gene_cancer_question(query, matched_nodes):
-            print("🎯 تشخیص سوال ژن-سرطان")
+            if self._verbose:
+                logger.debug("🎯 تشخیص سوال ژن-سرطان")
             results = self._search_gene_cancer_relationships(query, matched_nodes, max_depth)
         # بر اساس نوع سوال و metaedges، روش جستجوی مناسب را انتخاب کن
         elif intent['question_type'] == 'anatomy_expression':
-            print("🫀 تشخیص نوع سوال: بیان ژن در آناتومی")
+            if self._verbose:
+                logger.debug("🫀 تشخیص نوع سوال: بیان ژن در آناتومی")
             results = self._search_by_metaedges(matched_nodes, intent, ['AeG'], max_depth)
             
         elif intent['question_type'] == 'gene_expression_location':
-            print("📍 تشخیص نوع سوال: مکان بیان ژن")
+            if self._verbose:
+                logger.debug("📍 تشخیص نوع سوال: مکان بیان ژن")
             results = self._search_by_metaedges(matched_nodes, intent, ['GeA'], max_depth)
             
         elif intent['question_type'] == 'biological_participation':
-            print("🧬 تشخیص نوع سوال: مشارکت در فرآیند زیستی")
+            if self._verbose:
+                logger.debug("🧬 تشخیص نوع سوال: مشارکت در فرآیند زیستی")
             results = self._search_by_metaedges(matched_nodes, intent, ['GpBP', 'GpMF', 'GpCC'], max_depth)
             
         elif intent['question_type'] == 'gene_interaction':
-            print("🔗 تشخیص نوع سوال: تعامل ژن‌ها")
+            if self._verbose:
+                logger.debug("🔗 تشخیص نوع سوال: تعامل ژن‌ها")
             results = self._search_by_metaedges(matched_nodes, intent, ['GiG'], max_depth)
             
         elif intent['question_type'] == 'disease_gene_regulation':
-            print("🏥 تشخیص نوع سوال: تنظیم ژن توسط بیماری")
+            if self._verbose:
+                logger.debug("🏥 تشخیص نوع سوال: تنظیم ژن توسط بیماری")
             results = self._search_by_metaedges(matched_nodes, intent, ['DuG', 'DdG', 'DaG'], max_depth)
             
         elif intent['question_type'] == 'disease_treatment':
-            print("💊 تشخیص نوع سوال: درمان بیماری")
+            if self._verbose:
+                logger.debug("💊 تشخیص نوع سوال: درمان بیماری")
             results = self._search_by_metaedges(matched_nodes, intent, ['CtD'], max_depth)
             
         elif intent['question_type'] == 'compound_gene_regulation':
-            print("🧪 تشخیص نوع سوال: تنظیم ژن توسط دارو")
+            if self._verbose:
+                logger.debug("🧪 تشخیص نوع سوال: تنظیم ژن توسط دارو")
             results = self._search_by_metaedges(matched_nodes, intent, ['CuG', 'CdG', 'CbG'], max_depth)
             
         elif intent['question_type'] == 'anatomy_disease':
-            print("🏥 تشخیص نوع سوال: بیماری‌های مرتبط با بافت")
+            if self._verbose:
+                logger.debug("🏥 تشخیص نوع سوال: بیماری‌های مرتبط با بافت")
             results = self._search_by_metaedges(matched_nodes, intent, ['DlA'], max_depth)
             
         elif intent['question_type'] == 'disease_symptom':
-            print(" تشخیص نوع سوال: علائم بیماری")
+            if self._verbose:
+                logger.debug(" تشخیص نوع سوال: علائم بیماری")
             results = self._search_by_metaedges(matched_nodes, intent, ['DpS'], max_depth)
             
         elif intent['question_type'] == 'disease_similarity':
-            print("🔄 تشخیص نوع سوال: بیماری‌های مشابه")
+            if self._verbose:
+                logger.debug("🔄 تشخیص نوع سوال: بیماری‌های مشابه")
             results = self._search_by_metaedges(matched_nodes, intent, ['DrD'], max_depth)
             
         elif intent['question_type'] == 'compound_side_effect':
-            print("⚠️ تشخیص نوع سوال: عوارض دارو")
+            if self._verbose:
+                logger.debug("⚠️ تشخیص نوع سوال: عوارض دارو")
             results = self._search_by_metaedges(matched_nodes, intent, ['CcSE'], max_depth)
             
         elif intent['question_type'] == 'gene_pathway':
-            print("🛤️ تشخیص نوع سوال: مسیرهای ژن")
+            if self._verbose:
+                logger.debug("🛤️ تشخیص نوع سوال: مسیرهای ژن")
             results = self._search_by_metaedges(matched_nodes, intent, ['GpPW'], max_depth)
             
         elif intent['question_type'] == 'gene_regulation':
-            print("🎛️ تشخیص نوع سوال: تنظیم ژن توسط ژن دیگر")
+            if self._verbose:
+                logger.debug("🎛️ تشخیص نوع سوال: تنظیم ژن توسط ژن دیگر")
             results = self._search_by_metaedges(matched_nodes, intent, ['Gr>G'], max_depth)
             
         elif intent['question_type'] == 'gene_covariation':
-            print("📈 تشخیص نوع سوال: همبستگی ژن‌ها")
+            if self._verbose:
+                logger.debug("📈 تشخیص نوع سوال: همبستگی ژن‌ها")
             results = self._search_by_metaedges(matched_nodes, intent, ['GcG'], max_depth)
             
         else:
-            print("🔍 تشخیص نوع سوال: عمومی")
+            if self._verbose:
+                logger.debug("🔍 تشخیص نوع سوال: عمومی")
             # استفاده از تمام metaedges موجود
             all_metaedges = ['AeG', 'GeA', 'GpBP', 'GpMF', 'GpCC', 'GpPW', 'GiG', 'Gr>G', 'GcG', 
                            'DuG', 'DdG', 'DaG', 'DlA', 'DpS', 'DrD', 'CtD', 'CuG', 'CdG', 'CbG', 'CcSE']
@@ -1230,8 +1638,9 @@ def _search_gene_cancer_relationships(self, query: str, matched_nodes: Dict[str,
                 if any(keyword in node_name_lower for keyword in cancer_keywords):
                     cancer_nodes.append((token, node_id))
         
-        print(f"🧬 ژن‌های یافت شده: {[name for name, _ in gene_nodes]}")
-        print(f"🏥 سرطان‌های یافت شده: {[name for name, _ in cancer_nodes]}")
+        if self._verbose:
+            logger.debug(f"🧬 ژن‌های یافت شده: {[name for name, _ in gene_nodes]}")
+            logger.debug(f"🏥 سرطان‌های یافت شده: {[name for name, _ in cancer_nodes]}")
         
         # اضافه کردن ژن‌های اصلی به نتایج
         for gene_token, gene_node_id in gene_nodes:
@@ -1240,12 +1649,14 @@ def _search_gene_cancer_relationships(self, query: str, matched_nodes: Dict[str,
             score = 10.0  # امتیاز بالاتر برای ژن‌های اصلی
             explanation = f"Primary gene: {gene_name}"
             results.append((gene_node_id, 0, score, explanation))
-            print(f"  ✅ ژن اصلی: {gene_name} (امتیاز: {score})")
+            if self._verbose:
+                logger.debug(f"  ✅ ژن اصلی: {gene_name} (امتیاز: {score})")
         
         # جستجوی روابط مستقیم ژن-سرطان
         for gene_token, gene_node_id in gene_nodes:
             gene_name = self.G.nodes[gene_node_id]['name']
-            print(f"🔍 جستجوی روابط برای ژن: {gene_name}")
+            if self._verbose:
+                logger.debug(f"🔍 جستجوی روابط برای ژن: {gene_name}")
             
             # جستجوی همسایه‌های بیماری
             for neighbor in self.G.neighbors(gene_node_id):
@@ -1262,7 +1673,8 @@ def _search_gene_cancer_relationships(self, query: str, matched_nodes: Dict[str,
                         explanation = f"{gene_name} related to {neighbor_attrs['name']} via {metaedge}"
                         
                         results.append((neighbor, 1, score, explanation))
-                        print(f"  ✅ {neighbor_attrs['name']} - {metaedge} (امتیاز: {score})")
+                        if self._verbose:
+                            logger.debug(f"  ✅ {neighbor_attrs['name']} - {metaedge} (امتیاز: {score})")
             
             # جستجوی معکوس (بیماری‌ها که به ژن متصل هستند)
             for other_node, other_attrs in self.G.nodes(data=True):
@@ -1280,12 +1692,14 @@ def _search_gene_cancer_relationships(self, query: str, matched_nodes: Dict[str,
                                 explanation = f"{other_attrs['name']} related to {gene_name} via {metaedge}"
                                 
                                 results.append((other_node, 1, score, explanation))
-                                print(f"  ✅ {other_attrs['name']} - {metaedge} معکوس (امتیاز: {score})")
+                                if self._verbose:
+                                    logger.debug(f"  ✅ {other_attrs['name']} - {metaedge} معکوس (امتیاز: {score})")
         
         # جستجوی عمیق برای روابط غیرمستقیم
         if max_depth > 1:
             for gene_token, gene_node_id in gene_nodes:
-                print(f"🔍 جستجوی عمیق برای ژن: {self.G.nodes[gene_node_id]['name']}")
+                if self._verbose:
+                    logger.debug(f"🔍 جستجوی عمیق برای ژن: {self.G.nodes[gene_node_id]['name']}")
                 dfs_results = self.dfs_search(gene_node_id, max_depth)
                 for found_node, depth in dfs_results:
                     found_attrs = self.G.nodes[found_node]
@@ -1298,7 +1712,8 @@ def _search_gene_cancer_relationships(self, query: str, matched_nodes: Dict[str,
                         explanation = f"{found_attrs['name']} found at depth {depth} from {self.G.nodes[gene_node_id]['name']}"
                         
                         results.append((found_node, depth, score, explanation))
-                        print(f"  ✅ {found_attrs['name']} در عمق {depth} (امتیاز: {score})")
+                        if self._verbose:
+                            logger.debug(f"  ✅ {found_attrs['name']} در عمق {depth} (امتیاز: {score})")
         
         return results
     
@@ -1320,7 +1735,8 @@ def _search_genes_expressed_in_anatomy(self, matched_nodes: Dict[str, str], inte
         for token, node_id in matched_nodes.items():
             if self.G.nodes[node_id]['kind'] == 'Anatomy':
                 anatomy_name = self.G.nodes[node_id]['name']
-                print(f"🔍 جستجوی ژن‌های مرتبط با {anatomy_name} در Hetionet")
+                if self._verbose:
+                    logger.debug(f"🔍 جستجوی ژن‌های مرتبط با {anatomy_name} در Hetionet")
                 
                 # بررسی تمام روابط مرتبط با بیان ژن
                 expression_relations = ['AeG', 'AuG', 'AdG']  # Anatomy -> Gene relations
@@ -1332,7 +1748,8 @@ def _search_genes_expressed_in_anatomy(self, matched_nodes: Dict[str, str], inte
                         'AdG': 'downregulates'
                     }.get(relation, relation)
                     
-                    print(f"  🔍 بررسی رابطه {relation} ({relation_name})")
+                    if self._verbose:
+                        logger.debug(f"  🔍 بررسی رابطه {relation} ({relation_name})")
                     
                     for neighbor in self.G.neighbors(node_id):
                         if self.G.nodes[neighbor]['kind'] == 'Gene':
@@ -1355,41 +1772,40 @@ def _search_genes_expressed_in_anatomy(self, matched_nodes: Dict[str, str], inte
                                     explanation = f"{gene_name} is related to {anatomy_name} via {relation}"
                                 
                                 results.append((neighbor, 1, score, explanation))
-                                print(f"    ✅ {gene_name} - {relation_name} در {anatomy_name} (امتیاز: {score})")
+                                if self._verbose:
+                                    logger.debug(f"    ✅ {gene_name} - {relation_name} در {anatomy_name} (امتیاز: {score})")
                 
                 # جستجوی معکوس (Gene -> Anatomy) اگر وجود داشته باشد
-                print(f"  🔍 بررسی روابط معکوس (Gene -> {anatomy_name})")
+                if self._verbose:
+                    logger.debug(f"  🔍 بررسی روابط معکوس (Gene -> {anatomy_name})")
                 reverse_relations = ['GeA', 'GuA', 'GdA']  # Gene -> Anatomy relations
                 
-                for gene_node, gene_attrs in self.G.nodes(data=True):
+                for gene_node, relation in self._get_reverse_index().sources_any(node_id, reverse_relations):
+                    gene_attrs = self.G.nodes[gene_node]
                     if gene_attrs.get('kind') == 'Gene':
-                        for neighbor in self.G.neighbors(gene_node):
-                            if neighbor == node_id:
-                                edge_data = self.G.get_edge_data(gene_node, neighbor)
-                                if edge_data:
-                                    relation = edge_data.get('metaedge')
-                                    if relation in reverse_relations:
-                                        gene_name = gene_attrs['name']
-                                        
-                                        # امتیازدهی برای روابط معکوس
-                                        if relation == 'GeA':
-                                            score = 4.0
-                                            explanation = f"{gene_name} expresses in {anatomy_name}"
-                                        elif relation == 'GuA':
-                                            score = 3.5
-                                            explanation = f"{gene_name} upregulates in {anatomy_name}"
-                                        elif relation == 'GdA':
-                                            score = 3.0
-                                            explanation = f"{gene_name} downregulates in {anatomy_name}"
-                                        else:
-                                            score = 2.5
-                                            explanation = f"{gene_name} related to {anatomy_name} via {relation}"
-                                        
-                                        results.append((gene_node, 1, score, explanation))
-                                        print(f"    ✅ {gene_name} - رابطه معکوس {relation} با {anatomy_name} (امتیاز: {score})")
+                        gene_name = gene_attrs['name']
+                        
+                        # امتیازدهی برای روابط معکوس
+                        if relation == 'GeA':
+                            score = 4.0
+                            explanation = f"{gene_name} expresses in {anatomy_name}"
+                        elif relation == 'GuA':
+                            score = 3.5
+                            explanation = f"{gene_name} upregulates in {anatomy_name}"
+                        elif relation == 'GdA':
+                            score = 3.0
+                            explanation = f"{gene_name} downregulates in {anatomy_name}"
+                        else:
+                            score = 2.5
+                            explanation = f"{gene_name} related to {anatomy_name} via {relation}"
+                        
+                        results.append((gene_node, 1, score, explanation))
+                        if self._verbose:
+                            logger.debug(f"    ✅ {gene_name} - رابطه معکوس {relation} با {anatomy_name} (امتیاز: {score})")
                 
                 # جستجوی عمیق با فیلتر روابط بیان
-                print(f"  🔍 جستجوی عمیق با فیلتر روابط بیان")
+                if self._verbose:
+                    logger.debug(f"  🔍 جستجوی عمیق با فیلتر روابط بیان")
                 for depth in range(2, max_depth + 1):
                     for relation in expression_relations:
                         dfs_results = self.dfs_search(node_id, depth, relation_filter=relation)
@@ -1399,7 +1815,8 @@ def _search_genes_expressed_in_anatomy(self, matched_nodes: Dict[str, str], inte
                                 score = 4.0 / gene_depth  # کاهش امتیاز با افزایش عمق
                                 explanation = f"{gene_name} related to {anatomy_name} via {relation} (depth {gene_depth})"
                                 results.append((gene_node, gene_depth, score, explanation))
-                                print(f"    ✅ {gene_name} - عمق {gene_depth} با رابطه {relation} (امتیاز: {score:.2f})")
+                                if self._verbose:
+                                    logger.debug(f"    ✅ {gene_name} - عمق {gene_depth} با رابطه {relation} (امتیاز: {score:.2f})")
         
         # حذف تکراری‌ها و مرتب‌سازی بر اساس امتیاز
         unique_results = {}
@@ -1412,7 +1829,8 @@ def _search_genes_expressed_in_anatomy(self, matched_nodes: Dict[str, str], inte
         
         final_results = [(node_id, depth, score, explanation) for node_id, (depth, score, explanation) in sorted_results]
         
-        print(f"📊 مجموع {len(final_results)} ژن منحصر به فرد یافت شد")
+        if self._verbose:
+            logger.debug(f"📊 مجموع {len(final_results)} ژن منحصر به فرد یافت شد")
         return final_results
     
     # def _add_node_if_not_exists(self, node_id: str):
@@ -1435,7 +1853,8 @@ def _search_anatomy_expression(self, matched_nodes: Dict[str, str], intent: Dict
         for token, node_id in matched_nodes.items():
             if self.G.nodes[node_id]['kind'] == 'Anatomy':
                 anatomy_name = self.G.nodes[node_id]['name']
-                print(f"🔍 جستجوی بیان ژن در {anatomy_name} با استفاده از رابطه AeG")
+                if self._verbose:
+                    logger.debug(f"🔍 جستجوی بیان ژن در {anatomy_name} با استفاده از رابطه AeG")
                 
                 # روش 1: یافتن مستقیم ژن‌های بیان شده (Anatomy → expresses → Gene)
                 for neighbor in self.G.neighbors(node_id):
@@ -1443,7 +1862,8 @@ def _search_anatomy_expression(self, matched_nodes: Dict[str, str], intent: Dict
                         edge_data = self.G.get_edge_data(node_id, neighbor)
                         if edge_data and edge_data.get('metaedge') == 'AeG':
                             results.append((neighbor, 1, 5.0, f"{self.G.nodes[neighbor]['name']} expressed in {anatomy_name}"))
-                            print(f"  ✅ {self.G.nodes[neighbor]['name']} - بیان مستقیم در {anatomy_name} (AeG)")
+                            if self._verbose:
+                                logger.debug(f"  ✅ {self.G.nodes[neighbor]['name']} - بیان مستقیم در {anatomy_name} (AeG)")
                 
                 # روش 2: جستجوی معکوس (Gene → expresses → Anatomy) - اگر وجود داشته باشد
                 for gene_node, gene_attrs in self.G.nodes(data=True):
@@ -1453,7 +1873,8 @@ def _search_anatomy_expression(self, matched_nodes: Dict[str, str], intent: Dict
                                 edge_data = self.G.get_edge_data(gene_node, neighbor)
                                 if edge_data and edge_data.get('metaedge') == 'GeA':
                                     results.append((gene_node, 1, 4.5, f"{gene_attrs['name']} expressed in {anatomy_name}"))
-                                    print(f"  ✅ {gene_attrs['name']} - بیان معکوس در {anatomy_name} (GeA)")
+                                    if self._verbose:
+                                        logger.debug(f"  ✅ {gene_attrs['name']} - بیان معکوس در {anatomy_name} (GeA)")
                 
                 # روش 3: جستجوی عمیق با فیلتر دقیق AeG
                 for depth in range(2, max_depth + 1):
@@ -1463,7 +1884,8 @@ def _search_anatomy_expression(self, matched_nodes: Dict[str, str], intent: Dict
                         if self.G.nodes[gene_node]['kind'] == 'Gene':
                             score = 4.0 / gene_depth
                             results.append((gene_node, gene_depth, score, f"{self.G.nodes[gene_node]['name']} expressed in {anatomy_name} (depth {gene_depth})"))
-                            print(f"  ✅ {self.G.nodes[gene_node]['name']} - عمق {gene_depth} (AeG)")
+                            if self._verbose:
+                                logger.debug(f"  ✅ {self.G.nodes[gene_node]['name']} - عمق {gene_depth} (AeG)")
                 
                 # روش 4: جستجوی بر اساس کلمات کلیدی در نام‌ها (برای قلب)
                 if 'heart' in token.lower() or 'heart' in anatomy_name.lower():
@@ -1473,7 +1895,8 @@ def _search_anatomy_expression(self, matched_nodes: Dict[str, str], intent: Dict
                             # جستجوی ژن‌های مرتبط با قلب
                             if any(keyword in gene_name for keyword in ['cardiac', 'heart', 'myocardial', 'cardio']):
                                 results.append((gene_node, 2, 3.5, f"ژن مرتبط با قلب: {gene_attrs['name']}"))
-                                print(f"  ✅ {gene_attrs['name']} - مرتبط با قلب")
+                                if self._verbose:
+                                    logger.debug(f"  ✅ {gene_attrs['name']} - مرتبط با قلب")
         
         # حذف تکراری‌ها و مرتب‌سازی بر اساس امتیاز
         unique_results = {}
@@ -1582,6 +2005,11 @@ def _search_general(self, matched_nodes: Dict[str, str], intent: Dict, max_depth
     
     def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
         """تطبیق توکن‌ها با نودهای گراف با پشتیبانی از تطبیق نوع موجودیت بر اساس Hetionet"""
+        key = tuple(tokens)
+        return dict(self._query_memo(
+            'matches', None, lambda: self._cached(self._match_cache, key, lambda: self._match_tokens_to_nodes(list(key))), key=key))
+
+    def _match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
         matched = {}
         
         # نگاشت کامل بر اساس metanodes Hetionet
@@ -1647,54 +2075,47 @@ def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
             'nsaid': 'Pharmacologic Class', 'antibiotic': 'Pharmacologic Class', 'antihypertensive': 'Pharmacologic Class'
         }
         
-        # نگاشت ژن‌های مشهور و نام‌های مختلف آنها
-        famous_genes = {
-            'tp53': ['TP53', 'P53', 'p53', 'Tumor Protein P53', 'Tumor Suppressor P53'],
-            'brca1': ['BRCA1', 'Breast Cancer 1', 'BRCA1 Gene'],
-            'brca2': ['BRCA2', 'Breast Cancer 2', 'BRCA2 Gene'],
-            'apoe': ['APOE', 'Apolipoprotein E', 'APOE Gene'],
-            'cftr': ['CFTR', 'Cystic Fibrosis Transmembrane Conductance Regulator'],
-            'mmp9': ['MMP9', 'Matrix Metallopeptidase 9'],
-            'bid': ['BID', 'BH3 Interacting Domain Death Agonist'],
-            'kcnq2': ['KCNQ2', 'Potassium Voltage-Gated Channel Subfamily Q Member 2'],
-            'hmgb3': ['HMGB3', 'High Mobility Group Box 3']
-        }
+        node_index = self._get_node_index()
+        
+        def node_label(position):
+            attrs = self.G.nodes[node_index.node_ids[position]]
+            return attrs.get('name', ''), attrs.get('kind', 'Unknown')
         
         for token in tokens:
             token_lower = token.lower()
             found = False
             
-            # روش 1: تطبیق ژن‌های مشهور
-            if token_lower in famous_genes:
-                gene_variants = famous_genes[token_lower]
+            # روش 1: تطبیق ژن‌های مشهور (مترادف‌ها هنگام ساخت ایندکس با Aho-Corasick حل شده‌اند)
+            if token_lower in FAMOUS_GENE_SYNONYMS:
+                gene_variants = FAMOUS_GENE_SYNONYMS[token_lower]
                 # ابتدا تطبیق دقیق نام کامل ژن، سپس تطبیق‌های شامل
-                for node_id, attrs in self.G.nodes(data=True):
-                    if attrs.get('kind') == 'Gene' and attrs.get('name', '').upper() == 'TP53' and token_lower == 'tp53':
-                        matched[token] = node_id
+                if token_lower == 'tp53':
+                    position = node_index.gene_by_exact_name('TP53')
+                    if position is not None:
+                        matched[token] = node_index.node_ids[position]
                         found = True
-                        print(f"🔍 تطبیق ژن مشهور (قفل دقیق): '{token}' -> {attrs['name']} ({attrs.get('kind', 'Unknown')})")
-                        break
+                        name, kind = node_label(position)
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق ژن مشهور (قفل دقیق): '{token}' -> {name} ({kind})")
                 if not found:
                     for variant in gene_variants:
-                        for node_id, attrs in self.G.nodes(data=True):
-                            if (attrs.get('kind') == 'Gene' and 
-                                variant.upper() == attrs.get('name', '').upper()):
-                                matched[token] = node_id
-                                found = True
-                                print(f"🔍 تطبیق ژن مشهور (دقیق): '{token}' -> {attrs['name']} ({attrs.get('kind', 'Unknown')})")
-                                break
-                        if found:
+                        position = node_index.gene_by_exact_name(variant)
+                        if position is not None:
+                            matched[token] = node_index.node_ids[position]
+                            found = True
+                            name, kind = node_label(position)
+                            if self._verbose:
+                                logger.debug(f"🔍 تطبیق ژن مشهور (دقیق): '{token}' -> {name} ({kind})")
                             break
                 if not found:
                     for variant in gene_variants:
-                        for node_id, attrs in self.G.nodes(data=True):
-                            if (attrs.get('kind') == 'Gene' and 
-                                variant.upper() in attrs.get('name', '').upper()):
-                                matched[token] = node_id
-                                found = True
-                                print(f"🔍 تطبیق ژن مشهور (شامل): '{token}' -> {attrs['name']} ({attrs.get('kind', 'Unknown')})")
-                                break
-                        if found:
+                        position = node_index.gene_containing_synonym(variant)
+                        if position is not None:
+                            matched[token] = node_index.node_ids[position]
+                            found = True
+                            name, kind = node_label(position)
+                            if self._verbose:
+                                logger.debug(f"🔍 تطبیق ژن مشهور (شامل): '{token}' -> {name} ({kind})")
                             break
                     if found:
                         break
@@ -1703,24 +2124,31 @@ def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
             if not found:
                 import re
                 gene_symbol_like = bool(re.fullmatch(r"[A-Za-z0-9\-]{2,10}", token)) and sum(1 for c in token if c.isalpha() and c.isupper()) >= 2
-                for node_id, attrs in self.G.nodes(data=True):
-                    name = attrs.get('name', '')
-                    name_lower = name.lower()
-                    # اگر شبیه نماد ژنی است، برای نودهای Gene فقط تطبیق دقیق را قبول کن
-                    if gene_symbol_like and attrs.get('kind') == 'Gene':
-                        if name_upper := name.upper():
-                            if token.upper() == name_upper:
-                                matched[token] = node_id
-                                found = True
-                                print(f"🔍 تطبیق مستقیم دقیق ژن: '{token}' -> {name}")
-                                break
-                        continue  # از تطبیق‌های شامل مثل TP53RK جلوگیری کن
-                    # برای سایر انواع، تطبیق شامل مجاز است
-                    if token_lower in name_lower:
-                        matched[token] = node_id
+                if gene_symbol_like:
+                    # برای نودهای Gene فقط تطبیق دقیق قبول می‌شود (جلوگیری از تطبیق‌های شامل مثل TP53RK)
+                    gene_position = node_index.gene_by_exact_name(token)
+                    other_position = node_index.first_containing(
+                        [token_lower], limit=gene_position,
+                        predicate=lambda position: not node_index.is_gene(position))
+                    if other_position is not None:
+                        matched[token] = node_index.node_ids[other_position]
                         found = True
-                        print(f"🔍 تطبیق مستقیم: '{token}' -> {name} ({attrs.get('kind', 'Unknown')})")
-                        break
+                        name, kind = node_label(other_position)
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق مستقیم: '{token}' -> {name} ({kind})")
+                    elif gene_position is not None:
+                        matched[token] = node_index.node_ids[gene_position]
+                        found = True
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق مستقیم دقیق ژن: '{token}' -> {node_label(gene_position)[0]}")
+                else:
+                    position = node_index.first_containing([token_lower])
+                    if position is not None:
+                        matched[token] = node_index.node_ids[position]
+                        found = True
+                        name, kind = node_label(position)
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق مستقیم: '{token}' -> {name} ({kind})")
             
             # روش 3: جستجوی فازی برای کلمات مشابه (بهینه‌سازی شده با ایندکس)
             if not found and len(token) >= 3:
@@ -1730,12 +2158,10 @@ def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
                     found = True
                 else:
                     # 3.2 شامل بودن سبک روی ورودی‌های ایندکس‌شده (محدود برای کارایی)
-                    limit_scan = min(len(self._name_entries), 10000)
-                    for name_lower, node_id in self._name_entries[:limit_scan]:
-                        if token_lower in name_lower:
-                            matched[token] = node_id
-                            found = True
-                            break
+                    position = node_index.first_containing([token_lower], raw=False, limit=10000)
+                    if position is not None:
+                        matched[token] = node_index.node_ids[position]
+                        found = True
             
             # روش 3: جستجو بر اساس نوع موجودیت
             if not found and token_lower in fallback_kinds:
@@ -1764,19 +2190,19 @@ def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
                     
                     if best_candidate:
                         matched[token] = best_candidate[0]
-                        print(f"🔍 تطبیق نوع موجودیت: '{token}' -> {kind} (نمونه: {best_candidate[1]['name']})")
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق نوع موجودیت: '{token}' -> {kind} (نمونه: {best_candidate[1]['name']})")
                         found = True
             
             # روش 4: جستجوی جزئی برای کلمات چندبخشی
             if not found and ' ' in token_lower:
-                words = token_lower.split()
-                for node_id, attrs in self.G.nodes(data=True):
-                    name_lower = attrs['name'].lower()
-                    if all(word in name_lower for word in words):
-                        matched[token] = node_id
-                        found = True
-                        print(f"🔍 تطبیق جزئی: '{token}' -> {attrs['name']} ({attrs.get('kind', 'Unknown')})")
-                        break
+                position = node_index.first_containing(token_lower.split())
+                if position is not None:
+                    matched[token] = node_index.node_ids[position]
+                    found = True
+                    name, kind = node_label(position)
+                    if self._verbose:
+                        logger.debug(f"🔍 تطبیق جزئی: '{token}' -> {name} ({kind})")
             
             # روش 5: تطبیق کلمات فارسی با نودهای مشابه
             if not found and any('\u0600' <= c <= '\u06FF' for c in token):  # کاراکترهای فارسی
@@ -1807,27 +2233,31 @@ def match_tokens_to_nodes(self, tokens: List[str]) -> Dict[str, str]:
                 if token in persian_mapping:
                     english_word = persian_mapping[token]
                     # جستجوی نود با نام انگلیسی
-                    for node_id, attrs in self.G.nodes(data=True):
-                        if english_word in attrs['name'].lower():
-                            matched[token] = node_id
-                            found = True
-                            print(f"🔍 تطبیق فارسی-انگلیسی: '{token}' -> {attrs['name']} ({attrs.get('kind', 'Unknown')})")
-                            break
+                    position = node_index.first_containing([english_word])
+                    if position is not None:
+                        matched[token] = node_index.node_ids[position]
+                        found = True
+                        name, kind = node_label(position)
+                        if self._verbose:
+                            logger.debug(f"🔍 تطبیق فارسی-انگلیسی: '{token}' -> {name} ({kind})")
             
             # روش 5: جستجوی فازی ویژه ژن‌ها با ایندکس نوع
             if not found and len(token) >= 3 and 'Gene' in self._kind_to_ids:
-                for node_id in self._kind_to_ids['Gene'][: min(5000, len(self._kind_to_ids['Gene']))]:
-                    attrs = self.G.nodes[node_id]
-                    name_lower = attrs.get('name', '').lower()
-                    if not name_lower:
-                        continue
-                    if (token_lower in name_lower or name_lower in token_lower or any(word in name_lower for word in token_lower.split())):
-                        matched[token] = node_id
-                        found = True
-                        break
+                gene_ids = self._kind_to_ids['Gene']
+                # فقط 5000 ژن اول؛ لیست نوع به ترتیب نودهای گراف است
+                cutoff = node_index.positions[gene_ids[min(5000, len(gene_ids)) - 1]] + 1
+                is_indexed_gene = lambda position: node_index.kind(position) == 'Gene' and bool(node_index.raw_name(position))
+                candidates = [node_index.first_named_within(token_lower, kind='Gene', limit=cutoff)]
+                for sub in [token_lower] + token_lower.split():
+                    candidates.append(node_index.first_containing([sub], limit=cutoff, predicate=is_indexed_gene))
+                candidates = [position for position in candidates if position is not None]
+                if candidates:
+                    matched[token] = node_index.node_ids[min(candidates)]
+                    found = True
             
             if not found:
-                print(f"❌ تطبیق نشد: '{token}'")
+                if self._verbose:
+                    logger.debug(f"❌ تطبیق نشد: '{token}'")
         
         return matched
 
@@ -1849,6 +2279,10 @@ def _preferred_core_kinds_for_question(self, question_type: str) -> List[str]:
         return mapping.get(question_type, ['Gene', 'Disease', 'Pathway'])
 
     def _extract_core_nodes(self, query: str, matched_nodes: Dict[str, str], intent: Dict[str, Any]) -> List[str]:
+        key = (tuple(matched_nodes.items()), intent.get('question_type'))
+        return list(self._query_memo('core_nodes', query, lambda: self._select_core_nodes(query, matched_nodes, intent), key=key))
+
+    def _select_core_nodes(self, query: str, matched_nodes: Dict[str, str], intent: Dict[str, Any]) -> List[str]:
         """انتخاب هسته‌های دقیق بر اساس سوال، نیت و تطبیق‌ها.
         قواعد:
         - برای نمادهای شبیه ژن، فقط تطبیق دقیق نام ژن به‌عنوان هسته پذیرفته می‌شود.
@@ -1900,7 +2334,19 @@ def _extract_core_nodes(self, query: str, matched_nodes: Dict[str, str], intent:
         return unique_core_nodes
     
     def bfs_search(self, start_node: str, max_depth: int = 2) -> List[Tuple[str, int]]:
-        """جستجوی سطح اول"""
+        """جستجوی سطح اول (در پردازش دسته‌ای، پیمایش هر نود شروع یک‌بار برای کل دسته)"""
+        batch = self._query_batch()
+        if batch is None:
+            result = self._bfs_search(start_node, max_depth)
+        else:
+            result = list(batch.memo('bfs', lambda: self._bfs_search(start_node, max_depth), (start_node, max_depth)))
+        self._touch_traversal(result, max_depth)
+        return result
+
+    def _bfs_search(self, start_node: str, max_depth: int) -> List[Tuple[str, int]]:
+        compiled = self._get_compiled_graph()
+        if compiled is not None and compiled.has_node(start_node):
+            return compiled.bfs(start_node, max_depth)
         visited = set()
         queue = deque([(start_node, 0)])
         result = []
@@ -1923,6 +2369,19 @@ def bfs_search(self, start_node: str, max_depth: int = 2) -> List[Tuple[str, int
     
     def dfs_search(self, start_node: str, max_depth: int = 2, relation_filter: str = None) -> List[Tuple[str, int]]:
         """جستجوی عمیق اول با امکان فیلتر بر اساس نوع رابطه"""
+        batch = self._query_batch()
+        if batch is None:
+            result = self._dfs_search(start_node, max_depth, relation_filter)
+        else:
+            result = list(batch.memo('dfs', lambda: self._dfs_search(start_node, max_depth, relation_filter),
+                                     (start_node, max_depth, relation_filter)))
+        self._touch_traversal(result)
+        return result
+
+    def _dfs_search(self, start_node: str, max_depth: int, relation_filter: Optional[str]) -> List[Tuple[str, int]]:
+        compiled = self._get_compiled_graph()
+        if compiled is not None and compiled.has_node(start_node):
+            return compiled.dfs(start_node, max_depth, relation_filter)
         visited = set()
         result = []
         
@@ -2072,17 +2531,20 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
         is_relationship_question = any(word in query_lower for word in ['relationship', 'related', 'connection', 'link'])
         is_function_question = any(word in query_lower for word in ['function', 'role', 'purpose', 'effect'])
         
-        print(f"🔍 تشخیص نوع سوال: expression={is_expression_question}, relationship={is_relationship_question}, function={is_function_question}")
+        if self._verbose:
+            logger.debug(f"🔍 تشخیص نوع سوال: expression={is_expression_question}, relationship={is_relationship_question}, function={is_function_question}")
         
         for node in nodes:
             node_kind = self.G.nodes[node]['kind']
             node_name = self.G.nodes[node]['name']
-            print(f"  📍 پردازش نود: {node_name} ({node_kind})")
+            if self._verbose:
+                logger.debug(f"  📍 پردازش نود: {node_name} ({node_kind})")
             
             # انتخاب روش بر اساس نوع نود و سوال
             if node_kind == 'Anatomy' and is_expression_question:
                 # برای سوالات بیان در آناتومی، از جستجوی تخصصی استفاده کن
-                print(f"    🫀 استفاده از جستجوی تخصصی آناتومی برای {node_name}")
+                if self._verbose:
+                    logger.debug(f"    🫀 استفاده از جستجوی تخصصی آناتومی برای {node_name}")
                 
                 # جستجوی مستقیم ژن‌های بیان شده
                 for neighbor in self.G.neighbors(node):
@@ -2092,7 +2554,8 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
                             relation = edge_data.get('metaedge', '')
                             if relation == 'AeG':
                                 all_results.append((neighbor, 1, 'Expression-Direct'))
-                                print(f"      ✅ {self.G.nodes[neighbor]['name']} - بیان مستقیم (AeG)")
+                                if self._verbose:
+                                    logger.debug(f"      ✅ {self.G.nodes[neighbor]['name']} - بیان مستقیم (AeG)")
                 
                 # جستجوی معکوس
                 for gene_node, gene_attrs in self.G.nodes(data=True):
@@ -2104,18 +2567,21 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
                                     relation = edge_data.get('metaedge', '')
                                     if relation == 'GeA':
                                         all_results.append((gene_node, 1, 'Expression-Reverse'))
-                                        print(f"      ✅ {gene_attrs['name']} - بیان معکوس (GeA)")
+                                        if self._verbose:
+                                            logger.debug(f"      ✅ {gene_attrs['name']} - بیان معکوس (GeA)")
                 
                 # جستجوی عمیق با فیلتر
                 dfs_result = self.dfs_search(node, max_depth, relation_filter='AeG')
                 for n, depth in dfs_result:
                     if self.G.nodes[n]['kind'] == 'Gene':
                         all_results.append((n, depth, 'Expression-DFS'))
-                        print(f"      ✅ {self.G.nodes[n]['name']} - عمق {depth}")
+                        if self._verbose:
+                            logger.debug(f"      ✅ {self.G.nodes[n]['name']} - عمق {depth}")
             
             elif node_kind in ['Gene', 'Disease']:
                 # برای ژن‌ها و بیماری‌ها از BFS و همسایه‌ها
-                print(f"    🧬 استفاده از BFS برای {node_name}")
+                if self._verbose:
+                    logger.debug(f"    🧬 استفاده از BFS برای {node_name}")
                 bfs_result = self.bfs_search(node, max_depth)
                 for n, depth in bfs_result:
                     all_results.append((n, depth, 'BFS'))
@@ -2126,14 +2592,16 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
             
             elif node_kind in ['Drug', 'Compound']:
                 # برای داروها از DFS و کوتاه‌ترین مسیر
-                print(f"    💊 استفاده از DFS برای {node_name}")
+                if self._verbose:
+                    logger.debug(f"    💊 استفاده از DFS برای {node_name}")
                 dfs_result = self.dfs_search(node, max_depth)
                 for n, depth in dfs_result:
                     all_results.append((n, depth, 'DFS'))
             
             elif node_kind in ['Biological Process', 'Pathway']:
                 # برای فرآیندهای زیستی از همه روش‌ها
-                print(f"    ⚙️ استفاده از روش‌های ترکیبی برای {node_name}")
+                if self._verbose:
+                    logger.debug(f"    ⚙️ استفاده از روش‌های ترکیبی برای {node_name}")
                 bfs_result = self.bfs_search(node, max_depth)
                 for n, depth in bfs_result:
                     all_results.append((n, depth, 'BFS'))
@@ -2144,7 +2612,8 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
             
             else:
                 # برای بقیه از روش ترکیبی
-                print(f"    🔄 استفاده از روش ترکیبی برای {node_name}")
+                if self._verbose:
+                    logger.debug(f"    🔄 استفاده از روش ترکیبی برای {node_name}")
                 hybrid_result = self.hybrid_search([node], max_depth)
                 for n, depth in hybrid_result:
                     all_results.append((n, depth, 'Hybrid'))
@@ -2181,29 +2650,92 @@ def adaptive_search(self, nodes: List[str], max_depth: int = 2, query: str = "")
         
         return [(node, depth, method) for node, depth, method, score in sorted_results]
     
+    @pins_graph
+    @applies_request_options
+    @uses_query_context
     def retrieve_information(self, query: str, method: RetrievalMethod, 
                            max_depth: int = None, max_nodes: int = None) -> RetrievalResult:
-        """بازیابی اطلاعات از گراف"""
+        """بازیابی اطلاعات از گراف (آرگومان کلیدی options: override تنظیمات فقط برای همین درخواست)"""
         # استفاده از تنظیمات پیش‌فرض اگر مقدار داده نشده
         if max_depth is None:
             max_depth = self.config['max_depth']
         if max_nodes is None:
             max_nodes = self.config['max_nodes']
-        """بازیابی اطلاعات از گراف"""
-        print(f"🔍 بازیابی اطلاعات با روش {method}...")
+        method_name = method.value if hasattr(method, 'value') else str(method)
+        self._label_query(method.name if isinstance(method, RetrievalMethod) else method_name)
+        return self._cached_result(
+            'retrieval', query, {'method': method_name, 'max_depth': max_depth, 'max_nodes': max_nodes},
+            lambda: self._retrieve_information(query, method, max_depth, max_nodes),
+            _encode_retrieval_result, lambda payload: _decode_retrieval_result(payload, query))
+
+    def _retrieve_information(self, query: str, method: RetrievalMethod, max_depth: int, max_nodes: int) -> RetrievalResult:
+        if self._verbose:
+            logger.debug(f"🔍 بازیابی اطلاعات با روش {method}...")
         
         # استخراج کلمات کلیدی
         keywords = self.extract_keywords(query)
-        print(f"کلمات کلیدی: {keywords}")
+        if self._verbose:
+            logger.debug(f"کلمات کلیدی: {keywords}")
         
         # تطبیق با نودهای گراف
         matches = self.match_tokens_to_nodes(keywords)
-        print(f"تطبیق‌های یافت شده: {matches}")
+        if self._verbose:
+            logger.debug(f"تطبیق‌های یافت شده: {matches}")
         
         nodes = []
         edges = []
         paths = []
         
+        with self._query_stage('traversal'):
+            self._run_retrieval_method(query, method, matches, max_depth, max_nodes, nodes, edges, paths)
+
+        # حذف تکراری‌ها
+        unique_nodes = {}
+        for node in nodes:
+            if node.id not in unique_nodes:
+                unique_nodes[node.id] = node
+        
+        nodes = list(unique_nodes.values())
+        
+        # ایجاد یال‌ها بین نودهای مرتبط
+        for i, node1 in enumerate(nodes):
+            for j, node2 in enumerate(nodes[i+1:], i+1):
+                if self.G.has_edge(node1.id, node2.id):
+                    edge_data = self.G.get_edge_data(node1.id, node2.id)
+                    edges.append(GraphEdge(
+                        source=node1.id,
+                        target=node2.id,
+                        relation=edge_data['metaedge']
+                    ))
+        
+        # ایجاد متن زمینه بهبود یافته
+        retrieval_result = RetrievalResult(
+            nodes=nodes,
+            edges=edges,
+            paths=paths,
+            context_text="",
+            method=str(method),
+            query=query
+        )
+        # تولید متن زمینه بهبود یافته
+        with self._query_stage('context'):
+            if self.context_generator:
+                context_text = self.context_generator.create_enhanced_context_text(retrieval_result, context_type="INTELLIGENT")
+            else:
+                context_text = self._create_enhanced_context_text(retrieval_result)
+        
+        return RetrievalResult(
+            nodes=nodes,
+            edges=edges,
+            paths=paths,
+            context_text=context_text,
+            method=method.value if hasattr(method, 'value') else str(method),
+            query=query
+        )
+    
+    def _run_retrieval_method(self, query: str, method: RetrievalMethod, matches: Dict[str, str], max_depth: int,
+                              max_nodes: int, nodes: List[GraphNode], edges: List[GraphEdge], paths: List[List[str]]):
+        """پیمایش گراف با روش method؛ نودها، یال‌ها و مسیرهای یافت‌شده به لیست‌ها افزوده می‌شوند"""
         if method == RetrievalMethod.BFS:
             # BFS برای هر نود تطبیق یافته
             for token, node_id in matches.items():
@@ -2247,7 +2779,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                                 ))
             else:
                 # اگر کمتر از 2 نود پیدا شد، از BFS استفاده کن
-                print("⚠️ کمتر از 2 نود برای SHORTEST_PATH پیدا شد. استفاده از BFS...")
+                if self._verbose:
+                    logger.debug("⚠️ کمتر از 2 نود برای SHORTEST_PATH پیدا شد. استفاده از BFS...")
                 for token, node_id in matches.items():
                     bfs_result = self.bfs_search(node_id, max_depth)
                     for node, depth in bfs_result[:max_nodes]:
@@ -2284,7 +2817,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                     ))
             else:
                 # اگر کمتر از 2 نود پیدا شد، از BFS استفاده کن
-                print("⚠️ کمتر از 2 نود برای HYBRID پیدا شد. استفاده از BFS...")
+                if self._verbose:
+                    logger.debug("⚠️ کمتر از 2 نود برای HYBRID پیدا شد. استفاده از BFS...")
                 for token, node_id in matches.items():
                     bfs_result = self.bfs_search(node_id, max_depth)
                     for node, depth in bfs_result[:max_nodes]:
@@ -2309,7 +2843,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                         score=len(methods.split(', '))  # امتیاز بر اساس تعداد روش‌ها
                     ))
             else:
-                print("⚠️ هیچ نودی برای MULTI_METHOD پیدا نشد.")
+                if self._verbose:
+                    logger.debug("⚠️ هیچ نودی برای MULTI_METHOD پیدا نشد.")
         
         elif method == RetrievalMethod.ENSEMBLE:
             # جستجوی گروهی
@@ -2325,7 +2860,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                         score=score
                     ))
             else:
-                print("⚠️ هیچ نودی برای ENSEMBLE پیدا نشد.")
+                if self._verbose:
+                    logger.debug("⚠️ هیچ نودی برای ENSEMBLE پیدا نشد.")
         
         elif method == RetrievalMethod.ADAPTIVE:
             # جستجوی تطبیقی با پاس دادن query
@@ -2340,7 +2876,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                         depth=depth
                     ))
             else:
-                print("⚠️ هیچ نودی برای ADAPTIVE پیدا نشد.")
+                if self._verbose:
+                    logger.debug("⚠️ هیچ نودی برای ADAPTIVE پیدا نشد.")
         
         elif method == RetrievalMethod.INTELLIGENT:
             # جستجوی معنایی هوشمند
@@ -2401,7 +2938,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.KG_SEARCH:
             # جستجوی دانش‌گراف (Knowledge Graph Search)
-            print("🔍 استفاده از الگوریتم KG_SEARCH")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم KG_SEARCH")
             # Intent-aware: اگر سوال هم‌واریانس ژن است، فقط GcG با خروجی مینیمال را برگردان
             intent = self.analyze_question_intent(query)
             if intent.get('question_type') == 'gene_covariation':
@@ -2507,7 +3045,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.N_HOP_RETRIEVAL:
             # بازیابی چندمرحله‌ای
-            print("🔍 استفاده از الگوریتم N_HOP_RETRIEVAL")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم N_HOP_RETRIEVAL")
             multi_hop_result = self.multi_hop_search(query, max_depth)
             
             # تبدیل نتایج به GraphNode
@@ -2537,11 +3076,12 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.PAGERANK_BASED:
             # جستجو بر اساس PageRank
-            print("🔍 استفاده از الگوریتم PAGERANK_BASED")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم PAGERANK_BASED")
             try:
-                import networkx as nx
-                # محاسبه PageRank
-                pagerank_scores = nx.pagerank(self.G, alpha=0.85, max_iter=100)
+                # PageRank کش‌شده (سرویس مرکزیت)
+                self._ensure_pagerank()
+                pagerank_scores = self._pagerank
                 
                 # مرتب‌سازی نودها بر اساس PageRank
                 sorted_nodes = sorted(pagerank_scores.items(), key=lambda x: x[1], reverse=True)
@@ -2570,7 +3110,7 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                                     weight=edge_data.get('weight', 1.0)
                                 ))
             except Exception as e:
-                print(f"⚠️ خطا در محاسبه PageRank: {e}")
+                logger.warning(f"⚠️ خطا در محاسبه PageRank: {e}")
                 # استفاده از روش جایگزین
                 intelligent_result = self.intelligent_semantic_search(query, max_depth)
                 for node_id, depth, score, reason in intelligent_result[:max_nodes]:
@@ -2582,9 +3122,37 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                         score=score
                     ))
         
+        elif method == RetrievalMethod.PERSONALIZED_PAGERANK:
+            # random walk with restart از نودهای تطبیق‌یافته پرسش
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم PERSONALIZED_PAGERANK")
+            for node_id, depth, score in self.personalized_pagerank_search(list(matches.values()), max_nodes):
+                nodes.append(GraphNode(
+                    id=node_id,
+                    name=self.G.nodes[node_id]['name'],
+                    kind=self.G.nodes[node_id]['kind'],
+                    depth=depth,
+                    score=score
+                ))
+            
+            # یافتن یال‌های مرتبط
+            selected = {node.id for node in nodes}
+            for node in nodes:
+                for neighbor in self.G.neighbors(node.id):
+                    if neighbor in selected:
+                        edge_data = self.G.get_edge_data(node.id, neighbor)
+                        if edge_data:
+                            edges.append(GraphEdge(
+                                source=node.id,
+                                target=neighbor,
+                                relation=edge_data.get('metaedge', 'related'),
+                                weight=edge_data.get('weight', 1.0)
+                            ))
+        
         elif method == RetrievalMethod.SEMANTIC_SIMILARITY:
             # جستجو بر اساس شباهت معنایی
-            print("🔍 استفاده از الگوریتم SEMANTIC_SIMILARITY")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم SEMANTIC_SIMILARITY")
             intelligent_result = self.intelligent_semantic_search(query, max_depth)
             
             # تبدیل نتایج به GraphNode
@@ -2642,7 +3210,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.COMMUNITY_DETECTION:
             # تشخیص جامعه‌ها
-            print("🔍 استفاده از الگوریتم COMMUNITY_DETECTION")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم COMMUNITY_DETECTION")
             try:
                 import networkx as nx
                 from community import community_louvain
@@ -2688,7 +3257,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                                     weight=edge_data.get('weight', 1.0)
                                 ))
             except ImportError:
-                print("⚠️ کتابخانه community در دسترس نیست، استفاده از روش جایگزین")
+                if self._verbose:
+                    logger.debug("⚠️ کتابخانه community در دسترس نیست، استفاده از روش جایگزین")
                 intelligent_result = self.intelligent_semantic_search(query, max_depth)
                 for node_id, depth, score, reason in intelligent_result[:max_nodes]:
                     nodes.append(GraphNode(
@@ -2699,7 +3269,7 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                         score=score
                     ))
             except Exception as e:
-                print(f"⚠️ خطا در تشخیص جامعه‌ها: {e}")
+                logger.warning(f"⚠️ خطا در تشخیص جامعه‌ها: {e}")
                 intelligent_result = self.intelligent_semantic_search(query, max_depth)
                 for node_id, depth, score, reason in intelligent_result[:max_nodes]:
                     nodes.append(GraphNode(
@@ -2712,10 +3282,12 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.ENTITY_RESOLUTION:
             # حل موجودیت‌ها
-            print("🔍 استفاده از الگوریتم ENTITY_RESOLUTION")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم ENTITY_RESOLUTION")
             try:
                 if NEW_MODULES_AVAILABLE:
                     # استفاده از ماژول جدید EntityResolution
+                    from graphrag_new.entity_resolution import EntityResolution
                     entity_resolver = EntityResolution()
                     resolved_entities = entity_resolver.resolve_entities(query)
                     
@@ -2743,7 +3315,7 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                             score=score
                         ))
             except Exception as e:
-                print(f"⚠️ خطا در حل موجودیت‌ها: {e}")
+                logger.warning(f"⚠️ خطا در حل موجودیت‌ها: {e}")
                 intelligent_result = self.intelligent_semantic_search(query, max_depth)
                 for node_id, depth, score, reason in intelligent_result[:max_nodes]:
                     nodes.append(GraphNode(
@@ -2756,7 +3328,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.HYBRID_NEW:
             # ترکیب روش‌های جدید با قفل موجودیت (Entity Locking) و فیلتر نویز
-            print("🔍 استفاده از الگوریتم HYBRID_NEW")
+            if self._verbose:
+                logger.debug("🔍 استفاده از الگوریتم HYBRID_NEW")
 
             # تحلیل نیت سوال و استخراج توکن‌ها برای قفل موجودیت
             intent = self.analyze_question_intent(query)
@@ -2792,8 +3365,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
 
             # 3. PageRank (اگر در دسترس باشد)
             try:
-                import networkx as nx
-                pagerank_scores = nx.pagerank(self.G, alpha=0.85, max_iter=100)
+                self._ensure_pagerank()
+                pagerank_scores = self._pagerank
                 sorted_nodes = sorted(pagerank_scores.items(), key=lambda x: x[1], reverse=True)
                 for node_id, score in sorted_nodes[:max_nodes//3]:
                     if node_id in self.G.nodes:
@@ -2867,7 +3440,8 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
         
         elif method == RetrievalMethod.NO_RETRIEVAL:
             # بدون بازیابی - فقط مدل
-            print("🔍 بدون بازیابی از گراف - فقط استفاده از مدل")
+            if self._verbose:
+                logger.debug("🔍 بدون بازیابی از گراف - فقط استفاده از مدل")
             # ایجاد یک نود خالی برای حفظ ساختار
             nodes.append(GraphNode(
                 id="no_retrieval",
@@ -2875,49 +3449,6 @@ def retrieve_information(self, query: str, method: RetrievalMethod,
                 kind="System",
                 depth=0
             ))
-        
-        # حذف تکراری‌ها
-        unique_nodes = {}
-        for node in nodes:
-            if node.id not in unique_nodes:
-                unique_nodes[node.id] = node
-        
-        nodes = list(unique_nodes.values())
-        
-        # ایجاد یال‌ها بین نودهای مرتبط
-        for i, node1 in enumerate(nodes):
-            for j, node2 in enumerate(nodes[i+1:], i+1):
-                if self.G.has_edge(node1.id, node2.id):
-                    edge_data = self.G.get_edge_data(node1.id, node2.id)
-                    edges.append(GraphEdge(
-                        source=node1.id,
-                        target=node2.id,
-                        relation=edge_data['metaedge']
-                    ))
-        
-        # ایجاد متن زمینه بهبود یافته
-        retrieval_result = RetrievalResult(
-            nodes=nodes,
-            edges=edges,
-            paths=paths,
-            context_text="",
-            method=str(method),
-            query=query
-        )
-        # تولید متن زمینه بهبود یافته
-        if self.context_generator:
-            context_text = self.context_generator.create_enhanced_context_text(retrieval_result, context_type="INTELLIGENT")
-        else:
-            context_text = self._create_enhanced_context_text(retrieval_result)
-        
-        return RetrievalResult(
-            nodes=nodes,
-            edges=edges,
-            paths=paths,
-            context_text=context_text,
-            method=method.value if hasattr(method, 'value') else str(method),
-            query=query
-        )
     
     def create_context_text(self, nodes: List[GraphNode], edges: List[GraphEdge], 
                            paths: List[List[str]]) -> str:
@@ -2985,8 +3516,9 @@ def _targeted_retrieval_for_question(self, query: str, intent: Dict) -> Dict[str
         target_metaedges = self._get_target_metaedges_for_question(question_type, query)
         retrieval_data['metaedges_used'] = target_metaedges
         
-        print(f"🎯 بازیابی هدفمند برای سوال: {question_type}")
-        print(f"📋 Metaedge های هدف: {target_metaedges}")
+        if self._verbose:
+            logger.debug(f"🎯 بازیابی هدفمند برای سوال: {question_type}")
+            logger.debug(f"📋 Metaedge های هدف: {target_metaedges}")
         
         # بازیابی اولیه بر اساس metaedge های اصلی
         for metaedge in target_metaedges:
@@ -3541,13 +4073,25 @@ def test_compact_retrieval(self, query: str) -> Dict[str, Any]:
             'text_length': text_length
         }
     
+    @applies_request_options
     def generate_answer(self, retrieval_result: RetrievalResult, 
                        model: GenerationModel, text_generation_type: str = 'INTELLIGENT') -> GenerationResult:
-        """تولید پاسخ بر اساس نتایج بازیابی"""
-        print(f"🤖 تولید پاسخ با مدل {model.value} و نوع {text_generation_type}...")
+        """تولید پاسخ بر اساس نتایج بازیابی (آرگومان کلیدی options: override تنظیمات همین درخواست)"""
+        if self._verbose:
+            logger.debug(f"🤖 تولید پاسخ با مدل {model.value} و نوع {text_generation_type}...")
         # اطمینان از آماده بودن PageRank برای استفاده در امتیازدهی ضمنی
         self._ensure_pagerank()
-        
+        answer, confidence = self._generate_answer_text(retrieval_result, model, text_generation_type)
+        return self._finish_generation(retrieval_result, model, text_generation_type, answer, confidence)
+
+    def _remote_confidence(self, model: GenerationModel, text_generation_type: str) -> float:
+        """اطمینان پاسخ مدل‌های OpenAI/Anthropic (SIMPLE یا INTELLIGENT)"""
+        simple, intelligent = self.REMOTE_MODEL_CONFIDENCE['openai' if model in self.OPENAI_MODEL_NAMES else 'anthropic']
+        return simple if text_generation_type == 'SIMPLE' else intelligent
+
+    def _generate_answer_text(self, retrieval_result: RetrievalResult, model: GenerationModel,
+                              text_generation_type: str) -> Tuple[str, float]:
+        """متن پاسخ و اطمینان آن بر اساس مدل و نوع تولید متن"""
         # انتخاب نوع تولید متن
         if text_generation_type == 'SIMPLE':
             # استفاده از روش‌های ساده
@@ -3567,18 +4111,13 @@ def generate_answer(self, retrieval_result: RetrievalResult,
                 answer = self.huggingface_generation(retrieval_result)
                 confidence = 0.92
             # OpenAI GPT Models
-            elif model in [GenerationModel.OPENAI_GPT_4O, GenerationModel.OPENAI_GPT_4O_MINI, 
-                          GenerationModel.OPENAI_GPT_4_TURBO, GenerationModel.OPENAI_GPT_4,
-                          GenerationModel.OPENAI_GPT_3_5_TURBO, GenerationModel.OPENAI_GPT_3_5_TURBO_16K,
-                          GenerationModel.OPENAI_GPT]:  # سازگاری با مدل قدیمی
+            elif model in self.OPENAI_MODEL_NAMES:
                 answer = self.openai_gpt_generation(retrieval_result, model)
-                confidence = 0.95
+                confidence = self._remote_confidence(model, text_generation_type)
             # Anthropic Claude Models
-            elif model in [GenerationModel.ANTHROPIC_CLAUDE_3_5_SONNET, GenerationModel.ANTHROPIC_CLAUDE_3_5_HAIKU,
-                          GenerationModel.ANTHROPIC_CLAUDE_3_OPUS, GenerationModel.ANTHROPIC_CLAUDE_3_SONNET,
-                          GenerationModel.ANTHROPIC_CLAUDE_3_HAIKU, GenerationModel.ANTHROPIC_CLAUDE]:  # سازگاری
+            elif model in self.ANTHROPIC_MODEL_NAMES:
                 answer = self.anthropic_claude_generation(retrieval_result, model)
-                confidence = 0.94
+                confidence = self._remote_confidence(model, text_generation_type)
             # Google Gemini Models
             elif model in [GenerationModel.GOOGLE_GEMINI_1_5_PRO, GenerationModel.GOOGLE_GEMINI_1_5_FLASH,
                           GenerationModel.GOOGLE_GEMINI_1_0_PRO, GenerationModel.GOOGLE_GEMINI_1_0_FLASH,
@@ -3619,18 +4158,13 @@ def generate_answer(self, retrieval_result: RetrievalResult,
                 answer = self.huggingface_generation(retrieval_result)
                 confidence = 0.92
             # OpenAI GPT Models (Intelligent)
-            elif model in [GenerationModel.OPENAI_GPT_4O, GenerationModel.OPENAI_GPT_4O_MINI, 
-                          GenerationModel.OPENAI_GPT_4_TURBO, GenerationModel.OPENAI_GPT_4,
-                          GenerationModel.OPENAI_GPT_3_5_TURBO, GenerationModel.OPENAI_GPT_3_5_TURBO_16K,
-                          GenerationModel.OPENAI_GPT]:  # سازگاری با مدل قدیمی
+            elif model in self.OPENAI_MODEL_NAMES:
                 answer = self.openai_gpt_generation(retrieval_result, model)
-                confidence = 0.97
+                confidence = self._remote_confidence(model, text_generation_type)
             # Anthropic Claude Models (Intelligent)
-            elif model in [GenerationModel.ANTHROPIC_CLAUDE_3_5_SONNET, GenerationModel.ANTHROPIC_CLAUDE_3_5_HAIKU,
-                          GenerationModel.ANTHROPIC_CLAUDE_3_OPUS, GenerationModel.ANTHROPIC_CLAUDE_3_SONNET,
-                          GenerationModel.ANTHROPIC_CLAUDE_3_HAIKU, GenerationModel.ANTHROPIC_CLAUDE]:  # سازگاری
+            elif model in self.ANTHROPIC_MODEL_NAMES:
                 answer = self.anthropic_claude_generation(retrieval_result, model)
-                confidence = 0.96
+                confidence = self._remote_confidence(model, text_generation_type)
             # Google Gemini Models (Intelligent)
             elif model in [GenerationModel.GOOGLE_GEMINI_1_5_PRO, GenerationModel.GOOGLE_GEMINI_1_5_FLASH,
                           GenerationModel.GOOGLE_GEMINI_1_0_PRO, GenerationModel.GOOGLE_GEMINI_1_0_FLASH,
@@ -3654,23 +4188,29 @@ def generate_answer(self, retrieval_result: RetrievalResult,
                 answer = "متأسفانه مدل انتخاب شده در دسترس نیست."
                 confidence = 0.0
         
+        return answer, confidence
+
+    def _finish_generation(self, retrieval_result: RetrievalResult, model: GenerationModel,
+                           text_generation_type: str, answer: str, confidence: float) -> GenerationResult:
+        """ساخت متن زمینه متناسب با نوع تولید متن و نتیجه نهایی تولید"""
         # به‌روزرسانی context_text بر اساس نوع تولید متن
-        if text_generation_type == 'SIMPLE':
-            retrieval_result.context_text = self._create_simple_context_text(retrieval_result)
-        elif text_generation_type == 'ADVANCED':
-            retrieval_result.context_text = self._create_advanced_context_text(retrieval_result)
-        elif text_generation_type == 'SCIENTIFIC_ANALYTICAL':
-            retrieval_result.context_text = self._create_scientific_analytical_context(retrieval_result)
-        elif text_generation_type == 'NARRATIVE_DESCRIPTIVE':
-            retrieval_result.context_text = self._create_narrative_context(retrieval_result)
-        elif text_generation_type == 'DATA_DRIVEN':
-            retrieval_result.context_text = self._create_data_driven_context(retrieval_result)
-        elif text_generation_type == 'STEP_BY_STEP':
-            retrieval_result.context_text = self._create_step_by_step_context(retrieval_result)
-        elif text_generation_type == 'CONCISE_DIRECT':
-            retrieval_result.context_text = self._create_compact_direct_context(retrieval_result)
-        else:  # INTELLIGENT
-            retrieval_result.context_text = self._create_intelligent_context_text(retrieval_result)
+        with self._query_stage('context'):
+            if text_generation_type == 'SIMPLE':
+                retrieval_result.context_text = self._create_simple_context_text(retrieval_result)
+            elif text_generation_type == 'ADVANCED':
+                retrieval_result.context_text = self._create_advanced_context_text(retrieval_result)
+            elif text_generation_type == 'SCIENTIFIC_ANALYTICAL':
+                retrieval_result.context_text = self._create_scientific_analytical_context(retrieval_result)
+            elif text_generation_type == 'NARRATIVE_DESCRIPTIVE':
+                retrieval_result.context_text = self._create_narrative_context(retrieval_result)
+            elif text_generation_type == 'DATA_DRIVEN':
+                retrieval_result.context_text = self._create_data_driven_context(retrieval_result)
+            elif text_generation_type == 'STEP_BY_STEP':
+                retrieval_result.context_text = self._create_step_by_step_context(retrieval_result)
+            elif text_generation_type == 'CONCISE_DIRECT':
+                retrieval_result.context_text = self._create_compact_direct_context(retrieval_result)
+            else:  # INTELLIGENT
+                retrieval_result.context_text = self._create_intelligent_context_text(retrieval_result)
         
         return GenerationResult(
             answer=answer,
@@ -3893,8 +4433,8 @@ def _create_step_by_step_context(self, retrieval_result: RetrievalResult) -> str
             if len(main_path) >= 2:
                 context_parts.append("**گام 1: شناسایی مسیر اصلی**")
                 path_elements = []
-                from node_lookup_system import NodeLookupSystem
-                lookup = NodeLookupSystem()
+                from node_lookup_system import get_node_lookup_system
+                lookup = get_node_lookup_system()
                 for i, node in enumerate(main_path):
                     if i < len(main_path) - 1:
                         # پیدا کردن رابطه بین این نود و نود بعدی
@@ -3951,8 +4491,8 @@ def _create_compact_direct_context(self, retrieval_result: RetrievalResult) -> s
             main_path = paths[0] if paths else []
             if len(main_path) >= 2:
                 context_parts.append("**مسیر کلیدی:**")
-                from node_lookup_system import NodeLookupSystem
-                lookup = NodeLookupSystem()
+                from node_lookup_system import get_node_lookup_system
+                lookup = get_node_lookup_system()
                 path_elements = []
                 for node in main_path:
                     node_info = lookup.get_node_info(node)
@@ -4248,8 +4788,8 @@ def _create_intelligent_context_text(self, retrieval_result: RetrievalResult) ->
         if edges:
             context_parts.append("")
             context_parts.append("🔗 **تحلیل روابط معنادار:**")
-            from node_lookup_system import NodeLookupSystem
-            lookup = NodeLookupSystem()
+            from node_lookup_system import get_node_lookup_system
+            lookup = get_node_lookup_system()
             edge_analysis = {}
             for edge in edges:
                 if edge.relation not in edge_analysis:
@@ -4373,8 +4913,8 @@ def _create_path_description(self, path: List[str], edges: List[GraphEdge]) -> s
         if len(path) < 2:
             return ""
         
-        from node_lookup_system import NodeLookupSystem
-        lookup = NodeLookupSystem()
+        from node_lookup_system import get_node_lookup_system
+        lookup = get_node_lookup_system()
         descriptions = []
         for i in range(len(path) - 1):
             source = path[i]
@@ -5276,26 +5816,60 @@ def _custom_general_analysis(self, retrieval_result: RetrievalResult, gene_nodes
         
         return parts
     
+    @pins_graph
+    @applies_request_options
+    @uses_query_context
     def process_query(self, query: str, retrieval_method: RetrievalMethod, 
                      generation_model: GenerationModel, text_generation_type: str = 'INTELLIGENT', 
                      max_depth: int = 2) -> Dict[str, Any]:
-        """پردازش کامل یک سوال"""
-        print(f"🚀 پردازش سوال: {query}")
-        print(f"📝 نوع تولید متن: {text_generation_type}")
+        """پردازش کامل یک سوال (آرگومان کلیدی options: override تنظیمات همین درخواست)"""
+        if self._verbose:
+            logger.debug(f"🚀 پردازش سوال: {query}")
+            logger.debug(f"📝 نوع تولید متن: {text_generation_type}")
+        
+        context = self.current_query_context(query)
         
         # مرحله 1: بازیابی
-        retrieval_result = self.retrieve_information(query, retrieval_method, max_depth)
+        with context.stage('retrieval'):
+            retrieval_result = self.retrieve_information(query, retrieval_method, max_depth)
         
         # مرحله 2: تولید پاسخ
-        generation_result = self.generate_answer(retrieval_result, generation_model, text_generation_type)
+        with context.stage('generation'):
+            generation_result = self.generate_answer(retrieval_result, generation_model, text_generation_type)
         
-        # آماده‌سازی نتیجه
+        return self._query_result(query, retrieval_method, generation_model, retrieval_result,
+                                  generation_result, context)
+
+    def _query_result(self, query: str, retrieval_method: RetrievalMethod, generation_model: GenerationModel,
+                      retrieval_result: RetrievalResult, generation_result: GenerationResult,
+                      context: QueryContext) -> Dict[str, Any]:
+        """دیکشنری نتیجه process_query"""
         result = {
             "query": query,
             "retrieval_method": retrieval_method.value,
             "generation_model": generation_model.value,
-            "keywords": self.extract_keywords(query),
-            "matched_nodes": {k: self.G.nodes[v]['name'] for k, v in self.match_tokens_to_nodes(self.extract_keywords(query)).items()},
+            **self._retrieval_payload(query, retrieval_result),
+            "context_text": retrieval_result.context_text,
+            "answer": generation_result.answer,
+            "confidence": generation_result.confidence,
+            "process_steps": [
+                "1. استخراج کلمات کلیدی از سوال",
+                "2. تطبیق کلمات کلیدی با نودهای گراف",
+                f"3. بازیابی اطلاعات با روش {retrieval_method.value}",
+                "4. ایجاد متن زمینه از نتایج",
+                f"5. تولید پاسخ با مدل {generation_model.value}"
+            ],
+            "timings_ms": context.timings_ms()
+        }
+        
+        return result
+
+    def _retrieval_payload(self, query: str, retrieval_result: RetrievalResult) -> Dict[str, Any]:
+        """بخش بازیابی نتیجه process_query (کلمات کلیدی و تطبیق‌ها از زمینه پرسش، بدون محاسبه مجدد)"""
+        keywords = self.extract_keywords(query)
+        return {
+            "keywords": keywords,
+            "matched_nodes": {k: self.G.nodes[v]['name'] for k, v in self.match_tokens_to_nodes(keywords).items()},
             "retrieved_nodes": [
                 {
                     "id": node.id,
@@ -5313,170 +5887,398 @@ def process_query(self, query: str, retrieval_method: RetrievalMethod,
                     "weight": edge.weight
                 } for edge in retrieval_result.edges
             ],
-            "paths": retrieval_result.paths,
-            "context_text": retrieval_result.context_text,
-            "answer": generation_result.answer,
-            "confidence": generation_result.confidence,
-            "process_steps": [
-                "1. استخراج کلمات کلیدی از سوال",
-                "2. تطبیق کلمات کلیدی با نودهای گراف",
-                f"3. بازیابی اطلاعات با روش {retrieval_method.value}",
-                "4. ایجاد متن زمینه از نتایج",
-                f"5. تولید پاسخ با مدل {generation_model.value}"
-            ]
+            "paths": retrieval_result.paths
         }
-        
-        return result
+
+    def _acquire_graph_handle(self):
+        """پین کردن handle متصل برای درخواستی که بین چند thread پخش می‌شود (None: بدون handle)"""
+        handle = self._graph_handle
+        while handle is not None:
+            try:
+                handle.acquire()
+                return handle
+            except RuntimeError:
+                # handle در همین لحظه جایگزین و بسته شده؛ handle جدید متصل را پین کن
+                handle = self._graph_handle
+        return None
+
+    def _run_in_request(self, handle, context: QueryContext, options, fn, *args):
+        """اجرای fn روی thread جاری با handle گراف، زمینه پرسش و options یک درخواست"""
+        previous = (getattr(self._graph_local, 'handle', None), getattr(self._query_local, 'context', None),
+                    getattr(self._options_local, 'options', None))
+        self._graph_local.handle, self._query_local.context, self._options_local.options = handle, context, options
+        try:
+            return fn(*args)
+        finally:
+            self._graph_local.handle, self._query_local.context, self._options_local.options = previous
+
+    async def aprocess_query(self, query: str, retrieval_method: RetrievalMethod,
+                             generation_model: GenerationModel, text_generation_type: str = 'INTELLIGENT',
+                             max_depth: int = 2, options=None, executor=None) -> Dict[str, Any]:
+        """
+        نسخه async process_query با همان خروجی
+
+        مراحل CPU-bound (بازیابی، ساخت prompt و متن زمینه) در executor (پیش‌فرض: executor
+        پیش‌فرض event loop) و فراخوانی مدل‌های OpenAI/Anthropic با کلاینت async اجرا می‌شوند.
+        همه مراحل یک handle گراف، یک QueryContext و یک options مشترک می‌بینند.
+        """
+        loop = asyncio.get_running_loop()
+        context = QueryContext(query)
+        options = RequestOptions(options) if options is not None else None
+        handle = self._acquire_graph_handle()
+
+        def run(fn, *args):
+            return loop.run_in_executor(executor, self._run_in_request, handle, context, options, fn, *args)
+
+        failed = True
+        try:
+            with context.stage('retrieval'):
+                retrieval_result = await run(self.retrieve_information, query, retrieval_method, max_depth)
+            with context.stage('generation'):
+                if generation_model in self.OPENAI_MODEL_NAMES or generation_model in self.ANTHROPIC_MODEL_NAMES:
+                    prompt = await run(self._create_advanced_prompt, retrieval_result)
+                    answer = await self.aremote_generation(retrieval_result, generation_model, prompt)
+                    confidence = self._remote_confidence(generation_model, text_generation_type)
+                    generation_result = await run(self._finish_generation, retrieval_result, generation_model,
+                                                  text_generation_type, answer, confidence)
+                else:
+                    generation_result = await run(self.generate_answer, retrieval_result, generation_model,
+                                                  text_generation_type)
+            result = await run(self._query_result, query, retrieval_method, generation_model, retrieval_result,
+                               generation_result, context)
+            failed = False
+            return result
+        finally:
+            get_pipeline_metrics().observe_query(context, error=failed)
+            if handle is not None:
+                handle.release()
+
+    def iter_process_queries(self, queries: List[Any], retrieval_method: RetrievalMethod = RetrievalMethod.BFS,
+                             generation_model: GenerationModel = GenerationModel.GPT_SIMULATION,
+                             text_generation_type: str = 'INTELLIGENT', max_depth: int = 2, options=None,
+                             max_workers: Optional[int] = None):
+        """
+        پردازش دسته‌ای پرسش‌ها؛ نتیجه هر پرسش به محض آماده شدن برگردانده می‌شود
+
+        Args:
+            queries: متن پرسش‌ها یا دیکشنری آرگومان‌های process_query برای هر پرسش
+                (کلیدهای داده نشده از آرگومان‌های همین متد گرفته می‌شوند)
+            max_workers: تعداد پرسش‌های هم‌زمان (پیش‌فرض: config['batch_max_workers'])
+
+        Yields:
+            (اندیس پرسش، نتیجه process_query، خطا)؛ در صورت خطا نتیجه None است
+
+        همه پرسش‌ها یک handle گراف را می‌بینند. doc های spaCy با nlp.pipe یک‌جا ساخته
+        می‌شوند و پیمایش BFS/DFS از نودهای شروع مشترک یک‌بار برای کل دسته انجام می‌شود؛
+        تولید پاسخ‌ها به‌صورت هم‌زمان در thread pool اجرا می‌شود.
+        """
+        defaults = {'retrieval_method': retrieval_method, 'generation_model': generation_model,
+                    'text_generation_type': text_generation_type, 'max_depth': max_depth, 'options': options}
+        items = [{**defaults, **(item if isinstance(item, dict) else {'query': item})} for item in queries]
+        if not items:
+            return
+        batch = QueryBatch()
+        contexts = [QueryContext(item['query'], batch) for item in items]
+        self._pipe_query_docs(contexts)
+
+        handle = self._acquire_graph_handle()
+        workers = max_workers or self.config['batch_max_workers']
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="graphrag-batch")
+        futures = {}
+        try:
+            for index, (item, context) in enumerate(zip(items, contexts)):
+                args = dict(item)
+                item_options = args.pop('options')
+                item_options = RequestOptions(item_options) if item_options is not None else None
+                futures[pool.submit(self._run_in_request, handle, context, item_options,
+                                    functools.partial(self.process_query, **args))] = index
+            for future in as_completed(futures):
+                index = futures[future]
+                error = future.exception()
+                get_pipeline_metrics().observe_query(contexts[index], error=error is not None)
+                yield (index, None, error) if error is not None else (index, future.result(), None)
+        finally:
+            # در صورت رها شدن iterator، پرسش‌های شروع‌نشده لغو می‌شوند
+            # (shutdown(cancel_futures=True) در Python 3.8 وجود ندارد)
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+            if handle is not None:
+                handle.release()
+
+    def process_queries(self, queries: List[Any], **kwargs) -> List[Dict[str, Any]]:
+        """
+        پردازش دسته‌ای پرسش‌ها (همان آرگومان‌های iter_process_queries) با خروجی به ترتیب ورودی
+
+        برای پرسش‌های ناموفق به‌جای نتیجه، دیکشنری {"query", "error"} برگردانده می‌شود.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        for index, result, error in self.iter_process_queries(queries, **kwargs):
+            if error is not None:
+                item = queries[index]
+                result = {"query": item['query'] if isinstance(item, dict) else item, "error": str(error)}
+            results[index] = result
+        return results
+
+    def iter_process_query_events(self, query: str, retrieval_method: RetrievalMethod,
+                                  generation_model: GenerationModel, text_generation_type: str = 'INTELLIGENT',
+                                  max_depth: int = 2, options=None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        نسخه جریانی process_query: هر مرحله به محض آماده شدن برگردانده می‌شود
+
+        Yields:
+            ('retrieval', نودها/یال‌ها/مسیرهای بازیابی‌شده)، ('context', متن زمینه بازیابی)،
+            ('token', تکه‌ای از پاسخ) چندین بار و در پایان ('done', همان خروجی process_query)
+
+        پاسخ مدل‌های OpenAI/Anthropic با API جریانی آن‌ها و پاسخ مولدهای قالبی
+        (مثل gpt_simulation_generation) خط به خط ارسال می‌شود. handle گراف، زمینه پرسش و
+        options فقط در طول هر مرحله روی thread جاری فعال‌اند، چون مصرف‌کننده ممکن است
+        تکه‌ها را از thread های مختلف بخواند.
+        """
+        context = QueryContext(query)
+        options = RequestOptions(options) if options is not None else None
+        handle = self._acquire_graph_handle()
+
+        def run(fn, *args):
+            return self._run_in_request(handle, context, options, fn, *args)
+
+        failed = True
+        try:
+            with context.stage('retrieval'):
+                retrieval_result = run(self.retrieve_information, query, retrieval_method, max_depth)
+            yield 'retrieval', {"query": query, "retrieval_method": retrieval_method.value,
+                                **run(self._retrieval_payload, query, retrieval_result)}
+            yield 'context', {"context_text": retrieval_result.context_text}
+
+            answer_parts: List[str] = []
+            chunks = self._stream_answer(retrieval_result, generation_model, text_generation_type, run)
+            while True:
+                with context.stage('generation'):
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration as stop:
+                        confidence = stop.value
+                        break
+                answer_parts.append(chunk)
+                yield 'token', {"text": chunk}
+
+            answer = "".join(answer_parts)
+            if generation_model in self.OPENAI_MODEL_NAMES or generation_model in self.ANTHROPIC_MODEL_NAMES:
+                # مانند مسیر غیرجریانی، پاسخ مدل‌های راه دور بدون فاصله ابتدا و انتها
+                answer = answer.strip()
+            with context.stage('generation'):
+                generation_result = run(self._finish_generation, retrieval_result, generation_model,
+                                        text_generation_type, answer, confidence)
+            result = run(self._query_result, query, retrieval_method, generation_model, retrieval_result,
+                         generation_result, context)
+            failed = False
+            yield 'done', result
+        finally:
+            # رها شدن جریان پیش از پایان هم خطا شمرده می‌شود
+            get_pipeline_metrics().observe_query(context, error=failed)
+            if handle is not None:
+                handle.release()
+
+    def _stream_answer(self, retrieval_result: RetrievalResult, model: GenerationModel,
+                       text_generation_type: str, run):
+        """تکه‌های متن پاسخ به ترتیب تولید؛ مقدار بازگشتی generator اطمینان پاسخ است"""
+        run(self._ensure_pagerank)
+        if model in self.OPENAI_MODEL_NAMES or model in self.ANTHROPIC_MODEL_NAMES:
+            provider, api_key, model_choice = self._remote_model(model)
+            if api_key:
+                prompt = run(self._create_advanced_prompt, retrieval_result)
+                emitted = False
+                try:
+                    for chunk in self._remote_answer_stream(prompt, model):
+                        emitted = True
+                        yield chunk
+                except Exception as e:
+                    logger.warning(f"خطا در {provider} ({model_choice}): {e}")
+                    if not emitted:
+                        yield from _answer_chunks(run(self._fallback_generation, retrieval_result,
+                                                      f"{provider} ({model_choice})"))
+                return self._remote_confidence(model, text_generation_type)
+        # مولدهای قالبی (و مدل راه دور بدون API Key): پاسخ کامل، ارسال خط به خط
+        answer, confidence = run(self._generate_answer_text, retrieval_result, model, text_generation_type)
+        yield from _answer_chunks(answer)
+        return confidence
+
+    def _pipe_query_docs(self, contexts: List[QueryContext]):
+        """ساخت doc های spaCy پرسش‌های دسته با nlp.pipe (فقط پرسش‌هایی که کلمات کلیدی‌شان کش نشده)"""
+        nlp = self.nlp
+        if nlp is None:
+            return
+        self._caches.validate(self._graph_cache_token())
+        texts = list(dict.fromkeys(c.query for c in contexts if self._keyword_cache.get(c.query, count=False) is None))
+        if not texts:
+            return
+        docs = dict(zip(texts, nlp.pipe(texts, batch_size=self.config['nlp_batch_size'])))
+        for context in contexts:
+            if context.query in docs:
+                context.put('doc', docs[context.query])
     
     def huggingface_generation(self, retrieval_result: RetrievalResult) -> str:
-        """تولید پاسخ با مدل‌های HuggingFace (رایگان)"""
+        """تولید پاسخ با مدل‌های HuggingFace (رایگان)
+
+        مدل یک‌بار در pool مشترک فرایند بارگذاری و گرم نگه داشته می‌شود و درخواست‌های
+        هم‌زمان در یک فراخوانی generate دسته‌بندی می‌شوند (hf_model_pool).
+        """
+        pool = get_hf_model_pool()
         try:
-            # استفاده از مدل‌های رایگان HuggingFace
-            from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-            import torch
-            
-            # مدل‌های رایگان قدرتمند
-            models = [
-                "microsoft/DialoGPT-medium",  # چت‌بات
-                "gpt2",  # GPT-2
-                "distilgpt2",  # GPT-2 سبک
-                "EleutherAI/gpt-neo-125M",  # GPT-Neo کوچک
-                "microsoft/DialoGPT-small"  # چت‌بات کوچک
-            ]
-            
-            # انتخاب بهترین مدل موجود
-            selected_model = None
-            for model_name in models:
-                try:
-                    tokenizer = AutoTokenizer.from_pretrained(model_name)
-                    model = AutoModelForCausalLM.from_pretrained(model_name)
-                    selected_model = model_name
-                    break
-                except:
-                    continue
-            
-            if selected_model is None:
+            if not pool.ensure_loaded():
                 return self._fallback_generation(retrieval_result, "HuggingFace")
-            
+
             # آماده‌سازی متن ورودی
             prompt = self._create_advanced_prompt(retrieval_result)
-            
-            # تولید پاسخ
-            inputs = tokenizer.encode(prompt, return_tensors="pt", max_length=512, truncation=True)
-            
-            with torch.no_grad():
-                outputs = model.generate(
-                    inputs,
-                    max_length=300,
-                    num_return_sequences=1,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=tokenizer.eos_token_id
-                )
-            
-            response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            
-            # استخراج پاسخ از خروجی
-            if len(response) > len(prompt):
-                answer = response[len(prompt):].strip()
-            else:
-                answer = response.strip()
-            
+            # دسته‌ای که گیر کرده یا بسیار کند است نباید درخواست را نگه دارد (timeout → fallback)
+            answer = pool.generate(prompt, timeout=self.config['hf_generation_timeout'])
+
             return answer if answer else self._fallback_generation(retrieval_result, "HuggingFace")
-            
+
         except Exception as e:
-            print(f"خطا در HuggingFace: {e}")
+            logger.warning(f"خطا در HuggingFace: {e}")
             return self._fallback_generation(retrieval_result, "HuggingFace")
     
+    def _openai_chat_request(self, prompt: str, model_choice: str) -> Dict[str, Any]:
+        """آرگومان‌های درخواست chat.completions برای کلاینت هم‌زمان و async"""
+        return dict(
+            model=model_choice,
+            messages=[
+                {"role": "system", "content": "You are a biomedical expert analyzing knowledge graph data. Provide detailed, accurate, and well-structured answers in Persian with proper formatting and emojis."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1500 if "4o" in model_choice else 1000,
+            temperature=0.7,
+            presence_penalty=0.1,  # تشویق به تنوع
+            frequency_penalty=0.1   # کاهش تکرار
+        )
+
+    def _anthropic_messages_request(self, prompt: str, model_choice: str) -> Dict[str, Any]:
+        """آرگومان‌های درخواست messages برای کلاینت هم‌زمان و async"""
+        return dict(
+            model=model_choice,
+            max_tokens=1500 if "3-5" in model_choice else 1000,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+
     def openai_gpt_generation(self, retrieval_result: RetrievalResult, model: GenerationModel = None) -> str:
         """تولید پاسخ با OpenAI GPT (نیاز به API Key)"""
+        # تعیین مدل بر اساس انتخاب کاربر
+        model_choice = self.OPENAI_MODEL_NAMES.get(model, "gpt-4o")  # پیش‌فرض جدیدترین مدل
         try:
-            from openai import OpenAI
-            
             # بررسی وجود API Key
             if not hasattr(self, 'openai_api_key') or not self.openai_api_key:
                 return "🔑 برای استفاده از OpenAI GPT، لطفاً API Key را تنظیم کنید.\n\n" + self._fallback_generation(retrieval_result, "OpenAI")
             
-            # تعیین مدل بر اساس انتخاب کاربر
-            model_mapping = {
-                GenerationModel.OPENAI_GPT_4O: "gpt-4o",
-                GenerationModel.OPENAI_GPT_4O_MINI: "gpt-4o-mini",
-                GenerationModel.OPENAI_GPT_4_TURBO: "gpt-4-turbo",
-                GenerationModel.OPENAI_GPT_4: "gpt-4",
-                GenerationModel.OPENAI_GPT_3_5_TURBO: "gpt-3.5-turbo",
-                GenerationModel.OPENAI_GPT_3_5_TURBO_16K: "gpt-3.5-turbo-16k",
-                GenerationModel.OPENAI_GPT: "gpt-4o"  # مدل پیش‌فرض جدیدترین
-            }
-            
-            model_choice = model_mapping.get(model, "gpt-4o")  # پیش‌فرض جدیدترین مدل
-            max_tokens = 1500 if "4o" in model_choice else 1000
-            
-            # ایجاد کلاینت OpenAI
-            client = OpenAI(api_key=self.openai_api_key)
-            
             # آماده‌سازی متن ورودی
             prompt = self._create_advanced_prompt(retrieval_result)
             
-            # درخواست به OpenAI
-            response = client.chat.completions.create(
-                model=model_choice,
-                messages=[
-                    {"role": "system", "content": "You are a biomedical expert analyzing knowledge graph data. Provide detailed, accurate, and well-structured answers in Persian with proper formatting and emojis."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7,
-                presence_penalty=0.1,  # تشویق به تنوع
-                frequency_penalty=0.1   # کاهش تکرار
-            )
+            # درخواست به OpenAI از طریق درگاه مشترک (کلاینت و اتصال‌های مشترک، محدودیت نرخ و retry)
+            answer = get_llm_gateway().openai_chat(self.openai_api_key, self._openai_chat_request(prompt, model_choice),
+                                                   semantic=self._llm_cache_semantic(retrieval_result))
             
-            return response.choices[0].message.content.strip()
+            return answer.strip()
             
         except Exception as e:
-            print(f"خطا در OpenAI ({model_choice}): {e}")
+            logger.warning(f"خطا در OpenAI ({model_choice}): {e}")
             return self._fallback_generation(retrieval_result, f"OpenAI ({model_choice})")
     
     def anthropic_claude_generation(self, retrieval_result: RetrievalResult, model: GenerationModel = None) -> str:
         """تولید پاسخ با Anthropic Claude (نیاز به API Key)"""
+        # تعیین مدل بر اساس انتخاب کاربر
+        model_choice = self.ANTHROPIC_MODEL_NAMES.get(model, "claude-3-5-sonnet-20241022")  # پیش‌فرض جدیدترین مدل
         try:
-            import anthropic
-            
             # بررسی وجود API Key
             if not hasattr(self, 'anthropic_api_key') or not self.anthropic_api_key:
                 return "🔑 برای استفاده از Claude، لطفاً API Key را تنظیم کنید.\n\n" + self._fallback_generation(retrieval_result, "Claude")
             
-            # تعیین مدل بر اساس انتخاب کاربر
-            model_mapping = {
-                GenerationModel.ANTHROPIC_CLAUDE_3_5_SONNET: "claude-3-5-sonnet-20241022",
-                GenerationModel.ANTHROPIC_CLAUDE_3_5_HAIKU: "claude-3-5-haiku-20241022",
-                GenerationModel.ANTHROPIC_CLAUDE_3_OPUS: "claude-3-opus-20240229",
-                GenerationModel.ANTHROPIC_CLAUDE_3_SONNET: "claude-3-sonnet-20240229",
-                GenerationModel.ANTHROPIC_CLAUDE_3_HAIKU: "claude-3-haiku-20240307",
-                GenerationModel.ANTHROPIC_CLAUDE: "claude-3-5-sonnet-20241022"  # مدل پیش‌فرض جدیدترین
-            }
-            
-            model_choice = model_mapping.get(model, "claude-3-5-sonnet-20241022")  # پیش‌فرض جدیدترین مدل
-            max_tokens = 1500 if "3-5" in model_choice else 1000
-            
-            client = anthropic.Anthropic(api_key=self.anthropic_api_key)
-            
             # آماده‌سازی متن ورودی
             prompt = self._create_advanced_prompt(retrieval_result)
             
-            # درخواست به Claude
-            response = client.messages.create(
-                model=model_choice,
-                max_tokens=max_tokens,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            # درخواست به Claude از طریق درگاه مشترک
+            answer = get_llm_gateway().anthropic_message(self.anthropic_api_key,
+                                                         self._anthropic_messages_request(prompt, model_choice),
+                                                         semantic=self._llm_cache_semantic(retrieval_result))
             
-            return response.content[0].text.strip()
+            return answer.strip()
             
         except Exception as e:
-            print(f"خطا در Claude ({model_choice}): {e}")
+            logger.warning(f"خطا در Claude ({model_choice}): {e}")
             return self._fallback_generation(retrieval_result, f"Claude ({model_choice})")
+
+    @staticmethod
+    def _llm_cache_semantic(retrieval_result: RetrievalResult) -> Tuple[str, str]:
+        """(پرسش، زمینه بازیابی‌شده) برای تطبیق معنایی کش پاسخ‌های LLM"""
+        context = [f"{node.name} ({node.kind})" for node in retrieval_result.nodes]
+        context.extend(f"{edge.source} {edge.relation} {edge.target}" for edge in retrieval_result.edges)
+        return retrieval_result.query, "\n".join(context)
+
+    def _remote_model(self, model: GenerationModel) -> Tuple[str, Optional[str], str]:
+        """(نام سرویس‌دهنده، API Key، نام مدل API) برای مدل‌های OpenAI/Anthropic"""
+        if model in self.OPENAI_MODEL_NAMES:
+            return "OpenAI", getattr(self, 'openai_api_key', None), self.OPENAI_MODEL_NAMES[model]
+        return "Claude", getattr(self, 'anthropic_api_key', None), self.ANTHROPIC_MODEL_NAMES.get(model, "claude-3-5-sonnet-20241022")
+
+    def _remote_answer_stream(self, prompt: str, model: GenerationModel) -> Iterator[str]:
+        """تکه‌های پاسخ مدل OpenAI/Anthropic با API جریانی سرویس‌دهنده"""
+        provider, api_key, model_choice = self._remote_model(model)
+        gateway = get_llm_gateway()
+        cache_provider = 'openai' if provider == "OpenAI" else 'anthropic'
+        request = (self._openai_chat_request(prompt, model_choice) if provider == "OpenAI"
+                   else self._anthropic_messages_request(prompt, model_choice))
+        # پاسخ کش‌شده (دقیق) به‌صورت یک تکه؛ پاسخ جریانی کامل پس از پایان ذخیره می‌شود
+        cached = gateway.cache.lookup(cache_provider, request) if gateway.cache is not None else None
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        if provider == "OpenAI":
+            client = gateway.openai_client(api_key)
+            with gateway.slot('openai'):
+                stream = client.chat.completions.create(stream=True, **request)
+                for event in stream:
+                    if event.choices and event.choices[0].delta.content:
+                        chunks.append(event.choices[0].delta.content)
+                        yield chunks[-1]
+        else:
+            client = gateway.anthropic_client(api_key)
+            with gateway.slot('anthropic'):
+                with client.messages.stream(**request) as stream:
+                    for text in stream.text_stream:
+                        chunks.append(text)
+                        yield text
+        if gateway.cache is not None:
+            gateway.cache.store(cache_provider, request, "".join(chunks))
+
+    async def aremote_generation(self, retrieval_result: RetrievalResult, model: GenerationModel,
+                                 prompt: Optional[str] = None) -> str:
+        """
+        نسخه async تولید پاسخ با OpenAI/Anthropic (کلاینت‌های async درگاه LLM)
+
+        prompt را می‌توان از قبل (مثلاً در executor) ساخت تا event loop درگیر غنی‌سازی نشود.
+        """
+        provider, api_key, model_choice = self._remote_model(model)
+        is_openai = provider == "OpenAI"
+        if not api_key:
+            title = "OpenAI GPT" if is_openai else "Claude"
+            return f"🔑 برای استفاده از {title}، لطفاً API Key را تنظیم کنید.\n\n" + self._fallback_generation(retrieval_result, provider)
+        try:
+            if prompt is None:
+                prompt = self._create_advanced_prompt(retrieval_result)
+            gateway = get_llm_gateway()
+            semantic = self._llm_cache_semantic(retrieval_result)
+            if is_openai:
+                answer = await gateway.aopenai_chat(api_key, self._openai_chat_request(prompt, model_choice),
+                                                    semantic=semantic)
+            else:
+                answer = await gateway.aanthropic_message(api_key, self._anthropic_messages_request(prompt, model_choice),
+                                                          semantic=semantic)
+            return answer.strip()
+        except Exception as e:
+            logger.warning(f"خطا در {provider} ({model_choice}): {e}")
+            return self._fallback_generation(retrieval_result, f"{provider} ({model_choice})")
     
     def google_gemini_generation(self, retrieval_result: RetrievalResult, model: GenerationModel = None) -> str:
         """تولید پاسخ با Google Gemini (نیاز به API Key)"""
@@ -5510,7 +6312,7 @@ def google_gemini_generation(self, retrieval_result: RetrievalResult, model: Gen
             return response.text.strip()
             
         except Exception as e:
-            print(f"خطا در Gemini ({model_choice}): {e}")
+            logger.warning(f"خطا در Gemini ({model_choice}): {e}")
             return self._fallback_generation(retrieval_result, f"Gemini ({model_choice})")
     
     def _create_advanced_prompt(self, retrieval_result: RetrievalResult) -> str:
@@ -5616,17 +6418,17 @@ def _fallback_generation(self, retrieval_result: RetrievalResult, model_name: st
     def set_openai_api_key(self, api_key: str):
         """تنظیم API Key برای OpenAI"""
         self.openai_api_key = api_key
-        print("✅ OpenAI API Key تنظیم شد")
+        logger.info("✅ OpenAI API Key تنظیم شد")
     
     def set_anthropic_api_key(self, api_key: str):
         """تنظیم API Key برای Anthropic"""
         self.anthropic_api_key = api_key
-        print("✅ Anthropic API Key تنظیم شد")
+        logger.info("✅ Anthropic API Key تنظیم شد")
     
     def set_gemini_api_key(self, api_key: str):
         """تنظیم API Key برای Google Gemini"""
         self.gemini_api_key = api_key
-        print("✅ Gemini API Key تنظیم شد")
+        logger.info("✅ Gemini API Key تنظیم شد")
     
     def _search_by_metaedges(self, matched_nodes: Dict[str, str], intent: Dict, target_metaedges: List[str], max_depth: int = 2) -> List[Tuple[str, int, float, str]]:
         """
@@ -5634,16 +6436,19 @@ def _search_by_metaedges(self, matched_nodes: Dict[str, str], intent: Dict, targ
         """
         results = []
         
-        print(f"🔍 جستجو با metaedges: {target_metaedges}")
+        if self._verbose:
+            logger.debug(f"🔍 جستجو با metaedges: {target_metaedges}")
         
         for token, node_id in matched_nodes.items():
             node_name = self.G.nodes[node_id]['name']
             node_kind = self.G.nodes[node_id]['kind']
-            print(f"  بررسی نود: {node_name} ({node_kind})")
+            if self._verbose:
+                logger.debug(f"  بررسی نود: {node_name} ({node_kind})")
             
             # جستجوی مستقیم بر اساس metaedges
             for metaedge in target_metaedges:
-                print(f"    بررسی metaedge: {metaedge}")
+                if self._verbose:
+                    logger.debug(f"    بررسی metaedge: {metaedge}")
                 
                 # جستجوی همسایه‌ها با metaedge مشخص
                 for neighbor in self.G.neighbors(node_id):
@@ -5657,49 +6462,33 @@ def _search_by_metaedges(self, matched_nodes: Dict[str, str], intent: Dict, targ
                         explanation = f"{neighbor_name} ({neighbor_kind}) connected to {node_name} via {metaedge}"
                         
                         results.append((neighbor, 1, score, explanation))
-                        print(f"      ✅ {neighbor_name} - {metaedge} (امتیاز: {score})")
+                        if self._verbose:
+                            logger.debug(f"      ✅ {neighbor_name} - {metaedge} (امتیاز: {score})")
                 
-                # جستجوی معکوس (اگر metaedge معکوس وجود دارد)
+                # جستجوی معکوس (اگر metaedge معکوس وجود دارد) از طریق ایندکس یال‌های ورودی
+                reverse_index = self._get_reverse_index()
                 reverse_metaedges = self._get_reverse_metaedges(metaedge)
                 for reverse_metaedge in reverse_metaedges:
-                    print(f"    بررسی metaedge معکوس: {reverse_metaedge}")
-                    for other_node, other_attrs in self.G.nodes(data=True):
-                        if other_node != node_id:
-                            for neighbor in self.G.neighbors(other_node):
-                                if neighbor == node_id:
-                                    edge_data = self.G.get_edge_data(other_node, neighbor)
-                                    if edge_data and edge_data.get('metaedge') == reverse_metaedge:
-                                        other_name = other_attrs['name']
-                                        other_kind = other_attrs['kind']
-                                        
-                                        score = self._calculate_metaedge_score(reverse_metaedge, 1) * 0.8  # امتیاز کمتر برای معکوس
-                                        explanation = f"{other_name} ({other_kind}) connected to {node_name} via {reverse_metaedge}"
-                                        
-                                        results.append((other_node, 1, score, explanation))
-                                        print(f"      ✅ {other_name} - {reverse_metaedge} معکوس (امتیاز: {score})")
-                
-                # جستجوی معکوس (اگر metaedge معکوس وجود دارد)
-                reverse_metaedges = self._get_reverse_metaedges(metaedge)
-                for reverse_metaedge in reverse_metaedges:
-                    print(f"    بررسی metaedge معکوس: {reverse_metaedge}")
-                    for other_node, other_attrs in self.G.nodes(data=True):
-                        if other_node != node_id:
-                            for neighbor in self.G.neighbors(other_node):
-                                if neighbor == node_id:
-                                    edge_data = self.G.get_edge_data(other_node, neighbor)
-                                    if edge_data and edge_data.get('metaedge') == reverse_metaedge:
-                                        other_name = other_attrs['name']
-                                        other_kind = other_attrs['kind']
-                                        
-                                        score = self._calculate_metaedge_score(reverse_metaedge, 1) * 0.8  # امتیاز کمتر برای معکوس
-                                        explanation = f"{other_name} ({other_kind}) connected to {node_name} via {reverse_metaedge}"
-                                        
-                                        results.append((other_node, 1, score, explanation))
-                                        print(f"      ✅ {other_name} - {reverse_metaedge} معکوس (امتیاز: {score})")
+                    if self._verbose:
+                        logger.debug(f"    بررسی metaedge معکوس: {reverse_metaedge}")
+                    for other_node in reverse_index.sources(node_id, reverse_metaedge):
+                        if other_node == node_id:
+                            continue
+                        other_attrs = self.G.nodes[other_node]
+                        other_name = other_attrs['name']
+                        other_kind = other_attrs['kind']
+                        
+                        score = self._calculate_metaedge_score(reverse_metaedge, 1) * 0.8  # امتیاز کمتر برای معکوس
+                        explanation = f"{other_name} ({other_kind}) connected to {node_name} via {reverse_metaedge}"
+                        
+                        results.append((other_node, 1, score, explanation))
+                        if self._verbose:
+                            logger.debug(f"      ✅ {other_name} - {reverse_metaedge} معکوس (امتیاز: {score})")
             
             # جستجوی عمیق با فیلتر metaedges
             if max_depth > 1:
-                print(f"    جستجوی عمیق تا عمق {max_depth}")
+                if self._verbose:
+                    logger.debug(f"    جستجوی عمیق تا عمق {max_depth}")
                 for metaedge in target_metaedges:
                     dfs_results = self.dfs_search(node_id, max_depth, relation_filter=metaedge)
                     for found_node, depth in dfs_results:
@@ -5711,7 +6500,8 @@ def _search_by_metaedges(self, matched_nodes: Dict[str, str], intent: Dict, targ
                             explanation = f"{found_name} ({found_kind}) related to {node_name} via {metaedge} (depth {depth})"
                             
                             results.append((found_node, depth, score, explanation))
-                            print(f"      ✅ {found_name} - عمق {depth} با {metaedge} (امتیاز: {score:.2f})")
+                            if self._verbose:
+                                logger.debug(f"      ✅ {found_name} - عمق {depth} با {metaedge} (امتیاز: {score:.2f})")
         
         # حذف تکرار و مرتب‌سازی
         unique_results = {}
@@ -5721,100 +6511,43 @@ def _search_by_metaedges(self, matched_nodes: Dict[str, str], intent: Dict, targ
         
         final_results = sorted(unique_results.values(), key=lambda x: x[2], reverse=True)
         
-        print(f"  📊 نتایج نهایی: {len(final_results)} نود منحصر به فرد")
+        if self._verbose:
+            logger.debug(f"  📊 نتایج نهایی: {len(final_results)} نود منحصر به فرد")
         return final_results
     
+    def personalized_pagerank_search(self, seed_nodes: List[str], max_nodes: int = None) -> List[Tuple[str, int, float]]:
+        """
+        PageRank شخصی‌سازی‌شده (RWR) از نودهای seed با push محلی
+
+        در نبود seed معتبر به PageRank سراسری برمی‌گردد.
+
+        Returns:
+            لیست (node_id، فاصله گامی از نزدیک‌ترین seed، امتیاز) مرتب بر اساس امتیاز
+        """
+        if max_nodes is None:
+            max_nodes = self.config['max_nodes']
+        seeds = [node_id for node_id in seed_nodes if self.G.has_node(node_id)]
+        if not seeds:
+            if self._verbose:
+                logger.debug("⚠️ نود شروعی برای PERSONALIZED_PAGERANK یافت نشد. استفاده از PageRank سراسری...")
+            self._ensure_pagerank()
+            ranked = sorted(self._pagerank.items(), key=lambda x: x[1], reverse=True)
+            return [(node_id, 0, score) for node_id, score in ranked[:max_nodes]]
+        edge_weight = metaedge_edge_weight() if self.config.get('ppr_metaedge_weighting') else None
+        scores, hops = personalized_pagerank(
+            self.G, seeds,
+            alpha=self.config.get('ppr_alpha', 0.85),
+            epsilon=self.config.get('ppr_epsilon', 1e-6),
+            edge_weight=edge_weight,
+        )
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return [(node_id, hops[node_id], score) for node_id, score in ranked[:max_nodes]]
+
     def _calculate_metaedge_score(self, metaedge: str, depth: int) -> float:
         """
         محاسبه امتیاز بر اساس نوع metaedge و عمق - بهبود یافته
         """
-        # امتیازات پایه بر اساس اهمیت و فراوانی در Hetionet
-        base_scores = {
-            # بیان ژن در آناتومی - بسیار مهم
-            'AeG': 6.0,  # Anatomy expresses Gene (526,407 edges)
-            'GeA': 5.5,  # Gene expressed in Anatomy
-            
-            # تعاملات ژن‌ها - مهم
-            'GiG': 5.0,  # Gene interacts with Gene (147,164 edges)
-            'Gr>G': 4.5, # Gene regulates Gene (265,672 edges)
-            'GcG': 4.0,  # Gene covaries with Gene (61,690 edges)
-            
-            # مشارکت در فرآیندهای زیستی - مهم
-            'GpBP': 5.0, # Gene participates in Biological Process (559,504 edges)
-            'GpPW': 4.5, # Gene participates in Pathway (84,372 edges)
-            'GpMF': 4.0, # Gene participates in Molecular Function (97,222 edges)
-            'GpCC': 4.0, # Gene participates in Cellular Component (73,566 edges)
-            
-            # تنظیم ژن توسط آناتومی
-            'AuG': 4.5,  # Anatomy upregulates Gene (97,848 edges)
-            'AdG': 4.5,  # Anatomy downregulates Gene (102,240 edges)
-            'GuA': 4.0,  # Gene upregulates Anatomy
-            'GdA': 4.0,  # Gene downregulates Anatomy
-            
-            # بیماری‌ها و ژن‌ها
-            'DaG': 4.5,  # Disease associates with Gene (12,623 edges)
-            'DuG': 4.0,  # Disease upregulates Gene (7,731 edges)
-            'DdG': 4.0,  # Disease downregulates Gene (7,623 edges)
-            'GaD': 4.0,  # Gene associates Disease
-            'GuD': 3.5,  # Gene upregulates Disease
-            'GdD': 3.5,  # Gene downregulates Disease
-            
-            # داروها و درمان
-            'CtD': 4.5,  # Compound treats Disease (755 edges)
-            'CpD': 4.0,  # Compound palliates Disease (390 edges)
-            'DtC': 4.0,  # Disease treats Compound
-            'DpC': 3.5,  # Disease palliates Compound
-            
-            # تنظیم ژن توسط دارو
-            'CuG': 4.0,  # Compound upregulates Gene (18,756 edges)
-            'CdG': 4.0,  # Compound downregulates Gene (21,102 edges)
-            'CbG': 4.5,  # Compound binds Gene (11,571 edges)
-            'GuC': 3.5,  # Gene upregulates Compound
-            'GdC': 3.5,  # Gene downregulates Compound
-            'GbC': 4.0,  # Gene binds Compound
-            
-            # بیماری‌ها و آناتومی
-            'DlA': 4.0,  # Disease localizes to Anatomy (3,602 edges)
-            'AlD': 3.5,  # Anatomy localizes Disease
-            
-            # علائم و عوارض
-            'DpS': 4.0,  # Disease presents Symptom (3,357 edges)
-            'SpD': 3.5,  # Symptom presents Disease
-            'CcSE': 3.5, # Compound causes Side Effect (138,944 edges)
-            'SEcC': 3.0, # Side Effect causes Compound
-            
-            # تشابه‌ها
-            'DrD': 3.5,  # Disease resembles Disease (543 edges)
-            'CrC': 3.5,  # Compound resembles Compound (6,486 edges)
-            
-            # کلاس‌های دارویی
-            'PCiC': 3.0, # Pharmacologic Class includes Compound (1,029 edges)
-            'CiPC': 2.5  # Compound includes Pharmacologic Class
-        }
-        
-        # کاهش وزن روابط شباهت برای جلوگیری از نویز در سوالات مکانیزمی
-        base_score = base_scores.get(metaedge, 2.5)
-        if metaedge in ['DrD', 'CrC']:
-            base_score *= 0.6
-        
-        # بهبود محاسبه جریمه عمق
-        if depth == 1:
-            depth_penalty = 1.0
-        elif depth == 2:
-            depth_penalty = 0.7
-        elif depth == 3:
-            depth_penalty = 0.5
-        else:
-            depth_penalty = 0.3
-        
-        # اضافه کردن بونوس برای metaedges مهم
-        importance_bonus = 1.0
-        if metaedge in ['AeG', 'GiG', 'GpBP', 'DaG', 'CtD']:
-            importance_bonus = 1.2
-        elif metaedge in ['Gr>G', 'GpPW', 'CbG']:
-            importance_bonus = 1.1
-        
-        return base_score * depth_penalty * importance_bonus
+        return calculate_metaedge_score(metaedge, depth)
     
     def _get_reverse_metaedges(self, metaedge: str) -> List[str]:
         """
@@ -5862,6 +6595,8 @@ def _get_reverse_metaedges(self, metaedge: str) -> List[str]:
         return reverse_mapping.get(metaedge, [])
     
     # ==================== KGSearch (Intent-Aware + Schema-Aware for Hetionet) ====================
+    @pins_graph
+    @uses_query_context
     def kgsearch_traceable(self, query: str, top_k: int = 10) -> Tuple[List[Dict[str, Any]], str]:
         """
         اجرای kgsearch مبتنی بر Hetionet با توجه به Intent/Schema.
@@ -5871,6 +6606,14 @@ def kgsearch_traceable(self, query: str, top_k: int = 10) -> Tuple[List[Dict[str
         """
         if not self.G:
             return [], "گراف بارگذاری نشده است"
+        self._label_query('kgsearch')
+        return self._cached_result(
+            'kgsearch', query, {'top_k': top_k},
+            lambda: self._kgsearch_traceable(query, top_k),
+            lambda result: {'h': result[0], 's': result[1]},
+            lambda payload: (payload['h'], payload['s']))
+
+    def _kgsearch_traceable(self, query: str, top_k: int) -> Tuple[List[Dict[str, Any]], str]:
 
         intent_cfg = self._detect_intent_schema_map(query)
         allow = intent_cfg["allow"]
@@ -5888,23 +6631,26 @@ def kgsearch_traceable(self, query: str, top_k: int = 10) -> Tuple[List[Dict[str
             core_nodes = list(dict.fromkeys(matched.values()))[:3]
 
         # 2) Retrieval constrained by schema (allowlist/denylist + end-type)
-        paths_with_meta = self._find_paths_allowlist(
-            core_nodes=core_nodes,
-            allow_metaedges=allow,
-            deny_metaedges=deny,
-            end_kind=end_type,
-            hop_limit=hop_limit,
-            max_results_per_hop=100,
-            require_unique_nodes=True,
-            extra_constraints=constraints,
-            query=query,
-        )
+        with self._query_stage('traversal'):
+            paths_with_meta = self._find_paths_allowlist(
+                core_nodes=core_nodes,
+                allow_metaedges=allow,
+                deny_metaedges=deny,
+                end_kind=end_type,
+                hop_limit=hop_limit,
+                max_results_per_hop=100,
+                require_unique_nodes=True,
+                extra_constraints=constraints,
+                query=query,
+            )
+            self._touch_paths(paths_with_meta)
 
         # 3) Ranking
         # اگر intent دقیقاً هم‌واریانس ژن‌هاست، خروجی را مینیمال و ۱-هاپ روی GcG نگه‌دار
         if intent_cfg.get('intent') == 'G-G_covary':
             paths_with_meta = [p for p in paths_with_meta if len(p.get('path_nodes', [])) == 2 and all(m == 'GcG' for m in p.get('metaedges', []) if m)]
-        ranked = self._rank_paths(paths_with_meta, query, intent_cfg)
+        with self._query_stage('path_ranking'):
+            ranked = self._rank_paths(paths_with_meta, query, intent_cfg)
         hits = []
         for rank, item in enumerate(ranked[:top_k], start=1):
             path_nodes = item["path_nodes"]
@@ -5961,18 +6707,21 @@ def kgsearch_traceable(self, query: str, top_k: int = 10) -> Tuple[List[Dict[str
                 allow_fb = fb["allow"]
                 end_type_fb = fb["end_type"] or end_type
                 hop_limit_fb = fb["hop_limit"] or hop_limit
-                paths_with_meta = self._find_paths_allowlist(
-                    core_nodes=core_nodes,
-                    allow_metaedges=allow_fb,
-                    deny_metaedges=deny,
-                    end_kind=end_type_fb,
-                    hop_limit=hop_limit_fb,
-                    max_results_per_hop=100,
-                    require_unique_nodes=True,
-                    extra_constraints=fb.get("constraints", {}),
-                    query=query,
-                )
-                ranked = self._rank_paths(paths_with_meta, query, fb)
+                with self._query_stage('traversal'):
+                    paths_with_meta = self._find_paths_allowlist(
+                        core_nodes=core_nodes,
+                        allow_metaedges=allow_fb,
+                        deny_metaedges=deny,
+                        end_kind=end_type_fb,
+                        hop_limit=hop_limit_fb,
+                        max_results_per_hop=100,
+                        require_unique_nodes=True,
+                        extra_constraints=fb.get("constraints", {}),
+                        query=query,
+                    )
+                    self._touch_paths(paths_with_meta)
+                with self._query_stage('path_ranking'):
+                    ranked = self._rank_paths(paths_with_meta, query, fb)
                 for rank, item in enumerate(ranked[:top_k], start=1):
                     path_nodes = item["path_nodes"]
                     hop_count = max(0, len(path_nodes) - 1)
@@ -6018,6 +6767,9 @@ def kgsearch_traceable(self, query: str, top_k: int = 10) -> Tuple[List[Dict[str
         return hits[:top_k], summary
 
     def _detect_intent_schema_map(self, query: str) -> Dict[str, Any]:
+        return copy.deepcopy(self._cached(self._schema_map_cache, query, lambda: self._build_intent_schema_map(query)))
+
+    def _build_intent_schema_map(self, query: str) -> Dict[str, Any]:
         q = (query or "").lower()
         # پیش‌فرض
         cfg = {
@@ -6141,6 +6893,24 @@ def valid_edge(u, v) -> Optional[str]:
                 return None
             return meta
 
+        compiled = self._get_compiled_graph()
+        if compiled is not None:
+            accept_path = None
+            if extra_constraints:
+                accept_path = lambda path: self._path_satisfies_constraints(path, extra_constraints)
+            found = compiled.find_paths_allowlist(
+                core_nodes, allow_set, deny_set, end_kind, hop_limit,
+                max_results_per_hop, require_unique_nodes, accept_path,
+            )
+            return [
+                {
+                    "path_nodes": path,
+                    "path_edges": [(path[i], path[i+1], meta) for i, meta in enumerate(metaedges)],
+                    "metaedges": metaedges,
+                }
+                for path, metaedges in found
+            ]
+
         results: List[Dict[str, Any]] = []
         seen_paths: set = set()
 
@@ -6339,24 +7109,29 @@ def hub_penalty(path_nodes: List[str]) -> float:
         ranked.sort(key=lambda x: x["score"], reverse=True)
         return ranked
     
+    @uses_query_context
     def multi_hop_search(self, query: str, max_depth: int = 3) -> List[Tuple[str, int, float, str, List[str]]]:
         """
         جستجوی چندمرحله‌ای برای سوالات پیچیده
         Returns: (node_id, depth, score, explanation, path)
         """
-        print(f"🔄 جستجوی چندمرحله‌ای: {query}")
+        self._label_query('multi_hop')
+        if self._verbose:
+            logger.debug(f"🔄 جستجوی چندمرحله‌ای: {query}")
         
         # تحلیل سوال
         intent = self.analyze_question_intent(query)
-        print(f"  تشخیص نوع: {intent['question_type']}")
-        print(f"  Metaedges: {intent['metaedges']}")
+        if self._verbose:
+            logger.debug(f"  تشخیص نوع: {intent['question_type']}")
+            logger.debug(f"  Metaedges: {intent['metaedges']}")
         
         # استخراج کلمات کلیدی
         keywords = intent['keywords']
         matched_nodes = self.match_tokens_to_nodes(keywords)
         
         if not matched_nodes:
-            print("  ❌ هیچ نودی تطبیق نکرد")
+            if self._verbose:
+                logger.debug("  ❌ هیچ نودی تطبیق نکرد")
             return []
         
         results = []
@@ -6437,13 +7212,15 @@ def multi_hop_search(self, query: str, max_depth: int = 3) -> List[Tuple[str, in
         
         # تشخیص نوع سوال پیچیده
         complex_type = self._detect_complex_question_type(intent)
-        print(f"  نوع سوال پیچیده: {complex_type}")
+        if self._verbose:
+            logger.debug(f"  نوع سوال پیچیده: {complex_type}")
         
         if complex_type in multi_hop_patterns:
             patterns = multi_hop_patterns[complex_type]
             
             for pattern in patterns:
-                print(f"  بررسی الگو: {' → '.join(pattern)}")
+                if self._verbose:
+                    logger.debug(f"  بررسی الگو: {' → '.join(pattern)}")
                 pattern_results = self._search_multi_hop_pattern(matched_nodes, pattern, max_depth)
                 results.extend(pattern_results)
         
@@ -6455,7 +7232,8 @@ def multi_hop_search(self, query: str, max_depth: int = 3) -> List[Tuple[str, in
         
         final_results = sorted(unique_results.values(), key=lambda x: x[2], reverse=True)
         
-        print(f"  ✅ {len(final_results)} نتیجه چندمرحله‌ای یافت شد")
+        if self._verbose:
+            logger.debug(f"  ✅ {len(final_results)} نتیجه چندمرحله‌ای یافت شد")
         return final_results
     
     def _detect_complex_question_type(self, intent: Dict) -> str:
@@ -6505,7 +7283,8 @@ def _search_multi_hop_pattern(self, matched_nodes: Dict[str, str], pattern: List
         results = []
         
         for token, start_node in matched_nodes.items():
-            print(f"    شروع از نود: {self.G.nodes[start_node]['name']}")
+            if self._verbose:
+                logger.debug(f"    شروع از نود: {self.G.nodes[start_node]['name']}")
             
             # جستجوی مسیرهای چندمرحله‌ای
             paths = self._find_paths_with_pattern(start_node, pattern, max_depth)
@@ -6557,12 +7336,21 @@ def dfs_with_pattern(node: str, current_path: List[str], current_metaedges: List
             
             current_path.pop()
         
+        compiled = self._get_compiled_graph()
+
+        def search_from(node: str):
+            if compiled is not None and compiled.has_node(node):
+                paths.extend(compiled.find_paths_with_pattern(node, pattern, max_depth))
+            else:
+                dfs_with_pattern(node, [], [], 0)
+
         # شروع از نود اول
-        dfs_with_pattern(start_node, [], [], 0)
+        search_from(start_node)
         
         # اگر مسیری پیدا نشد، سعی کن از نودهای دیگر شروع کنی
         if not paths:
-            print(f"    ⚠️ هیچ مسیری از {start_node} پیدا نشد، تلاش از نودهای دیگر...")
+            if self._verbose:
+                logger.debug(f"    ⚠️ هیچ مسیری از {start_node} پیدا نشد، تلاش از نودهای دیگر...")
             
             # برای الگوهای چندمرحله‌ای، سعی کن از نودهای میانی شروع کنی
             if len(pattern) > 1:
@@ -6573,8 +7361,9 @@ def dfs_with_pattern(node: str, current_path: List[str], current_metaedges: List
                     
                     for compound_node in compound_nodes[:3]:  # 3 نود اول
                         if compound_node != start_node:
-                            print(f"    تلاش از نود: {self.G.nodes[compound_node]['name']}")
-                            dfs_with_pattern(compound_node, [], [], 0)
+                            if self._verbose:
+                                logger.debug(f"    تلاش از نود: {self.G.nodes[compound_node]['name']}")
+                            search_from(compound_node)
                 
                 # از نودهای ژن شروع کن (برای الگوهای دیگر)
                 else:
@@ -6583,8 +7372,9 @@ def dfs_with_pattern(node: str, current_path: List[str], current_metaedges: List
                     
                     for gene_node in gene_nodes[:5]:  # 5 نود اول
                         if gene_node != start_node:
-                            print(f"    تلاش از نود: {self.G.nodes[gene_node]['name']}")
-                            dfs_with_pattern(gene_node, [], [], 0)
+                            if self._verbose:
+                                logger.debug(f"    تلاش از نود: {self.G.nodes[gene_node]['name']}")
+                            search_from(gene_node)
         
         return paths
     
@@ -6902,7 +7692,7 @@ def meta_llama_generation(self, retrieval_result: RetrievalResult) -> str:
             # برای استفاده نیاز به API Key یا نصب محلی است
             return "🔧 Meta Llama 3.1 در حال توسعه است.\n\n" + self._fallback_generation(retrieval_result, "Meta Llama 3.1")
         except Exception as e:
-            print(f"خطا در Meta Llama 3.1: {e}")
+            logger.warning(f"خطا در Meta Llama 3.1: {e}")
             return self._fallback_generation(retrieval_result, "Meta Llama 3.1")
     
     def mistral_ai_generation(self, retrieval_result: RetrievalResult) -> str:
@@ -6911,7 +7701,7 @@ def mistral_ai_generation(self, retrieval_result: RetrievalResult) -> str:
             # این متد نیاز به API Key از Mistral AI دارد
             return "🔧 Mistral AI در حال توسعه است.\n\n" + self._fallback_generation(retrieval_result, "Mistral AI")
         except Exception as e:
-            print(f"خطا در Mistral AI: {e}")
+            logger.warning(f"خطا در Mistral AI: {e}")
             return self._fallback_generation(retrieval_result, "Mistral AI")
     
     def cohere_command_generation(self, retrieval_result: RetrievalResult) -> str:
@@ -6920,7 +7710,7 @@ def cohere_command_generation(self, retrieval_result: RetrievalResult) -> str:
             # این متد نیاز به API Key از Cohere دارد
             return "🔧 Cohere Command در حال توسعه است.\n\n" + self._fallback_generation(retrieval_result, "Cohere Command")
         except Exception as e:
-            print(f"خطا در Cohere Command: {e}")
+            logger.warning(f"خطا در Cohere Command: {e}")
             return self._fallback_generation(retrieval_result, "Cohere Command")
     
     def perplexity_sonar_generation(self, retrieval_result: RetrievalResult) -> str:
@@ -6929,7 +7719,7 @@ def perplexity_sonar_generation(self, retrieval_result: RetrievalResult) -> str:
             # این متد نیاز به API Key از Perplexity دارد
             return "🔧 Perplexity Sonar در حال توسعه است.\n\n" + self._fallback_generation(retrieval_result, "Perplexity Sonar")
         except Exception as e:
-            print(f"خطا در Perplexity Sonar: {e}")
+            logger.warning(f"خطا در Perplexity Sonar: {e}")
             return self._fallback_generation(retrieval_result, "Perplexity Sonar")
 
 # نمونه استفاده
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+HF Model Pool - نگهداری مدل‌های تولید متن HuggingFace در حافظه فرایند
+
+HFModelPool اولین مدل محلی قابل بارگذاری از فهرست کاندیدها را یک‌بار بارگذاری و
+گرم نگه می‌دارد (فقط CPU و فقط وزن‌های موجود در کش محلی، local_files_only).
+درخواست‌های هم‌زمان در یک صف قرار می‌گیرند و یک thread کارگر آن‌ها را با سیاست
+max_batch/max_wait دسته‌بندی و با یک فراخوانی generate پاسخ می‌دهد. وضعیت بارگذاری،
+طول صف و آمار دسته‌ها از stats() در دسترس است.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# مدل‌های رایگان به ترتیب اولویت (همان فهرست huggingface_generation)
+DEFAULT_HF_MODELS = (
+    "microsoft/DialoGPT-medium",  # چت‌بات
+    "gpt2",  # GPT-2
+    "distilgpt2",  # GPT-2 سبک
+    "EleutherAI/gpt-neo-125M",  # GPT-Neo کوچک
+    "microsoft/DialoGPT-small",  # چت‌بات کوچک
+)
+
+UNLOADED, LOADING, READY, FAILED = "unloaded", "loading", "ready", "failed"
+
+
+def load_local_causal_lm(model_name: str) -> Tuple[Any, Any]:
+    """بارگذاری tokenizer و مدل علّی روی CPU فقط از کش محلی HuggingFace"""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+    model = AutoModelForCausalLM.from_pretrained(model_name, local_files_only=True)
+    model.to("cpu").eval()
+    # تولید دسته‌ای: padding از چپ تا توکن‌های جدید همه ردیف‌ها در انتها باشند
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer, model
+
+
+class _Request:
+    __slots__ = ("prompt", "future", "enqueued")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class HFModelPool:
+    """مدل HuggingFace گرم با صف درخواست و تولید دسته‌ای"""
+
+    def __init__(self, candidates: Sequence[str] = DEFAULT_HF_MODELS, max_batch: int = 4,
+                 max_wait: float = 0.05, max_input_tokens: int = 512, max_new_tokens: int = 200,
+                 loader: Callable[[str], Tuple[Any, Any]] = load_local_causal_lm):
+        """
+        Args:
+            candidates: نام مدل‌ها به ترتیب اولویت؛ اولین مدل قابل بارگذاری انتخاب می‌شود
+            max_batch: حداکثر تعداد درخواست در یک فراخوانی generate
+            max_wait: حداکثر انتظار (ثانیه) برای پر شدن دسته پس از رسیدن اولین درخواست
+            loader: تابع بارگذاری (tokenizer, model) برای یک نام مدل
+        """
+        self.candidates = tuple(candidates)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_input_tokens = max_input_tokens
+        self.max_new_tokens = max_new_tokens
+        self._loader = loader
+        self.state = UNLOADED
+        self.model_name: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.load_errors: Dict[str, str] = {}
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    # ---- بارگذاری ----
+
+    def ensure_loaded(self) -> bool:
+        """بارگذاری یک‌باره اولین مدل محلی موجود (False اگر هیچ مدلی قابل بارگذاری نباشد)"""
+        if self.state == READY:
+            return True
+        with self._load_lock:
+            if self.state in (READY, FAILED):
+                return self.state == READY
+            self.state = LOADING
+            started = time.perf_counter()
+            for model_name in self.candidates:
+                try:
+                    self._tokenizer, self._model = self._loader(model_name)
+                except Exception as e:  # شامل ImportError و نبود وزن‌ها در کش محلی
+                    self.load_errors[model_name] = str(e)
+                    continue
+                self.model_name = model_name
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self._worker = threading.Thread(target=self._serve, name="hf-model-pool", daemon=True)
+                self._worker.start()
+                self.state = READY
+                logging.info(f"مدل HuggingFace {model_name} در {self.load_seconds} ثانیه بارگذاری شد")
+                return True
+            self.state = FAILED
+            logging.warning(f"هیچ مدل HuggingFace محلی قابل بارگذاری نیست: {list(self.load_errors)}")
+            return False
+
+    def reset(self):
+        """فراموش کردن خطای بارگذاری تا تلاش بعدی دوباره بارگذاری کند (مثلاً پس از دانلود وزن‌ها)"""
+        with self._load_lock:
+            if self.state == FAILED:
+                self.state = UNLOADED
+                self.load_errors.clear()
+
+    # ---- تولید ----
+
+    def submit(self, prompt: str) -> Future:
+        """قرار دادن prompt در صف؛ Future متن تولیدشده (بدون prompt) را برمی‌گرداند"""
+        if not self.ensure_loaded():
+            raise RuntimeError("هیچ مدل HuggingFace محلی در دسترس نیست")
+        request = _Request(prompt)
+        with self._stats_lock:
+            self.requests += 1
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        متن تولیدشده برای prompt
+
+        Raises:
+            concurrent.futures.TimeoutError: اگر پاسخ تا timeout ثانیه آماده نشود؛ درخواستی
+                که هنوز وارد دسته‌ای نشده لغو می‌شود تا کارگر برایش generate اجرا نکند
+        """
+        future = self.submit(prompt)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+
+    def _next_batch(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # درخواست‌هایی که پس از timeout لغو شده‌اند کنار گذاشته می‌شوند؛ بقیه دیگر قابل لغو نیستند
+        return [request for request in batch if request.future.set_running_or_notify_cancel()]
+
+    def _serve(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                texts = self._generate_batch([request.prompt for request in batch])
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self.batches += 1
+                self.batched_requests += len(batch)
+            for request, text in zip(batch, texts):
+                request.future.set_result(text)
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        import torch
+
+        tokenizer, model = self._tokenizer, self._model
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True,
+                           max_length=self.max_input_tokens)
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                num_return_sequences=1,
+                temperature=0.7,
+                do_sample=True,
+                pad_token_id=tokenizer.pad_token_id
+            )
+        # فقط توکن‌های تولیدشده پس از prompt (با padding از چپ طول ورودی همه ردیف‌ها یکسان است)
+        prompt_length = inputs["input_ids"].shape[1]
+        return [tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip() for output in outputs]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            requests, batches, batched_requests, errors, timeouts = (
+                self.requests, self.batches, self.batched_requests, self.errors, self.timeouts)
+        return {
+            'state': self.state,
+            'model': self.model_name,
+            'load_seconds': self.load_seconds,
+            'load_errors': dict(self.load_errors),
+            'queue_depth': self._queue.qsize(),
+            'requests': requests,
+            'batches': batches,
+            'avg_batch_size': round(batched_requests / batches, 2) if batches else 0.0,
+            'errors': errors,
+            'timeouts': timeouts,
+            'max_batch': self.max_batch,
+            'max_wait_ms': round(self.max_wait * 1000, 1),
+        }
+
+
+_default_pool: Optional[HFModelPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_hf_model_pool() -> HFModelPool:
+    """pool مشترک فرایند (همه نمونه‌های سرویس یک مدل گرم را به اشتراک می‌گذارند)"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HFModelPool()
+    return _default_pool
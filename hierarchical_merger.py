@@ -26,6 +26,7 @@ def __init__(self,
         self.weight_by_frequency = weight_by_frequency
         self.min_confidence = min_confidence
         self.similarity_threshold = similarity_threshold
+        self.reset()
     
     def merge_chunk_results(self, chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -40,58 +41,79 @@ def merge_chunk_results(self, chunk_results: List[Dict[str, Any]]) -> Dict[str,
         if not chunk_results:
             return {"entities": [], "relationships": []}
         
-        # Merge entities
-        merged_entities = self._merge_entities([r.get("entities", []) for r in chunk_results])
+        self.reset()
+        for chunk_result in chunk_results:
+            self.add_chunk_result(chunk_result)
+        return self.merged()
+    
+    def reset(self):
+        """پاک کردن وضعیت ادغام تدریجی"""
+        self._entity_map = {}  # text -> entity with metadata
+        self._entity_frequency = defaultdict(int)
+        self._entity_confidence_sum = defaultdict(float)
+        # relationship key: (source, target, relation_type)
+        self._rel_map = {}
+        self._rel_frequency = defaultdict(int)
+        self._rel_confidence_sum = defaultdict(float)
+        self._num_chunks = 0
+    
+    def add_chunk_result(self, chunk_result: Dict[str, Any]):
+        """
+        افزودن نتیجه یک chunk به ادغام تدریجی (به ترتیب chunkها)
         
-        # Merge relationships
-        merged_relationships = self._merge_relationships([r.get("relationships", []) for r in chunk_results])
+        نتیجه نهایی با merged() ساخته می‌شود و برابر merge_chunk_results روی همه نتایج است.
+        """
+        self._num_chunks += 1
+        self._add_entities(chunk_result.get("entities", []))
+        self._add_relationships(chunk_result.get("relationships", []))
+    
+    def merged(self) -> Dict[str, Any]:
+        """موجودیت‌ها و روابط ادغام شده از chunkهای افزوده‌شده تا این لحظه"""
+        merged_entities = self._finalize_entities()
+        merged_relationships = self._finalize_relationships()
         
         return {
             "entities": merged_entities,
             "relationships": merged_relationships,
             "stats": {
-                "num_chunks": len(chunk_results),
+                "num_chunks": self._num_chunks,
                 "num_entities": len(merged_entities),
                 "num_relationships": len(merged_relationships)
             }
         }
     
-    def _merge_entities(self, entity_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
-        """ادغام موجودیت‌ها از چندین chunk"""
-        # Count frequency and collect entities
-        entity_map = {}  # text -> entity with metadata
-        entity_frequency = defaultdict(int)
-        entity_confidence_sum = defaultdict(float)
-        
-        for entity_list in entity_lists:
-            for entity in entity_list:
-                entity_text = entity.get("text", "") or entity.get("name", "")
-                if not entity_text:
-                    continue
-                
-                # Normalize text for comparison
-                normalized_text = self._normalize_text(entity_text)
-                
-                # Update frequency
-                entity_frequency[normalized_text] += 1
-                
-                # Sum confidence scores
-                confidence = entity.get("score", 0.5) or entity.get("confidence", 0.5)
-                entity_confidence_sum[normalized_text] += confidence
-                
-                # Store entity (keep the one with highest confidence)
-                if normalized_text not in entity_map:
-                    entity_map[normalized_text] = entity.copy()
-                else:
-                    existing_conf = entity_map[normalized_text].get("score", 0.5) or entity_map[normalized_text].get("confidence", 0.5)
-                    if confidence > existing_conf:
-                        entity_map[normalized_text] = entity.copy()
-        
-        # Create merged entities with weights
+    def _add_entities(self, entity_list: List[Dict[str, Any]]):
+        """ادغام موجودیت‌های یک chunk"""
+        for entity in entity_list:
+            entity_text = entity.get("text", "") or entity.get("name", "")
+            if not entity_text:
+                continue
+            
+            # Normalize text for comparison
+            normalized_text = self._normalize_text(entity_text)
+            
+            # Update frequency
+            self._entity_frequency[normalized_text] += 1
+            
+            # Sum confidence scores
+            confidence = entity.get("score", 0.5) or entity.get("confidence", 0.5)
+            self._entity_confidence_sum[normalized_text] += confidence
+            
+            # Store entity (keep the one with highest confidence)
+            if normalized_text not in self._entity_map:
+                self._entity_map[normalized_text] = entity.copy()
+            else:
+                existing = self._entity_map[normalized_text]
+                existing_conf = existing.get("score", 0.5) or existing.get("confidence", 0.5)
+                if confidence > existing_conf:
+                    self._entity_map[normalized_text] = entity.copy()
+    
+    def _finalize_entities(self) -> List[Dict[str, Any]]:
+        """ساخت موجودیت‌های ادغام شده با وزن"""
         merged = []
-        for normalized_text, entity in entity_map.items():
-            frequency = entity_frequency[normalized_text]
-            avg_confidence = entity_confidence_sum[normalized_text] / frequency if frequency > 0 else 0.5
+        for normalized_text, entity in self._entity_map.items():
+            frequency = self._entity_frequency[normalized_text]
+            avg_confidence = self._entity_confidence_sum[normalized_text] / frequency if frequency > 0 else 0.5
             
             # Filter by minimum confidence
             if avg_confidence < self.min_confidence:
@@ -111,50 +133,46 @@ def _merge_entities(self, entity_lists: List[List[Dict[str, Any]]]) -> List[Dict
         
         return merged
     
-    def _merge_relationships(self, relationship_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
-        """ادغام روابط از چندین chunk"""
-        # Create relationship key: (source, target, relation_type)
-        rel_map = {}
-        rel_frequency = defaultdict(int)
-        rel_confidence_sum = defaultdict(float)
-        
-        for rel_list in relationship_lists:
-            for rel in rel_list:
-                source = rel.get("source", "")
-                target = rel.get("target", "")
-                relation = rel.get("relation", "") or rel.get("metaedge", "")
-                
-                if not source or not target:
-                    continue
-                
-                # Normalize for comparison
-                normalized_source = self._normalize_text(source)
-                normalized_target = self._normalize_text(target)
-                normalized_relation = self._normalize_text(relation)
-                
-                key = (normalized_source, normalized_target, normalized_relation)
-                
-                # Update frequency
-                rel_frequency[key] += 1
-                
-                # Sum confidence
-                confidence = rel.get("confidence", 0.5) or rel.get("score", 0.5)
-                rel_confidence_sum[key] += confidence
-                
-                # Store relationship
-                if key not in rel_map:
-                    rel_map[key] = rel.copy()
-                else:
-                    # Update if higher confidence
-                    existing_conf = rel_map[key].get("confidence", 0.5) or rel_map[key].get("score", 0.5)
-                    if confidence > existing_conf:
-                        rel_map[key] = rel.copy()
-        
-        # Create merged relationships
+    def _add_relationships(self, rel_list: List[Dict[str, Any]]):
+        """ادغام روابط یک chunk"""
+        for rel in rel_list:
+            source = rel.get("source", "")
+            target = rel.get("target", "")
+            relation = rel.get("relation", "") or rel.get("metaedge", "")
+            
+            if not source or not target:
+                continue
+            
+            # Normalize for comparison
+            normalized_source = self._normalize_text(source)
+            normalized_target = self._normalize_text(target)
+            normalized_relation = self._normalize_text(relation)
+            
+            key = (normalized_source, normalized_target, normalized_relation)
+            
+            # Update frequency
+            self._rel_frequency[key] += 1
+            
+            # Sum confidence
+            confidence = rel.get("confidence", 0.5) or rel.get("score", 0.5)
+            self._rel_confidence_sum[key] += confidence
+            
+            # Store relationship
+            if key not in self._rel_map:
+                self._rel_map[key] = rel.copy()
+            else:
+                # Update if higher confidence
+                existing = self._rel_map[key]
+                existing_conf = existing.get("confidence", 0.5) or existing.get("score", 0.5)
+                if confidence > existing_conf:
+                    self._rel_map[key] = rel.copy()
+    
+    def _finalize_relationships(self) -> List[Dict[str, Any]]:
+        """ساخت روابط ادغام شده با وزن"""
         merged = []
-        for key, rel in rel_map.items():
-            frequency = rel_frequency[key]
-            avg_confidence = rel_confidence_sum[key] / frequency if frequency > 0 else 0.5
+        for key, rel in self._rel_map.items():
+            frequency = self._rel_frequency[key]
+            avg_confidence = self._rel_confidence_sum[key] / frequency if frequency > 0 else 0.5
             
             # Filter by minimum confidence
             if avg_confidence < self.min_confidence:
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental Graph Builder - ساخت تدریجی گراف از جریان نتایج chunkها
+
+extract_incremental نتایج chunkها را یکی‌یکی (به صورت generator) دریافت می‌کند.
+IncrementalGraphBuilder موجودیت‌ها را با نام نرمال‌شده و روابط را با کلید
+(source_id, target_id, relation) در دیکشنری نگه می‌دارد، بنابراین ادغام هر
+موجودیت/رابطه تکراری O(1) است، و نودها و یال‌ها را همان لحظه در یک
+nx.MultiDiGraph می‌نویسد؛ دیگر نیازی به build_graph پس از پایان استخراج نیست.
+
+گراف خروجی همان گرافی است که build_graph از نتیجه برش‌خورده (max_entities و
+max_relationships) می‌سازد.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import networkx as nx
+
+
+def node_attributes(entity: Dict[str, Any]) -> Dict[str, Any]:
+    """ویژگی‌های نود یک موجودیت (همان build_graph)"""
+    entity_type = entity.get("type", "Unknown")
+    attributes = entity.get("attributes", {})
+    if not isinstance(attributes, dict):
+        attributes = {}
+    return dict(name=entity.get("name", entity.get("id")), kind=entity_type, type=entity_type, **attributes)
+
+
+def edge_attributes(rel: Dict[str, Any]) -> Dict[str, Any]:
+    """ویژگی‌های یال یک رابطه: metaedge، نام رابطه و مفهوم آن برای نمایش (همان build_graph)"""
+    metaedge = rel.get("metaedge", "related_to")
+    attributes = rel.get("attributes", {})
+    if not isinstance(attributes, dict):
+        attributes = {}
+
+    # استخراج نام رابطه از rel یا attributes؛ در نهایت metaedge
+    relation_name = (rel.get("relation") or attributes.get("description") or attributes.get("verb")
+                     or attributes.get("pattern") or metaedge)
+    relation_meaning = relation_name
+    if metaedge and metaedge != relation_name:
+        relation_meaning = f"{relation_name} ({metaedge})"
+    return dict(metaedge=metaedge, relation=relation_name, relation_meaning=relation_meaning, **attributes)
+
+
+class IncrementalGraphBuilder:
+    """ادغام O(1) نتایج chunkها و نوشتن مستقیم در nx.MultiDiGraph"""
+
+    def __init__(self, max_entities: Optional[int] = None, max_relationships: Optional[int] = None):
+        """
+        Args:
+            max_entities: تعداد موجودیت‌هایی که در خروجی و گراف می‌آیند (None = همه)
+            max_relationships: تعداد روابطی که در خروجی و گراف می‌آیند (None = همه)
+        """
+        self.max_entities = max_entities
+        self.max_relationships = max_relationships
+        self.graph = nx.MultiDiGraph()
+        self.entities: Dict[str, Dict[str, Any]] = {}        # entity_id -> entity
+        self.entity_ids: Dict[str, str] = {}                 # نام نرمال‌شده -> entity_id
+        self.relationships: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._edge_keys: Dict[Tuple[str, str, str], int] = {}  # کلید رابطه -> کلید یال در گراف
+        self.num_chunks = 0
+
+    def consume(self, chunk_results: Iterable[Tuple[int, Dict[str, Any]]]) -> "IncrementalGraphBuilder":
+        """ادغام جریان (شماره chunk، نتیجه استخراج) به ترتیب رسیدن"""
+        for chunk_index, chunk_result in chunk_results:
+            self.add_chunk_result(chunk_result, chunk_index)
+        return self
+
+    def add_chunk_result(self, chunk_result: Dict[str, Any], chunk_index: int):
+        """ادغام موجودیت‌ها و روابط یک chunk"""
+        self.num_chunks += 1
+        for entity in chunk_result.get("entities", []):
+            self.add_entity(entity, chunk_index)
+        for rel in chunk_result.get("relationships", []):
+            self.add_relationship(rel, chunk_index)
+
+    def add_entity(self, entity: Dict[str, Any], chunk_index: int) -> str:
+        """افزودن موجودیت جدید یا ادغام ویژگی‌های موجودیت تکراری؛ شناسه موجودیت را برمی‌گرداند"""
+        entity_name = entity.get("name", "").strip().lower()
+        entity_id = self.entity_ids.get(entity_name)
+        if entity_id is not None:
+            # موجودیت تکراری - merge attributes و ثبت chunk
+            existing_attrs = self.entities[entity_id].setdefault("attributes", {})
+            new_attrs = entity.get("attributes", {})
+            existing_attrs.setdefault("chunks", []).append(chunk_index)
+            existing_attrs.update(new_attrs)
+            if entity_id in self.graph:
+                self.graph.nodes[entity_id].update(existing_attrs)
+            return entity_id
+
+        entity_id = f"ENT_{len(self.entities)}"
+        self.entity_ids[entity_name] = entity_id
+        entity["id"] = entity_id
+        entity.setdefault("attributes", {})["chunks"] = [chunk_index]
+        self.entities[entity_id] = entity
+        if self.max_entities is None or len(self.entities) <= self.max_entities:
+            try:
+                self.graph.add_node(entity_id, **node_attributes(entity))
+            except Exception as e:
+                logging.warning(f"Error adding node {entity_id}: {e}")
+        return entity_id
+
+    def add_relationship(self, rel: Dict[str, Any], chunk_index: int) -> bool:
+        """افزودن رابطه بین موجودیت‌های شناخته‌شده یا افزایش frequency رابطه تکراری"""
+        source_id = self.entity_ids.get(rel.get("source", "").strip().lower())
+        target_id = self.entity_ids.get(rel.get("target", "").strip().lower())
+        if not (source_id and target_id):
+            return False
+
+        rel_key = (source_id, target_id, rel.get("relation", "").strip())
+        existing = self.relationships.get(rel_key)
+        if existing is not None:
+            attributes = existing["attributes"]
+            attributes["frequency"] = attributes.get("frequency", 1) + 1
+            edge_key = self._edge_keys.get(rel_key)
+            if edge_key is not None:
+                self.graph.edges[source_id, target_id, edge_key]["frequency"] = attributes["frequency"]
+            return True
+
+        rel["source"] = source_id
+        rel["target"] = target_id
+        rel.setdefault("attributes", {})["chunk"] = chunk_index
+        self.relationships[rel_key] = rel
+        if ((self.max_relationships is None or len(self.relationships) <= self.max_relationships)
+                and source_id in self.graph and target_id in self.graph):
+            try:
+                self._edge_keys[rel_key] = self.graph.add_edge(source_id, target_id, **edge_attributes(rel))
+            except Exception as e:
+                logging.warning(f"Error adding edge {source_id} -> {target_id}: {e}")
+        return True
+
+    def result(self, method: str, **stats) -> Dict[str, Any]:
+        """نتیجه استخراج در قالب extract (با برش max_entities / max_relationships)"""
+        entities = list(self.entities.values())
+        relationships = list(self.relationships.values())
+        return {
+            "entities": entities[:self.max_entities],
+            "relationships": relationships[:self.max_relationships],
+            "method": method,
+            "stats": {
+                "num_entities": len(entities),
+                "num_relationships": len(relationships),
+                **stats
+            }
+        }
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+LLM Cache - کش پایدار پاسخ‌های LLM (تولید پاسخ، استخراج گراف و ارزیابی)
+
+هر پاسخ با کلیدی از سرویس‌دهنده و بدنه کامل درخواست (مدل، پیام‌ها، پارامترها؛ بدون
+API Key) ذخیره می‌شود. backend پیش‌فرض یک فایل SQLite (حالت WAL، قابل اشتراک بین
+فرایندها) است و می‌توان Redis (rag_new.utils.redis_conn) را به جای آن به کار برد.
+
+تطبیق معنایی اختیاری است. فراخوان (پرسش، زمینه بازیابی‌شده) را می‌فرستد. اگر در همان
+دامنه درخواست (سرویس‌دهنده، مدل و پارامترها) مدخلی پیدا شود که شباهت کسینوسی embedding
+پرسش و زمینه آن هر دو از آستانه بیشتر باشد، پاسخ آن مدخل برگردانده می‌شود.
+embedding پیش‌فرض یک بردار hashing از n-gram های حرفی است و به مدل نیاز ندارد. تابع
+embedding دیگری را می‌توان به سازنده داد.
+
+صرفه‌جویی توکن (تخمینی، حدود ۴ نویسه برای هر توکن) برای هر hit شمرده می‌شود.
+
+تنظیم با متغیرهای محیطی:
+    GRAPHRAG_LLM_CACHE                   مسیر فایل SQLite یا off (پیش‌فرض: .llm_cache/responses.sqlite)
+    GRAPHRAG_LLM_CACHE_BACKEND           sqlite (پیش‌فرض) یا redis
+    GRAPHRAG_LLM_CACHE_TTL               انقضای مدخل‌ها به ثانیه (پیش‌فرض: بدون انقضا)
+    GRAPHRAG_LLM_SEMANTIC_THRESHOLD      آستانه تطبیق معنایی، مثلاً 0.95 (پیش‌فرض: غیرفعال)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+LLM_CACHE_DIRNAME = ".llm_cache"
+LLM_CACHE_PREFIX = "llm_cache:"
+EMBEDDING_DIM = 512
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """تخمین تعداد توکن (حدود ۴ نویسه برای هر توکن)"""
+    return max(1, round(len(text or "") / 4)) if text else 0
+
+
+def hashed_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """بردار نرمال‌شده n-gram های سه‌حرفی کلمات (hashing trick، بدون مدل)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall((text or "").lower()):
+        padded = f"#{word}#"
+        for i in range(max(1, len(padded) - 2)):
+            digest = hashlib.blake2b(padded[i:i + 3].encode("utf-8"), digest_size=4).digest()
+            vector[int.from_bytes(digest, "little") % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def response_key(provider: str, request: Dict[str, Any]) -> str:
+    """کلید پاسخ: سرویس‌دهنده و بدنه کامل درخواست"""
+    payload = json.dumps([provider, request], sort_keys=True, ensure_ascii=False, default=str)
+    return LLM_CACHE_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _scope_key(provider: str, request: Dict[str, Any]) -> str:
+    """دامنه تطبیق معنایی: درخواست بدون پیام‌ها"""
+    return response_key(provider, {k: v for k, v in request.items() if k not in ("messages", "system")})
+
+
+def _request_text(request: Dict[str, Any]) -> str:
+    parts = [str(request.get("system") or "")]
+    parts.extend(str(message.get("content", "")) for message in request.get("messages") or [])
+    return "\n".join(parts)
+
+
+class LLMResponseCache:
+    """کش پاسخ‌های LLM با تطبیق دقیق (SQLite/Redis) و تطبیق معنایی اختیاری"""
+
+    def __init__(self, path: str = ":memory:", backend=None, ttl: Optional[int] = None,
+                 semantic_threshold: Optional[float] = None,
+                 embed: Callable[[str], np.ndarray] = hashed_embedding):
+        """
+        Args:
+            path: فایل SQLite (مدخل‌ها و بردارهای معنایی)
+            backend: اتصال Redis برای مدخل‌های دقیق؛ None = همان SQLite
+            ttl: انقضای مدخل‌ها (ثانیه)؛ None = بدون انقضا
+            semantic_threshold: حداقل شباهت کسینوسی پرسش و زمینه؛ None = فقط تطبیق دقیق
+        """
+        self.path = path
+        self.backend = backend
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._embed = embed
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT,
+                prompt_tokens INTEGER, completion_tokens INTEGER, created REAL, expires REAL, hits INTEGER DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS semantic (
+                key TEXT PRIMARY KEY, scope TEXT, question BLOB, context BLOB);
+            CREATE INDEX IF NOT EXISTS semantic_scope ON semantic (scope);
+        """)
+        self._db.commit()
+        # بردارهای معنایی هر دامنه پس از اولین استفاده در حافظه نگه داشته می‌شوند
+        self._vectors: Dict[str, List[Tuple[str, np.ndarray, np.ndarray]]] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+
+    # ---- مدخل‌های دقیق ----
+
+    def get_text(self, key: str) -> Optional[str]:
+        """مقدار خام یک کلید (برای کش‌های قدیمی مثل graphrag_new.utils.get_llm_cache)"""
+        entry = self._get_entry(key)
+        return entry["response"] if entry else None
+
+    def set_text(self, key: str, value: str, ttl: Optional[int] = None, **meta):
+        self._set_entry(key, dict(meta, response=value), ttl)
+
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            if self.backend is not None:
+                # RedisConnection خودش JSON را serialize/deserialize می‌کند
+                raw = self.backend.get(key)
+                return json.loads(raw) if isinstance(raw, str) else raw or None
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT response, prompt_tokens, completion_tokens, expires FROM responses WHERE key = ?",
+                    (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[3] is not None and time.time() > row[3]:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute("UPDATE responses SET hits = hits + 1 WHERE key = ?", (key,))
+                self._db.commit()
+            return {"response": row[0], "prompt_tokens": row[1] or 0, "completion_tokens": row[2] or 0}
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در خواندن کش LLM: {e}")
+            return None
+
+    def _set_entry(self, key: str, entry: Dict[str, Any], ttl: Optional[int] = None):
+        ttl = ttl if ttl is not None else self.ttl
+        try:
+            if self.backend is not None:
+                self.backend.set(key, entry, ex=ttl)
+                return
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, provider, model, response, prompt_tokens, "
+                    "completion_tokens, created, expires) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.get("provider"), entry.get("model"), entry["response"],
+                     entry.get("prompt_tokens", 0), entry.get("completion_tokens", 0), time.time(),
+                     time.time() + ttl if ttl else None))
+                self._db.commit()
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در نوشتن کش LLM: {e}")
+
+    # ---- تطبیق معنایی ----
+
+    def _scope_vectors(self, scope: str) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+        vectors = self._vectors.get(scope)
+        if vectors is None:
+            with self._lock:
+                rows = self._db.execute("SELECT key, question, context FROM semantic WHERE scope = ?",
+                                        (scope,)).fetchall()
+            vectors = self._vectors[scope] = [
+                (key, np.frombuffer(question, dtype=np.float32), np.frombuffer(context, dtype=np.float32))
+                for key, question, context in rows]
+        return vectors
+
+    def _semantic_match(self, scope: str, semantic: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        question, context = self._embed(semantic[0]), self._embed(semantic[1])
+        best_key, best_score = None, self.semantic_threshold
+        for key, q_vector, c_vector in self._scope_vectors(scope):
+            score = min(float(question @ q_vector), float(context @ c_vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self._get_entry(best_key) if best_key else None
+
+    def _index_semantic(self, key: str, scope: str, semantic: Tuple[str, str]):
+        question, context = self._embed(semantic[0]), self._embed(semantic[1])
+        try:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO semantic (key, scope, question, context) VALUES (?, ?, ?, ?)",
+                                 (key, scope, question.astype(np.float32).tobytes(),
+                                  context.astype(np.float32).tobytes()))
+                self._db.commit()
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در نوشتن بردار کش LLM: {e}")
+            return
+        self._scope_vectors(scope).append((key, question, context))
+
+    # ---- رابط اصلی ----
+
+    def lookup(self, provider: str, request: Dict[str, Any],
+               semantic: Optional[Tuple[str, str]] = None) -> Optional[str]:
+        """
+        پاسخ کش‌شده درخواست یا None
+
+        Args:
+            semantic: (پرسش، زمینه بازیابی‌شده) برای تطبیق معنایی
+        """
+        entry = self._get_entry(response_key(provider, request))
+        if entry is not None:
+            self.hits += 1
+        elif semantic is not None and self.semantic_threshold is not None:
+            entry = self._semantic_match(_scope_key(provider, request), semantic)
+            if entry is not None:
+                self.semantic_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self.saved_prompt_tokens += entry.get("prompt_tokens", 0)
+        self.saved_completion_tokens += entry.get("completion_tokens", 0)
+        return entry["response"]
+
+    def store(self, provider: str, request: Dict[str, Any], response: str,
+              semantic: Optional[Tuple[str, str]] = None):
+        if not response:
+            return
+        key = response_key(provider, request)
+        self._set_entry(key, {
+            "provider": provider, "model": request.get("model"), "response": response,
+            "prompt_tokens": estimate_tokens(_request_text(request)),
+            "completion_tokens": estimate_tokens(response),
+        })
+        if semantic is not None and self.semantic_threshold is not None:
+            self._index_semantic(key, _scope_key(provider, request), semantic)
+
+    def get_or_call(self, provider: str, request: Dict[str, Any], call: Callable[[], str],
+                    semantic: Optional[Tuple[str, str]] = None) -> str:
+        cached = self.lookup(provider, request, semantic)
+        if cached is not None:
+            return cached
+        response = call()
+        self.store(provider, request, response, semantic)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM semantic")
+            self._db.commit()
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        stats = {
+            'backend': 'sqlite' if self.backend is None else type(self.backend).__name__,
+            'hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            'saved_prompt_tokens': self.saved_prompt_tokens,
+            'saved_completion_tokens': self.saved_completion_tokens,
+            'saved_tokens': self.saved_prompt_tokens + self.saved_completion_tokens,
+            'errors': self.errors,
+            'semantic_threshold': self.semantic_threshold,
+        }
+        if self.backend is None:
+            with self._lock:
+                stats['entries'] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+_default_cache_disabled = False
+
+
+def default_llm_cache_path() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), LLM_CACHE_DIRNAME, "responses.sqlite")
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """کش مشترک فرایند بر اساس متغیرهای محیطی (None اگر GRAPHRAG_LLM_CACHE=off)"""
+    global _default_cache, _default_cache_disabled
+    if _default_cache is None and not _default_cache_disabled:
+        with _default_cache_lock:
+            if _default_cache is None and not _default_cache_disabled:
+                path = os.environ.get("GRAPHRAG_LLM_CACHE") or default_llm_cache_path()
+                if path.lower() == "off":
+                    _default_cache_disabled = True
+                    return None
+                backend = None
+                if os.environ.get("GRAPHRAG_LLM_CACHE_BACKEND", "sqlite").lower() == "redis":
+                    from rag_new.utils.redis_conn import REDIS_CONN
+                    backend = REDIS_CONN
+                ttl = os.environ.get("GRAPHRAG_LLM_CACHE_TTL")
+                threshold = os.environ.get("GRAPHRAG_LLM_SEMANTIC_THRESHOLD")
+                _default_cache = LLMResponseCache(path, backend=backend, ttl=int(ttl) if ttl else None,
+                                                  semantic_threshold=float(threshold) if threshold else None)
+    return _default_cache
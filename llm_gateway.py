@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+LLM Gateway - درگاه مشترک فراخوانی سرویس‌دهنده‌های LLM
+
+همه فراخوانی‌های LLM (GraphRAGService، مقایسه با GPT و rag_new.llm) از این درگاه عبور
+می‌کنند تا:
+- کلاینت‌های OpenAI/Anthropic یک‌بار ساخته شوند و اتصال‌های keep-alive یک pool مشترک
+  httpx را دوباره به کار ببرند؛
+- تعداد درخواست‌های هم‌زمان هر سرویس‌دهنده با semaphore محدود شود؛
+- نرخ درخواست هر سرویس‌دهنده با token bucket محدود شود؛
+- تلاش مجدد خطاهای گذرا (429، timeout، 5xx) از یک بودجه مشترک برداشت شود تا در
+  قطعی سرویس‌دهنده طوفان retry ایجاد نشود؛
+- درخواست‌های یکسان هم‌زمان (همان سرویس‌دهنده، کلید و بدنه) فقط یک‌بار ارسال شوند؛
+- پاسخ‌ها در کش پایدار llm_cache ذخیره شوند (درگاه پیش‌فرض فرایند).
+
+کلاینت‌های SDK با max_retries=0 ساخته می‌شوند و retry فقط در درگاه انجام می‌شود.
+آدرس سرویس‌دهنده از base_url یا متغیرهای OPENAI_BASE_URL/ANTHROPIC_BASE_URL خوانده می‌شود
+(در تست‌ها به یک سرور محلی جایگزین اشاره می‌کند).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from llm_cache import LLMResponseCache, get_llm_cache
+
+# محدودیت‌های پیش‌فرض هر سرویس‌دهنده: (درخواست هم‌زمان، نرخ در ثانیه، ظرفیت burst)
+DEFAULT_PROVIDER_LIMITS = {
+    'openai': (8, 10.0, 20),
+    'anthropic': (8, 10.0, 20),
+}
+FALLBACK_PROVIDER_LIMITS = (4, 5.0, 10)
+
+BASE_URL_ENV = {'openai': 'OPENAI_BASE_URL', 'anthropic': 'ANTHROPIC_BASE_URL'}
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """محدودکننده نرخ token bucket (rate توکن در ثانیه، حداکثر capacity توکن)"""
+
+    def __init__(self, rate: Optional[float], capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """رزرو یک توکن؛ مدت انتظار لازم (ثانیه) تا توکن معتبر شود را برمی‌گرداند"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class RetryBudget:
+    """
+    بودجه مشترک تلاش مجدد
+
+    هر درخواست اصلی ratio توکن واریز می‌کند (حداکثر max_tokens) و هر retry یک توکن
+    برمی‌دارد؛ بنابراین در بلندمدت تعداد retry ها حداکثر ratio برابر درخواست‌هاست.
+    """
+
+    def __init__(self, ratio: float = 0.2, initial: float = 10, max_tokens: float = 50):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._balance = float(initial)
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.max_tokens, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._balance >= 1:
+                self._balance -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+    @property
+    def balance(self) -> float:
+        return self._balance
+
+
+def is_retryable(error: Exception) -> bool:
+    """خطاهای گذرا: 408/409/429/5xx، timeout و خطای اتصال"""
+    status = getattr(error, 'status_code', None)
+    if status is None and isinstance(getattr(error, 'response', None), httpx.Response):
+        status = error.response.status_code
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    message = str(error).lower()
+    return ('Timeout' in name or 'Connection' in name or 'rate limit' in message or 'timed out' in message)
+
+
+def request_key(provider: str, api_key: Optional[str], request: Dict[str, Any]) -> str:
+    """کلید یکتای درخواست برای یکی‌سازی درخواست‌های هم‌زمان یکسان"""
+    payload = json.dumps([provider, hashlib.sha256((api_key or '').encode()).hexdigest(), request],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _ProviderState:
+    def __init__(self, limits):
+        max_concurrency, rate, burst = limits
+        self.max_concurrency = max_concurrency
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.coalesced = 0
+
+
+class LLMGateway:
+    """درگاه مشترک فرایند برای فراخوانی LLM ها"""
+
+    def __init__(self, provider_limits: Optional[Dict[str, tuple]] = None, retry_budget: Optional[RetryBudget] = None,
+                 max_attempts: int = 3, backoff: float = 0.5, max_backoff: float = 8.0,
+                 timeout: float = 120.0, max_connections: int = 64, cache: Optional[LLMResponseCache] = None):
+        """
+        Args:
+            provider_limits: {سرویس‌دهنده: (درخواست هم‌زمان، نرخ در ثانیه، ظرفیت burst)}
+            cache: کش پاسخ‌های LLM؛ None = بدون کش
+        """
+        self.cache = cache
+        self.provider_limits = dict(DEFAULT_PROVIDER_LIMITS, **(provider_limits or {}))
+        self.retry_budget = retry_budget or RetryBudget()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        # قفل بازگشتی: ساخت کلاینت (زیر قفل) به http_client مشترک نیاز دارد
+        self._lock = threading.RLock()
+        self._providers: Dict[str, _ProviderState] = {}
+        self._clients: Dict[tuple, Any] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._http_client: Optional[httpx.Client] = None
+        # اشیای async به event loop وابسته‌اند و برای هر loop جداگانه نگه داشته می‌شوند
+        self._loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = \
+            weakref.WeakKeyDictionary()
+
+    # ---- کلاینت‌ها ----
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """کلاینت httpx مشترک با pool اتصال‌های keep-alive"""
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=self._limits, timeout=self.timeout)
+        return self._http_client
+
+    @staticmethod
+    def _base_url(provider: str, base_url: Optional[str]) -> Optional[str]:
+        return base_url or os.environ.get(BASE_URL_ENV.get(provider, ''), None) or None
+
+    def _client(self, kind: str, api_key: Optional[str], base_url: Optional[str], build: Callable[[], Any]):
+        key = (kind, hashlib.sha256((api_key or '').encode()).hexdigest(), base_url)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = build()
+        return client
+
+    def _sdk_client(self, cls, http_client, **kwargs):
+        """ساخت کلاینت SDK روی pool اتصال مشترک؛ اگر SDK کلاینت httpx دیگری بخواهد (مثلاً httpx2)
+        از pool خود کلاینت SDK استفاده می‌شود که آن هم چون کلاینت نگه داشته می‌شود دوباره به کار می‌رود"""
+        kwargs.update(max_retries=0, timeout=self.timeout)
+        try:
+            return cls(http_client=http_client, **kwargs)
+        except TypeError:
+            return cls(**kwargs)
+
+    def openai_client(self, api_key: Optional[str], base_url: Optional[str] = None):
+        """کلاینت OpenAI (یا سازگار با OpenAI) مشترک روی pool اتصال درگاه"""
+        from openai import OpenAI
+        base_url = self._base_url('openai', base_url)
+        return self._client('openai', api_key, base_url, lambda: self._sdk_client(
+            OpenAI, self.http_client, api_key=api_key, base_url=base_url))
+
+    def anthropic_client(self, api_key: Optional[str], base_url: Optional[str] = None):
+        """کلاینت Anthropic مشترک روی pool اتصال درگاه"""
+        from anthropic import Anthropic
+        base_url = self._base_url('anthropic', base_url)
+        return self._client('anthropic', api_key, base_url, lambda: self._sdk_client(
+            Anthropic, self.http_client, api_key=api_key, base_url=base_url))
+
+    def _loop(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = self._loop_state[loop] = {'http': None, 'clients': {}, 'semaphores': {}, 'inflight': {}}
+        return state
+
+    def _async_client(self, kind: str, api_key: Optional[str], base_url: Optional[str], build: Callable[[httpx.AsyncClient], Any]):
+        state = self._loop()
+        if state['http'] is None:
+            state['http'] = httpx.AsyncClient(limits=self._limits, timeout=self.timeout)
+        key = (kind, hashlib.sha256((api_key or '').encode()).hexdigest(), base_url)
+        if key not in state['clients']:
+            state['clients'][key] = build(state['http'])
+        return state['clients'][key]
+
+    def async_openai_client(self, api_key: Optional[str], base_url: Optional[str] = None):
+        """کلاینت AsyncOpenAI مشترک event loop جاری"""
+        from openai import AsyncOpenAI
+        base_url = self._base_url('openai', base_url)
+        return self._async_client('openai', api_key, base_url, lambda http: self._sdk_client(
+            AsyncOpenAI, http, api_key=api_key, base_url=base_url))
+
+    def async_anthropic_client(self, api_key: Optional[str], base_url: Optional[str] = None):
+        """کلاینت AsyncAnthropic مشترک event loop جاری"""
+        from anthropic import AsyncAnthropic
+        base_url = self._base_url('anthropic', base_url)
+        return self._async_client('anthropic', api_key, base_url, lambda http: self._sdk_client(
+            AsyncAnthropic, http, api_key=api_key, base_url=base_url))
+
+    # ---- محدودیت‌ها ----
+
+    def _provider(self, provider: str) -> _ProviderState:
+        state = self._providers.get(provider)
+        if state is None:
+            with self._lock:
+                state = self._providers.get(provider)
+                if state is None:
+                    state = self._providers[provider] = _ProviderState(
+                        self.provider_limits.get(provider, FALLBACK_PROVIDER_LIMITS))
+        return state
+
+    @contextmanager
+    def slot(self, provider: str):
+        """نوبت نرخ و جای هم‌زمانی سرویس‌دهنده برای یک درخواست (شامل پاسخ‌های جریانی)"""
+        state = self._provider(provider)
+        state.bucket.acquire()
+        with state.semaphore:
+            state.in_flight += 1
+            state.requests += 1
+            try:
+                yield
+            finally:
+                state.in_flight -= 1
+
+    @asynccontextmanager
+    async def aslot(self, provider: str):
+        state = self._provider(provider)
+        semaphores = self._loop()['semaphores']
+        if provider not in semaphores:
+            semaphores[provider] = asyncio.Semaphore(state.max_concurrency)
+        await state.bucket.aacquire()
+        async with semaphores[provider]:
+            state.in_flight += 1
+            state.requests += 1
+            try:
+                yield
+            finally:
+                state.in_flight -= 1
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(self.max_backoff, float(retry_after))
+        except ValueError:
+            pass
+        return min(self.max_backoff, self.backoff * (2 ** attempt))
+
+    def _should_retry(self, state: _ProviderState, attempt: int, error: Exception) -> bool:
+        if attempt + 1 >= self.max_attempts or not is_retryable(error) or not self.retry_budget.try_spend():
+            state.errors += 1
+            return False
+        state.retries += 1
+        logging.warning(f"تلاش مجدد LLM ({attempt + 1}): {type(error).__name__}: {error}")
+        return True
+
+    # ---- فراخوانی ----
+
+    def call(self, provider: str, fn: Callable[[], Any], key: Optional[str] = None) -> Any:
+        """
+        اجرای fn با محدودیت‌های سرویس‌دهنده و retry از بودجه مشترک
+
+        درخواست‌هایی با key یکسان که هم‌زمان در جریان‌اند یک‌بار اجرا و نتیجه بین آن‌ها
+        به اشتراک گذاشته می‌شود.
+        """
+        if key is None:
+            return self._call(provider, fn)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            self._provider(provider).coalesced += 1
+            return future.result()
+        try:
+            future.set_result(self._call(provider, fn))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def _call(self, provider: str, fn: Callable[[], Any]) -> Any:
+        state = self._provider(provider)
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                with self.slot(provider):
+                    return fn()
+            except Exception as e:
+                if not self._should_retry(state, attempt, e):
+                    raise
+                time.sleep(self._backoff_delay(attempt, e))
+                attempt += 1
+
+    async def acall(self, provider: str, fn: Callable[[], Any], key: Optional[str] = None) -> Any:
+        """نسخه async call؛ fn یک coroutine function است"""
+        if key is None:
+            return await self._acall(provider, fn)
+        inflight = self._loop()['inflight']
+        task = inflight.get(key)
+        if task is not None:
+            self._provider(provider).coalesced += 1
+            return await asyncio.shield(task)
+        task = inflight[key] = asyncio.ensure_future(self._acall(provider, fn))
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _acall(self, provider: str, fn: Callable[[], Any]) -> Any:
+        state = self._provider(provider)
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                async with self.aslot(provider):
+                    return await fn()
+            except Exception as e:
+                if not self._should_retry(state, attempt, e):
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt, e))
+                attempt += 1
+
+    # ---- درخواست‌های متداول ----
+
+    def _cached_call(self, provider: str, api_key: Optional[str], request: Dict[str, Any], send,
+                     semantic: Optional[Tuple[str, str]]) -> str:
+        if self.cache is None:
+            return self.call(provider, send, key=request_key(provider, api_key, request))
+        return self.cache.get_or_call(
+            provider, request, lambda: self.call(provider, send, key=request_key(provider, api_key, request)),
+            semantic)
+
+    async def _acached_call(self, provider: str, api_key: Optional[str], request: Dict[str, Any], send,
+                            semantic: Optional[Tuple[str, str]]) -> str:
+        cached = self.cache.lookup(provider, request, semantic) if self.cache is not None else None
+        if cached is not None:
+            return cached
+        response = await self.acall(provider, send, key=request_key(provider, api_key, request))
+        if self.cache is not None:
+            self.cache.store(provider, request, response, semantic)
+        return response
+
+    def openai_chat(self, api_key: Optional[str], request: Dict[str, Any], base_url: Optional[str] = None,
+                    provider: str = 'openai', semantic: Optional[Tuple[str, str]] = None) -> str:
+        """
+        متن پاسخ chat.completions یک سرویس‌دهنده سازگار با OpenAI
+
+        Args:
+            semantic: (پرسش، زمینه بازیابی‌شده) برای تطبیق معنایی در کش پاسخ‌ها
+        """
+        client = self.openai_client(api_key, base_url)
+        return self._cached_call(provider, api_key, request,
+                                 lambda: client.chat.completions.create(**request).choices[0].message.content,
+                                 semantic)
+
+    def anthropic_message(self, api_key: Optional[str], request: Dict[str, Any], base_url: Optional[str] = None,
+                          semantic: Optional[Tuple[str, str]] = None) -> str:
+        """متن پاسخ messages.create در Anthropic"""
+        client = self.anthropic_client(api_key, base_url)
+        return self._cached_call('anthropic', api_key, request,
+                                 lambda: client.messages.create(**request).content[0].text, semantic)
+
+    async def aopenai_chat(self, api_key: Optional[str], request: Dict[str, Any], base_url: Optional[str] = None,
+                           provider: str = 'openai', semantic: Optional[Tuple[str, str]] = None) -> str:
+        client = self.async_openai_client(api_key, base_url)
+
+        async def send():
+            return (await client.chat.completions.create(**request)).choices[0].message.content
+        return await self._acached_call(provider, api_key, request, send, semantic)
+
+    async def aanthropic_message(self, api_key: Optional[str], request: Dict[str, Any],
+                                 base_url: Optional[str] = None, semantic: Optional[Tuple[str, str]] = None) -> str:
+        client = self.async_anthropic_client(api_key, base_url)
+
+        async def send():
+            return (await client.messages.create(**request)).content[0].text
+        return await self._acached_call('anthropic', api_key, request, send, semantic)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'providers': {name: {'in_flight': state.in_flight, 'max_concurrency': state.max_concurrency,
+                                 'requests': state.requests, 'retries': state.retries, 'errors': state.errors,
+                                 'coalesced': state.coalesced}
+                          for name, state in self._providers.items()},
+            'retry_budget': {'balance': round(self.retry_budget.balance, 2), 'spent': self.retry_budget.spent,
+                             'denied': self.retry_budget.denied},
+            'clients': len(self._clients),
+            'cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+
+_default_gateway: Optional[LLMGateway] = None
+_default_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """درگاه مشترک فرایند"""
+    global _default_gateway
+    if _default_gateway is None:
+        with _default_gateway_lock:
+            if _default_gateway is None:
+                _default_gateway = LLMGateway(cache=get_llm_cache())
+    return _default_gateway
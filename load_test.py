@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Load Test - مقایسه حالت سرویس‌دهی Flask (WSGI)، ASGI و prefork زیر بار هم‌زمان
+
+درخواست‌های هم‌زمان به یک endpoint پرسش ارسال می‌کند و توان عملیاتی، تأخیر
+(p50/p95/p99) و تعداد خطاها را گزارش می‌دهد.
+
+نمونه‌ها:
+    # مقایسه هر دو حالت (سرورها به‌صورت خودکار راه‌اندازی می‌شوند)
+    python load_test.py --mode both --concurrency 32 --requests 256
+
+    # مقیاس‌پذیری prefork با تعداد worker (روی میزبان چند هسته‌ای)
+    python load_test.py --mode prefork --workers 1,2,4 --unique
+
+    # آزمون یک سرور در حال اجرا
+    python load_test.py --url http://localhost:8000 --generation-model OPENAI_GPT_4O_MINI
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+SAMPLE_QUERIES = [
+    "What genes are expressed in liver?",
+    "Which drugs treat hypertension?",
+    "How does TP53 relate to cancer?",
+    "What diseases are associated with BRCA1?",
+    "Which genes participate in apoptosis?",
+    "What compounds bind to EGFR?",
+]
+
+SERVER_COMMANDS = {
+    'flask': [sys.executable, '-m', 'flask', '--app', 'web_app', 'run', '--port', '{port}', '--no-reload',
+              '--with-threads'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', '{port}', '--log-level', 'warning'],
+    'prefork': [sys.executable, 'prefork_server.py', '--port', '{port}', '--workers', '{workers}'],
+}
+DEFAULT_PORTS = {'flask': 5050, 'asgi': 8050, 'prefork': 6050}
+
+
+def request_body(endpoint: str, index: int, args) -> Dict:
+    """بدنه درخواست شماره index برای endpoint"""
+    query = SAMPLE_QUERIES[index % len(SAMPLE_QUERIES)]
+    if args.unique:
+        # پرسش یکتا تا کش نتایج بازیابی اثری نداشته باشد
+        query = f"{query} #{index}"
+    if endpoint == '/api/compare_texts':
+        return {'text1': query, 'text2': SAMPLE_QUERIES[(index + 1) % len(SAMPLE_QUERIES)],
+                'method': 'cosine_tfidf'}
+    if endpoint == '/api/enhanced_process_query':
+        return {'query': query}
+    return {'query': query, 'retrieval_method': args.retrieval_method,
+            'generation_model': args.generation_model}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run_load(base_url: str, args) -> Dict:
+    """ارسال args.requests درخواست با حداکثر args.concurrency درخواست هم‌زمان"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(args.requests))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for index in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(args.endpoint, json=request_body(args.endpoint, index, args))
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+async def wait_until_ready(base_url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get('/api/graph_info')).status_code < 500:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    return False
+
+
+def start_server(mode: str, port: int, cpu_workers: Optional[int], workers: int = 1) -> subprocess.Popen:
+    env = dict(os.environ)
+    if cpu_workers:
+        env['GRAPHRAG_CPU_WORKERS'] = str(cpu_workers)
+    command = [part.format(port=port, workers=workers) for part in SERVER_COMMANDS[mode]]
+    return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def run_mode(mode: str, args, workers: int = 1) -> Dict:
+    """راه‌اندازی سرور یک حالت، گرم کردن و اجرای بار"""
+    port = DEFAULT_PORTS[mode]
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(mode, port, args.cpu_workers, workers)
+    try:
+        if not await wait_until_ready(base_url, args.startup_timeout):
+            raise RuntimeError(f"سرور {mode} در {args.startup_timeout} ثانیه آماده نشد")
+        if args.warmup:
+            # درخواست‌های هم‌زمان تا هر worker (در prefork) import های lazy خود را پیش از اندازه‌گیری انجام دهد
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+                await asyncio.gather(*(client.post(args.endpoint, json=request_body(args.endpoint, index, args))
+                                       for index in range(2 * workers)))
+        return await run_load(base_url, args)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def print_table(results: Dict[str, Dict]):
+    columns = ['requests', 'errors', 'elapsed_s', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']
+    print(f"{'mode':<10}" + "".join(f"{column:>16}" for column in columns))
+    for mode, stats in results.items():
+        print(f"{mode:<10}" + "".join(f"{stats[column]:>16}" for column in columns))
+    sweep = [(mode, stats) for mode, stats in results.items() if mode.startswith('prefork-')]
+    if len(sweep) > 1 and sweep[0][1]['throughput_rps']:
+        baseline = sweep[0][1]['throughput_rps']
+        print("speedup: " + ", ".join(f"{mode} x{stats['throughput_rps'] / baseline:.2f}" for mode, stats in sweep))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="مقایسه بار حالت‌های Flask، ASGI و prefork سرویس GraphRAG")
+    parser.add_argument('--url', help="آدرس سرور در حال اجرا (در این صورت سروری راه‌اندازی نمی‌شود)")
+    parser.add_argument('--mode', choices=['flask', 'asgi', 'prefork', 'both'], default='both')
+    parser.add_argument('--endpoint', default='/api/process_query',
+                        choices=['/api/process_query', '/api/enhanced_process_query', '/api/compare_texts'])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=128)
+    parser.add_argument('--retrieval-method', default='BFS')
+    parser.add_argument('--generation-model', default='GPT_SIMULATION')
+    parser.add_argument('--unique', action='store_true', help="پرسش یکتا برای هر درخواست (بدون اثر کش)")
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false')
+    parser.add_argument('--cpu-workers', type=int, help="GRAPHRAG_CPU_WORKERS برای سرور ASGI")
+    parser.add_argument('--workers', default='1,2,4', help="تعداد workerهای prefork (فهرست با کاما برای سنجش مقیاس‌پذیری)")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    args = parser.parse_args(argv)
+
+    if args.url:
+        results = {'target': asyncio.run(run_load(args.url.rstrip('/'), args))}
+    else:
+        modes = ['flask', 'asgi'] if args.mode == 'both' else [args.mode]
+        results = {}
+        for mode in modes:
+            if mode == 'prefork':
+                for workers in (int(count) for count in args.workers.split(',')):
+                    results[f'prefork-{workers}'] = asyncio.run(run_mode(mode, args, workers))
+            else:
+                results[mode] = asyncio.run(run_mode(mode, args))
+
+    print(f"\n📊 {args.endpoint} | concurrency={args.concurrency} | model={args.generation_model}")
+    print_table(results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Metaedge Weights - امتیاز اهمیت انواع یال Hetionet برای امتیازدهی مسیرها و پیمایش وزن‌دار
+"""
+
+from typing import Any, Callable, Dict
+
+# امتیازات پایه بر اساس اهمیت و فراوانی در Hetionet
+METAEDGE_BASE_SCORES: Dict[str, float] = {
+    # بیان ژن در آناتومی - بسیار مهم
+    'AeG': 6.0,  # Anatomy expresses Gene (526,407 edges)
+    'GeA': 5.5,  # Gene expressed in Anatomy
+
+    # تعاملات ژن‌ها - مهم
+    'GiG': 5.0,  # Gene interacts with Gene (147,164 edges)
+    'Gr>G': 4.5, # Gene regulates Gene (265,672 edges)
+    'GcG': 4.0,  # Gene covaries with Gene (61,690 edges)
+
+    # مشارکت در فرآیندهای زیستی - مهم
+    'GpBP': 5.0, # Gene participates in Biological Process (559,504 edges)
+    'GpPW': 4.5, # Gene participates in Pathway (84,372 edges)
+    'GpMF': 4.0, # Gene participates in Molecular Function (97,222 edges)
+    'GpCC': 4.0, # Gene participates in Cellular Component (73,566 edges)
+
+    # تنظیم ژن توسط آناتومی
+    'AuG': 4.5,  # Anatomy upregulates Gene (97,848 edges)
+    'AdG': 4.5,  # Anatomy downregulates Gene (102,240 edges)
+    'GuA': 4.0,  # Gene upregulates Anatomy
+    'GdA': 4.0,  # Gene downregulates Anatomy
+
+    # بیماری‌ها و ژن‌ها
+    'DaG': 4.5,  # Disease associates with Gene (12,623 edges)
+    'DuG': 4.0,  # Disease upregulates Gene (7,731 edges)
+    'DdG': 4.0,  # Disease downregulates Gene (7,623 edges)
+    'GaD': 4.0,  # Gene associates Disease
+    'GuD': 3.5,  # Gene upregulates Disease
+    'GdD': 3.5,  # Gene downregulates Disease
+
+    # داروها و درمان
+    'CtD': 4.5,  # Compound treats Disease (755 edges)
+    'CpD': 4.0,  # Compound palliates Disease (390 edges)
+    'DtC': 4.0,  # Disease treats Compound
+    'DpC': 3.5,  # Disease palliates Compound
+
+    # تنظیم ژن توسط دارو
+    'CuG': 4.0,  # Compound upregulates Gene (18,756 edges)
+    'CdG': 4.0,  # Compound downregulates Gene (21,102 edges)
+    'CbG': 4.5,  # Compound binds Gene (11,571 edges)
+    'GuC': 3.5,  # Gene upregulates Compound
+    'GdC': 3.5,  # Gene downregulates Compound
+    'GbC': 4.0,  # Gene binds Compound
+
+    # بیماری‌ها و آناتومی
+    'DlA': 4.0,  # Disease localizes to Anatomy (3,602 edges)
+    'AlD': 3.5,  # Anatomy localizes Disease
+
+    # علائم و عوارض
+    'DpS': 4.0,  # Disease presents Symptom (3,357 edges)
+    'SpD': 3.5,  # Symptom presents Disease
+    'CcSE': 3.5, # Compound causes Side Effect (138,944 edges)
+    'SEcC': 3.0, # Side Effect causes Compound
+
+    # تشابه‌ها
+    'DrD': 3.5,  # Disease resembles Disease (543 edges)
+    'CrC': 3.5,  # Compound resembles Compound (6,486 edges)
+
+    # کلاس‌های دارویی
+    'PCiC': 3.0, # Pharmacologic Class includes Compound (1,029 edges)
+    'CiPC': 2.5  # Compound includes Pharmacologic Class
+}
+
+
+def calculate_metaedge_score(metaedge: str, depth: int) -> float:
+    """
+    محاسبه امتیاز بر اساس نوع metaedge و عمق - بهبود یافته
+    """
+    # کاهش وزن روابط شباهت برای جلوگیری از نویز در سوالات مکانیزمی
+    base_score = METAEDGE_BASE_SCORES.get(metaedge, 2.5)
+    if metaedge in ['DrD', 'CrC']:
+        base_score *= 0.6
+
+    # بهبود محاسبه جریمه عمق
+    if depth == 1:
+        depth_penalty = 1.0
+    elif depth == 2:
+        depth_penalty = 0.7
+    elif depth == 3:
+        depth_penalty = 0.5
+    else:
+        depth_penalty = 0.3
+
+    # اضافه کردن بونوس برای metaedges مهم
+    importance_bonus = 1.0
+    if metaedge in ['AeG', 'GiG', 'GpBP', 'DaG', 'CtD']:
+        importance_bonus = 1.2
+    elif metaedge in ['Gr>G', 'GpPW', 'CbG']:
+        importance_bonus = 1.1
+
+    return base_score * depth_penalty * importance_bonus
+
+
+def metaedge_edge_weight() -> Callable[[Dict[str, Any]], float]:
+    """تابع وزن یال (برای random walk) بر اساس امتیاز metaedge در عمق 1"""
+    cache: Dict[Any, float] = {}
+
+    def weight(edge_data: Dict[str, Any]) -> float:
+        metaedge = edge_data.get('metaedge') or edge_data.get('relation')
+        score = cache.get(metaedge)
+        if score is None:
+            score = cache[metaedge] = calculate_metaedge_score(metaedge, 1)
+        return score * edge_data.get('weight', 1.0)
+
+    return weight
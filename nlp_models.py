@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+NLP Models - رجیستری مشترک مدل‌های spaCy و sentence-transformers
+
+هر مدل حداکثر یک‌بار در هر فرایند و تنها در اولین درخواست بارگذاری می‌شود؛ سرویس‌ها
+(GraphRAGService، TextToGraphService، SmartChunker و web_app) به‌جای spacy.load یا
+SentenceTransformer(...) از این ماژول استفاده می‌کنند. شکست بارگذاری هم به خاطر سپرده
+می‌شود تا هر درخواست دوباره هزینه جستجوی مدل را نپردازد. زمان بارگذاری هر مدل از
+model_stats() در دسترس است (برای /api/startup_profile و --profile-startup).
+"""
+
+import importlib.util
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_SPACY_MODEL = "en_core_web_sm"
+DEFAULT_SENTENCE_TRANSFORMER = "paraphrase-multilingual-MiniLM-L12-v2"
+
+_lock = threading.Lock()
+_models: Dict[str, Any] = {}
+_stats: Dict[str, Dict[str, Any]] = {}
+_loading: Dict[str, threading.Event] = {}
+
+
+def spacy_available() -> bool:
+    """نصب بودن spaCy بدون import کردن آن"""
+    return importlib.util.find_spec("spacy") is not None
+
+
+def get_model(key: str, loader: Callable[[], Any]) -> Optional[Any]:
+    """مدل کلید key را یک‌بار با loader بارگذاری و در فرایند نگه می‌دارد (None در صورت شکست)
+
+    فراخوانی‌های هم‌زمان برای یک کلید منتظر همان بارگذاری می‌مانند.
+    """
+    with _lock:
+        if key in _models:
+            return _models[key]
+        event = _loading.get(key)
+        owner = event is None
+        if owner:
+            event = _loading[key] = threading.Event()
+    if not owner:
+        event.wait()
+        return _models.get(key)
+    started = time.perf_counter()
+    model, error = None, None
+    try:
+        model = loader()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        logging.warning(f"Failed to load {key}: {error}")
+    with _lock:
+        _models[key] = model
+        _stats[key] = {"loaded": model is not None, "load_seconds": round(time.perf_counter() - started, 4),
+                       "error": error}
+        del _loading[key]
+    event.set()
+    return model
+
+
+def get_spacy_model(name: str = DEFAULT_SPACY_MODEL) -> Optional[Any]:
+    """مدل spaCy مشترک فرایند (None اگر spaCy یا مدل نصب نباشد)"""
+    def load():
+        import spacy
+        return spacy.load(name)
+    return get_model(f"spacy:{name}", load)
+
+
+def get_sentence_transformer(name: str = DEFAULT_SENTENCE_TRANSFORMER) -> Optional[Any]:
+    """مدل sentence-transformers مشترک فرایند (None اگر کتابخانه یا وزن‌ها در دسترس نباشد)"""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name)
+    return get_model(f"sentence_transformers:{name}", load)
+
+
+def is_loaded(key: str) -> bool:
+    with _lock:
+        return key in _models
+
+
+def model_stats() -> Dict[str, Dict[str, Any]]:
+    """وضعیت و زمان بارگذاری هر مدلی که تاکنون درخواست شده است"""
+    with _lock:
+        return {key: dict(value) for key, value in _stats.items()}
+
+
+def reset_models():
+    """حذف همه مدل‌های بارگذاری شده (برای تست‌ها)"""
+    with _lock:
+        _models.clear()
+        _stats.clear()
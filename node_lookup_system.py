@@ -5,9 +5,9 @@
 برای گراف زیستی Hetionet
 """
 
-import pandas as pd
 import pickle
 import os
+import threading
 from typing import Dict, Optional, Tuple, List
 from dataclasses import dataclass
 
@@ -34,14 +34,12 @@ def __init__(self, nodes_file: str = "hetionet-v1.0-nodes.tsv"):
     def load_nodes(self):
         """بارگذاری نودها از فایل TSV"""
         try:
+            import pandas as pd
             df = pd.read_csv(self.nodes_file, sep='\t')
             print(f"📊 بارگذاری {len(df)} نود از فایل {self.nodes_file}")
             
-            for _, row in df.iterrows():
-                node_id = row['id']
-                name = row['name']
-                kind = row['kind']
-                
+            # zip روی ستون‌ها به‌جای iterrows (ساخت Series برای هر سطر ~50 برابر کندتر است)
+            for node_id, name, kind in zip(df['id'].tolist(), df['name'].tolist(), df['kind'].tolist()):
                 # ایجاد NodeInfo
                 node_info = NodeInfo(
                     id=node_id,
@@ -335,6 +333,20 @@ def load_lookup_cache(self, filename: str = "node_lookup_cache.pkl"):
             print(f"❌ خطا در بارگذاری کش: {e}")
             return False
 
+_shared_lookups: Dict[str, NodeLookupSystem] = {}
+_shared_lock = threading.Lock()
+
+
+def get_node_lookup_system(nodes_file: str = "hetionet-v1.0-nodes.tsv") -> NodeLookupSystem:
+    """نمونه مشترک فرایند برای nodes_file (فایل TSV نودها تنها یک‌بار و در اولین استفاده خوانده می‌شود)"""
+    lookup = _shared_lookups.get(nodes_file)
+    if lookup is None:
+        with _shared_lock:
+            lookup = _shared_lookups.get(nodes_file)
+            if lookup is None:
+                lookup = _shared_lookups[nodes_file] = NodeLookupSystem(nodes_file)
+    return lookup
+
 def test_node_lookup_system():
     """تست سیستم lookup"""
     print("🧬 تست سیستم تبدیل شناسه‌ها به نام‌های معنادار")
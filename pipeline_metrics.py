@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline Metrics - آمار تأخیر مراحل پایپ‌لاین پرسش و خروجی Prometheus
+
+هر QueryContext زمان مراحل پرسش و تعداد نودها/یال‌هایی را که پیمایش‌ها لمس کرده‌اند
+ثبت می‌کند. در پایان پرسش، observe_query این مقادیر را در هیستوگرام‌های مشترک فرایند
+به تفکیک روش بازیابی (BFS، DFS، INTELLIGENT، kgsearch و ...) جمع می‌زند و
+endpoint /metrics آن‌ها را در قالب متنی Prometheus برمی‌گرداند:
+
+    graphrag_stage_duration_seconds{stage, method}   هیستوگرام زمان هر مرحله
+    graphrag_query_duration_seconds{method}          هیستوگرام زمان کل پرسش
+    graphrag_queries_total{method, outcome}          تعداد پرسش‌ها (ok / error)
+    graphrag_nodes_touched_total{method}             نودهای بازگشتی پیمایش‌ها
+    graphrag_edges_touched_total{method}             یال‌های بررسی شده در پیمایش‌ها
+
+زمان مراحل تو در تو شامل زیرمرحله‌ها است (مثلاً traversal در روش INTELLIGENT تحلیل
+نیت را هم در بر می‌گیرد). آمار هر فرایند جداست؛ در prefork_server هر worker آمار
+خود را دارد.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# نام مراحل QueryContext -> نام span در خروجی
+STAGE_NAMES = {
+    'doc': 'nlp_parse',
+    'keywords': 'keyword_extraction',
+    'intent': 'intent_analysis',
+    'matches': 'node_matching',
+    'core_nodes': 'core_node_selection',
+    'traversal': 'traversal',
+    'path_ranking': 'path_ranking',
+    'context': 'context_building',
+    'retrieval': 'retrieval',
+    'generation': 'generation',
+}
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """هیستوگرام با مرزهای ثابت (مانند histogram در Prometheus)؛ قفل با PipelineMetrics است"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)  # اولین مرز >= value
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(مرز، تعداد مقادیر <= مرز) برای هر bucket"""
+        total, result = 0, []
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'mean_ms': round(self.sum / self.count * 1000.0, 3) if self.count else 0.0,
+                'buckets': {str(bound): count for bound, count in self.cumulative()}}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class PipelineMetrics:
+    """هیستوگرام‌ها و شمارنده‌های پایپ‌لاین پرسش (امن برای thread های هم‌زمان)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, str], Histogram] = {}
+        self._queries: Dict[str, Histogram] = {}
+        self._outcomes: Dict[Tuple[str, str], int] = {}
+        self._nodes: Dict[str, int] = {}
+        self._edges: Dict[str, int] = {}
+
+    def observe_query(self, context, error: bool = False):
+        """ثبت زمان مراحل و کل پرسش و شمار نودها/یال‌های لمس‌شده یک QueryContext"""
+        method = context.method or 'unknown'
+        elapsed = time.perf_counter() - context.started
+        with self._lock:
+            for stage, seconds in context.timings.items():
+                key = (STAGE_NAMES.get(stage, stage), method)
+                histogram = self._stages.get(key)
+                if histogram is None:
+                    histogram = self._stages[key] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            histogram = self._queries.get(method)
+            if histogram is None:
+                histogram = self._queries[method] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            outcome = (method, 'error' if error else 'ok')
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            self._nodes[method] = self._nodes.get(method, 0) + context.nodes_touched
+            self._edges[method] = self._edges.get(method, 0) + context.edges_touched
+
+    def snapshot(self) -> Dict[str, Any]:
+        """آمار به صورت دیکشنری (برای JSON)"""
+        with self._lock:
+            methods: Dict[str, Dict[str, Any]] = {}
+            for method, histogram in self._queries.items():
+                methods[method] = {'query': histogram.to_dict(), 'stages': {},
+                                   'ok': self._outcomes.get((method, 'ok'), 0),
+                                   'errors': self._outcomes.get((method, 'error'), 0),
+                                   'nodes_touched': self._nodes.get(method, 0),
+                                   'edges_touched': self._edges.get(method, 0)}
+            for (stage, method), histogram in self._stages.items():
+                methods[method]['stages'][stage] = histogram.to_dict()
+            return methods
+
+    def render_prometheus(self) -> str:
+        """خروجی متنی Prometheus (text exposition format 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(lines, 'graphrag_stage_duration_seconds',
+                                    "Duration of each query pipeline stage",
+                                    {(('stage', stage), ('method', method)): histogram
+                                     for (stage, method), histogram in sorted(self._stages.items())})
+            self._render_histograms(lines, 'graphrag_query_duration_seconds', "End-to-end query duration",
+                                    {(('method', method),): histogram
+                                     for method, histogram in sorted(self._queries.items())})
+            lines += ["# HELP graphrag_queries_total Queries processed",
+                      "# TYPE graphrag_queries_total counter"]
+            lines += [f"graphrag_queries_total{_labels(method=method, outcome=outcome)} {count}"
+                      for (method, outcome), count in sorted(self._outcomes.items())]
+            for name, values, help_text in (
+                    ('graphrag_nodes_touched_total', self._nodes, "Nodes returned by graph traversals"),
+                    ('graphrag_edges_touched_total', self._edges, "Edges scanned by graph traversals")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_labels(method=method)} {count}" for method, count in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, help_text: str, histograms: Dict[tuple, Histogram]):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, histogram in histograms.items():
+            labels = dict(labels)
+            for bound, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_labels(**labels, le=_number(bound))} {count}")
+            lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._queries.clear()
+            self._outcomes.clear()
+            self._nodes.clear()
+            self._edges.clear()
+
+
+_metrics: Optional[PipelineMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_pipeline_metrics() -> PipelineMetrics:
+    """آمار مشترک پایپ‌لاین در فرایند"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = PipelineMetrics()
+    return _metrics
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Prefork Server - چند worker روی یک سوکت با گراف مشترک copy-on-write
+
+پیمایش‌های گراف در graphrag_service پایتون خالص و محدود به GIL هستند؛ برای استفاده از
+چند هسته، فرایند master برنامه (پیش‌فرض web_app:app) را یک‌بار import می‌کند تا گراف،
+ایندکس‌ها، نسخه CSR و معیارهای مرکزیت فقط یک‌بار ساخته شوند. سپس gc.freeze() همه
+اشیای موجود را به نسل دائمی GC منتقل می‌کند (چرخه‌های GC در workerها هدر این اشیا را
+نمی‌نویسند و صفحات مشترک کپی نمی‌شوند) و N worker با fork ساخته می‌شوند که همگی روی یک
+سوکت شنونده accept می‌کنند. اگر گراف از فایل .graphsnap بارگذاری شده باشد بخش‌های عددی
+آن mmap هستند و صفحاتشان مستقیماً بین همه فرایندها مشترک است.
+
+بارگذاری مجدد تدریجی (rolling reload):
+- وقتی در یک worker گراف جدیدی در GraphRegistry نصب شود (مثلاً با /api/load_graph)،
+  مسیر آن از طریق pipe کنترلی به master گزارش می‌شود؛ SIGHUP گراف جاری را دوباره
+  بارگذاری می‌کند
+- master گراف را یک‌بار بارگذاری و دوباره freeze می‌کند و workerها را یکی‌یکی جایگزین
+  می‌کند: worker جدید fork می‌شود و پس از آماده شدن، worker قدیمی SIGTERM می‌گیرد،
+  accept را متوقف می‌کند و درخواست‌های در جریان را تمام می‌کند
+- worker ای که غیرمنتظره خارج شود دوباره ساخته می‌شود؛ SIGTERM/SIGINT همه را متوقف می‌کند
+
+اجرا (فقط سیستم‌های POSIX):
+    python prefork_server.py --workers 4 --port 5000
+    python load_test.py --mode prefork --workers 1,2,4 --unique   # مقیاس‌پذیری با تعداد worker
+"""
+
+import argparse
+import errno
+import gc
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger("prefork")
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """بدون لاگ دسترسی برای هر درخواست (فقط خطاها)"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _GraphLoadForwarder:
+    """در worker: گرافی که در رجیستری نصب می‌شود را برای بارگذاری مجدد تدریجی به master گزارش می‌دهد"""
+
+    def __init__(self, control_fd: int, initial_handle):
+        self.control_fd = control_fd
+        self.initial_handle = initial_handle
+
+    def attach_graph(self, handle):
+        if handle is self.initial_handle or not handle.path:
+            return
+        _send(self.control_fd, f"reload {handle.path}")
+
+
+def _send(fd: int, message: str):
+    # پیام‌های کوتاه‌تر از PIPE_BUF به‌صورت اتمیک نوشته می‌شوند
+    os.write(fd, (message + "\n").encode("utf-8"))
+
+
+class PreforkServer:
+    """master ای که برنامه WSGI را یک‌بار بارگذاری و workerها را fork می‌کند"""
+
+    def __init__(self, app_spec: str = "web_app:app", host: str = "127.0.0.1", port: int = 5000,
+                 workers: Optional[int] = None, graceful_timeout: float = 30.0, backlog: int = 2048,
+                 access_log: bool = False):
+        """
+        Args:
+            app_spec: "module:attr" برنامه WSGI؛ رجیستری گراف از module.graph_registry خوانده می‌شود
+            workers: تعداد فرایندهای worker (پیش‌فرض: تعداد هسته‌ها)
+            graceful_timeout: مهلت پایان درخواست‌های در جریان یک worker پیش از SIGKILL
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("prefork_server به os.fork نیاز دارد (فقط POSIX)")
+        self.app_spec = app_spec
+        self.host = host
+        self.port = port
+        self.num_workers = workers or os.cpu_count() or 1
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.access_log = access_log
+        self.module = None
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self.workers: Dict[int, float] = {}  # pid -> زمان fork
+        self.reloads = 0
+        self._ready: Set[int] = set()
+        self._retiring: Set[int] = set()
+        self._signals: List[int] = []
+        self._pending_reload: Optional[str] = None
+        self._stopping = False
+        self._control_r = self._control_w = -1
+        self._buffer = b""
+
+    # ---- master ----
+
+    def load_app(self):
+        module_name, _, attr = self.app_spec.partition(":")
+        self.module = importlib.import_module(module_name)
+        self.app = getattr(self.module, attr or "app")
+        self._freeze()
+
+    @staticmethod
+    def _freeze():
+        """جمع‌آوری زباله و انتقال اشیای باقی‌مانده به نسل دائمی GC پیش از fork"""
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    @property
+    def graph_registry(self):
+        return getattr(self.module, "graph_registry", None)
+
+    def bind(self):
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        # چند فرایند روی یک سوکت accept می‌کنند؛ accept غیرمسدود تا worker ای که در رقابت
+        # برای یک اتصال بازنده شده در accept گیر نکند
+        sock.setblocking(False)
+        self.socket = sock
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def serve(self):
+        """بارگذاری برنامه، fork کردن workerها و مدیریت آن‌ها تا دریافت SIGTERM/SIGINT"""
+        if self.app is None:
+            self.load_app()
+        if self.socket is None:
+            self.bind()
+        self._control_r, self._control_w = os.pipe()
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        print(f"🚀 prefork: {self.num_workers} worker روی http://{self.host}:{self.port} (master {os.getpid()})",
+              flush=True)
+        for _ in range(self.num_workers):
+            self._spawn()
+        try:
+            while not self._stopping:
+                self._poll(0.5)
+                if self._pending_reload and not self._stopping:
+                    path, self._pending_reload = self._pending_reload, None
+                    self.rolling_reload(path)
+        finally:
+            self._stop_workers()
+            os.close(self._control_r)
+            os.close(self._control_w)
+            self.socket.close()
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _poll(self, timeout: float):
+        """خواندن پیام‌های pipe کنترلی، رسیدگی به سیگنال‌ها و جمع‌آوری workerهای خارج‌شده"""
+        try:
+            readable, _, _ = select.select([self._control_r], [], [], timeout)
+        except InterruptedError:
+            readable = []
+        if readable:
+            self._buffer += os.read(self._control_r, 65536)
+            *lines, self._buffer = self._buffer.split(b"\n")
+            for line in lines:
+                self._handle_message(line.decode("utf-8"))
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum in (signal.SIGTERM, signal.SIGINT):
+                self._stopping = True
+            elif signum == signal.SIGHUP:
+                handle = self.graph_registry.current() if self.graph_registry is not None else None
+                if handle is not None and handle.path:
+                    self._pending_reload = handle.path
+                else:
+                    logger.warning("SIGHUP: گراف فایل‌محوری برای بارگذاری مجدد وجود ندارد")
+        self._reap()
+
+    def _handle_message(self, line: str):
+        kind, _, value = line.partition(" ")
+        if kind == "ready":
+            self._ready.add(int(value))
+        elif kind == "reload":
+            # درخواست‌های پشت‌سرهم: فقط آخرین گراف بارگذاری می‌شود
+            self._pending_reload = value
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            self._ready.discard(pid)
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+            elif started is not None and not self._stopping:
+                logger.warning(f"worker {pid} به‌طور غیرمنتظره خارج شد (status={status})؛ جایگزین می‌شود")
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)  # جلوگیری از fork پیاپی worker ای که هنگام شروع خطا می‌دهد
+                self._spawn()
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._worker_main()
+                code = 0
+            except BaseException:
+                logger.exception("خطا در worker")
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def _wait_ready(self, pid: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while pid not in self._ready and pid in self.workers and time.monotonic() < deadline:
+            self._poll(0.05)
+        return pid in self._ready
+
+    def _terminate(self, pid: int):
+        """SIGTERM و انتظار برای پایان درخواست‌های در جریان (SIGKILL پس از graceful_timeout)"""
+        self._retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while pid in self.workers and time.monotonic() < deadline:
+            self._poll(0.05)
+        if pid in self.workers:
+            logger.warning(f"worker {pid} در مهلت {self.graceful_timeout}s متوقف نشد؛ SIGKILL")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            while pid in self.workers:
+                self._poll(0.05)
+
+    def rolling_reload(self, graph_path: str) -> bool:
+        """بارگذاری گراف در master و جایگزینی تدریجی workerها (در هر لحظه حداقل N worker فعال است)"""
+        registry = self.graph_registry
+        if registry is None:
+            logger.warning(f"{self.app_spec} رجیستری گراف ندارد؛ بارگذاری مجدد انجام نشد")
+            return False
+        started = time.perf_counter()
+        try:
+            registry.swap(graph_path)
+        except Exception as e:
+            logger.error(f"بارگذاری گراف {graph_path} در master ناموفق بود؛ workerها بدون تغییر ماندند: {e}")
+            return False
+        self._freeze()
+        for old_pid in list(self.workers):
+            if self._stopping:
+                break
+            new_pid = self._spawn()
+            if not self._wait_ready(new_pid, self.graceful_timeout):
+                logger.error(f"worker جدید {new_pid} آماده نشد؛ بارگذاری مجدد متوقف شد")
+                return False
+            self._terminate(old_pid)
+        self.reloads += 1
+        print(f"♻️ prefork: گراف {graph_path} در {time.perf_counter() - started:.2f}s روی همه workerها اعمال شد",
+              flush=True)
+        return True
+
+    def _stop_workers(self):
+        for pid in list(self.workers):
+            self._retiring.add(pid)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._poll(0.05)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.workers.pop(pid, None)
+
+    # ---- worker ----
+
+    def _worker_main(self):
+        # تا آماده شدن سرور، SIGTERM worker را فوراً متوقف می‌کند (handler ارث‌بری‌شده master نه)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        for signum in (signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_IGN)
+        os.close(self._control_r)
+        registry = self.graph_registry
+        forwarder = None
+        if registry is not None:
+            forwarder = _GraphLoadForwarder(self._control_w, registry.current())
+            registry.subscribe(forwarder)
+
+        handler = WSGIRequestHandler if self.access_log else _QuietRequestHandler
+        server = ThreadedWSGIServer(self.host, self.port, self.app, handler=handler, fd=self.socket.fileno())
+        # پایان ملایم: server_close منتظر thread های درخواست‌های در جریان می‌ماند
+        server.daemon_threads = False
+        server.block_on_close = True
+
+        def shutdown(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        _send(self._control_w, f"ready {os.getpid()}")
+        try:
+            server.serve_forever()
+        except OSError as e:
+            if e.errno != errno.EBADF:
+                raise
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="اجرای web_app با چند worker و گراف مشترک copy-on-write")
+    parser.add_argument("--app", default="web_app:app", help="برنامه WSGI به صورت module:attr")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None, help="تعداد worker (پیش‌فرض: تعداد هسته‌ها)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    server = PreforkServer(args.app, host=args.host, port=args.port, workers=args.workers,
+                           graceful_timeout=args.graceful_timeout, access_log=args.access_log)
+    server.serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Query Context - زمینه یک درخواست پرسش
+
+QueryContext نتایج مراحل پیش‌پردازش پرسش (doc اسپیسی، کلمات کلیدی، نیت، تطبیق
+نودها و هسته‌ها) را یک‌بار محاسبه و بین بازیابی، ساخت متن زمینه و تولید پاسخ به
+اشتراک می‌گذارد. زمان هر مرحله هم روی همین شیء ثبت می‌شود.
+
+سرویس زمینه فعال را در یک threading.local نگه می‌دارد؛ متدهای ورودی با دکوراتور
+uses_query_context زمینه را برای مدت فراخوانی باز می‌کنند و فراخوانی‌های تو در تو
+(مثلاً retrieve_information از داخل process_query) همان زمینه را دوباره استفاده می‌کنند.
+
+در پردازش دسته‌ای، زمینه‌های پرسش‌های یک دسته یک QueryBatch مشترک دارند تا نتایج
+مستقل از پرسش (مثل پیمایش از یک نود شروع) فقط یک‌بار برای کل دسته محاسبه شوند.
+
+پس از پایان پرسش، زمان مراحل، روش بازیابی و شمار نودها/یال‌های لمس‌شده در
+pipeline_metrics جمع زده می‌شود.
+"""
+
+import functools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from pipeline_metrics import get_pipeline_metrics
+
+
+class QueryBatch:
+    """نتایج مشترک بین پرسش‌های یک دسته (امن برای thread های هم‌زمان)"""
+
+    def __init__(self):
+        self._values: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def memo(self, stage: str, compute: Callable[[], Any], key: Hashable = None) -> Any:
+        """مقدار مشترک دسته؛ thread هایی که همان مقدار را هم‌زمان بخواهند منتظر محاسبه اول می‌مانند"""
+        slot = (stage, key)
+        with self._lock:
+            future = self._values.get(slot)
+            owner = future is None
+            if owner:
+                future = self._values[slot] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                # خطا به منتظرها هم می‌رسد ولی ذخیره نمی‌شود تا فراخوانی بعدی دوباره تلاش کند
+                with self._lock:
+                    del self._values[slot]
+                future.set_exception(e)
+        return future.result()
+
+
+class QueryContext:
+    """نتایج مشترک و زمان‌بندی مراحل برای یک پرسش"""
+
+    def __init__(self, query: str, batch: Optional[QueryBatch] = None):
+        self.query = query
+        self.batch = batch
+        # زمان تجمعی هر مرحله (ثانیه)؛ مراحل تو در تو زمان زیرمرحله‌ها را هم شامل می‌شوند
+        self.timings: Dict[str, float] = {}
+        self._values: Dict[tuple, Any] = {}
+        # برچسب روش بازیابی در آمار (اولین روش ثبت‌شده) و شمار نودها/یال‌های پیمایش‌شده
+        self.method: Optional[str] = None
+        self.nodes_touched = 0
+        self.edges_touched = 0
+        self.started = time.perf_counter()
+        self._open_stages = set()
+
+    @contextmanager
+    def stage(self, name: str):
+        """ثبت زمان اجرای یک مرحله (مرحله هم‌نام تو در تو دوباره شمرده نمی‌شود)"""
+        if name in self._open_stages:
+            yield self
+            return
+        self._open_stages.add(name)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._open_stages.discard(name)
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """افزودن زمان اندازه‌گیری‌شده به مرحله name"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def touch(self, nodes: int, edges: int = 0):
+        """ثبت نودها و یال‌هایی که یک پیمایش لمس کرده است"""
+        self.nodes_touched += nodes
+        self.edges_touched += edges
+
+    def memo(self, stage: str, compute: Callable[[], Any], key: Hashable = None) -> Any:
+        """مقدار مرحله را فقط بار اول محاسبه (و زمان‌بندی) می‌کند"""
+        slot = (stage, key)
+        if slot not in self._values:
+            with self.stage(stage):
+                self._values[slot] = compute()
+        return self._values[slot]
+
+    def get(self, stage: str, key: Hashable = None) -> Any:
+        return self._values.get((stage, key))
+
+    def put(self, stage: str, value: Any, key: Hashable = None):
+        """ثبت مقدار از پیش محاسبه‌شده یک مرحله (مثلاً doc حاصل از nlp.pipe)"""
+        self._values[(stage, key)] = value
+
+    @property
+    def doc(self):
+        return self.get('doc')
+
+    @property
+    def keywords(self):
+        return self.get('keywords')
+
+    @property
+    def intent(self):
+        return self.get('intent')
+
+    @property
+    def matches(self) -> Optional[Dict[str, str]]:
+        """تطبیق کلمات کلیدی خود پرسش با نودها"""
+        keywords = self.keywords
+        return self.get('matches', tuple(keywords)) if keywords is not None else None
+
+    @property
+    def core_nodes(self):
+        matches = self.matches
+        intent = self.intent
+        if matches is None or intent is None:
+            return None
+        return self.get('core_nodes', (tuple(matches.items()), intent.get('question_type')))
+
+    def timings_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000.0, 3) for name, seconds in self.timings.items()}
+
+
+def active_query_context(local, query: Optional[str] = None) -> Optional[QueryContext]:
+    """زمینه فعال thread جاری (در صورت دادن query فقط اگر برای همان پرسش باشد)"""
+    context = getattr(local, 'context', None)
+    if context is None or (query is not None and context.query != query):
+        return None
+    return context
+
+
+def uses_query_context(method):
+    """
+    دکوراتور متدهای ورودی سرویس: برای اولین آرگومان (متن پرسش) زمینه باز می‌کند
+
+    سرویس باید ویژگی _query_local (threading.local) داشته باشد. زمینه‌ای که این دکوراتور
+    باز می‌کند پس از پایان فراخوانی در pipeline_metrics ثبت می‌شود.
+    """
+    @functools.wraps(method)
+    def wrapper(self, query, *args, **kwargs):
+        local = self._query_local
+        if active_query_context(local, query) is not None:
+            return method(self, query, *args, **kwargs)
+        previous = getattr(local, 'context', None)
+        context = local.context = QueryContext(query)
+        failed = True
+        try:
+            result = method(self, query, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            local.context = previous
+            get_pipeline_metrics().observe_query(context, error=failed)
+    return wrapper
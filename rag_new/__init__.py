@@ -1,33 +1,48 @@
 # -*- coding: utf-8 -*-
 """
 RAG New - سیستم جدید RAG
+
+زیرماژول‌ها در اولین دسترسی به هر نام import می‌شوند (PEP 562) تا import بسته
+وابستگی‌های سنگین (SDK های LLM، Redis و ...) را بی‌دلیل بارگذاری نکند.
 """
-from .nlp.search import Dealer, index_name
-from .utils import DocStoreConnection, REDIS_CONN, rmSpace, get_float, num_tokens_from_string
-from .llm.chat_model import Base, GptTurbo, MoonshotChat, AzureChat, QWenChat, ZhipuChat, OllamaChat, GeminiChat, AnthropicChat
-from .settings import DEFAULT_SETTINGS, MODEL_SETTINGS, EMBEDDING_SETTINGS, REDIS_SETTINGS, ES_SETTINGS, DB_SETTINGS
+import importlib
+
+_LAZY_ATTRS = {
+    "Dealer": ".nlp.search",
+    "index_name": ".nlp.search",
+    "DocStoreConnection": ".utils",
+    "REDIS_CONN": ".utils",
+    "rmSpace": ".utils",
+    "get_float": ".utils",
+    "num_tokens_from_string": ".utils",
+    "Base": ".llm.chat_model",
+    "GptTurbo": ".llm.chat_model",
+    "MoonshotChat": ".llm.chat_model",
+    "AzureChat": ".llm.chat_model",
+    "QWenChat": ".llm.chat_model",
+    "ZhipuChat": ".llm.chat_model",
+    "OllamaChat": ".llm.chat_model",
+    "GeminiChat": ".llm.chat_model",
+    "AnthropicChat": ".llm.chat_model",
+    "DEFAULT_SETTINGS": ".settings",
+    "MODEL_SETTINGS": ".settings",
+    "EMBEDDING_SETTINGS": ".settings",
+    "REDIS_SETTINGS": ".settings",
+    "ES_SETTINGS": ".settings",
+    "DB_SETTINGS": ".settings",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    "Dealer",
-    "index_name",
-    "DocStoreConnection", 
-    "REDIS_CONN",
-    "rmSpace",
-    "get_float",
-    "num_tokens_from_string",
-    "Base",
-    "GptTurbo",
-    "MoonshotChat",
-    "AzureChat", 
-    "QWenChat",
-    "ZhipuChat",
-    "OllamaChat",
-    "GeminiChat",
-    "AnthropicChat",
-    "DEFAULT_SETTINGS",
-    "MODEL_SETTINGS",
-    "EMBEDDING_SETTINGS",
-    "REDIS_SETTINGS",
-    "ES_SETTINGS",
-    "DB_SETTINGS"
-] 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
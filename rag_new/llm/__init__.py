@@ -1,17 +1,35 @@
 # -*- coding: utf-8 -*-
 """
 LLM Models - مدل‌های LLM
+
+زیرماژول‌ها در اولین دسترسی به هر نام import می‌شوند (PEP 562) تا import بسته
+وابستگی‌های سنگین (SDK های LLM، Redis و ...) را بی‌دلیل بارگذاری نکند.
 """
-from .chat_model import Base, GptTurbo, MoonshotChat, AzureChat, QWenChat, ZhipuChat, OllamaChat, GeminiChat, AnthropicChat
+import importlib
+
+_LAZY_ATTRS = {
+    "Base": ".chat_model",
+    "GptTurbo": ".chat_model",
+    "MoonshotChat": ".chat_model",
+    "AzureChat": ".chat_model",
+    "QWenChat": ".chat_model",
+    "ZhipuChat": ".chat_model",
+    "OllamaChat": ".chat_model",
+    "GeminiChat": ".chat_model",
+    "AnthropicChat": ".chat_model",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    "Base",
-    "GptTurbo", 
-    "MoonshotChat",
-    "AzureChat",
-    "QWenChat",
-    "ZhipuChat",
-    "OllamaChat",
-    "GeminiChat",
-    "AnthropicChat"
-] 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -3,16 +3,19 @@
 Chat Model - مدل چت LLM
 """
 import json
-import time
 import logging
 from typing import Dict, Any, List, Optional
-import openai
-import anthropic
 from google.generativeai import GenerativeModel
-import requests
+from llm_gateway import get_llm_gateway, request_key
 
 class Base:
-    """کلاس پایه برای مدل‌های LLM"""
+    """کلاس پایه برای مدل‌های LLM
+
+    همه مدل‌ها از درگاه مشترک llm_gateway استفاده می‌کنند (کلاینت و اتصال‌های مشترک،
+    محدودیت هم‌زمانی و نرخ هر سرویس‌دهنده و بودجه مشترک retry).
+    """
+    
+    provider = "default"
     
     def __init__(self, model_name: str = None, api_key: str = None, base_url: str = None):
         self.model_name = model_name
@@ -34,23 +37,13 @@ def _classify_error(self, error: Exception) -> str:
             return "unknown"
     
     def _retry_with_backoff(self, func, *args, **kwargs):
-        """تلاش مجدد با تاخیر تصاعدی"""
-        for attempt in range(self.max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                error_type = self._classify_error(e)
-                if error_type == "rate_limit":
-                    wait_time = 2 ** attempt
-                    time.sleep(wait_time)
-                elif error_type == "timeout":
-                    if attempt < self.max_retries - 1:
-                        time.sleep(1)
-                    else:
-                        raise
-                else:
-                    raise
-        raise Exception("Max retries exceeded")
+        """تلاش مجدد با تاخیر تصاعدی (از بودجه مشترک retry درگاه)"""
+        return get_llm_gateway().call(self.provider, lambda: func(*args, **kwargs))
+    
+    def _openai_chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """درخواست chat.completions سازگار با OpenAI از طریق درگاه"""
+        request = dict(model=self.model_name, messages=messages, **kwargs)
+        return get_llm_gateway().openai_chat(self.api_key, request, base_url=self.base_url, provider=self.provider)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """متد اصلی چت - باید در کلاس‌های فرزند پیاده‌سازی شود"""
@@ -59,18 +52,15 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class GptTurbo(Base):
     """مدل GPT از OpenAI"""
     
+    provider = "openai"
+    
     def __init__(self, api_key: str, model_name: str = "gpt-4o", base_url: str = "https://api.openai.com/v1"):
         super().__init__(model_name, api_key, base_url)
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_llm_gateway().openai_client(api_key, base_url)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            return self._openai_chat(messages, **kwargs)
         except Exception as e:
             logging.error(f"OpenAI API error: {e}")
             raise
@@ -78,18 +68,15 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class MoonshotChat(Base):
     """مدل Moonshot"""
     
+    provider = "moonshot"
+    
     def __init__(self, api_key: str, model_name: str = "moonshot-v1-8k", base_url: str = "https://api.moonshot.cn/v1"):
         super().__init__(model_name, api_key, base_url)
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_llm_gateway().openai_client(api_key, base_url)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            return self._openai_chat(messages, **kwargs)
         except Exception as e:
             logging.error(f"Moonshot API error: {e}")
             raise
@@ -97,18 +84,15 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class AzureChat(Base):
     """مدل Azure OpenAI"""
     
+    provider = "azure"
+    
     def __init__(self, api_key: str, model_name: str = "gpt-4", base_url: str = None):
         super().__init__(model_name, api_key, base_url)
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_llm_gateway().openai_client(api_key, base_url)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            return self._openai_chat(messages, **kwargs)
         except Exception as e:
             logging.error(f"Azure API error: {e}")
             raise
@@ -116,18 +100,15 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class QWenChat(Base):
     """مدل QWen از Alibaba"""
     
+    provider = "qwen"
+    
     def __init__(self, api_key: str, model_name: str = "qwen-turbo", base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"):
         super().__init__(model_name, api_key, base_url)
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_llm_gateway().openai_client(api_key, base_url)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            return self._openai_chat(messages, **kwargs)
         except Exception as e:
             logging.error(f"QWen API error: {e}")
             raise
@@ -135,18 +116,15 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class ZhipuChat(Base):
     """مدل Zhipu"""
     
+    provider = "zhipu"
+    
     def __init__(self, api_key: str, model_name: str = "glm-4", base_url: str = "https://open.bigmodel.cn/api/paas/v4"):
         super().__init__(model_name, api_key, base_url)
-        self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = get_llm_gateway().openai_client(api_key, base_url)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            return self._openai_chat(messages, **kwargs)
         except Exception as e:
             logging.error(f"Zhipu API error: {e}")
             raise
@@ -154,6 +132,8 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class OllamaChat(Base):
     """مدل Ollama محلی"""
     
+    provider = "ollama"
+    
     def __init__(self, model_name: str = "llama2", base_url: str = "http://localhost:11434"):
         super().__init__(model_name, None, base_url)
         self.base_url = base_url
@@ -166,9 +146,14 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
                 "messages": messages,
                 **kwargs
             }
-            response = requests.post(url, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            gateway = get_llm_gateway()
+            
+            def send():
+                response = gateway.http_client.post(url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()["choices"][0]["message"]["content"]
+            
+            return gateway.call(self.provider, send, key=request_key(self.provider, None, {"url": url, **payload}))
         except Exception as e:
             logging.error(f"Ollama API error: {e}")
             raise
@@ -176,6 +161,8 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class GeminiChat(Base):
     """مدل Gemini از Google"""
     
+    provider = "gemini"
+    
     def __init__(self, api_key: str, model_name: str = "gemini-pro"):
         super().__init__(model_name, api_key)
         import google.generativeai as genai
@@ -192,8 +179,7 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
                 elif msg["role"] == "assistant":
                     prompt += f"Assistant: {msg['content']}\n"
             
-            response = self.model.generate_content(prompt, **kwargs)
-            return response.text
+            return get_llm_gateway().call(self.provider, lambda: self.model.generate_content(prompt, **kwargs).text)
         except Exception as e:
             logging.error(f"Gemini API error: {e}")
             raise
@@ -201,9 +187,11 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
 class AnthropicChat(Base):
     """مدل Claude از Anthropic"""
     
+    provider = "anthropic"
+    
     def __init__(self, api_key: str, model_name: str = "claude-3-sonnet-20240229"):
         super().__init__(model_name, api_key)
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = get_llm_gateway().anthropic_client(api_key)
     
     def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
@@ -222,13 +210,12 @@ def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
             
             user_content = "\n".join(user_messages)
             
-            response = self.client.messages.create(
+            return get_llm_gateway().anthropic_message(self.api_key, dict(
                 model=self.model_name,
                 max_tokens=kwargs.get("max_tokens", 1000),
                 system=system_message,
                 messages=[{"role": "user", "content": user_content}]
-            )
-            return response.content[0].text
+            ))
         except Exception as e:
             logging.error(f"Anthropic API error: {e}")
             raise 
\ No newline at end of file
@@ -6,8 +6,8 @@
 import logging
 import json
 import pickle
+import threading
 from typing import Any, Optional
-import redis
 
 # تنظیمات پیش‌فرض Redis
 REDIS_CONFIG = {
@@ -34,6 +34,7 @@ def client(self):
         """دریافت کلاینت Redis"""
         if self._client is None:
             try:
+                import redis
                 self._client = redis.Redis(**self.config)
                 # تست اتصال
                 self._client.ping()
@@ -272,13 +273,42 @@ def ping(self) -> bool:
         return True
 
 
-# ایجاد نمونه پیش‌فرض
-try:
-    REDIS_CONN = RedisConnection()
-    # تست اتصال
-    if not REDIS_CONN.ping():
-        REDIS_CONN = MockRedisConnection()
-        logging.warning("Using Mock Redis connection")
-except Exception as e:
-    REDIS_CONN = MockRedisConnection()
-    logging.warning(f"Redis connection failed, using Mock: {e}") 
\ No newline at end of file
+class LazyRedisConnection:
+    """اتصال پیش‌فرض Redis که تنها در اولین استفاده برقرار می‌شود
+
+    ping به Redis در دسترس نبودن سرور چند ثانیه طول می‌کشد؛ با این کلاس import ماژول
+    هزینه‌ای ندارد و در اولین فراخوانی بین RedisConnection و MockRedisConnection انتخاب می‌شود.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    try:
+                        conn = RedisConnection(**self._kwargs)
+                        # تست اتصال
+                        if not conn.ping():
+                            conn = MockRedisConnection()
+                            logging.warning("Using Mock Redis connection")
+                    except Exception as e:
+                        conn = MockRedisConnection()
+                        logging.warning(f"Redis connection failed, using Mock: {e}")
+                    self._conn = conn
+        return self._conn
+
+    @property
+    def resolved(self) -> bool:
+        """آیا اتصال برقرار (یا Mock انتخاب) شده است"""
+        return self._conn is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+# ایجاد نمونه پیش‌فرض (اتصال در اولین استفاده)
+REDIS_CONN = LazyRedisConnection()
@@ -9,6 +9,8 @@
 import os
 from datetime import datetime
 
+from graph_snapshot import snapshot_path_for, write_snapshot
+
 def rebuild_graph():
     """بازسازی گراف با داده‌های جدید"""
     print("🔧 شروع بازسازی گراف...")
@@ -112,6 +114,10 @@ def rebuild_graph():
         with open(graph_filename, "wb") as f:
             pickle.dump(G, f)
         
+        # snapshot باینری هم‌نام برای بارگذاری سریع با mmap
+        snapshot_filename = write_snapshot(G, snapshot_path_for(graph_filename), source=edges_file)
+        print(f"💾 snapshot گراف: {snapshot_filename}")
+        
         # ایجاد فایل آمار
         stats_filename = f"graph_stats_{timestamp}.txt"
         with open(stats_filename, "w", encoding="utf-8") as f:
@@ -174,6 +180,9 @@ def update_service_graph():
     # کپی به نام استاندارد
     import shutil
     shutil.copy(latest_graph_file, 'hetionet_graph.pkl')
+    latest_snapshot_file = snapshot_path_for(latest_graph_file)
+    if os.path.exists(latest_snapshot_file):
+        shutil.copy(latest_snapshot_file, snapshot_path_for('hetionet_graph.pkl'))
     print(" فایل گراف به‌روزرسانی شد")
     
     return True
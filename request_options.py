@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Request Options - تنظیمات فقط‌خواندنی یک درخواست
+
+به‌جای تغییر config مشترک سرویس (که درخواست‌های هم‌زمان را روی هم می‌نویسد)،
+هر درخواست یک RequestOptions می‌سازد و به متدهای ورودی می‌دهد. سرویس این
+override‌ها را در یک threading.local نگه می‌دارد و self.config در طول فراخوانی
+ترکیب فقط‌خواندنی تنظیمات پایه و override‌های همان درخواست است.
+"""
+
+import functools
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping, Optional
+
+
+class RequestOptions(Mapping):
+    """نگاشت تغییرناپذیر از کلیدهای config به مقدار مخصوص یک درخواست"""
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values: Optional[Mapping[str, Any]] = None, **overrides):
+        merged = dict(values or {})
+        merged.update(overrides)
+        object.__setattr__(self, '_values', MappingProxyType(merged))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RequestOptions تغییرناپذیر است")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"RequestOptions({dict(self._values)!r})"
+
+    def merged(self, other: Mapping[str, Any]) -> 'RequestOptions':
+        """options جدید که مقادیر other روی این options اعمال شده‌اند"""
+        return RequestOptions(self._values, **other)
+
+    def apply_to(self, config: Mapping[str, Any]) -> Mapping[str, Any]:
+        """نمای فقط‌خواندنی config پایه با override‌های این درخواست"""
+        return MappingProxyType({**config, **self._values})
+
+
+def applies_request_options(method):
+    """
+    دکوراتور متدهای ورودی سرویس: آرگومان options را برای مدت فراخوانی فعال می‌کند
+
+    سرویس باید ویژگی _options_local (threading.local) داشته باشد. فراخوانی‌های تو در تو
+    بدون options همان override‌های بیرونی را می‌بینند و options درونی روی آن‌ها اعمال می‌شود.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, options: Optional[Mapping[str, Any]] = None, **kwargs):
+        if options is None:
+            return method(self, *args, **kwargs)
+        local = self._options_local
+        previous = getattr(local, 'options', None)
+        local.options = previous.merged(options) if previous is not None else RequestOptions(options)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            local.options = previous
+    return wrapper
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Retrieval Cache - کش نتایج کامل بازیابی (retrieve_information و kgsearch_traceable)
+
+کلید هر مدخل از متن نرمال‌شده پرسش، نوع و پارامترهای بازیابی (روش، تنظیمات مؤثر
+بر نتیجه) و اثرانگشت محتوای گراف ساخته می‌شود. مقدار به‌صورت JSON فشرده (zlib +
+base64) ذخیره می‌شود تا در Redis (rag_new.utils.redis_conn) و کش محلی یکسان باشد.
+برای جلوگیری از stampede، در هر فرایند فقط یک thread نتیجه یک کلید را محاسبه
+می‌کند و بقیه منتظر همان نتیجه می‌مانند.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+from bounded_cache import BoundedCache
+
+RESULT_CACHE_PREFIX = "graphrag:result"
+RESULT_CACHE_TTL = 3600
+
+# نویسه‌های عربی/فارسی هم‌ارز و نیم‌فاصله
+_CHAR_MAP = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "‌": " ", "‍": ""})
+_TRAILING_PUNCT = re.compile(r"[\s?!.؟،,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """نرمال‌سازی متن پرسش برای کلید کش (یونیکد، حروف، فاصله‌ها و علامت پایانی)"""
+    text = unicodedata.normalize("NFKC", query or "").translate(_CHAR_MAP).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return _TRAILING_PUNCT.sub("", text)
+
+
+def _digest(text: str, size: int) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=size).hexdigest()
+
+
+def _json_default(value):
+    # اسکالرهای numpy و مقادیر مشابه
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def pack(payload: Any) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+    return base64.b64encode(zlib.compress(raw.encode("utf-8"))).decode("ascii")
+
+
+def unpack(blob: str) -> Any:
+    return json.loads(zlib.decompress(base64.b64decode(blob)).decode("utf-8"))
+
+
+class RetrievalResultCache:
+    """کش نتایج بازیابی با backend محلی (BoundedCache) یا Redis"""
+
+    def __init__(self, backend=None, ttl: int = RESULT_CACHE_TTL, max_entries: int = 2048,
+                 max_bytes: int = 64 << 20):
+        """
+        Args:
+            backend: اتصال Redis (RedisConnection/MockRedisConnection)؛ None = کش محلی فرایند
+            ttl: زمان انقضای مدخل‌ها (ثانیه)
+        """
+        self.ttl = ttl
+        self.backend = backend if backend is not None else BoundedCache(
+            "results", max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, sizeof=len)
+        self._inflight: Dict[str, list] = {}
+        self._inflight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    # ---- کلیدها ----
+
+    def key(self, kind: str, query: str, params: Dict[str, Any], graph_fingerprint: str) -> str:
+        """کلید: پیشوند:نوع:هش پرسش:هش پارامترها و گراف"""
+        params_text = json.dumps([graph_fingerprint, params], sort_keys=True, default=str)
+        return f"{RESULT_CACHE_PREFIX}:{kind}:{_digest(normalize_query(query), 10)}:{_digest(params_text, 10)}"
+
+    # ---- دسترسی به backend (خطاهای Redis باعث شکست درخواست نمی‌شوند) ----
+
+    def _get(self, key: str) -> Optional[Any]:
+        try:
+            blob = self.backend.get(key)
+            return unpack(blob) if blob else None
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در خواندن کش نتایج: {e}")
+            return None
+
+    def _set(self, key: str, payload: Any):
+        try:
+            if isinstance(self.backend, BoundedCache):
+                self.backend.set(key, pack(payload))
+            else:
+                self.backend.set(key, pack(payload), ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در نوشتن کش نتایج: {e}")
+
+    def _key_lock(self, key: str):
+        with self._inflight_lock:
+            entry = self._inflight.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        return entry
+
+    def _release_key_lock(self, key: str, entry):
+        with self._inflight_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._inflight.pop(key, None)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       encode: Callable[[Any], Any], decode: Callable[[Any], Any]) -> Any:
+        """نتیجه کش‌شده یا محاسبه یک‌باره آن (درخواست‌های هم‌زمان همان کلید منتظر می‌مانند)"""
+        payload = self._get(key)
+        if payload is not None:
+            self.hits += 1
+            return decode(payload)
+        entry = self._key_lock(key)
+        try:
+            with entry[0]:
+                payload = self._get(key)
+                if payload is not None:
+                    self.hits += 1
+                    return decode(payload)
+                self.misses += 1
+                value = compute()
+                self._set(key, encode(value))
+                return value
+        finally:
+            self._release_key_lock(key, entry)
+
+    # ---- باطل‌سازی ----
+
+    def invalidate(self, query: Optional[str] = None, kind: str = "*") -> int:
+        """حذف مدخل‌های یک پرسش (همه روش‌ها/پارامترها) یا در صورت None همه مدخل‌ها"""
+        query_part = _digest(normalize_query(query), 10) if query is not None else "*"
+        removed = 0
+        try:
+            for key in self.backend.keys(f"{RESULT_CACHE_PREFIX}:{kind}:{query_part}:*"):
+                removed += bool(self.backend.delete(key))
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"خطا در باطل‌سازی کش نتایج: {e}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'errors': self.errors,
+        }
+        if isinstance(self.backend, BoundedCache):
+            stats.update(entries=len(self.backend), evictions=self.backend.evictions)
+        return stats
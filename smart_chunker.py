@@ -15,12 +15,10 @@
 except ImportError:
     HAZM_AVAILABLE = False
 
-# Try to import spacy for sentence segmentation
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
+# spaCy for sentence segmentation (shared model registry, loaded on first use)
+from nlp_models import get_spacy_model, spacy_available
+from doc_pipeline import DocPipeline, get_doc_pipeline
+SPACY_AVAILABLE = spacy_available()
 
 
 class ChunkingStrategy(Enum):
@@ -38,7 +36,8 @@ def __init__(self,
                  strategy: ChunkingStrategy = ChunkingStrategy.SMART,
                  max_tokens: int = 512,
                  overlap_ratio: float = 0.2,
-                 language: str = "auto"):
+                 language: str = "auto",
+                 doc_pipeline: Optional[DocPipeline] = None):
         """
         Initialize smart chunker
         
@@ -47,6 +46,7 @@ def __init__(self,
             max_tokens: حداکثر تعداد توکن در هر chunk
             overlap_ratio: نسبت overlap در sliding window (0.0 تا 1.0)
             language: زبان متن (auto/fa/en)
+            doc_pipeline: مرحله مشترک پردازش spaCy (پیش‌فرض: DocPipeline مدل انگلیسی)
         """
         self.strategy = strategy
         self.max_tokens = max_tokens
@@ -54,20 +54,12 @@ def __init__(self,
         self.language = language
         
         # Initialize spaCy for sentence segmentation if available
-        self.nlp = None
-        if SPACY_AVAILABLE and language != "fa":
-            try:
-                # Try to load appropriate model
-                if language == "en":
-                    self.nlp = spacy.load("en_core_web_sm")
-                else:
-                    # Try English as default
-                    try:
-                        self.nlp = spacy.load("en_core_web_sm")
-                    except:
-                        pass
-            except Exception as e:
-                logging.warning(f"Failed to load spaCy model: {e}")
+        self.nlp = doc_pipeline.nlp if doc_pipeline else None
+        if self.nlp is None and SPACY_AVAILABLE and language != "fa":
+            # English model (also the default for auto-detected text)
+            self.nlp = get_spacy_model("en_core_web_sm")
+        # جداسازی جملات فقط با senter/sentencizer و دسته‌ای (nlp.pipe)
+        self.doc_pipeline = doc_pipeline or get_doc_pipeline(self.nlp)
     
     def _detect_language(self, text: str) -> str:
         """تشخیص زبان متن"""
@@ -95,10 +87,11 @@ def _split_sentences(self, text: str, lang: str) -> List[str]:
                 logging.warning(f"hazm sentence tokenization failed: {e}")
         
         # Fallback: use regex or spaCy
-        if self.nlp:
+        if self.doc_pipeline:
             try:
-                doc = self.nlp(text)
-                return [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+                sentences = self.doc_pipeline.sentences(text)
+                if sentences is not None:
+                    return sentences
             except Exception as e:
                 logging.warning(f"spaCy sentence segmentation failed: {e}")
         
@@ -111,6 +104,18 @@ def _split_sentences(self, text: str, lang: str) -> List[str]:
         
         return [s.strip() for s in sentences if s.strip()]
     
+    def _split_sentences_batch(self, texts: List[str], lang: str) -> Dict[str, List[str]]:
+        """تقسیم چند متن به جملات در یک دسته nlp.pipe"""
+        if texts and self.doc_pipeline and not (lang == "fa" and HAZM_AVAILABLE):
+            try:
+                docs = self.doc_pipeline.sentence_docs(texts)
+                if docs is not None:
+                    return {text: [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+                            for text, doc in zip(texts, docs)}
+            except Exception as e:
+                logging.warning(f"spaCy sentence segmentation failed: {e}")
+        return {text: self._split_sentences(text, lang) for text in texts}
+    
     def _split_paragraphs(self, text: str) -> List[str]:
         """تقسیم متن به پاراگراف‌ها"""
         # Split by double newlines
@@ -206,6 +211,9 @@ def chunk_smart(self, text: str) -> List[Dict[str, Any]]:
         """تقسیم هوشمند: ترکیب پاراگراف و جمله"""
         lang = self._detect_language(text)
         paragraphs = self._split_paragraphs(text)
+        # پاراگراف‌های بلند با هم جمله‌بندی می‌شوند
+        sentence_map = self._split_sentences_batch(
+            [para for para in paragraphs if self._estimate_tokens(para) > self.max_tokens], lang)
         
         chunks = []
         
@@ -223,7 +231,7 @@ def chunk_smart(self, text: str) -> List[Dict[str, Any]]:
                 })
             else:
                 # Split paragraph into sentences
-                sentences = self._split_sentences(para, lang)
+                sentences = sentence_map[para]
                 current_chunk = []
                 current_tokens = 0
                 
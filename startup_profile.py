@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Profile - گزارش هزینه import و راه‌اندازی اجزای web_app
+
+اجرا:
+    python web_app.py --profile-startup
+    python startup_profile.py [--module web_app] [--probe /api/graph_info] [--json]
+
+برنامه در یک فرایند تازه import می‌شود و اولین درخواست probe با test client فرستاده
+می‌شود؛ گزارش شامل این موارد است:
+- زمان تا پاسخ سالم probe (هدف: کمتر از BOOT_TARGET_SECONDS)
+- مراحل راه‌اندازی ثبت شده در STARTUP_TIMINGS ماژول (import ها، ساخت سرویس‌ها و ...)
+- هزینه import تجمعی هر جزء که ماژول مستقیماً import می‌کند (اجرای دوم با
+  python -X importtime؛ هر ماژول به حساب اولین import کننده‌اش نوشته می‌شود)
+- وابستگی‌های سنگینی که در مسیر boot بارگذاری شده‌اند (باید lazy بمانند) و مدل‌های
+  رجیستری nlp_models
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+BOOT_TARGET_SECONDS = 1.0
+
+# وابستگی‌هایی که نباید برای رسیدن به یک سرور سالم import شوند
+HEAVY_MODULES = (
+    "spacy", "sklearn", "sentence_transformers", "transformers", "torch",
+    "openai", "anthropic", "google.generativeai", "huggingface_hub", "redis", "trio",
+)
+
+_MARKER = "__STARTUP_PROFILE__"
+
+_CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+response = target.app.test_client().get({probe!r})
+finished = time.perf_counter()
+body = response.get_json(silent=True)
+from nlp_models import model_stats
+print({marker!r} + json.dumps({{
+    "import_seconds": imported - started,
+    "probe_seconds": finished - imported,
+    "boot_seconds": finished - started,
+    "status": response.status_code,
+    "healthy": response.status_code == 200 and not (isinstance(body, dict) and body.get("success") is False),
+    "stages": getattr(target, "STARTUP_TIMINGS", {{}}),
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+    "models": model_stats(),
+}}))
+"""
+
+
+def _run_child(module: str, probe: str, importtime: bool, cwd: str) -> Tuple[Dict[str, Any], str]:
+    script = _CHILD_SCRIPT.format(module=module, probe=probe, marker=_MARKER, heavy=HEAVY_MODULES)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", script]
+    proc = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(_MARKER):
+            return json.loads(line[len(_MARKER):]), proc.stderr
+    raise RuntimeError(f"startup probe failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def parse_importtime(stderr: str, root: str) -> List[Tuple[str, float]]:
+    """هزینه تجمعی (ثانیه) بسته‌هایی که root مستقیماً import کرده است، نزولی
+
+    خروجی -X importtime پس‌ترتیب است (فرزندان پیش از والد) و هر سطح ۲ فاصله تورفتگی دارد.
+    زیرماژول‌هایی که جدا از بسته‌شان (مثلاً lazy در حین راه‌اندازی) import شده‌اند با
+    بسته سطح بالا جمع زده می‌شوند.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # سطر عنوان
+        name = parts[2].rstrip()[1:]  # یک فاصله جداکننده پس از "|"
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(parts[1]) / 1e6))
+    root_index = next((i for i, (indent, name, _) in enumerate(entries) if name == root and indent == 0), None)
+    if root_index is None:
+        return []
+    components: Dict[str, float] = {}
+    for indent, name, seconds in reversed(entries[:root_index]):
+        if indent == 0:
+            break
+        if indent == 2:
+            package = name.split(".")[0]
+            components[package] = components.get(package, 0.0) + seconds
+    return sorted(components.items(), key=lambda item: -item[1])
+
+
+def profile_startup(module: str = "web_app", probe: str = "/api/graph_info", breakdown: bool = True,
+                    cwd: Optional[str] = None) -> Dict[str, Any]:
+    """گزارش راه‌اندازی module در فرایند تازه (زمان‌ها بدون سربار importtime اندازه‌گیری می‌شوند)"""
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    report, _ = _run_child(module, probe, importtime=False, cwd=cwd)
+    report.update(module=module, probe=probe, target_seconds=BOOT_TARGET_SECONDS)
+    if breakdown:
+        _, stderr = _run_child(module, probe, importtime=True, cwd=cwd)
+        report["components"] = parse_importtime(stderr, module)
+    return report
+
+
+def format_report(report: Dict[str, Any], top: int = 15) -> str:
+    within = report["healthy"] and report["boot_seconds"] < report["target_seconds"]
+    lines = [
+        f"Startup profile: {report['module']} -> {report['probe']}",
+        f"  boot to healthy probe: {report['boot_seconds']:.3f}s "
+        f"(target < {report['target_seconds']:.1f}s) {'OK' if within else 'OVER' if report['healthy'] else 'UNHEALTHY'}",
+        f"  import {report['module']}: {report['import_seconds']:.3f}s, "
+        f"first request: {report['probe_seconds']:.3f}s (HTTP {report['status']})",
+    ]
+    if report.get("stages"):
+        lines.append("  stages:")
+        lines += [f"    {name:<28} {seconds:.3f}s" for name, seconds in report["stages"].items()]
+    if report.get("components"):
+        lines.append("  import cost by component (cumulative, -X importtime):")
+        lines += [f"    {name:<28} {seconds:.3f}s" for name, seconds in report["components"][:top]]
+    lines.append("  heavy modules loaded during boot: " + (", ".join(report["heavy_modules"]) or "none"))
+    models = report.get("models") or {}
+    lines.append("  models loaded during boot: " + (", ".join(
+        f"{key} ({value['load_seconds']:.2f}s)" for key, value in models.items()) or "none"))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import/initialization cost of the web app components")
+    parser.add_argument("--module", default="web_app")
+    parser.add_argument("--probe", default="/api/graph_info")
+    parser.add_argument("--json", action="store_true", help="گزارش به صورت JSON")
+    parser.add_argument("--no-breakdown", action="store_true", help="بدون اجرای دوم -X importtime")
+    parser.add_argument("--profile-startup", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    report = profile_startup(args.module, args.probe, breakdown=not args.no_breakdown)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0 if report["healthy"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -208,7 +208,8 @@ class GraphRAGApp {
         this.showLoading(true);
 
         try {
-            const response = await fetch('/api/process_query', {
+            // پاسخ جریانی: نتایج بازیابی و متن زمینه زودتر از پاسخ نهایی نمایش داده می‌شوند
+            const response = await fetch('/api/process_query_stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -235,13 +236,28 @@ class GraphRAGApp {
                 })
             });
 
-            const data = await response.json();
-
-            if (data.success) {
-                this.displayResults(data.result);
-            } else {
+            if (!response.ok) {
+                const data = await response.json();
                 this.showError(data.error);
+                return;
             }
+
+            let answer = '';
+            await this.readEventStream(response, (event, data) => {
+                if (event === 'retrieval') {
+                    this.showLoading(false);
+                    this.displayRetrieval(data);
+                } else if (event === 'context') {
+                    this.displayContextText(data.context_text);
+                } else if (event === 'token') {
+                    answer += data.text;
+                    this.displayAnswer(answer);
+                } else if (event === 'done') {
+                    this.displayResults(data.result);
+                } else if (event === 'error') {
+                    this.showError(data.error);
+                }
+            });
         } catch (error) {
             this.showError('خطا در ارتباط با سرور: ' + error.message);
         } finally {
@@ -292,13 +308,33 @@ class GraphRAGApp {
         }
     }
 
-    displayResults(result) {
+    // خواندن پاسخ text/event-stream و فراخوانی onEvent(نام رویداد، داده JSON) برای هر رویداد
+    async readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const blocks = buffer.split('\n\n');
+            buffer = blocks.pop();
+            for (const block of blocks) {
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+            if (done) break;
+        }
+    }
+
+    displayRetrieval(result) {
         // Show results section
         document.getElementById('results-section').style.display = 'block';
 
-        // Display process steps
-        this.displayProcessSteps(result.process_steps);
-
         // Display keywords
         this.displayKeywords(result.keywords);
 
@@ -309,6 +345,15 @@ class GraphRAGApp {
         this.displayRetrievedNodes(result.retrieved_nodes);
         this.displayRetrievedEdges(result.retrieved_edges);
         this.displayRetrievedPaths(result.paths);
+    }
+
+    displayResults(result) {
+        // Display retrieval results (keywords, matched nodes, nodes, edges, paths)
+        this.displayRetrieval(result);
+
+        // Display process steps
+        this.displayProcessSteps(result.process_steps);
+
         this.displayContextText(result.context_text);
 
         // Display answer
@@ -251,8 +251,7 @@ document.addEventListener('DOMContentLoaded', function() {
         inputType2Select.value = 'auto';
 
         // Generate both answers
-        generateAnswer(1);
-        generateAnswer(2);
+        generateBothAnswersBatch();
 
         // Show success message
         showSuccess('در حال تولید پاسخ‌ها...');
@@ -528,15 +527,8 @@ document.addEventListener('DOMContentLoaded', function() {
         };
     }
 
-    // بهبود تابع generateAnswer برای استفاده از تنظیمات پیشرفته
-    function generateAnswer(answerBoxNumber) {
-        const query = queryInput.value;
-        if (!query.trim()) {
-            showError('لطفاً ابتدا سوال را وارد کنید');
-            return;
-        }
-
-        const textarea = answerBoxNumber === 1 ? answer1Textarea : answer2Textarea;
+    // بدنه درخواست /api/process_query برای یکی از دو جعبه پاسخ (با تنظیمات پیشرفته)
+    function buildQueryPayload(answerBoxNumber) {
         const tokenExtractionMethod = answerBoxNumber === 1 ? tokenExtractionMethod1Select.value : tokenExtractionMethod2Select.value;
         const tokenExtractionModel = answerBoxNumber === 1 ? tokenExtractionModel1Select.value : tokenExtractionModel2Select.value;
         const retrievalMethod = answerBoxNumber === 1 ? retrievalMethod1Select.value : retrievalMethod2Select.value;
@@ -547,6 +539,48 @@ document.addEventListener('DOMContentLoaded', function() {
         // اضافه کردن تنظیمات پیشرفته
         const advancedSettings = getAdvancedSettings(answerBoxNumber);
 
+        return {
+            query: queryInput.value,
+            token_extraction_method: tokenExtractionMethod,
+            token_extraction_model: tokenExtractionModel,
+            retrieval_method: retrievalMethod,
+            generation_model: generationModel,
+            max_depth: parseInt(maxDepth),
+            text_generation_type: textGenerationType,
+            // اضافه کردن تنظیمات پیشرفته
+            max_nodes: advancedSettings.max_nodes,
+            max_edges: advancedSettings.max_edges,
+            similarity_threshold: advancedSettings.similarity_threshold,
+            community_detection_method: advancedSettings.community_detection_method,
+            advanced_retrieval_algorithm: advancedSettings.advanced_retrieval_algorithm,
+            advanced_token_extraction_method: advancedSettings.advanced_token_extraction_method
+        };
+    }
+
+    function showAnswer(textarea, data) {
+        if (data.success) {
+            textarea.value = data.result.answer || 'پاسخ تولید شد اما متن خالی است';
+        } else {
+            textarea.value = `خطا در تولید پاسخ: ${data.error}`;
+        }
+        textarea.style.color = '#2c3e50';
+    }
+
+    function showConnectionError(textarea, error) {
+        textarea.value = `خطا در ارتباط با سرور: ${error.message}`;
+        textarea.style.color = '#e74c3c';
+    }
+
+    // بهبود تابع generateAnswer برای استفاده از تنظیمات پیشرفته
+    function generateAnswer(answerBoxNumber) {
+        const query = queryInput.value;
+        if (!query.trim()) {
+            showError('لطفاً ابتدا سوال را وارد کنید');
+            return;
+        }
+
+        const textarea = answerBoxNumber === 1 ? answer1Textarea : answer2Textarea;
+
         // Show loading state
         textarea.value = 'در حال تولید پاسخ...';
         textarea.style.color = '#7f8c8d';
@@ -557,35 +591,48 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({
-                query: query,
-                token_extraction_method: tokenExtractionMethod,
-                token_extraction_model: tokenExtractionModel,
-                retrieval_method: retrievalMethod,
-                generation_model: generationModel,
-                max_depth: parseInt(maxDepth),
-                text_generation_type: textGenerationType,
-                // اضافه کردن تنظیمات پیشرفته
-                max_nodes: advancedSettings.max_nodes,
-                max_edges: advancedSettings.max_edges,
-                similarity_threshold: advancedSettings.similarity_threshold,
-                community_detection_method: advancedSettings.community_detection_method,
-                advanced_retrieval_algorithm: advancedSettings.advanced_retrieval_algorithm,
-                advanced_token_extraction_method: advancedSettings.advanced_token_extraction_method
-            })
+            body: JSON.stringify(buildQueryPayload(answerBoxNumber))
         })
         .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                textarea.value = data.result.answer || 'پاسخ تولید شد اما متن خالی است';
-            } else {
-                textarea.value = `خطا در تولید پاسخ: ${data.error}`;
-            }
-            textarea.style.color = '#2c3e50';
-        })
-        .catch(error => {
-            textarea.value = `خطا در ارتباط با سرور: ${error.message}`;
-            textarea.style.color = '#e74c3c';
+        .then(data => showAnswer(textarea, data))
+        .catch(error => showConnectionError(textarea, error));
+    }
+
+    // خواندن پاسخ جریانی NDJSON و فراخوانی onLine برای هر خط به محض رسیدن
+    async function readNdjson(response, onLine) {
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || response.statusText);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onLine(JSON.parse(line)));
+            if (done) break;
+        }
+    }
+
+    // تولید هر دو پاسخ با یک درخواست دسته‌ای؛ هر پاسخ به محض آماده شدن نمایش داده می‌شود
+    function generateBothAnswersBatch() {
+        const textareas = [answer1Textarea, answer2Textarea];
+        textareas.forEach(textarea => {
+            textarea.value = 'در حال تولید پاسخ...';
+            textarea.style.color = '#7f8c8d';
         });
+
+        fetch('/api/process_queries_batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ queries: [buildQueryPayload(1), buildQueryPayload(2)] })
+        })
+        .then(response => readNdjson(response, data => showAnswer(textareas[data.index], data)))
+        .catch(error => textareas.forEach(textarea => showConnectionError(textarea, error)));
     }
 }); 
\ No newline at end of file
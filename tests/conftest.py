@@ -11,6 +11,9 @@
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# نتایج استخراج بین اجراهای تست روی دیسک ذخیره نشوند (تست‌های کش، کش خود را می‌سازند)
+os.environ.setdefault("GRAPHRAG_EXTRACTION_CACHE", "off")
+
 # تنظیمات pytest
 def pytest_configure(config):
     """تنظیمات pytest"""
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+سرور محلی جایگزین سرویس‌دهنده‌های LLM برای تست‌ها
+
+مسیرهای /v1/chat/completions (OpenAI و سازگارها) و /v1/messages (Anthropic) را با پاسخ
+قطعی "stub: <آخرین پیام کاربر>" شبیه‌سازی می‌کند. می‌توان تأخیر و خطاهای پیش از پاسخ
+(مثلاً 429) را تنظیم کرد و تعداد درخواست‌ها، اتصال‌ها و بیشینه هم‌زمانی را خواند.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LLMStubServer:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.fail_next = []  # کدهای وضعیت خطا که به ترتیب پیش از پاسخ موفق برگردانده می‌شوند
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests.append((self.path, body))
+                    stub.connections.add(self.client_address)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.fail_next.pop(0) if stub.fail_next else 200
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    if status != 200:
+                        self._send(status, {"error": {"message": "stub error", "type": "rate_limit_error"}})
+                    elif self.path.endswith("/chat/completions"):
+                        self._send(200, stub.openai_response(body))
+                    elif self.path.endswith("/messages"):
+                        self._send(200, stub.anthropic_response(body))
+                    else:
+                        self._send(404, {"error": {"message": "not found"}})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("retry-after", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @staticmethod
+    def answer(messages) -> str:
+        content = [m["content"] for m in messages if m.get("role") == "user"][-1]
+        return "stub: " + content[:40]
+
+    def openai_response(self, body):
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.answer(body["messages"])}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    def anthropic_response(self, body):
+        return {
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": body.get("model"),
+            "content": [{"type": "text", "text": self.answer(body["messages"])}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست حالت سرویس‌دهی ASGI: هم‌خوانی پاسخ‌ها با Flask و اجرای async پردازش پرسش
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+
+from starlette.testclient import TestClient
+
+import networkx as nx
+
+from enhanced_graphrag_service import EnhancedGraphRAGService
+from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+
+@pytest.fixture(scope="module")
+def clients():
+    import asgi_app
+    import web_app
+    with TestClient(asgi_app.app) as asgi_client:
+        yield web_app.app.test_client(), asgi_client
+
+
+def _without_volatile(result):
+    return {k: v for k, v in result.items() if k not in ("timestamp", "timings_ms")}
+
+
+def test_process_query_matches_flask(clients):
+    flask_client, asgi_client = clients
+    body = {"query": "What genes are expressed in liver?", "retrieval_method": "PAGERANK_BASED",
+            "generation_model": "GPT_SIMULATION", "max_nodes": 5}
+    flask_response = flask_client.post("/api/process_query", json=body)
+    asgi_response = asgi_client.post("/api/process_query", json=body)
+    assert flask_response.status_code == asgi_response.status_code == 200
+    flask_result, asgi_result = flask_response.get_json()["result"], asgi_response.json()["result"]
+    assert _without_volatile(asgi_result) == _without_volatile(flask_result)
+    assert len(asgi_result["retrieved_nodes"]) <= 5
+    assert asgi_response.headers["access-control-allow-origin"] == "*"
+
+    bad = {"query": "x", "retrieval_method": "NOPE"}
+    assert flask_client.post("/api/process_query", json=bad).get_json() == \
+        asgi_client.post("/api/process_query", json=bad).json()
+
+
+def test_compare_texts_and_fallthrough_routes(clients):
+    flask_client, asgi_client = clients
+    for body in ({"text1": "TP53 regulates apoptosis", "text2": "TP53 controls apoptosis", "method": "jaccard"},
+                 {"text1": "", "text2": "x"},
+                 {"text1": "a", "text2": "b", "method": "bogus"}):
+        flask_response = flask_client.post("/api/compare_texts", json=body)
+        asgi_response = asgi_client.post("/api/compare_texts", json=body)
+        assert flask_response.status_code == asgi_response.status_code
+        assert flask_response.get_json() == asgi_response.json()
+    # مسیرهای دیگر از طریق برنامه Flask سرویس داده می‌شوند
+    assert asgi_client.get("/api/graph_info").json() == flask_client.get("/api/graph_info").get_json()
+
+
+def test_aprocess_query_runs_remote_models_async(monkeypatch):
+    service = GraphRAGService()
+    service.create_sample_graph()
+    sync = service.process_query("Where is BRCA1 expressed?", RetrievalMethod.BFS, GenerationModel.OPENAI_GPT_4O)
+
+    calls = []
+
+    async def fake_remote(retrieval_result, model, prompt=None):
+        calls.append((model, prompt is not None))
+        return "پاسخ آزمایشی"
+    monkeypatch.setattr(service, "aremote_generation", fake_remote)
+
+    result = asyncio.run(service.aprocess_query("Where is BRCA1 expressed?", RetrievalMethod.PAGERANK_BASED,
+                                                GenerationModel.OPENAI_GPT_4O, options={"max_nodes": 3}))
+    assert calls == [(GenerationModel.OPENAI_GPT_4O, True)]
+    assert result["answer"] == "پاسخ آزمایشی"
+    assert result["confidence"] == sync["confidence"]
+    assert len(result["retrieved_nodes"]) <= 3
+    assert {"retrieval", "generation"} <= set(result["timings_ms"])
+    assert service.config["max_nodes"] == 10
+
+
+def test_enhanced_requests_do_not_share_config(monkeypatch):
+    service = EnhancedGraphRAGService()
+    service.G = nx.path_graph([f"Gene::G{i}" for i in range(10)])
+    base = service.get_config()
+    barrier = threading.Barrier(4)
+    seen, echoed = {}, {}
+
+    def fake_bfs(query, start_nodes):
+        # همه درخواست‌ها هم‌زمان داخل بازیابی هستند
+        barrier.wait(timeout=5)
+        seen[query] = (service.config.retrieval_algorithm.value, service.config.max_nodes)
+        return {'nodes': [], 'edges': []}
+    monkeypatch.setattr(service, "bfs_retrieval", fake_bfs)
+    monkeypatch.setattr(service, "dfs_retrieval", fake_bfs)
+
+    def run(i):
+        options = {"retrieval_algorithm": "bfs" if i % 2 else "dfs", "max_nodes": i,
+                   "token_extraction_method": "rule_based"}
+        result = service.process_query(f"q{i}", start_nodes=["Gene::G0"], options=options)
+        echoed[i] = (result["query_analysis"]["algorithm"], service.get_config(options)["max_nodes"])
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {f"q{i}": ("bfs" if i % 2 else "dfs", i) for i in range(1, 5)}
+    assert echoed == {i: ("bfs" if i % 2 else "dfs", i) for i in range(1, 5)}
+    assert service.get_config() == base
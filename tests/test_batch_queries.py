@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست پردازش دسته‌ای پرسش‌ها (process_queries) و endpoint جریانی /api/process_queries_batch
+"""
+
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+QUERIES = [
+    "What genes are expressed in liver?",
+    "Which genes are expressed in the liver and brain?",
+    "Where is TP53 expressed?",
+]
+
+
+def _volatile_free(result):
+    return {k: v for k, v in result.items() if k != "timings_ms"}
+
+
+def test_batch_matches_single_queries_and_shares_traversals(monkeypatch):
+    single = GraphRAGService()
+    single.create_sample_graph()
+    expected = [single.process_query(q, RetrievalMethod.BFS, GenerationModel.SIMPLE) for q in QUERIES]
+
+    service = GraphRAGService()
+    service.create_sample_graph()
+    traversals = Counter()
+    original = service._bfs_search
+
+    def counted(start_node, max_depth):
+        traversals[start_node] += 1
+        return original(start_node, max_depth)
+    monkeypatch.setattr(service, "_bfs_search", counted)
+
+    results = service.process_queries(QUERIES, retrieval_method=RetrievalMethod.BFS,
+                                      generation_model=GenerationModel.SIMPLE, max_workers=3)
+    assert [_volatile_free(r) for r in results] == [_volatile_free(r) for r in expected]
+    # نود شروع مشترک (مثلاً Liver) فقط یک‌بار برای کل دسته پیمایش می‌شود
+    assert traversals and max(traversals.values()) == 1
+    assert "Anatomy::Liver" in traversals
+
+
+def test_batch_reports_failures_per_query(monkeypatch):
+    service = GraphRAGService()
+    service.create_sample_graph()
+    original = service.generate_answer
+
+    def failing(retrieval_result, model, text_generation_type='INTELLIGENT'):
+        if "TP53" in retrieval_result.query:
+            raise RuntimeError("boom")
+        return original(retrieval_result, model, text_generation_type)
+    monkeypatch.setattr(service, "generate_answer", failing)
+
+    seen = sorted(service.iter_process_queries(
+        [QUERIES[0], {"query": QUERIES[2], "max_depth": 1}], generation_model=GenerationModel.SIMPLE),
+        key=lambda item: item[0])
+    assert [index for index, _, _ in seen] == [0, 1]
+    assert seen[0][1]["query"] == QUERIES[0] and seen[0][2] is None
+    assert seen[1][1] is None and str(seen[1][2]) == "boom"
+    assert service.process_queries([QUERIES[2]])[0] == {"query": QUERIES[2], "error": "boom"}
+
+
+def test_batch_endpoint_streams_ndjson():
+    import web_app
+    client = web_app.app.test_client()
+    response = client.post("/api/process_queries_batch", json={
+        "queries": [QUERIES[0], {"query": QUERIES[2], "retrieval_method": "DFS"}],
+        "generation_model": "SIMPLE",
+    })
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    by_index = {line["index"]: line for line in lines}
+    assert all(line["success"] for line in lines)
+    assert by_index[1]["result"]["retrieval_method"] == RetrievalMethod.DFS.value
+    assert by_index[0]["result"]["advanced_settings"]["max_nodes"] == 20
+
+    assert client.post("/api/process_queries_batch", json={"queries": []}).status_code == 400
+    bad = client.post("/api/process_queries_batch", json={"queries": [{"query": "x", "retrieval_method": "NOPE"}]})
+    assert bad.status_code == 400 and bad.get_json()["success"] is False
+
+
+def test_batch_endpoint_validates_and_caps_max_workers(monkeypatch):
+    import web_app
+    client = web_app.app.test_client()
+    for bad in ("4", 0, -2, 1.5, True):
+        response = client.post("/api/process_queries_batch", json={"queries": ["x"], "max_workers": bad})
+        assert response.status_code == 400 and response.get_json()["success"] is False
+
+    requested = []
+    original = web_app.graphrag_service.iter_process_queries
+
+    def recording(queries, **kwargs):
+        requested.append(kwargs["max_workers"])
+        return original(queries, **kwargs)
+    monkeypatch.setattr(web_app.graphrag_service, "iter_process_queries", recording)
+    response = client.post("/api/process_queries_batch", json={
+        "queries": [QUERIES[0]] * 3, "generation_model": "SIMPLE", "max_workers": 500})
+    assert response.status_code == 200 and len(response.get_data(as_text=True).splitlines()) == 3
+    assert requested == [web_app.graphrag_service.config["batch_max_workers"]]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست کش‌های محدود (LRU + TTL) و باطل شدن آن‌ها با تغییر گراف
+"""
+
+import sys
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import bounded_cache
+from bounded_cache import BoundedCache, CacheGroup
+from graphrag_service import GraphRAGService
+
+
+def test_lru_eviction_and_counters():
+    cache = BoundedCache("t", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a تازه‌تر از b می‌شود
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 1, 1, 2)
+
+
+def test_byte_limit_and_ttl(monkeypatch):
+    cache = BoundedCache("t", max_entries=100, max_bytes=200, sizeof=len, ttl=10)
+    cache.set("big", "x" * 500)
+    assert "big" not in cache
+    for i in range(5):
+        cache.set(i, "y" * 60)
+    assert len(cache) == 3 and cache.stats()["bytes"] == 180
+
+    now = [1000.0]
+    monkeypatch.setattr(bounded_cache.time, "monotonic", lambda: now[0])
+    cache.set("k", "v")
+    now[0] += 11
+    assert cache.get("k") is None and cache.stats()["expirations"] == 1
+
+
+def test_group_invalidates_on_token_change():
+    group = CacheGroup()
+    cache = group.add("x")
+    group.validate(("g", 1))
+    cache.set("k", "v")
+    group.validate(("g", 1))
+    assert cache.get("k") == "v"
+    group.validate(("g", 2))
+    assert len(cache) == 0 and group.invalidations == 1
+
+
+def test_service_caches_follow_graph():
+    service = GraphRAGService()
+    service.create_sample_graph()
+    assert service.match_tokens_to_nodes(["EGFR"]) == {}
+    service.match_tokens_to_nodes(["EGFR"])
+    assert service.get_cache_stats()["caches"]["matches"]["hits"] == 1
+    # نود جدید → کش تطبیق باطل می‌شود
+    service.G.add_node("Gene::EGFR", name="EGFR", kind="Gene")
+    assert service.match_tokens_to_nodes(["EGFR"]) == {"EGFR": "Gene::EGFR"}
+    # نتیجه کش‌شده قابل تغییر توسط فراخواننده نیست
+    service._detect_intent_schema_map("which genes covary with TP53")["allow"].append("XXX")
+    assert service._detect_intent_schema_map("which genes covary with TP53")["allow"] == ["GcG"]
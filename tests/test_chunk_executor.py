@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست استخراج موازی chunkها: حفظ ترتیب و برابری نتیجه با اجرای ترتیبی در process pool،
+هم‌زمانی روش‌های LLM در thread pool و ادغام تدریجی HierarchicalMerger
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import chunk_executor
+from chunk_executor import ChunkExtractionExecutor, uses_llm
+from extraction_cache import ExtractionCache
+from hierarchical_merger import HierarchicalMerger
+from text_to_graph_service import TextToGraphService
+
+PARAGRAPH = ("TP53 regulates apoptosis in liver cells. BRCA1 interacts with TP53 in breast tissue. "
+             "Aspirin treats inflammation and inhibits COX2. ")
+TEXT = "\n\n".join(PARAGRAPH * 3 for _ in range(8))
+
+
+@pytest.fixture(scope="module")
+def service():
+    return TextToGraphService()
+
+
+def _graph(result):
+    return json.dumps([result["entities"], result["relationships"]], sort_keys=True, default=str)
+
+
+def test_uses_llm():
+    assert uses_llm("llm", {}) and uses_llm("edc", {})
+    assert uses_llm("hybrid", {"hybrid_methods": ["spacy", "llm"]})
+    assert not uses_llm("hybrid", {"hybrid_methods": ["spacy", "simple"]})
+    assert not uses_llm("simple", {}) and not uses_llm("spacy", {})
+
+
+def test_process_pool_matches_sequential(service):
+    serial = service.extract_long_text(TEXT, method="simple", max_tokens=128, max_workers=1)
+    parallel = service.extract_long_text(TEXT, method="simple", max_tokens=128, max_workers=2)
+    assert _graph(parallel) == _graph(serial)
+    timings = parallel["stats"]["chunk_timings"]
+    assert [t["chunk"] for t in timings] == list(range(parallel["stats"]["num_chunks"]))
+    assert all(t["error"] is None and t["num_entities"] > 0 for t in timings)
+
+    serial = service.extract_incremental(TEXT, chunk_size=400, base_method="simple", max_workers=1)
+    parallel = service.extract_incremental(TEXT, chunk_size=400, base_method="simple", max_workers=2)
+    assert _graph(parallel) == _graph(serial)
+    assert len(parallel["stats"]["chunk_timings"]) == parallel["stats"]["num_chunks"]
+
+
+def test_llm_chunks_run_concurrently_in_order(service, monkeypatch):
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def fake_llm(text, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        # chunk های اول دیرتر تمام می‌شوند تا ترتیب خروجی آزموده شود
+        time.sleep(0.2 if text.startswith("chunk 0") else 0.05)
+        with lock:
+            active[0] -= 1
+        name = text.split()[1]
+        return {"entities": [{"id": f"e{name}", "name": f"Entity{name}", "type": "CONCEPT"}], "relationships": []}
+
+    monkeypatch.setattr(service, "extract_llm", fake_llm)
+    chunks = [{"text": f"chunk {i} text"} for i in range(6)] + [{"text": ""}]
+    started = time.perf_counter()
+    outcomes = list(ChunkExtractionExecutor(service, llm_concurrency=4).map(chunks, "llm"))
+    assert time.perf_counter() - started < 0.2 + 0.05 * 5
+    assert peak[0] > 1
+    assert [o.index for o in outcomes] == list(range(6))
+    assert [o.result["entities"][0]["name"] for o in outcomes] == [f"Entity{i}" for i in range(6)]
+
+
+def test_chunk_errors_are_reported_not_raised(service, monkeypatch):
+    def failing_llm(text, **kwargs):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(service, "extract_llm", failing_llm)
+    outcomes = list(ChunkExtractionExecutor(service).map([{"text": "a"}, {"text": "b"}], "llm"))
+    assert [o.result for o in outcomes] == [None, None]
+    assert "provider down" in outcomes[0].error and outcomes[0].timing()["error"]
+
+
+def test_incremental_merger_matches_batch_merge(service):
+    chunks = [{"text": PARAGRAPH * 2}, {"text": PARAGRAPH}, {"text": "TP53 binds MDM2 in the nucleus."}]
+    results = [service.extract(c["text"], method="simple") for c in chunks]
+    for index, (chunk, result) in enumerate(zip(chunks, results)):
+        result["chunk_metadata"] = {"chunk_index": index, "chunk_size": len(chunk["text"])}
+
+    batch = HierarchicalMerger().merge_chunk_results(results)
+    merger = HierarchicalMerger()
+    for result in results:
+        merger.add_chunk_result(result)
+    incremental = merger.merged()
+    assert _graph(incremental) == _graph(batch)
+    assert incremental["stats"] == batch["stats"]
+
+
+def test_abandoned_map_cancels_pending_chunks(service, monkeypatch):
+    calls = []
+
+    def slow_llm(text, **kwargs):
+        calls.append(text)
+        time.sleep(0.1)
+        return {"entities": [], "relationships": []}
+
+    monkeypatch.setattr(service, "extract_llm", slow_llm)
+    chunks = [{"text": f"Chunk {i} text."} for i in range(8)]
+    outcomes = ChunkExtractionExecutor(service, llm_concurrency=2).map(chunks, "llm", use_cache=False)
+    assert next(outcomes).index == 0
+    outcomes.close()
+    assert len(calls) < len(chunks)
+
+
+def test_process_pool_is_shared_and_safe_with_held_locks(service, tmp_path, monkeypatch):
+    # قفلی که thread دیگری هنگام ساخت workerها نگه داشته نباید worker را قفل کند
+    monkeypatch.setenv("GRAPHRAG_CHUNK_TIMEOUT", "60")
+    cache = ExtractionCache(str(tmp_path / "extractions.sqlite"))
+    monkeypatch.setattr(service, "extraction_cache", cache)
+    with cache._lock:
+        first = service.extract_incremental(TEXT, chunk_size=400, base_method="simple", max_workers=2)
+    assert "partial" not in first
+    pools = dict(chunk_executor._process_pools)
+    assert pools[2]._mp_context.get_start_method() in ("forkserver", "spawn")
+
+    second = service.extract_incremental(TEXT, chunk_size=400, base_method="simple", max_workers=2)
+    assert chunk_executor._process_pools == pools
+    assert _graph(second) == _graph(first) and cache.stats()["entries"] == first["stats"]["num_chunks"]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست هم‌ارزی پیمایش‌های گراف فشرده (CSR) با پیمایش‌های NetworkX
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import networkx as nx
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService
+from compiled_graph import CompiledGraph
+
+METAEDGES = ['AeG', 'GiG', 'CbG', 'CtD', 'DaG', 'GpBP']
+KINDS = ['Gene', 'Anatomy', 'Compound', 'Disease']
+
+
+def _random_graph(seed: int, directed: bool = True):
+    rng = random.Random(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    for i in range(60):
+        G.add_node(f"N{i}", name=f"node {i}", kind=rng.choice(KINDS))
+    for _ in range(240):
+        u, v = f"N{rng.randrange(60)}", f"N{rng.randrange(60)}"
+        attrs = {}
+        roll = rng.random()
+        if roll < 0.6:
+            attrs = {'metaedge': rng.choice(METAEDGES), 'relation': rng.choice(METAEDGES)}
+        elif roll < 0.8:
+            attrs = {'relation': rng.choice(METAEDGES)}
+        elif roll < 0.9:
+            attrs = {'metaedge': rng.choice(METAEDGES)}
+        G.add_edge(u, v, **attrs)
+    return G
+
+
+def _service_with_graph(G):
+    service = GraphRAGService()
+    service.G = G
+    service._post_graph_loaded()
+    return service
+
+
+def _run_both(service, fn):
+    service.set_config(use_compiled_graph=True)
+    assert service._get_compiled_graph() is not None
+    compiled_result = fn()
+    service.set_config(use_compiled_graph=False)
+    networkx_result = fn()
+    service.set_config(use_compiled_graph=True)
+    return compiled_result, networkx_result
+
+
+def test_bfs_dfs_match_networkx():
+    """BFS و DFS باید دقیقاً همان خروجی NetworkX را بدهند"""
+    for seed, directed in [(1, True), (2, True), (3, False)]:
+        service = _service_with_graph(_random_graph(seed, directed))
+        for start in ['N0', 'N7', 'N33']:
+            for depth in [0, 1, 2, 3]:
+                compiled, reference = _run_both(service, lambda: service.bfs_search(start, depth))
+                assert compiled == reference
+                compiled, reference = _run_both(service, lambda: service.dfs_search(start, depth))
+                assert compiled == reference
+                compiled, reference = _run_both(service, lambda: service.dfs_search(start, depth, relation_filter='g'))
+                assert compiled == reference
+
+
+def test_allowlist_paths_match_networkx():
+    """مسیرهای allowlist با و بدون قیود باید یکسان باشند"""
+    service = _service_with_graph(_random_graph(4))
+
+    def run(constraints):
+        return service._find_paths_allowlist(
+            core_nodes=['N0', 'N5', 'N11'],
+            allow_metaedges=['AeG', 'GiG', 'CbG', 'CtD'],
+            deny_metaedges=['GiG'],
+            end_kind='Disease|Compound',
+            hop_limit=3,
+            max_results_per_hop=20,
+            require_unique_nodes=True,
+            extra_constraints=constraints,
+            query='',
+        )
+
+    for constraints in [{}, {"require_any_edge": ["CtD"], "require_edge_to": "Disease"}]:
+        compiled, reference = _run_both(service, lambda: run(constraints))
+        assert compiled == reference
+
+
+def test_pattern_paths_match_networkx():
+    """جستجوی الگوی چندمرحله‌ای روی گراف نمونه و گراف تصادفی"""
+    service = GraphRAGService()
+    for start in ['Anatomy::Heart', 'Gene::TP53']:
+        compiled, reference = _run_both(service, lambda: service._find_paths_with_pattern(start, ['AeG', 'CuG'], 3))
+        assert compiled == reference
+
+    service = _service_with_graph(_random_graph(5))
+    compiled, reference = _run_both(service, lambda: service._find_paths_with_pattern('N3', ['AeG', 'GiG'], 4))
+    assert compiled == reference
+
+
+def test_compiled_graph_is_invalidated_on_graph_swap():
+    """با جایگزینی self.G نسخه فشرده قدیمی نباید استفاده شود"""
+    service = GraphRAGService()
+    assert service._get_compiled_graph() is not None
+    service.G = _random_graph(6)
+    assert service._get_compiled_graph() is None
+    assert service.bfs_search('N0', 2)
+
+
+def test_multigraph_is_not_compiled():
+    G = nx.MultiDiGraph()
+    G.add_edge('a', 'b', relation='r')
+    service = _service_with_graph(G)
+    assert service._compiled_graph is None
+    try:
+        CompiledGraph(G)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("MultiGraph should be rejected")
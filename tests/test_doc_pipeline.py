@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست DocPipeline: پردازش دسته‌ای و کش Doc ها با nlp.pipe، جمله‌بندی فقط با senter/sentencizer
+و استفاده از یک Doc مشترک در SmartChunker و extract_long_text
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+spacy = pytest.importorskip("spacy")
+
+from doc_pipeline import DocPipeline, get_doc_pipeline
+from smart_chunker import ChunkingStrategy, SmartChunker
+from text_to_graph_service import TextToGraphService
+
+PARAGRAPH = ("TP53 regulates apoptosis in liver cells. BRCA1 interacts with TP53 in breast tissue. "
+             "Aspirin treats inflammation and inhibits COX2. ")
+TEXT = "\n\n".join(f"Sample {i}. " + PARAGRAPH * 3 for i in range(5))
+
+
+@pytest.fixture
+def nlp():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "GENE", "pattern": gene} for gene in ("TP53", "BRCA1")])
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def test_parse_batches_and_caches_docs(nlp):
+    pipeline = DocPipeline(nlp, batch_size=4)
+    texts = [f"TP53 binds BRCA1 in sample {i}." for i in range(6)]
+    docs = pipeline.parse(texts + texts[:2])
+    assert [doc.text for doc in docs] == texts + texts[:2]
+    assert docs[6] is docs[0] and pipeline.parsed["full"] == 6
+    assert pipeline.doc(texts[3]) is docs[3] and pipeline.parsed["full"] == 6
+    assert [ent.text for ent in docs[0].ents] == ["TP53", "BRCA1"]
+
+
+def test_sentence_stage_runs_only_sentence_component(nlp):
+    pipeline = DocPipeline(nlp)
+    nlp.disable_pipe("sentencizer")
+    docs = pipeline.sentence_docs(["TP53 binds BRCA1. Aspirin treats pain.", "One sentence only."])
+    assert [len(list(doc.sents)) for doc in docs] == [2, 1]
+    assert all(doc.ents == () for doc in docs)
+    assert pipeline.parsed == {"full": 0, "sentences": 2}
+
+    # Doc کامل موجود در کش دوباره پردازش نمی‌شود
+    full = pipeline.doc("Already parsed. Twice.")
+    assert pipeline.sentence_docs(["Already parsed. Twice."])[0] is full
+    assert pipeline.sentences("First. Second.\n\nThird paragraph.") == ["First.", "Second.", "Third paragraph."]
+
+
+def test_model_without_sentence_boundaries():
+    pipeline = DocPipeline(spacy.blank("en"))
+    assert pipeline.sentences("No segmenter here. At all.") is None
+    chunker = SmartChunker(strategy=ChunkingStrategy.SENTENCE, max_tokens=3, doc_pipeline=pipeline)
+    assert [c["text"] for c in chunker.chunk("No segmenter here. At all.")] == ["No segmenter here", "At all."]
+
+
+def test_chunker_segments_long_paragraphs_in_one_batch(nlp):
+    pipeline = DocPipeline(nlp)
+    chunker = SmartChunker(strategy=ChunkingStrategy.SMART, max_tokens=40, doc_pipeline=pipeline)
+    chunks = chunker.chunk(TEXT)
+    assert chunker.nlp is nlp and len(chunks) > 5
+    assert pipeline.parsed == {"full": 0, "sentences": 5}
+    assert all(chunk["text"].endswith(".") for chunk in chunks)
+
+
+def test_long_text_extraction_parses_each_chunk_once(nlp, monkeypatch):
+    service = TextToGraphService()
+    service.nlp = nlp
+    pipeline = get_doc_pipeline(nlp)
+    assert service.doc_pipeline is pipeline
+
+    parsed_docs = []
+
+    def fake_spacy(text, **kwargs):
+        doc = service.doc_pipeline.doc(text)
+        parsed_docs.append(doc)
+        return {"entities": [{"id": f"GENE_{i}", "name": ent.text, "type": "Gene", "attributes": {}}
+                             for i, ent in enumerate(doc.ents)], "relationships": []}
+
+    monkeypatch.setattr(service, "extract_spacy", fake_spacy)
+    result = service.extract_long_text(TEXT, method="spacy", max_tokens=40, max_workers=1)
+    num_chunks = result["stats"]["num_chunks"]
+    assert len(parsed_docs) == num_chunks > 1
+    # جمله‌بندی chunker و یک پردازش کامل برای هر chunk متمایز، همه دسته‌ای
+    assert pipeline.parsed == {"full": len({doc.text for doc in parsed_docs}), "sentences": 5}
+    assert pipeline.docs.stats()["hits"] >= num_chunks
+    assert {e["name"] for e in result["entities"]} == {"TP53", "BRCA1"}
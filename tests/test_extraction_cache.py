@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست کش استخراج: کلید content-addressed، پایداری روی دیسک، حذف LRU بر اساس حجم و
+استفاده در TextToGraphService.extract در سطح سند و chunk
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from extraction_cache import ExtractionCache, extraction_key
+from text_to_graph_service import TextToGraphService
+
+PARAGRAPHS = [f"Gene{i} regulates apoptosis in liver cells and interacts with TP53 in sample {i}." for i in range(4)]
+
+
+@pytest.fixture(scope="module")
+def service():
+    return TextToGraphService()
+
+
+@pytest.fixture
+def llm_calls(service, monkeypatch):
+    calls = []
+
+    def fake_llm(text, **kwargs):
+        calls.append(text)
+        names = sorted({word.strip(".") for word in text.split() if word[:1].isupper()})
+        return {"entities": [{"id": f"E{i}", "name": name, "type": "Gene", "attributes": {}}
+                             for i, name in enumerate(names)], "relationships": []}
+
+    monkeypatch.setattr(service, "extract_llm", fake_llm)
+    return calls
+
+
+def test_key_normalizes_text_and_covers_parameters():
+    params = {"max_entities": 100, "model": "gpt-4o"}
+    key = extraction_key("TP53 binds MDM2.\nBRCA1 too.", "llm", params)
+    assert extraction_key("  TP53 binds MDM2.  \r\nBRCA1 too.\n", "llm", dict(params)) == key
+    assert extraction_key("TP53 binds MDM2. BRCA1 too.", "llm", params) != key
+    assert extraction_key("TP53 binds MDM2.\nBRCA1 too.", "llm_multipass", params) != key
+    assert extraction_key("TP53 binds MDM2.\nBRCA1 too.", "llm", dict(params, max_entities=10)) != key
+    assert extraction_key("TP53 binds MDM2.\nBRCA1 too.", "llm", dict(params, model="gpt-4o-mini")) != key
+
+
+def test_entries_persist_and_evict_least_recently_used(tmp_path):
+    path = str(tmp_path / "extractions.sqlite")
+    entity = {"id": "E0", "name": "x" * 200, "type": "Gene", "attributes": {}}
+    cache = ExtractionCache(path, max_bytes=700)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"entities": [entity], "relationships": []}, "llm")
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1 and cache.get("a") is None
+    assert cache.get("b")["entities"] == [entity]
+
+    reopened = ExtractionCache(path, max_bytes=700)
+    reopened.set("d", {"entities": [entity], "relationships": []}, "llm")
+    # b دیرتر از c استفاده شده است
+    assert reopened.get("c") is None and reopened.get("b") is not None
+    assert reopened.stats()["hits"] == 1 and reopened.stats()["misses"] == 1
+
+
+def test_extract_reuses_document_results(service, llm_calls, monkeypatch):
+    monkeypatch.setattr(service, "extraction_cache", ExtractionCache())
+    text = " ".join(PARAGRAPHS)
+    first = service.extract(text, method="llm")
+    second = service.extract(text + "\n", method="llm")
+    assert second == first and second is not first and len(llm_calls) == 1
+
+    service.extract(text, method="llm", max_entities=5)
+    service.extract(text, method="llm", use_cache=False)
+    assert len(llm_calls) == 3
+
+    service.extraction_cache.clear()
+    monkeypatch.setattr(service, "extract_llm",
+                        lambda text, **kwargs: {"entities": [], "relationships": [], "error": "timeout"})
+    service.extract(text, method="llm")
+    assert service.extraction_cache.stats()["entries"] == 0
+
+
+def test_editing_one_paragraph_reextracts_only_its_chunk(service, llm_calls, monkeypatch):
+    monkeypatch.setattr(service, "extraction_cache", ExtractionCache())
+    options = dict(method="llm", max_tokens=20, chunking_strategy="paragraph", max_workers=1)
+    service.extract_long_text("\n\n".join(PARAGRAPHS), **options)
+    assert len(llm_calls) == 4
+
+    edited = PARAGRAPHS[:2] + ["Gene9 inhibits COX2 in inflamed tissue."] + PARAGRAPHS[3:]
+    result = service.extract_long_text("\n\n".join(edited), **options)
+    assert llm_calls[4:] == ["Gene9 inhibits COX2 in inflamed tissue."]
+    assert "Gene9" in {e["name"] for e in result["entities"]}
+
+    service.extract_long_text("\n\n".join(edited), use_cache=False, **options)
+    assert len(llm_calls) == 9
+
+
+def test_failed_chunk_is_retried_without_caching_the_document(service, llm_calls, monkeypatch):
+    monkeypatch.setattr(service, "extraction_cache", ExtractionCache())
+    working_llm = service.extract_llm
+    failures = []
+
+    def flaky_llm(text, **kwargs):
+        if "Gene2" in text and not failures:
+            failures.append(text)
+            raise RuntimeError("503 Service Unavailable")
+        return working_llm(text, **kwargs)
+
+    monkeypatch.setattr(service, "extract_llm", flaky_llm)
+    text = "\n\n".join(PARAGRAPHS)
+    options = dict(method="llm", max_tokens=20, chunking_strategy="paragraph", max_workers=1)
+    first = service.extract_long_text(text, **options)
+    assert first["partial"] and first["failed_chunks"] == [2]
+    # فقط chunk های موفق در کش هستند
+    assert service.extraction_cache.stats()["entries"] == 3
+
+    second = service.extract_long_text(text, **options)
+    assert llm_calls[3:] == [PARAGRAPHS[2]] and "partial" not in second
+    assert "Gene2" in {e["name"] for e in second["entities"]}
+
+    # کل سند فقط وقتی ذخیره می‌شود که همه chunk ها موفق باشند
+    service.extraction_cache.clear()
+    failures.clear()
+    options = dict(method="incremental", chunk_size=120, overlap=0, base_method="llm", max_workers=1)
+    partial = service.extract(text, **options)
+    assert partial["partial"] and len(partial["failed_chunks"]) == 1
+    calls_before = len(llm_calls)
+    full = service.extract(text, **options)
+    assert len(llm_calls) == calls_before + 1 and "partial" not in full
+    assert service.extract(text, **options) == full and len(llm_calls) == calls_before + 1
+
+
+def test_forked_chunk_workers_share_disk_cache(service, tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "extractions.sqlite"))
+    monkeypatch.setattr(service, "extraction_cache", cache)
+    text = "\n\n".join(PARAGRAPHS)
+    first = service.extract_incremental(text, chunk_size=120, base_method="simple", max_workers=2)
+    # نتیجه chunk ها را workerهای fork شده با اتصال SQLite خودشان نوشته‌اند
+    assert cache.stats()["entries"] == first["stats"]["num_chunks"]
+
+    second = service.extract(text, method="incremental", chunk_size=120, base_method="simple", max_workers=2)
+    third = service.extract(text, method="incremental", chunk_size=120, base_method="simple", max_workers=1)
+    assert third == second and cache.hits >= 1
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست سرویس مرکزیت اسپارس (PageRank، درجه، closeness) و کش دیسک آن
+"""
+
+import pickle
+import sys
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import graph_centrality
+from graph_centrality import CentralityService
+from enhanced_graphrag_service import EnhancedGraphRAGService
+from graph_registry import GraphRegistry
+
+
+def _graph(directed: bool):
+    G = nx.gnm_random_graph(120, 400, seed=3, directed=directed)
+    G = nx.relabel_nodes(G, {i: f"Gene::{i}" for i in G})
+    for i, (u, v) in enumerate(G.edges()):
+        G.edges[u, v]['metaedge'] = 'GiG'
+        if i % 5 == 0:
+            G.edges[u, v]['weight'] = 2.0
+    for node_id in G:
+        G.nodes[node_id].update(name=node_id.split('::')[1], kind='Gene')
+    return G
+
+
+@pytest.mark.parametrize("directed", [True, False])
+def test_matches_networkx(directed):
+    G = _graph(directed)
+    centrality = CentralityService(G)
+    expected = nx.pagerank(G, alpha=0.85)
+    assert centrality.pagerank().keys() == expected.keys()
+    assert all(abs(centrality.pagerank()[n] - expected[n]) < 1e-9 for n in G)
+    assert centrality.degree_centrality() == nx.degree_centrality(G)
+    assert centrality.degree() == dict(G.degree())
+    if not directed and nx.is_connected(G):
+        expected_closeness = nx.closeness_centrality(G)
+        assert all(abs(centrality.closeness()[n] - expected_closeness[n]) < 1e-12 for n in G)
+
+
+def test_disk_cache_keyed_by_graph_content(tmp_path, monkeypatch):
+    G = _graph(False)
+    first = CentralityService(G, cache_dir=str(tmp_path)).warm(closeness=True)
+
+    # همان محتوا (شیء گراف دیگر) → بدون محاسبه مجدد
+    def fail(*args, **kwargs):
+        raise AssertionError("نباید دوباره محاسبه شود")
+    monkeypatch.setattr(CentralityService, "power_iteration", fail)
+    monkeypatch.setattr(graph_centrality, "shortest_path", fail)
+    second = CentralityService(pickle.loads(pickle.dumps(G)), cache_dir=str(tmp_path))
+    assert second.fingerprint == first.fingerprint
+    assert second.pagerank() == first.pagerank()
+    assert second.closeness() == first.closeness()
+
+    # تغییر یک یال → کلید جدید
+    H = G.copy()
+    H.add_edge("Gene::0", "Gene::119", metaedge='GiG')
+    assert CentralityService(H).fingerprint != first.fingerprint
+
+
+def test_enhanced_service_shares_precomputed_centrality(tmp_path, monkeypatch):
+    graph_path = tmp_path / "g.pkl"
+    with open(graph_path, "wb") as f:
+        pickle.dump(_graph(False), f)
+    registry = GraphRegistry()
+    handle = registry.swap(str(graph_path))
+    assert (tmp_path / ".centrality_cache" / f"{handle.centrality.fingerprint}.npz").exists()
+
+    service = EnhancedGraphRAGService(graph_registry=registry)
+    monkeypatch.setattr(nx, "pagerank", lambda *a, **k: pytest.fail("nx.pagerank در مسیر درخواست"))
+    monkeypatch.setattr(nx, "closeness_centrality", lambda *a, **k: pytest.fail("closeness در مسیر درخواست"))
+    results = service.pagerank_retrieval("genes", [])
+    assert results['nodes']
+    top = results['nodes'][0]
+    assert top['pagerank'] == max(handle.pagerank.values())
+    assert top['centrality'] == handle.centrality.closeness()[top['id']]
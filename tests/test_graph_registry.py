@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست رجیستری گراف مشترک بین GraphRAGService و EnhancedGraphRAGService
+"""
+
+import pickle
+import sys
+import threading
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService, RetrievalMethod
+from enhanced_graphrag_service import EnhancedGraphRAGService
+from graph_registry import GraphRegistry, pins_graph
+
+
+def _write_graph(path: Path, genes) -> str:
+    G = nx.Graph()
+    G.add_node("Anatomy::liver", name="liver", kind="Anatomy")
+    for gene in genes:
+        G.add_node(f"Gene::{gene}", name=gene, kind="Gene")
+        G.add_edge("Anatomy::liver", f"Gene::{gene}", metaedge="AeG")
+    with open(path, "wb") as f:
+        pickle.dump(G, f)
+    return str(path)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = GraphRegistry()
+    registry.swap(_write_graph(tmp_path / "g1.pkl", ["TP53", "BRCA1"]))
+    return registry
+
+
+def test_services_share_one_graph_and_indices(registry):
+    """هر دو سرویس باید همان شیء گراف و ایندکس‌های پیش‌محاسبه‌شده را ببینند"""
+    handle = registry.current()
+    service = GraphRAGService(graph_registry=registry)
+    enhanced = EnhancedGraphRAGService(graph_registry=registry)
+
+    assert service.G is handle.G
+    assert enhanced.G is handle.G
+    assert service._name_to_ids is handle.node_index.name_to_ids
+    assert service._pagerank is handle.pagerank and handle.pagerank
+    assert service.match_tokens_to_nodes(["TP53"]) == {"TP53": "Gene::TP53"}
+    with pytest.raises(RuntimeError):
+        service.add_graph_edge("Gene::TP53", "Gene::BRCA1", metaedge="GiG")
+
+
+def test_swap_updates_services_and_retires_old_handle(registry, tmp_path):
+    service = GraphRAGService(graph_registry=registry)
+    enhanced = EnhancedGraphRAGService(graph_registry=registry)
+    old_handle = registry.current()
+
+    new_handle = registry.swap(_write_graph(tmp_path / "g2.pkl", ["EGFR"]))
+
+    assert old_handle.closed
+    assert service.G is new_handle.G and enhanced.G is new_handle.G
+    assert "egfr" in service._name_to_ids and "tp53" not in service._name_to_ids
+    assert enhanced.get_graph_statistics()['total_nodes'] == 2
+    result = service.retrieve_information("EGFR liver", RetrievalMethod.BFS)
+    assert any(node.id == "Gene::EGFR" for node in result.nodes)
+
+
+def test_in_flight_request_keeps_pinned_graph(registry, tmp_path):
+    """swap وسط یک درخواست نباید گراف آن درخواست را عوض کند یا منتظر آن بماند"""
+    service = GraphRAGService(graph_registry=registry)
+    old_handle = registry.current()
+    entered, swapped = threading.Event(), threading.Event()
+    seen = {}
+
+    @pins_graph
+    def slow_request(self):
+        before = self.G
+        entered.set()
+        swapped.wait(5)
+        seen['same_graph'] = self.G is before
+        seen['names'] = set(self._name_to_ids)
+
+    worker = threading.Thread(target=slow_request, args=(service,))
+    worker.start()
+    entered.wait(5)
+    new_handle = registry.swap(_write_graph(tmp_path / "g2.pkl", ["EGFR"]))
+    # درخواست جدید در thread اصلی گراف جدید را می‌بیند، گراف قدیمی هنوز باز است
+    assert service.G is new_handle.G
+    assert not old_handle.closed and old_handle.refcount == 1
+    swapped.set()
+    worker.join(5)
+
+    assert seen == {'same_graph': True, 'names': {"liver", "tp53", "brca1"}}
+    assert old_handle.closed
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست فرمت snapshot باینری گراف (mmap) و مبدل‌های آن
+"""
+
+import gzip
+import os
+import pickle
+import random
+import struct
+import sys
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService
+from graph_snapshot import (
+    GraphSnapshot, convert_to_snapshot, resolve_graph_path, snapshot_path_for, write_snapshot,
+)
+
+METAEDGES = ['AeG', 'GiG', 'CbG', 'CtD']
+
+
+def _random_graph(seed: int, directed: bool):
+    rng = random.Random(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    for i in range(50):
+        G.add_node(f"Gene::{i}", name=f"ژن {i}" if i % 7 == 0 else f"gene {i}", kind=rng.choice(['Gene', 'Disease']))
+    G.add_node("Orphan::x")
+    for _ in range(200):
+        attrs = {'metaedge': rng.choice(METAEDGES)}
+        if rng.random() < 0.5:
+            attrs['relation'] = rng.choice(METAEDGES)
+        if rng.random() < 0.2:
+            attrs['weight'] = 0.5
+        G.add_edge(f"Gene::{rng.randrange(50)}", f"Gene::{rng.randrange(50)}", **attrs)
+    return G
+
+
+@pytest.mark.parametrize("directed", [True, False])
+def test_snapshot_roundtrip_preserves_graph(tmp_path, directed):
+    """گراف بازسازی‌شده باید همان نودها، یال‌ها، ویژگی‌ها و ترتیب همسایه‌ها را داشته باشد"""
+    G = _random_graph(1, directed)
+    path = write_snapshot(G, str(tmp_path / "g.graphsnap"))
+    snapshot = GraphSnapshot.open(path)
+    H = snapshot.to_networkx()
+
+    assert H.is_directed() == directed
+    assert list(H.nodes(data=True)) == list(G.nodes(data=True))
+    for node_id in G.nodes():
+        assert list(H.neighbors(node_id)) == list(G.neighbors(node_id))
+        for neighbor in G.neighbors(node_id):
+            assert H.get_edge_data(node_id, neighbor) == G.get_edge_data(node_id, neighbor)
+    assert H.number_of_edges() == G.number_of_edges()
+    if directed:
+        for node_id in G.nodes():
+            assert set(H.predecessors(node_id)) == set(G.predecessors(node_id))
+
+
+def test_compiled_graph_from_snapshot_matches(tmp_path):
+    """CompiledGraph ساخته‌شده از آرایه‌های mmap همان خروجی پیمایش را دارد"""
+    G = _random_graph(2, True)
+    snapshot = GraphSnapshot.open(write_snapshot(G, str(tmp_path / "g.graphsnap")))
+    H = snapshot.to_networkx()
+    compiled = snapshot.compiled_graph(H)
+    assert compiled.is_compiled_from(H)
+    for start in ["Gene::0", "Gene::9", "Orphan::x"]:
+        service_like = GraphRAGService()
+        service_like.G = H
+        service_like._post_graph_loaded()
+        service_like.set_config(use_compiled_graph=False)
+        assert compiled.bfs(start, 3) == service_like.bfs_search(start, 3)
+        assert compiled.dfs(start, 3) == service_like.dfs_search(start, 3)
+
+
+def test_service_prefers_fresh_sibling_snapshot(tmp_path):
+    """GraphRAGService باید snapshot هم‌نام و به‌روز را به جای pickle باز کند"""
+    G = _random_graph(3, False)
+    pkl_path = tmp_path / "hetionet_graph_test.pkl"
+    with open(pkl_path, "wb") as f:
+        pickle.dump(G, f)
+    assert resolve_graph_path(str(pkl_path)) == str(pkl_path)
+
+    snapshot_path = convert_to_snapshot(snapshot_path_for(str(pkl_path)), pkl_path=str(pkl_path))
+    assert resolve_graph_path(str(pkl_path)) == snapshot_path
+
+    service = GraphRAGService(graph_data_path=str(pkl_path))
+    assert service._graph_snapshot is not None
+    assert service.G.number_of_nodes() == G.number_of_nodes()
+    assert service._get_compiled_graph().targets.base is not None  # نمای mmap، نه کپی
+    compiled_result = service.bfs_search("Gene::1", 2)
+    service.set_config(use_compiled_graph=False)
+    assert compiled_result == service.bfs_search("Gene::1", 2)
+
+    # pickle جدیدتر از snapshot → snapshot کهنه نادیده گرفته می‌شود
+    os.utime(snapshot_path, (1, 1))
+    assert resolve_graph_path(str(pkl_path)) == str(pkl_path)
+
+
+def test_convert_from_sif_and_nodes_tsv(tmp_path):
+    """مبدل SIF (+ gz) و فایل نودهای TSV"""
+    nodes_path = tmp_path / "nodes.tsv"
+    nodes_path.write_text(
+        "id\tname\tkind\n"
+        "Gene::7157\tTP53\tGene\n"
+        "Disease::DOID:1612\tbreast cancer\tDisease\n"
+        "Anatomy::UBERON:0002107\tliver\tAnatomy\n",
+        encoding="utf-8",
+    )
+    sif_path = tmp_path / "edges.sif.gz"
+    with gzip.open(sif_path, "wt", encoding="utf-8") as f:
+        f.write("source\tmetaedge\ttarget\n")
+        f.write("Disease::DOID:1612\tDaG\tGene::7157\n")
+        f.write("Anatomy::UBERON:0002107\tAeG\tGene::7157\n")
+        f.write("Anatomy::UBERON:0002107\tAeG\tGene::unknown\n")
+
+    output = convert_to_snapshot(str(tmp_path / "hetionet.graphsnap"), sif_path=str(sif_path), nodes_path=str(nodes_path))
+    snapshot = GraphSnapshot.open(output)
+    H = snapshot.to_networkx()
+    assert not H.is_directed()
+    assert H.nodes["Gene::7157"] == {"name": "TP53", "kind": "Gene"}
+    assert H.number_of_edges() == 2
+    assert H.get_edge_data("Gene::7157", "Anatomy::UBERON:0002107") == {"metaedge": "AeG"}
+
+
+def test_rejects_unknown_version(tmp_path):
+    path = write_snapshot(_random_graph(4, True), str(tmp_path / "g.graphsnap"))
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack("<I", 999))
+    with pytest.raises(ValueError):
+        GraphSnapshot.open(path)
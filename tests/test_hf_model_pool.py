@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست pool مدل HuggingFace: بارگذاری یک‌باره، تولید دسته‌ای درخواست‌های هم‌زمان و fallback
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+import hf_model_pool
+from hf_model_pool import FAILED, READY, HFModelPool
+
+
+class _FakeBatchPool(HFModelPool):
+    """جایگزین generate مدل واقعی تا منطق صف و دسته‌بندی بدون torch آزموده شود"""
+
+    def __init__(self, **kwargs):
+        self.loads = []
+        self.batch_sizes = []
+        self.release = threading.Event()
+
+        def loader(name):
+            self.loads.append(name)
+            if name == "missing":
+                raise OSError("not in local cache")
+            return object(), object()
+        super().__init__(loader=loader, **kwargs)
+
+    def _generate_batch(self, prompts):
+        self.release.wait(5)
+        self.batch_sizes.append(len(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+
+def test_concurrent_requests_share_one_load_and_are_batched():
+    pool = _FakeBatchPool(candidates=["missing", "tiny"], max_batch=4, max_wait=0.5)
+    prompts = [f"prompt {i}" for i in range(5)]
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(pool.generate, prompt, 10) for prompt in prompts]
+        # اولین دسته تا پر شدن (۴ درخواست) یا max_wait منتظر می‌ماند
+        while pool.requests < 5:
+            time.sleep(0.01)
+        pool.release.set()
+        answers = [future.result() for future in futures]
+
+    assert answers == [prompt.upper() for prompt in prompts]
+    assert pool.loads == ["missing", "tiny"]
+    stats = pool.stats()
+    assert stats["state"] == READY and stats["model"] == "tiny"
+    assert "missing" in stats["load_errors"]
+    assert sorted(pool.batch_sizes) == [1, 4]
+    assert stats["requests"] == 5 and stats["batches"] == 2 and stats["queue_depth"] == 0
+    assert stats["avg_batch_size"] == 2.5
+
+
+def test_unavailable_models_fall_back_and_are_not_retried(monkeypatch):
+    from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+    pool = _FakeBatchPool(candidates=["missing"])
+    monkeypatch.setattr(hf_model_pool, "_default_pool", pool)
+    service = GraphRAGService()
+    service.create_sample_graph()
+    result = service.process_query("What genes are expressed in liver?", RetrievalMethod.BFS,
+                                   GenerationModel.HUGGINGFACE)
+    assert result["answer"]
+    service.process_query("Where is TP53 expressed?", RetrievalMethod.BFS, GenerationModel.HUGGINGFACE)
+    assert pool.loads == ["missing"] and pool.state == FAILED
+
+    import web_app
+    stats = web_app.app.test_client().get("/api/hf_model_stats").get_json()["stats"]
+    assert stats["state"] == FAILED and stats["queue_depth"] == 0
+
+
+def test_stuck_generate_times_out_and_falls_back(monkeypatch):
+    from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+    pool = _FakeBatchPool(candidates=["tiny"], max_batch=1, max_wait=0)
+    with pytest.raises(FuturesTimeoutError):
+        pool.generate("first", timeout=0.2)
+    # درخواست دوم پشت دسته گیرکرده در صف مانده و پس از timeout لغو می‌شود
+    with pytest.raises(FuturesTimeoutError):
+        pool.generate("second", timeout=0.2)
+
+    monkeypatch.setattr(hf_model_pool, "_default_pool", pool)
+    service = GraphRAGService()
+    service.create_sample_graph()
+    service.set_config(hf_generation_timeout=0.2)
+    started = time.perf_counter()
+    result = service.process_query("What genes are expressed in liver?", RetrievalMethod.BFS,
+                                   GenerationModel.HUGGINGFACE)
+    assert result["answer"] and time.perf_counter() - started < 4
+
+    pool.release.set()
+    pool.generate("after", timeout=5)
+    # فقط درخواست اول (که در حال اجرا بود) و درخواست آخر تولید شده‌اند
+    assert pool.batch_sizes == [1, 1]
+    assert pool.stats()["timeouts"] == 3
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست اجرای هم‌زمان روش‌ها در extract_hybrid: هم‌پوشانی روش CPU و LLM، ادغام نتایج به
+محض پایان هر روش و برگرداندن ادغام جزئی پس از deadline
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from extraction_cache import ExtractionCache
+from text_to_graph_service import TextToGraphService
+
+TEXT = "TP53 regulates apoptosis in liver cells. BRCA1 interacts with TP53 in breast tissue."
+
+
+@pytest.fixture(scope="module")
+def service():
+    return TextToGraphService()
+
+
+def _result(*names, confidence=0.5):
+    return {"entities": [{"id": f"E_{name}", "name": name, "type": "Gene", "attributes": {"confidence": confidence}}
+                         for name in names],
+            "relationships": [{"source": f"E_{names[0]}", "target": f"E_{names[-1]}", "metaedge": "GiG",
+                               "attributes": {"confidence": confidence}}]}
+
+
+@pytest.fixture
+def slow_methods(service, monkeypatch):
+    """spacy و llm جعلی با تأخیر قابل تنظیم که thread اجرای خود را ثبت می‌کنند"""
+    delays, threads = {"spacy": 0.3, "llm": 0.3}, {}
+
+    def fake(name, *names, confidence=0.5):
+        def extract(text, **kwargs):
+            threads[name] = threading.current_thread().name
+            time.sleep(delays[name])
+            return _result(*names, confidence=confidence)
+        return extract
+
+    monkeypatch.setattr(service, "extract_spacy", fake("spacy", "TP53", "BRCA1"))
+    monkeypatch.setattr(service, "extract_llm", fake("llm", "TP53", "apoptosis", confidence=0.9))
+    return delays, threads
+
+
+def test_methods_run_concurrently_and_merge(service, slow_methods):
+    delays, threads = slow_methods
+    started = time.perf_counter()
+    result = service.extract_hybrid(TEXT, methods=["spacy", "llm"])
+    assert time.perf_counter() - started < 0.55
+    assert threads["spacy"].startswith("hybrid-cpu") and threads["llm"].startswith("hybrid-llm")
+
+    assert sorted(result["stats"]["completed_methods"]) == ["llm", "spacy"]
+    assert result["stats"]["timed_out_methods"] == [] and "partial" not in result
+    entities = {e["name"]: e for e in result["entities"]}
+    assert set(entities) == {"TP53", "BRCA1", "apoptosis"}
+    assert entities["TP53"]["attributes"]["confidence"] == 0.9
+
+
+def test_deadline_returns_partial_merge(service, slow_methods):
+    delays, _ = slow_methods
+    delays["llm"] = 2.0
+    started = time.perf_counter()
+    result = service.extract_hybrid(TEXT, methods=["spacy", "llm"], deadline=0.8)
+    assert time.perf_counter() - started < 1.5
+    assert result["partial"] is True
+    assert result["stats"]["completed_methods"] == ["spacy"] and result["stats"]["timed_out_methods"] == ["llm"]
+    assert {e["name"] for e in result["entities"]} == {"TP53", "BRCA1"}
+
+
+def test_failed_method_does_not_block_others(service, slow_methods, monkeypatch):
+    def broken_llm(text, **kwargs):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(service, "extract_llm", broken_llm)
+    result = service.extract_hybrid(TEXT, methods=["spacy", "llm", "unknown"])
+    assert result["stats"]["completed_methods"] == ["spacy"] and result["stats"]["failed_methods"] == ["llm"]
+    assert result["partial"] is True
+    assert {e["name"] for e in result["entities"]} == {"TP53", "BRCA1"}
+
+
+def test_partial_results_are_not_cached(service, slow_methods, monkeypatch):
+    delays, _ = slow_methods
+    delays["llm"] = 1.0
+    monkeypatch.setattr(service, "extraction_cache", ExtractionCache())
+    partial = service.extract(TEXT, method="hybrid", hybrid_methods=["spacy", "llm"], deadline=0.5)
+    assert partial["partial"] and service.extraction_cache.stats()["entries"] == 0
+
+    delays["llm"] = 0.0
+    full = service.extract(TEXT, method="hybrid", hybrid_methods=["spacy", "llm"], deadline=5)
+    assert "partial" not in full and service.extraction_cache.stats()["entries"] == 1
+
+    # deadline فقط زمان انتظار است، نه بخشی از کلید: نتیجه کامل با deadline دیگر هم از کش می‌آید
+    again = service.extract(TEXT, method="hybrid", hybrid_methods=["spacy", "llm"], deadline=30)
+    stats = service.extraction_cache.stats()
+    assert again["entities"] == full["entities"] and stats["entries"] == 1 and stats["hits"] == 1
+
+
+def test_failed_method_is_retried_not_cached(service, slow_methods, monkeypatch):
+    delays, _ = slow_methods
+    delays.update(spacy=0.0, llm=0.0)
+    working_llm = service.extract_llm
+    llm_calls = []
+
+    def flaky_llm(text, **kwargs):
+        llm_calls.append(text)
+        if len(llm_calls) == 1:
+            raise RuntimeError("503 Service Unavailable")
+        return working_llm(text, **kwargs)
+
+    monkeypatch.setattr(service, "extract_llm", flaky_llm)
+    monkeypatch.setattr(service, "extraction_cache", ExtractionCache())
+    first = service.extract(TEXT, method="hybrid", hybrid_methods=["spacy", "llm"])
+    assert first["partial"] and first["stats"]["failed_methods"] == ["llm"]
+    assert service.extraction_cache.stats()["entries"] == 0
+
+    second = service.extract(TEXT, method="hybrid", hybrid_methods=["spacy", "llm"])
+    assert len(llm_calls) == 2 and "partial" not in second
+    assert "apoptosis" in {e["name"] for e in second["entities"]}
+    assert service.extraction_cache.stats()["entries"] == 1
+
+
+def test_merge_follows_method_order_not_completion_order(service, monkeypatch):
+    def fake(name, delay):
+        def extract(text, **kwargs):
+            time.sleep(delay)
+            return {"entities": [{"id": f"{name}_{gene}", "name": gene, "type": "Gene",
+                                  "attributes": {"confidence": 0.5, "source": name}}
+                                 for gene in (f"{name.upper()}1", "TP53")],
+                    "relationships": [{"source": "TP53", "target": "BRCA1", "metaedge": "GiG",
+                                       "attributes": {"confidence": 0.6, "description": f"from {name}"}}]}
+        return extract
+
+    results = []
+    for spacy_delay, llm_delay in ((0.0, 0.3), (0.3, 0.0)):
+        monkeypatch.setattr(service, "extract_spacy", fake("spacy", spacy_delay))
+        monkeypatch.setattr(service, "extract_llm", fake("llm", llm_delay))
+        results.append(service.extract_hybrid(TEXT, methods=["spacy", "llm"], max_entities=2))
+
+    # llm زودتر تمام شده است ولی ادغام همان نتیجه اجرای ترتیبی spacy سپس llm است
+    assert results[1] == results[0]
+    assert [e["name"] for e in results[1]["entities"]] == ["SPACY1", "TP53"]
+    assert results[1]["entities"][1]["attributes"]["source"] == "spacy"
+    assert results[1]["relationships"][0]["attributes"]["description"] == "from spacy; from llm"
+    assert results[1]["stats"]["completed_methods"] == ["spacy", "llm"]
+
+
+@pytest.mark.parametrize("deadline", [0, -1, "nan", "inf", "soon"])
+def test_invalid_hybrid_deadline_is_rejected(deadline):
+    import web_app
+    payload, status = web_app.text_to_graph_payload(
+        {"text": TEXT, "method": "hybrid", "hybrid_deadline": deadline})
+    assert status == 400 and not payload["success"] and "hybrid_deadline" in payload["error"]
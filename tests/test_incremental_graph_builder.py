@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست IncrementalGraphBuilder: ادغام جریان نتایج chunkها با دیکشنری‌های شناسه‌دار،
+برابری گراف ساخته‌شده حین ادغام با build_graph و استفاده در extract_incremental
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from incremental_graph_builder import IncrementalGraphBuilder
+from text_to_graph_service import TextToGraphService
+
+PARAGRAPH = ("TP53 regulates apoptosis in liver cells. BRCA1 interacts with TP53 in breast tissue. "
+             "Aspirin treats inflammation and inhibits COX2. ")
+
+
+@pytest.fixture(scope="module")
+def service():
+    return TextToGraphService()
+
+
+def _chunk(i, names, relations):
+    return {
+        "entities": [{"name": name, "type": "Gene", "attributes": {"seen": i}} for name in names],
+        "relationships": [{"source": s, "target": t, "relation": r, "attributes": {}} for s, t, r in relations],
+    }
+
+
+def _same_graph(G, H):
+    return (sorted(G.nodes(data=True)) == sorted(H.nodes(data=True))
+            and sorted(G.edges(keys=True, data=True), key=str) == sorted(H.edges(keys=True, data=True), key=str))
+
+
+def test_duplicates_are_merged_into_graph(service):
+    stream = ((i, _chunk(i, ["TP53", "brca1 ", f"Gene{i}"], [("TP53", "BRCA1", "binds"), ("TP53", f"gene{i}", "regulates")]))
+              for i in range(3))
+    builder = IncrementalGraphBuilder().consume(stream)
+    result = builder.result("incremental_test", num_chunks=builder.num_chunks)
+
+    assert result["stats"] == {"num_entities": 5, "num_relationships": 4, "num_chunks": 3}
+    tp53 = builder.graph.nodes["ENT_0"]
+    assert tp53["name"] == "TP53" and tp53["chunks"] == [0, 1, 2] and tp53["seen"] == 2
+    binds = [data for _, _, data in builder.graph.edges("ENT_0", data=True) if data["relation"] == "binds"]
+    assert len(binds) == 1 and binds[0]["frequency"] == 3 and binds[0]["chunk"] == 0
+    assert _same_graph(builder.graph, service.build_graph(result))
+
+
+def test_limits_match_build_graph_of_truncated_result(service):
+    builder = IncrementalGraphBuilder(max_entities=3, max_relationships=2)
+    builder.consume((i, _chunk(i, [f"G{i}", f"G{i+1}"], [(f"G{i}", f"G{i+1}", "next"), ("G0", f"G{i+1}", "from")]))
+                    for i in range(5))
+    result = builder.result("incremental_test")
+    assert len(result["entities"]) == 3 and len(result["relationships"]) == 2
+    assert result["stats"]["num_entities"] == 6
+    assert _same_graph(builder.graph, service.build_graph(result))
+
+
+def test_merge_cost_is_linear():
+    def run(n):
+        names = [f"Gene{i % 50}" for i in range(n)]
+        relations = [(names[i], names[i - 1], "r") for i in range(1, n)]
+        started = time.perf_counter()
+        IncrementalGraphBuilder().add_chunk_result(_chunk(0, names, relations), 0)
+        return time.perf_counter() - started
+
+    run(1000)
+    assert run(40000) < run(4000) * 40
+
+
+def test_extract_incremental_returns_streamed_graph(service):
+    text = "\n\n".join(PARAGRAPH * 3 for _ in range(6))
+    result = service.extract_incremental(text, chunk_size=400, base_method="simple", max_workers=1, return_graph=True)
+    graph = result.pop("graph")
+    assert graph.number_of_nodes() == len(result["entities"]) > 0
+    assert _same_graph(graph, service.build_graph(result))
+
+    processed = service.process_text_to_graph(text, method="incremental", save=False, chunk_size=400,
+                                              base_method="simple", enable_entity_resolution=False,
+                                              enable_relationship_weighting=False)
+    assert "graph" not in processed["extraction_result"]
+    assert _same_graph(processed["graph"], graph)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست کش پایدار پاسخ‌های LLM: تطبیق دقیق پایدار، تطبیق معنایی، صرفه‌جویی توکن و
+استفاده در درگاه LLM، استخراج HuggingFace و graphrag_new.utils
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_cache
+from llm_cache import LLMResponseCache
+from llm_gateway import LLMGateway
+from llm_stub_server import LLMStubServer
+
+CONTEXT = "TP53 (Gene)\nLiver (Anatomy)\nTP53 expressed_in Liver"
+
+
+def _request(content, model="gpt-4o-mini"):
+    return {"model": model, "temperature": 0.7, "messages": [{"role": "user", "content": content}]}
+
+
+def test_exact_hits_persist_and_report_token_savings(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    cache = LLMResponseCache(path)
+    calls = []
+    answer = cache.get_or_call("openai", _request("x" * 400), lambda: calls.append(1) or "y" * 80)
+    assert answer == "y" * 80 and cache.stats()["misses"] == 1
+
+    reopened = LLMResponseCache(path)
+    assert reopened.get_or_call("openai", _request("x" * 400), lambda: calls.append(1) or "other") == "y" * 80
+    assert calls == [1]
+    stats = reopened.stats()
+    assert stats["hits"] == 1 and stats["entries"] == 1
+    assert stats["saved_prompt_tokens"] == 100 and stats["saved_completion_tokens"] == 20
+    # مدل یا پارامتر دیگر کلید دیگری دارد
+    assert reopened.lookup("openai", _request("x" * 400, model="gpt-4o")) is None
+
+    reopened.set_text("llm_cache:legacy", "value", ttl=-1)
+    assert reopened.get_text("llm_cache:legacy") is None
+
+
+def test_semantic_match_requires_similar_question_and_context():
+    cache = LLMResponseCache(semantic_threshold=0.85)
+    cache.store("openai", _request("prompt about liver"), "cached answer",
+                semantic=("What genes are expressed in liver?", CONTEXT))
+
+    hit = cache.lookup("openai", _request("another prompt about the liver"),
+                       semantic=("Which genes are expressed in the liver?", CONTEXT + "\nBRCA1 (Gene)"))
+    assert hit == "cached answer" and cache.semantic_hits == 1
+    assert cache.lookup("openai", _request("p3"), semantic=("What drugs treat hypertension?", CONTEXT)) is None
+    assert cache.lookup("openai", _request("p4", model="gpt-4o"),
+                        semantic=("What genes are expressed in liver?", CONTEXT)) is None
+    assert LLMResponseCache().lookup("openai", _request("p5"), semantic=("What genes are expressed in liver?", CONTEXT)) is None
+
+
+def test_gateway_rerun_costs_no_provider_calls():
+    with LLMStubServer() as stub:
+        gateway = LLMGateway(cache=LLMResponseCache())
+        base_url = stub.url + "/v1"
+        first = [gateway.openai_chat("k", _request(f"compare {i}"), base_url=base_url) for i in range(3)]
+        rerun = [gateway.openai_chat("other-key", _request(f"compare {i}"), base_url=base_url) for i in range(3)]
+        assert rerun == first and len(stub.requests) == 3
+        assert asyncio.run(gateway.aopenai_chat("k", _request("compare 0"), base_url=base_url)) == first[0]
+        assert len(stub.requests) == 3
+        stats = gateway.stats()["cache"]
+        assert stats["hits"] == 4 and stats["saved_tokens"] > 0
+
+
+def test_extraction_and_legacy_helpers_share_the_cache(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_default_cache", LLMResponseCache())
+    from text_to_graph_service import TextToGraphService
+
+    created = []
+
+    def create(**request):
+        created.append(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='{"entities": []}'))])
+
+    service = TextToGraphService()
+    service.hf_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    messages = [{"role": "user", "content": "TP53 is expressed in liver."}]
+    for _ in range(2):
+        assert service._hf_chat(model="m", messages=messages, temperature=0.2) == '{"entities": []}'
+    assert len(created) == 1
+
+    graphrag_utils = pytest.importorskip("graphrag_new.utils")
+    graphrag_utils.set_llm_cache("llm", "system", "response", [{"role": "user", "content": "q"}], {"t": 0})
+    assert graphrag_utils.get_llm_cache("llm", "system", [{"role": "user", "content": "q"}], {"t": 0}) == "response"
+    assert llm_cache.get_llm_cache().stats()["entries"] == 2
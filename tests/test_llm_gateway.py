@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست درگاه LLM با سرور محلی جایگزین سرویس‌دهنده‌ها: استفاده مجدد از اتصال، محدودیت
+هم‌زمانی، یکی‌سازی درخواست‌های یکسان، بودجه retry و مسیرهای GraphRAGService و rag_new.llm
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_gateway
+from llm_gateway import LLMGateway, RetryBudget, TokenBucket
+from llm_stub_server import LLMStubServer
+
+
+def _chat(content):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}
+
+
+@pytest.fixture
+def stub():
+    with LLMStubServer() as server:
+        yield server
+
+
+def test_clients_and_connections_are_reused(stub):
+    gateway = LLMGateway()
+    answers = [gateway.openai_chat("k", _chat(f"q{i}"), base_url=stub.url + "/v1") for i in range(5)]
+    assert answers == [f"stub: q{i}" for i in range(5)]
+    assert len(stub.requests) == 5 and len(stub.connections) == 1
+    assert gateway.stats()["clients"] == 1
+    assert gateway.openai_client("k", stub.url + "/v1") is gateway.openai_client("k", stub.url + "/v1")
+
+
+def test_concurrency_limit_and_coalescing(stub):
+    stub.delay = 0.2
+    gateway = LLMGateway(provider_limits={"openai": (2, None, 1)})
+    base_url = stub.url + "/v1"
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        distinct = list(executor.map(lambda i: gateway.openai_chat("k", _chat(f"d{i}"), base_url=base_url), range(6)))
+    assert distinct == [f"stub: d{i}" for i in range(6)]
+    assert stub.max_in_flight == 2
+
+    stub.requests.clear()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        same = list(executor.map(lambda _: gateway.openai_chat("k", _chat("same"), base_url=base_url), range(4)))
+    assert same == ["stub: same"] * 4
+    assert len(stub.requests) == 1
+    assert gateway.stats()["providers"]["openai"]["coalesced"] == 3
+
+
+def test_transient_errors_are_retried_from_shared_budget(stub):
+    gateway = LLMGateway(backoff=0.01)
+    stub.fail_next = [429, 503]
+    assert gateway.openai_chat("k", _chat("retry"), base_url=stub.url + "/v1") == "stub: retry"
+    assert len(stub.requests) == 3
+    assert gateway.stats()["providers"]["openai"]["retries"] == 2
+
+    exhausted = LLMGateway(backoff=0.01, retry_budget=RetryBudget(ratio=0, initial=0))
+    stub.requests.clear()
+    stub.fail_next = [429]
+    with pytest.raises(Exception):
+        exhausted.openai_chat("k", _chat("no budget"), base_url=stub.url + "/v1")
+    assert len(stub.requests) == 1 and exhausted.retry_budget.denied == 1
+
+    stub.fail_next = [400]
+    with pytest.raises(Exception):
+        gateway.openai_chat("k", _chat("bad request"), base_url=stub.url + "/v1")
+    assert stub.fail_next == []
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.perf_counter()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.perf_counter() - started >= 0.09
+
+
+def test_services_route_through_gateway(stub, monkeypatch):
+    from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+    monkeypatch.setattr(llm_gateway, "_default_gateway", LLMGateway())
+    monkeypatch.setenv("OPENAI_BASE_URL", stub.url + "/v1")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", stub.url)
+    service = GraphRAGService()
+    service.create_sample_graph()
+    service.openai_api_key = service.anthropic_api_key = "k"
+
+    result = service.process_query("Where is TP53 expressed?", RetrievalMethod.BFS, GenerationModel.OPENAI_GPT_4O_MINI)
+    assert result["answer"].startswith("stub:")
+    result = service.process_query("Where is TP53 expressed?", RetrievalMethod.BFS, GenerationModel.ANTHROPIC_CLAUDE_3_5_HAIKU)
+    assert result["answer"].startswith("stub:")
+    result = asyncio.run(service.aprocess_query("Where is TP53 expressed?", RetrievalMethod.BFS,
+                                                GenerationModel.OPENAI_GPT_4O_MINI))
+    assert result["answer"].startswith("stub:")
+    assert {path for path, _ in stub.requests} == {"/v1/chat/completions", "/v1/messages"}
+
+    from rag_new.llm.chat_model import AnthropicChat, GptTurbo
+    assert GptTurbo("k", base_url=stub.url + "/v1").chat([{"role": "user", "content": "hi"}]) == "stub: hi"
+    assert AnthropicChat("k").chat([{"role": "system", "content": "s"}, {"role": "user", "content": "yo"}]) == "stub: yo"
+    providers = llm_gateway.get_llm_gateway().stats()["providers"]
+    assert providers["openai"]["requests"] == 3 and providers["anthropic"]["requests"] == 2
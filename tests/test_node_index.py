@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست ایندکس نام نودها (trigram + Aho-Corasick) و تطبیق توکن‌ها با نودها
+"""
+
+import sys
+from pathlib import Path
+
+import networkx as nx
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService
+from graph_indices import AhoCorasick, NodeIndex
+
+
+def _graph():
+    G = nx.DiGraph()
+    G.add_node("Gene::TP53RK", name="TP53RK", kind="Gene")
+    G.add_node("Disease::liver-cancer", name="liver cancer", kind="Disease")
+    G.add_node("Anatomy::liver", name="liver", kind="Anatomy")
+    G.add_node("Gene::TP53", name="TP53", kind="Gene")
+    G.add_node("Gene::APOE", name="Apolipoprotein E variant", kind="Gene")
+    G.add_node("Disease::breast-cancer", name="breast cancer", kind="Disease")
+    G.add_node("Compound::liver", name="liver", kind="Compound")
+    return G
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["HE", "SHE", "HERS", "P53"])
+    matches = sorted(automaton.iter_matches("USHERS TP53"))
+    assert matches == [(3, "HE"), (3, "SHE"), (5, "HERS"), (10, "P53")]
+
+
+def test_first_containing_follows_graph_order():
+    index = NodeIndex(_graph())
+    assert index.node_ids[index.first_containing(["liver"])] == "Disease::liver-cancer"
+    assert index.node_ids[index.first_containing(["cancer", "breast"])] == "Disease::breast-cancer"
+    assert index.first_containing(["liver"], limit=1) is None
+    assert index.first_containing(["zzz"]) is None
+    # زیررشته کوتاه (بدون trigram) با پیمایش خطی
+    assert index.node_ids[index.first_containing(["e"], predicate=index.is_gene)] == "Gene::APOE"
+
+
+def test_famous_gene_synonyms_resolved_at_build():
+    index = NodeIndex(_graph())
+    assert index.node_ids[index.gene_containing_synonym("Apolipoprotein E")] == "Gene::APOE"
+    assert index.node_ids[index.gene_by_exact_name("tp53")] == "Gene::TP53"
+    # ژنی که بعداً اضافه می‌شود هم در نتایج Aho-Corasick ثبت می‌شود
+    index.add_node("Gene::MMP9", {"name": "MMP9", "kind": "Gene"})
+    assert index.node_ids[index.gene_containing_synonym("MMP9")] == "Gene::MMP9"
+
+
+def test_first_named_within_single_pass():
+    index = NodeIndex(_graph())
+    assert index.node_ids[index.first_named_within("mytp53rkx")] == "Gene::TP53RK"
+    assert index.node_ids[index.first_named_within("xtp53x", kind="Gene")] == "Gene::TP53"
+    assert index.node_ids[index.first_named_within("the liver", kind="Compound")] == "Compound::liver"
+    assert index.first_named_within("tp53rk", kind="Gene", limit=0) is None
+    assert index.first_named_within("nothing here") is None
+    # نود جدید خودکاره نوع خودش را باطل می‌کند
+    index.add_node("Gene::BID", {"name": "BID", "kind": "Gene"})
+    assert index.node_ids[index.first_named_within("morbid", kind="Gene")] == "Gene::BID"
+
+
+def test_match_tokens_to_nodes_uses_index():
+    service = GraphRAGService()
+    service.G = _graph()
+    service._post_graph_loaded()
+    matched = service.match_tokens_to_nodes(["TP53", "liver", "Apolipoprotein", "کبد"])
+    assert matched == {
+        "TP53": "Gene::TP53",  # نه TP53RK
+        "liver": "Disease::liver-cancer",
+        "Apolipoprotein": "Gene::APOE",
+        "کبد": "Disease::liver-cancer",
+    }
+    # تغییر مستقیم گراف باعث بازسازی ایندکس می‌شود
+    service.G.add_node("Gene::EGFR", name="EGFR", kind="Gene")
+    assert service.match_tokens_to_nodes(["EGFR"]) == {"EGFR": "Gene::EGFR"}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست PageRank شخصی‌سازی‌شده (random walk with restart) با push محلی
+"""
+
+import sys
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService, RetrievalMethod
+from enhanced_graphrag_service import EnhancedGraphRAGService
+from graph_centrality import personalized_pagerank
+from metaedge_weights import metaedge_edge_weight
+
+
+@pytest.mark.parametrize("directed", [True, False])
+def test_push_matches_power_iteration(directed):
+    G = nx.gnm_random_graph(300, 1200, seed=4, directed=directed)
+    seeds = [3, 17]
+    scores, hops = personalized_pagerank(G, seeds, epsilon=1e-10)
+    restart = {seed: 1.0 for seed in seeds}
+    expected = nx.pagerank(G, personalization=restart, dangling=restart, tol=1e-12, max_iter=1000)
+    assert max(abs(scores.get(n, 0.0) - expected[n]) for n in G) < 1e-7
+    assert all(hops[seed] == 0 for seed in seeds)
+
+
+def test_cost_is_local():
+    G = nx.barabasi_albert_graph(50000, 3, seed=0)
+    scores, hops = personalized_pagerank(G, [12345], epsilon=1e-4)
+    assert 12345 in scores and len(scores) < 2000
+
+
+def test_metaedge_weighting_biases_walk():
+    G = nx.Graph()
+    G.add_edge("Gene::A", "Anatomy::liver", metaedge="GeA")
+    G.add_edge("Gene::A", "Compound::x", metaedge="CiPC")
+    plain, _ = personalized_pagerank(G, ["Gene::A"])
+    weighted, _ = personalized_pagerank(G, ["Gene::A"], edge_weight=metaedge_edge_weight())
+    assert plain["Anatomy::liver"] == pytest.approx(plain["Compound::x"])
+    assert weighted["Anatomy::liver"] > weighted["Compound::x"]
+
+
+def test_retrieval_method_is_seeded_from_query():
+    service = GraphRAGService()
+    service.create_sample_graph()
+    result = service.retrieve_information("Where is BRCA1 expressed?", RetrievalMethod.PERSONALIZED_PAGERANK, max_nodes=5)
+    assert result.nodes[0].id == "Gene::BRCA1" and result.nodes[0].depth == 0
+    scores = [node.score for node in result.nodes]
+    assert scores == sorted(scores, reverse=True)
+    # seedهای متفاوت → رتبه‌بندی متفاوت (برخلاف PageRank سراسری)
+    other = service.retrieve_information("Where is CFTR expressed?", RetrievalMethod.PERSONALIZED_PAGERANK, max_nodes=5)
+    assert other.nodes[0].id == "Gene::CFTR"
+
+
+def test_enhanced_personalized_pagerank_algorithm():
+    service = EnhancedGraphRAGService()
+    service.G = nx.path_graph(["Gene::A", "Gene::B", "Gene::C", "Gene::D"])
+    service.set_config(retrieval_algorithm="personalized_pagerank", ppr_metaedge_weighting=True)
+    results = service.process_query("A?", start_nodes=["Gene::D"])
+    assert results['seeds'] == ["Gene::D"]
+    assert {node['id'] for node in results['nodes'][:2]} == {"Gene::D", "Gene::C"}
+    assert {node['id']: node['depth'] for node in results['nodes']}["Gene::D"] == 0
+    assert results['nodes'][-1]['id'] == "Gene::A"
+    assert results['query_analysis']['algorithm'] == "personalized_pagerank"
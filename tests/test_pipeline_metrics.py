@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست آمار پایپ‌لاین پرسش: هیستوگرام مراحل به تفکیک روش، شمار نودها/یال‌های پیمایش‌شده،
+خروجی /metrics و لاگر سطح‌بندی‌شده GraphRAGService
+"""
+
+import logging
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService, RetrievalMethod, GenerationModel
+from pipeline_metrics import Histogram, PipelineMetrics, get_pipeline_metrics
+from query_context import QueryContext
+
+QUERY = "What genes are expressed in liver?"
+
+
+@pytest.fixture(scope="module")
+def service():
+    return GraphRAGService()
+
+
+@pytest.fixture
+def metrics():
+    metrics = get_pipeline_metrics()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3)]
+    assert histogram.count == 4 and abs(histogram.sum - 2.65) < 1e-9
+
+
+def test_render_prometheus_text_format():
+    metrics = PipelineMetrics(buckets=(0.5,))
+    context = QueryContext("q")
+    context.method = 'BFS'
+    context.record('keywords', 0.25)
+    context.record('traversal', 1.5)
+    context.touch(10, 30)
+    metrics.observe_query(context)
+    metrics.observe_query(QueryContext("q2"), error=True)
+    text = metrics.render_prometheus()
+    assert 'graphrag_stage_duration_seconds_bucket{stage="keyword_extraction",method="BFS",le="0.5"} 1' in text
+    assert 'graphrag_stage_duration_seconds_bucket{stage="traversal",method="BFS",le="0.5"} 0' in text
+    assert 'graphrag_stage_duration_seconds_bucket{stage="traversal",method="BFS",le="+Inf"} 1' in text
+    assert 'graphrag_queries_total{method="unknown",outcome="error"} 1' in text
+    assert 'graphrag_nodes_touched_total{method="BFS"} 10' in text
+    assert 'graphrag_edges_touched_total{method="BFS"} 30' in text
+    for line in text.splitlines():
+        assert line.startswith("#") or re.match(r'^[a-z_]+(\{[^}]*\})? [0-9.e+-]+$', line), line
+
+
+def test_nested_stage_is_counted_once():
+    context = QueryContext("q")
+    with context.stage('traversal'):
+        with context.stage('traversal'):
+            pass
+        with context.stage('path_ranking'):
+            pass
+    assert set(context.timings) == {'traversal', 'path_ranking'}
+    assert context.timings['path_ranking'] <= context.timings['traversal']
+
+
+def test_queries_record_spans_per_method(service, metrics):
+    service.process_query(QUERY, RetrievalMethod.BFS, GenerationModel.GPT_SIMULATION)
+    service.process_query(QUERY, RetrievalMethod.INTELLIGENT, GenerationModel.GPT_SIMULATION,
+                          options={'enable_result_cache': False})
+    service.kgsearch_traceable("Which genes covary with TP53?")
+
+    snapshot = metrics.snapshot()
+    assert {'BFS', 'INTELLIGENT', 'kgsearch'} <= set(snapshot)
+    bfs = snapshot['BFS']
+    assert bfs['ok'] == 1 and bfs['errors'] == 0
+    assert {'keyword_extraction', 'node_matching', 'traversal', 'context_building', 'generation'} <= set(bfs['stages'])
+    assert bfs['nodes_touched'] > 0 and bfs['edges_touched'] >= bfs['nodes_touched'] - 1
+    assert 'intent_analysis' in snapshot['INTELLIGENT']['stages']
+    assert {'traversal', 'path_ranking'} <= set(snapshot['kgsearch']['stages'])
+    assert bfs['query']['count'] == 1
+
+
+def test_batch_queries_are_observed(service, metrics):
+    service.process_queries([QUERY, "How does TP53 relate to cancer?"], retrieval_method=RetrievalMethod.DFS,
+                            options={'enable_result_cache': False})
+    assert metrics.snapshot()['DFS']['ok'] == 2
+
+
+def test_metrics_endpoint():
+    import web_app
+
+    client = web_app.app.test_client()
+    client.post('/api/process_query', json={'query': QUERY, 'retrieval_method': 'BFS',
+                                            'generation_model': 'GPT_SIMULATION'})
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE graphrag_stage_duration_seconds histogram' in text
+    assert 'graphrag_query_duration_seconds_count{method="BFS"}' in text
+    assert client.get('/api/pipeline_metrics').get_json()['success']
+
+
+def test_verbose_trace_is_logged_only_when_enabled(service, caplog, capsys):
+    capsys.readouterr()
+    with caplog.at_level(logging.DEBUG, logger="graphrag_service"):
+        service.retrieve_information(QUERY, RetrievalMethod.INTELLIGENT, options={'enable_result_cache': False})
+        quiet = [r for r in caplog.records if r.levelno == logging.DEBUG]
+        service.retrieve_information(QUERY, RetrievalMethod.INTELLIGENT,
+                                     options={'enable_result_cache': False, 'enable_verbose_logging': True})
+        traced = [r for r in caplog.records if r.levelno == logging.DEBUG]
+    assert quiet == [] and traced
+    assert "🔑" not in capsys.readouterr().out
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست prefork_server: workerهای fork شده روی یک سوکت، بارگذاری مجدد تدریجی پس از
+/api/load_graph و SIGHUP بدون خطای درخواست، و توقف ملایم با SIGTERM
+"""
+
+import json
+import os
+import pickle
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import networkx as nx
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork") or not os.path.isdir("/proc"),
+                                reason="prefork به fork و /proc (لینوکس) نیاز دارد")
+
+
+def _write_graph(path: Path, genes) -> str:
+    G = nx.Graph()
+    G.add_node("Anatomy::liver", name="liver", kind="Anatomy")
+    for gene in genes:
+        G.add_node(f"Gene::{gene}", name=gene, kind="Gene")
+        G.add_edge("Anatomy::liver", f"Gene::{gene}", metaedge="AeG")
+    with open(path, "wb") as f:
+        pickle.dump(G, f)
+    return str(path)
+
+
+def _children(pid: int):
+    children = set()
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == pid:
+                children.add(int(entry))
+    return children
+
+
+def _get(base_url, path):
+    with urllib.request.urlopen(base_url + path, timeout=30) as response:
+        return response.status, json.loads(response.read())
+
+
+def _post(base_url, path, payload):
+    request = urllib.request.Request(base_url + path, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.status, json.loads(response.read())
+
+
+def _wait_for(predicate, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+@pytest.fixture
+def prefork():
+    proc = subprocess.Popen([sys.executable, "prefork_server.py", "--workers", "2", "--port", "0",
+                             "--graceful-timeout", "10"],
+                            cwd=project_root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    base_url = None
+    for line in proc.stdout:
+        match = re.search(r"http://127\.0\.0\.1:(\d+)", line)
+        if match:
+            base_url = f"http://127.0.0.1:{match.group(1)}"
+            break
+    threading.Thread(target=proc.stdout.read, daemon=True).start()
+    try:
+        assert base_url, "prefork master شروع نشد"
+        yield proc, base_url
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def test_rolling_reload_and_graceful_shutdown(prefork, tmp_path):
+    proc, base_url = prefork
+    assert _wait_for(lambda: len(_children(proc.pid)) == 2)
+    initial_workers = _children(proc.pid)
+    assert _get(base_url, "/api/graph_info")[0] == 200
+
+    # ترافیک پیوسته در طول بارگذاری‌های مجدد
+    errors, served, stop = [], [], threading.Event()
+
+    def hammer():
+        while not stop.is_set():
+            try:
+                served.append(_get(base_url, "/api/graph_info")[1]["total_nodes"])
+            except Exception as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=hammer)
+    thread.start()
+    try:
+        status, body = _post(base_url, "/api/load_graph",
+                             {"graph_path": _write_graph(tmp_path / "g.pkl", ["TP53", "BRCA1"])})
+        assert status == 200 and body["success"]
+        # همه workerها جایگزین شده‌اند و همه گراف جدید (۳ نود) را می‌بینند
+        assert _wait_for(lambda: not (_children(proc.pid) & initial_workers) and len(_children(proc.pid)) == 2)
+        assert all(_get(base_url, "/api/graph_info")[1]["total_nodes"] == 3 for _ in range(10))
+
+        reloaded_workers = _children(proc.pid)
+        proc.send_signal(signal.SIGHUP)
+        assert _wait_for(lambda: not (_children(proc.pid) & reloaded_workers) and len(_children(proc.pid)) == 2)
+        assert _get(base_url, "/api/graph_info")[1]["total_nodes"] == 3
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == [] and len(served) > 10
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=30) == 0
+    assert _children(proc.pid) == set()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست زمینه پرسش (QueryContext): محاسبه یک‌باره مراحل پیش‌پردازش و زمان‌بندی مراحل
+"""
+
+import sys
+from collections import Counter
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService, RetrievalMethod, GenerationModel
+from query_context import QueryContext
+
+
+def _counting_service(monkeypatch):
+    service = GraphRAGService()
+    service.create_sample_graph()
+    calls = Counter()
+    for name in ("_extract_keywords", "_analyze_question_intent", "_match_tokens_to_nodes", "_select_core_nodes"):
+        original = getattr(service, name)
+
+        def counted(*args, _name=name, _original=original):
+            calls[_name] += 1
+            return _original(*args)
+        monkeypatch.setattr(service, name, counted)
+    return service, calls
+
+
+def test_memo_records_stage_once():
+    context = QueryContext("q")
+    values = iter([1, 2])
+    assert context.memo("keywords", lambda: next(values)) == 1
+    assert context.memo("keywords", lambda: next(values)) == 1
+    assert context.memo("matches", lambda: next(values), key=("a",)) == 2
+    assert set(context.timings) == {"keywords", "matches"}
+    with context.stage("generation"):
+        pass
+    assert context.timings_ms()["generation"] >= 0.0
+
+
+def test_process_query_computes_each_stage_once(monkeypatch):
+    service, calls = _counting_service(monkeypatch)
+    result = service.process_query("What genes are expressed in liver?", RetrievalMethod.HYBRID_NEW,
+                                   GenerationModel.SIMPLE, text_generation_type='SIMPLE')
+    assert calls["_extract_keywords"] == 1
+    assert calls["_analyze_question_intent"] == 1
+    assert calls["_select_core_nodes"] <= 1
+    # تطبیق کلمات کلیدی پرسش فقط یک‌بار (تطبیق‌های دیگر فقط برای توکن‌های متفاوت)
+    assert calls["_match_tokens_to_nodes"] == 1
+    assert result["matched_nodes"]
+    assert {"keywords", "intent", "matches", "retrieval", "context", "generation"} <= set(result["timings_ms"])
+    # زمینه پس از پایان درخواست بسته می‌شود
+    assert service.current_query_context() is None
+
+
+def test_contexts_are_per_query(monkeypatch):
+    service, calls = _counting_service(monkeypatch)
+    service.kgsearch_traceable("Which genes covary with BRCA1?")
+    first = service.current_query_context()
+    service.kgsearch_traceable("Which genes covary with CFTR?")
+    assert first is None and calls["_analyze_question_intent"] == 2
+    # بیرون از درخواست، بدون زمینه (فقط کش محدود بین درخواست‌ها)
+    service.analyze_question_intent("Where is TP53 expressed?")
+    assert calls["_analyze_question_intent"] == 3
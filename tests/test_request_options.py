@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تنظیمات per-request (RequestOptions) و ایمنی فراخوانی هم‌زمان سرویس
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod, RetrievalResult
+from request_options import RequestOptions
+
+
+def test_options_are_immutable():
+    options = RequestOptions({"max_nodes": 3}, max_edges=4)
+    assert dict(options) == {"max_nodes": 3, "max_edges": 4}
+    with pytest.raises(TypeError):
+        options["max_nodes"] = 5
+    with pytest.raises(AttributeError):
+        options.max_nodes = 5
+    assert dict(options.merged({"max_nodes": 7})) == {"max_nodes": 7, "max_edges": 4}
+
+
+def test_concurrent_requests_see_their_own_config(monkeypatch):
+    service = GraphRAGService()
+    service.create_sample_graph()
+    base = service.get_config()
+    barrier = threading.Barrier(4)
+    seen = {}
+
+    def fake_retrieve(query, method, max_depth, max_nodes):
+        # همه درخواست‌ها هم‌زمان داخل بازیابی هستند
+        barrier.wait(timeout=5)
+        seen[query] = (max_nodes, service.config['max_edges'])
+        with pytest.raises(TypeError):
+            service.config['max_edges'] = 0
+        return RetrievalResult(nodes=[], edges=[], paths=[], context_text="", method=str(method), query=query)
+    monkeypatch.setattr(service, "_retrieve_information", fake_retrieve)
+
+    def run(i):
+        service.retrieve_information(f"q{i}", RetrievalMethod.BFS,
+                                     options=service.request_options(max_nodes=i, max_edges=10 * i))
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {f"q{i}": (i, 10 * i) for i in range(1, 5)}
+    assert service.get_config() == base
+
+
+def test_options_flow_through_process_query():
+    service = GraphRAGService()
+    service.create_sample_graph()
+    result = service.process_query("What genes are expressed in liver?", RetrievalMethod.PAGERANK_BASED,
+                                   GenerationModel.SIMPLE,
+                                   options=RequestOptions(max_nodes=2))
+    assert len(result["retrieved_nodes"]) <= 2
+    assert service.config['max_nodes'] == 10
+    assert "bogus" not in service.request_options(bogus=1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست کش نتایج بازیابی (کلید نرمال‌شده، backend Redis آزمایشی، stampede و باطل‌سازی)
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService, RetrievalMethod
+from rag_new.utils.redis_conn import MockRedisConnection
+from retrieval_cache import RetrievalResultCache, normalize_query
+
+
+def _service(monkeypatch):
+    service = GraphRAGService(result_cache=RetrievalResultCache(backend=MockRedisConnection()))
+    service.create_sample_graph()
+    calls = []
+    original = service._retrieve_information
+
+    def counted(*args):
+        calls.append(args[1])
+        return original(*args)
+    monkeypatch.setattr(service, "_retrieve_information", counted)
+    return service, calls
+
+
+def test_normalize_query():
+    assert normalize_query("  What genes are EXPRESSED in  the liver? ") == "what genes are expressed in the liver"
+    assert normalize_query("ژن‌هاي كبد؟") == normalize_query("ژن های کبد")
+
+
+def test_results_cached_in_redis_backend(monkeypatch):
+    service, calls = _service(monkeypatch)
+    first = service.retrieve_information("What genes are expressed in liver?", RetrievalMethod.BFS)
+    second = service.retrieve_information("what genes are expressed in liver", RetrievalMethod.BFS)
+    assert len(calls) == 1
+    assert second.nodes == first.nodes and second.edges == first.edges
+    assert second.context_text == first.context_text
+    assert second.query == "what genes are expressed in liver"
+    assert all(key.startswith("graphrag:result:retrieval:") for key in service.result_cache.backend.keys())
+
+    # روش، تنظیمات یا گراف متفاوت → کلید متفاوت
+    service.retrieve_information("What genes are expressed in liver?", RetrievalMethod.DFS)
+    service.set_config(max_nodes=3)
+    service.retrieve_information("What genes are expressed in liver?", RetrievalMethod.BFS)
+    service.add_graph_edge("Gene::TP53", "Anatomy::Liver", metaedge="GeA")
+    service.retrieve_information("What genes are expressed in liver?", RetrievalMethod.BFS)
+    assert len(calls) == 4
+
+
+def test_per_query_invalidation(monkeypatch):
+    service, calls = _service(monkeypatch)
+    service.retrieve_information("Where is BRCA1 expressed?", RetrievalMethod.BFS)
+    service.retrieve_information("Where is TP53 expressed?", RetrievalMethod.BFS)
+    hits, _ = service.kgsearch_traceable("Where is BRCA1 expressed?")
+    assert service.kgsearch_traceable("Where is BRCA1 expressed?")[0] == hits
+    assert service.invalidate_result_cache("where is brca1 expressed") == 2
+    service.retrieve_information("Where is TP53 expressed?", RetrievalMethod.BFS)
+    service.retrieve_information("Where is BRCA1 expressed?", RetrievalMethod.BFS)
+    assert len(calls) == 3
+
+
+def test_concurrent_misses_compute_once():
+    cache = RetrievalResultCache()
+    computed = []
+
+    def compute():
+        computed.append(1)
+        time.sleep(0.05)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.get_or_compute("k", compute, lambda v: v, lambda p: p))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(computed) == 1 and results == [{"value": 42}] * 8
+    assert cache.stats()["hits"] == 7
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست ایندکس یال‌های ورودی (نود مقصد، metaedge) و هماهنگی آن با گراف
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import networkx as nx
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GraphRAGService
+from graph_indices import ReverseEdgeIndex
+
+METAEDGES = ['AeG', 'GeA', 'GuA', 'GdA', 'CtD', 'DtC']
+
+
+def _brute_force_sources(G, target, metaedge):
+    """همان پیمایش کامل قبلی روی همه نودها"""
+    found = []
+    for other_node in G.nodes():
+        for neighbor in G.neighbors(other_node):
+            if neighbor == target:
+                edge_data = G.get_edge_data(other_node, neighbor)
+                if edge_data and edge_data.get('metaedge') == metaedge:
+                    found.append(other_node)
+    return found
+
+
+def _random_graph(seed: int, directed: bool = True):
+    rng = random.Random(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    for i in range(40):
+        G.add_node(f"N{i}", name=f"node {i}", kind=rng.choice(['Gene', 'Anatomy']))
+    for _ in range(150):
+        G.add_edge(f"N{rng.randrange(40)}", f"N{rng.randrange(40)}", metaedge=rng.choice(METAEDGES))
+    return G
+
+
+def test_index_matches_full_scan():
+    """نتیجه ایندکس باید با پیمایش کامل گراف (با همان ترتیب) یکسان باشد"""
+    for seed, directed in [(1, True), (2, False)]:
+        G = _random_graph(seed, directed)
+        index = ReverseEdgeIndex(G)
+        for target in G.nodes():
+            for metaedge in METAEDGES:
+                assert index.sources(target, metaedge) == _brute_force_sources(G, target, metaedge)
+            merged = index.sources_any(target, ['GeA', 'GuA', 'GdA'])
+            expected = [(n, G.get_edge_data(n, target)['metaedge']) for n in G.nodes()
+                        if G.has_edge(n, target) and G.get_edge_data(n, target)['metaedge'] in ('GeA', 'GuA', 'GdA')]
+            assert merged == expected
+
+
+def test_index_stays_in_sync_with_graph_edits():
+    """افزودن و حذف یال از طریق سرویس باید ایندکس را به‌روز نگه دارد"""
+    service = GraphRAGService()
+    index = service._get_reverse_index()
+
+    service.add_graph_edge('Gene::TEST1', 'Anatomy::Heart', metaedge='GeA', relation='GeA')
+    assert 'Gene::TEST1' in index.sources('Anatomy::Heart', 'GeA')
+    assert service.G.nodes['Gene::TEST1']['name'] == 'Gene::TEST1'
+    assert service.bfs_search('Gene::TEST1', 1) == [('Gene::TEST1', 0), ('Anatomy::Heart', 1)]
+
+    # تغییر metaedge یک یال موجود
+    service.add_graph_edge('Gene::TEST1', 'Anatomy::Heart', metaedge='GuA', relation='GuA')
+    assert 'Gene::TEST1' not in index.sources('Anatomy::Heart', 'GeA')
+    assert 'Gene::TEST1' in index.sources('Anatomy::Heart', 'GuA')
+
+    service.remove_graph_edge('Gene::TEST1', 'Anatomy::Heart')
+    assert 'Gene::TEST1' not in index.sources('Anatomy::Heart', 'GuA')
+    assert service.bfs_search('Gene::TEST1', 1) == [('Gene::TEST1', 0)]
+
+
+def test_search_by_metaedges_reverse_results():
+    """جستجوی AeG باید ژن‌های دارای یال معکوس GeA را هم برگرداند"""
+    service = GraphRAGService()
+    service.G = nx.DiGraph()
+    service.G.add_node('Anatomy::Liver', name='Liver', kind='Anatomy')
+    service.G.add_node('Gene::ALB', name='ALB', kind='Gene')
+    service.G.add_node('Gene::APOA1', name='APOA1', kind='Gene')
+    service.G.add_edge('Anatomy::Liver', 'Gene::ALB', metaedge='AeG', relation='AeG')
+    service.G.add_edge('Gene::APOA1', 'Anatomy::Liver', metaedge='GeA', relation='GeA')
+    service._post_graph_loaded()
+
+    results = service._search_by_metaedges({'liver': 'Anatomy::Liver'}, {}, ['AeG'], max_depth=1)
+    found = {node_id: score for node_id, _, score, _ in results}
+    assert set(found) == {'Gene::ALB', 'Gene::APOA1'}
+    assert found['Gene::APOA1'] == service._calculate_metaedge_score('GeA', 1) * 0.8
+
+    genes = service._search_genes_expressed_in_anatomy({'liver': 'Anatomy::Liver'}, {}, max_depth=1)
+    assert [g[0] for g in genes] == ['Gene::ALB', 'Gene::APOA1']
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست راه‌اندازی سبک web_app: رجیستری مشترک مدل‌های NLP، NodeLookupSystem مشترک،
+گزارش --profile-startup و عدم بارگذاری وابستگی‌های سنگین در مسیر boot
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import nlp_models
+from startup_profile import format_report, parse_importtime, profile_startup
+
+
+def test_model_registry_loads_each_model_once(monkeypatch):
+    monkeypatch.setattr(nlp_models, "_models", {})
+    monkeypatch.setattr(nlp_models, "_stats", {})
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(nlp_models.get_model("fake:model", slow_loader)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(r) for r in results}) == 1
+
+    def failing_loader():
+        calls.append(1)
+        raise OSError("model not installed")
+
+    assert nlp_models.get_model("fake:missing", failing_loader) is None
+    assert nlp_models.get_model("fake:missing", failing_loader) is None
+    assert len(calls) == 2
+    stats = nlp_models.model_stats()
+    assert stats["fake:model"]["loaded"] and "model not installed" in stats["fake:missing"]["error"]
+
+
+def test_services_share_lazy_resources():
+    from graphrag_service import GraphRAGService
+    from enhanced_context_generator import EnhancedContextGenerator
+    from node_lookup_system import get_node_lookup_system
+
+    assert EnhancedContextGenerator().lookup_system is EnhancedContextGenerator().lookup_system
+    assert get_node_lookup_system() is get_node_lookup_system()
+    service = GraphRAGService()
+    assert service._nlp is not None and "nlp" not in vars(service)
+    assert service.nlp is GraphRAGService().nlp  # هر دو از رجیستری nlp_models
+
+
+def test_parse_importtime_groups_direct_children():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |     numpy.core",
+        "import time:       200 |        300 |   numpy",
+        "import time:        50 |         50 |   flask",
+        "import time:        10 |         10 |   scipy.sparse._base",
+        "import time:        20 |         20 |   scipy.sparse._csr",
+        "import time:        40 |        420 | web_app",
+        "import time:         5 |          5 | later",
+    ])
+    components = parse_importtime(stderr, "web_app")
+    assert [name for name, _ in components] == ["numpy", "flask", "scipy"]
+    assert abs(dict(components)["scipy"] - 0.00003) < 1e-9
+    assert parse_importtime(stderr, "missing") == []
+
+
+def test_web_app_boots_without_heavy_imports_or_models():
+    report = profile_startup(breakdown=False)
+    assert report["healthy"] and report["status"] == 200
+    assert report["heavy_modules"] == []
+    assert report["models"] == {}
+    assert {"imports", "services", "ready"} <= set(report["stages"])
+    assert "boot to healthy probe" in format_report(report)
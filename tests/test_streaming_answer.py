@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تولید پاسخ جریانی (iter_process_query_events) و endpoint SSE /api/process_query_stream
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# اضافه کردن مسیر اصلی پروژه به sys.path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from graphrag_service import GenerationModel, GraphRAGService, RetrievalMethod
+
+QUERY = "What genes are expressed in liver?"
+
+
+def _service():
+    service = GraphRAGService()
+    service.create_sample_graph()
+    return service
+
+
+def test_events_arrive_in_order_and_match_process_query():
+    service = _service()
+    expected = service.process_query(QUERY, RetrievalMethod.BFS, GenerationModel.SIMPLE)
+    events = list(service.iter_process_query_events(QUERY, RetrievalMethod.BFS, GenerationModel.SIMPLE))
+
+    names = [name for name, _ in events]
+    assert names[:2] == ["retrieval", "context"] and names[-1] == "done"
+    assert set(names[2:-1]) == {"token"}
+    retrieval, done = events[0][1], events[-1][1]
+    assert retrieval["retrieved_nodes"] == expected["retrieved_nodes"]
+    assert retrieval["matched_nodes"] == expected["matched_nodes"]
+    assert "".join(payload["text"] for name, payload in events if name == "token") == done["answer"]
+    assert {k: v for k, v in done.items() if k != "timings_ms"} == \
+        {k: v for k, v in expected.items() if k != "timings_ms"}
+    assert {"retrieval", "generation"} <= set(done["timings_ms"])
+
+
+def test_remote_models_use_provider_stream(monkeypatch):
+    service = _service()
+    service.openai_api_key = "test-key"
+    monkeypatch.setattr(service, "_remote_answer_stream", lambda prompt, model: iter([" TP53 ", "is ", "expressed. "]))
+    events = list(service.iter_process_query_events(QUERY, RetrievalMethod.BFS, GenerationModel.OPENAI_GPT_4O,
+                                                    text_generation_type="SIMPLE"))
+    assert [p["text"] for name, p in events if name == "token"] == [" TP53 ", "is ", "expressed. "]
+    assert events[-1][1]["answer"] == "TP53 is expressed."
+    assert events[-1][1]["confidence"] == 0.95
+
+    def broken(prompt, model):
+        raise ConnectionError("offline")
+        yield
+    monkeypatch.setattr(service, "_remote_answer_stream", broken)
+    done = list(service.iter_process_query_events(QUERY, RetrievalMethod.BFS, GenerationModel.OPENAI_GPT_4O))[-1][1]
+    assert done["answer"]
+
+
+def test_sse_endpoint():
+    import web_app
+    client = web_app.app.test_client()
+    response = client.post("/api/process_query_stream", json={"query": QUERY, "generation_model": "SIMPLE"})
+    assert response.status_code == 200 and response.mimetype == "text/event-stream"
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    assert events[0][0] == "retrieval" and events[-1][0] == "done"
+    assert events[-1][1]["success"] is True
+    assert events[-1][1]["result"]["advanced_settings"]["max_nodes"] == 20
+
+    bad = client.post("/api/process_query_stream", json={"query": QUERY, "retrieval_method": "NOPE"})
+    assert bad.status_code == 400
@@ -5,29 +5,31 @@
 
 import re
 import json
+import importlib.util
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from urllib.parse import quote
 import networkx as nx
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 
-# Try to import spaCy
-try:
-    import spacy
-    from spacy.lang.en.stop_words import STOP_WORDS
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
-    spacy = None
+from llm_cache import get_llm_cache
 
-# Try to import OpenAI
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    openai = None
+# spaCy (مدل‌ها از رجیستری مشترک nlp_models و در صورت نیاز بارگذاری می‌شوند)
+from nlp_models import get_spacy_model, spacy_available
+from doc_pipeline import get_doc_pipeline
+from extraction_cache import extraction_key, get_extraction_cache
+from chunk_executor import ChunkExtractionExecutor, uses_spacy
+from incremental_graph_builder import IncrementalGraphBuilder, edge_attributes, node_attributes
+SPACY_AVAILABLE = spacy_available()
+
+# روش‌های قابل ترکیب در extract_hybrid
+HYBRID_CPU_METHODS = ("simple", "spacy", "spacy_svo_enhanced")
+HYBRID_LLM_METHODS = ("llm", "llm_multipass")
+
+# OpenAI availability (the client itself is created through llm_gateway when needed)
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 
 # Try to import HuggingFace
 try:
@@ -70,10 +72,17 @@
     detect_language = None
     is_persian = None
 
-# Import new extraction modules
+# Chunking/merging for long texts (بدون وابستگی به torch)
 try:
     from smart_chunker import SmartChunker, ChunkingStrategy, SlidingWindowProcessor
     from hierarchical_merger import HierarchicalMerger
+    CHUNKING_AVAILABLE = True
+except ImportError as e:
+    CHUNKING_AVAILABLE = False
+    logging.warning(f"Chunking modules not available: {e}")
+
+# Import new extraction modules
+try:
     from modular_pipeline import ModularExtractionPipeline
     from span_based_extractor import SpanBasedExtractor, BioBERTExtractor, SciBERTExtractor
     from bert_relation_extractor import BERTRelationExtractor
@@ -113,26 +122,18 @@ def __init__(self, openai_api_key: Optional[str] = None, spacy_model: str = "en_
         
         # Initialize spaCy if available
         if SPACY_AVAILABLE:
-            # Load English model
-            try:
-                self.nlp = spacy.load(spacy_model)
-                logging.info(f"Loaded spaCy model: {spacy_model}")
-            except OSError:
-                try:
-                    # Try biomedical model
-                    self.nlp = spacy.load("en_ner_bionlp13cg_md")
-                    logging.info("Loaded biomedical spaCy model")
-                except OSError:
+            # Load English model (shared per process via nlp_models)
+            self.nlp = get_spacy_model(spacy_model)
+            if self.nlp is None:
+                # Try biomedical model
+                self.nlp = get_spacy_model("en_ner_bionlp13cg_md")
+                if self.nlp is None:
                     logging.warning(f"spaCy model {spacy_model} not found. spaCy extraction will be disabled.")
-                    self.nlp = None
             
             # Try to load Persian model
-            try:
-                self.nlp_fa = spacy.load("fa_core_news_sm")
-                logging.info("Loaded Persian spaCy model: fa_core_news_sm")
-            except OSError:
+            self.nlp_fa = get_spacy_model("fa_core_news_sm")
+            if self.nlp_fa is None:
                 logging.warning("Persian spaCy model (fa_core_news_sm) not found. Install with: python -m spacy download fa_core_news_sm")
-                self.nlp_fa = None
         
         # Initialize OpenAI if available (currently disabled due to token issues)
         self.openai_client = None
@@ -181,6 +182,9 @@ def __init__(self, openai_api_key: Optional[str] = None, spacy_model: str = "en_
             except Exception as e:
                 logging.warning(f"Failed to initialize EntityResolution: {e}")
                 self.entity_resolution = None
+        
+        # کش پایدار نتایج استخراج (مشترک فرایند؛ None اگر GRAPHRAG_EXTRACTION_CACHE=off)
+        self.extraction_cache = get_extraction_cache()
     
     def _detect_text_language(self, text: str) -> str:
         """
@@ -229,6 +233,11 @@ def _get_spacy_model(self, language: str = "auto"):
         
         return self.nlp  # Fallback to English
     
+    @property
+    def doc_pipeline(self):
+        """مرحله مشترک پردازش spaCy برای self.nlp (None اگر مدلی بارگذاری نشده باشد)"""
+        return get_doc_pipeline(self.nlp)
+    
     def _preprocess_text_for_graph(self, text: str, language: str = "auto", 
                                     remove_stop_words: bool = True) -> str:
         """
@@ -343,7 +352,8 @@ def extract_simple(self, text: str, max_entities: int = 100, max_relationships:
         
         # Extract potential genes
         genes = re.findall(gene_pattern, text)
-        for gene in set(genes):
+        # ترتیب اولین رخداد (ترتیب set به hash seed فرایند بستگی دارد و شناسه‌ها را عوض می‌کند)
+        for gene in dict.fromkeys(genes):
             if len(gene) >= 2 and gene not in entity_map:
                 entity_id = f"GENE_{len(entities)}"
                 entities.append({
@@ -373,7 +383,7 @@ def extract_simple(self, text: str, max_entities: int = 100, max_relationships:
         
         # Extract compounds
         compounds = re.findall(compound_pattern, text_lower)
-        for compound in set(compounds):
+        for compound in dict.fromkeys(compounds):
             if compound not in entity_map:
                 entity_id = f"COMPOUND_{len(entities)}"
                 entities.append({
@@ -490,8 +500,8 @@ def extract_spacy(self, text: str, max_entities: int = 100, max_relationships: i
         relationships = []
         entity_map = {}
         
-        # Process text with spaCy
-        doc = self.nlp(text)
+        # Process text with spaCy (Doc مشترک با chunker و سایر استخراج‌کننده‌ها)
+        doc = self.doc_pipeline.doc(text)
         
         # Extract named entities
         for ent in doc.ents:
@@ -520,7 +530,7 @@ def extract_spacy(self, text: str, max_entities: int = 100, max_relationships: i
             chunk_text = chunk.text.strip()
             if len(chunk_text.split()) <= 5 and chunk_text not in entity_map:
                 # Check if it's not a stop word
-                if not all(word.lower() in STOP_WORDS for word in chunk_text.split()):
+                if not all(word.lower() in self.nlp.Defaults.stop_words for word in chunk_text.split()):
                     entity_id = f"ENTITY_{len(entities)}"
                     entities.append({
                         "id": entity_id,
@@ -689,6 +699,23 @@ def extract_spacy(self, text: str, max_entities: int = 100, max_relationships: i
             }
         }
     
+    def _hf_chat(self, **request) -> Optional[str]:
+        """
+        متن پاسخ chat.completions از HuggingFace (None برای پاسخ نامعتبر)
+
+        پاسخ‌ها در کش مشترک پاسخ‌های LLM (llm_cache) ذخیره می‌شوند تا استخراج دوباره همان
+        متن با همان مدل و تنظیمات بدون فراخوانی API انجام شود.
+        """
+        def call():
+            response = self.hf_client.chat.completions.create(**request)
+            if not response or not hasattr(response, 'choices') or not response.choices:
+                logging.error(f"❌ Invalid response structure: {response}")
+                return None
+            return response.choices[0].message.content
+
+        cache = get_llm_cache()
+        return cache.get_or_call('huggingface', request, call) if cache is not None else call()
+
     def extract_llm(self, text: str, model: str = "gpt-4o", max_entities: int = 100, 
                     max_relationships: int = 200, confidence_threshold: float = 0.5) -> Dict[str, Any]:
         """
@@ -810,7 +837,7 @@ def _extract_llm_huggingface(self, text: str, model: str, max_entities: int, max
                 raise ValueError("❌ HuggingFace client not initialized. لطفاً توکن را بررسی کنید.")
             
             try:
-                response = self.hf_client.chat.completions.create(
+                response_text = self._hf_chat(
                     model=model,
                     messages=[
                         {"role": "system", "content": system_prompt},
@@ -819,7 +846,7 @@ def _extract_llm_huggingface(self, text: str, model: str, max_entities: int, max
                     temperature=0.2,
                     max_tokens=4096,
                 )
-                logging.info(f"✅ API call successful, response type: {type(response)}")
+                logging.info("✅ API call successful")
             except Exception as api_error:
                 error_type = type(api_error).__name__
                 error_msg = str(api_error)
@@ -837,11 +864,10 @@ def _extract_llm_huggingface(self, text: str, model: str, max_entities: int, max
                 else:
                     raise ValueError(f"❌ خطا در ارتباط با HuggingFace API: {error_msg}\nلطفاً توکن و مدل را بررسی کنید.")
             
-            if not response or not hasattr(response, 'choices') or not response.choices:
-                logging.error(f"❌ Invalid response structure: {response}")
+            if response_text is None:
                 raise ValueError("❌ پاسخ نامعتبر از HuggingFace API دریافت شد. لطفاً توکن و مدل را بررسی کنید.")
             
-            response_text = response.choices[0].message.content.strip()
+            response_text = response_text.strip()
             logging.info(f"✅ Received response from HuggingFace (length: {len(response_text)} chars)")
             logging.info(f"📝 Response starts with: {repr(response_text[:200])}")
             logging.info(f"📝 Response preview: {response_text[:300]}")
@@ -1001,7 +1027,7 @@ def pick_entity_for_span(ents_by_char: List[Tuple[int, int, str]], start: int, e
                     return text
             return None
         
-        doc = self.nlp(text)
+        doc = self.doc_pipeline.doc(text)
         entities = []
         relationships = []
         entity_map = {}
@@ -1032,7 +1058,7 @@ def pick_entity_for_span(ents_by_char: List[Tuple[int, int, str]], start: int, e
         for chunk in doc.noun_chunks:
             chunk_text = normalize(chunk.text)
             if len(chunk_text.split()) <= 5 and chunk_text not in entity_map:
-                if not all(word.lower() in STOP_WORDS for word in chunk_text.split()):
+                if not all(word.lower() in self.nlp.Defaults.stop_words for word in chunk_text.split()):
                     entity_id = f"ENTITY_{len(entities)}"
                     entities.append({
                         "id": entity_id,
@@ -1201,14 +1227,12 @@ def extract_llm_multipass(self, text: str, model: str = "mistralai/Mistral-7B-In
         
         try:
             # Initial extraction
-            response = self.hf_client.chat.completions.create(
+            response_text = self._hf_chat(
                 model=model,
                 messages=history,
                 temperature=0.2,
                 max_tokens=4096,
-            )
-            
-            response_text = response.choices[0].message.content.strip()
+            ).strip()
             history.append({"role": "assistant", "content": response_text})
             
             # Parse initial response
@@ -1256,14 +1280,12 @@ def extract_llm_multipass(self, text: str, model: str = "mistralai/Mistral-7B-In
                     "Output ONLY valid JSON.\n"
                 )
                 history.append({"role": "user", "content": followup_prompt})
-                response = self.hf_client.chat.completions.create(
+                response_text = self._hf_chat(
                     model=model,
                     messages=history,
                     temperature=0.2,
                     max_tokens=4096,
-                )
-                
-                response_text = response.choices[0].message.content.strip()
+                ).strip()
                 history.append({"role": "assistant", "content": response_text})
                 
                 # Parse additional entities
@@ -1624,10 +1646,19 @@ def _parse_llm_response(self, response_text: str) -> Optional[Dict[str, Any]]:
     
     def extract_hybrid(self, text: str, max_entities: int = 100, max_relationships: int = 200,
                       methods: List[str] = None, confidence_threshold: float = 0.5,
-                      original_text: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+                      original_text: Optional[str] = None, deadline: Optional[float] = None,
+                      **kwargs) -> Dict[str, Any]:
         """
         استخراج ترکیبی: ترکیب نتایج از چندین روش
         
+        روش‌ها هم‌زمان اجرا می‌شوند: روش‌های CPU-bound (simple، spacy، spacy_svo_enhanced) به
+        ترتیب در یک worker و هر روش LLM در thread خودش (محدودیت هم‌زمانی درخواست‌ها با
+        llm_gateway است). نتیجه هر روش به محض پایان آن و روش‌های پیش از آن در methods، در
+        entity_map/relationship_map ادغام می‌شود؛ پس خروجی مستقل از ترتیب پایان روش‌ها و برابر
+        اجرای ترتیبی است. با deadline، روش‌هایی که تا آن زمان تمام نشده‌اند کنار گذاشته می‌شوند و
+        ادغام جزئی (با partial=True) برگردانده می‌شود؛ روشی که خطا دهد هم در
+        stats.failed_methods ثبت و نتیجه partial می‌شود.
+        
         Args:
             text: متن ورودی (ممکن است پیش‌پردازش شده باشد)
             max_entities: حداکثر تعداد موجودیت‌ها
@@ -1635,13 +1666,15 @@ def extract_hybrid(self, text: str, max_entities: int = 100, max_relationships:
             methods: لیست روش‌های استخراج (پیش‌فرض: ['spacy', 'llm'])
             confidence_threshold: حداقل confidence برای روابط
             original_text: متن اصلی (برای استفاده در LLM - اگر preprocessing فعال باشد)
+            deadline: حداکثر زمان انتظار برای روش‌ها به ثانیه (None = انتظار برای همه)
             **kwargs: پارامترهای اضافی
             
         Returns:
             Dictionary containing entities and relationships
         """
+        hybrid_methods = kwargs.pop("hybrid_methods", ['spacy', 'llm'])
         if methods is None:
-            methods = kwargs.get("hybrid_methods", ['spacy', 'llm'])
+            methods = hybrid_methods
         
         # استفاده از متن اصلی برای LLM (اگر موجود باشد)
         llm_text = original_text if original_text else text
@@ -1649,83 +1682,142 @@ def extract_hybrid(self, text: str, max_entities: int = 100, max_relationships:
         all_entities = []
         all_relationships = []
         entity_map = {}  # name -> entity
+        entity_index = {}  # name -> position in all_entities
         relationship_map = {}  # (source, target, metaedge) -> relationship
         
-        # Run each method
-        for method in methods:
-            try:
-                # برای LLM: از متن اصلی استفاده کن (حتی اگر preprocessing فعال باشد)
-                # برای بقیه: از متن پیش‌پردازش شده استفاده کن
-                text_for_method = llm_text if method in ["llm", "llm_multipass"] else text
-                
-                if method == "simple":
-                    result = self.extract_simple(text_for_method, max_entities=max_entities, max_relationships=max_relationships)
-                elif method == "spacy":
-                    result = self.extract_spacy(text_for_method, max_entities=max_entities, max_relationships=max_relationships)
-                elif method == "spacy_svo_enhanced":
-                    result = self.extract_spacy_svo_enhanced(text_for_method, max_entities=max_entities, max_relationships=max_relationships)
-                elif method == "llm":
-                    result = self.extract_llm(llm_text, max_entities=max_entities, max_relationships=max_relationships, 
-                                            confidence_threshold=confidence_threshold, **kwargs)
-                elif method == "llm_multipass":
-                    result = self.extract_llm_multipass(llm_text, max_entities=max_entities, max_relationships=max_relationships,
-                                                      confidence_threshold=confidence_threshold, **kwargs)
-                else:
-                    logging.warning(f"Unknown method: {method}, skipping")
-                    continue
+        def run(method):
+            # برای LLM: از متن اصلی استفاده کن (حتی اگر preprocessing فعال باشد)
+            # برای بقیه: از متن پیش‌پردازش شده استفاده کن
+            if method == "simple":
+                return self.extract_simple(text, max_entities=max_entities, max_relationships=max_relationships)
+            elif method == "spacy":
+                return self.extract_spacy(text, max_entities=max_entities, max_relationships=max_relationships)
+            elif method == "spacy_svo_enhanced":
+                return self.extract_spacy_svo_enhanced(text, max_entities=max_entities, max_relationships=max_relationships)
+            elif method == "llm":
+                return self.extract_llm(llm_text, max_entities=max_entities, max_relationships=max_relationships, 
+                                        confidence_threshold=confidence_threshold, **kwargs)
+            else:  # llm_multipass
+                return self.extract_llm_multipass(llm_text, max_entities=max_entities, max_relationships=max_relationships,
+                                                  confidence_threshold=confidence_threshold, **kwargs)
+        
+        def merge(result):
+            # Merge entities (prefer higher confidence)
+            for ent in result.get("entities", []):
+                ent_name = ent.get("name", "")
                 
-                # Merge entities (prefer higher confidence)
-                for ent in result.get("entities", []):
-                    ent_name = ent.get("name", "")
-                    ent_id = ent.get("id", "")
+                if ent_name in entity_map:
+                    # Merge: keep entity with higher confidence or more attributes
+                    existing = entity_map[ent_name]
+                    existing_conf = existing.get("attributes", {}).get("confidence", 0.5)
+                    new_conf = ent.get("attributes", {}).get("confidence", 0.5)
                     
-                    if ent_name in entity_map:
-                        # Merge: keep entity with higher confidence or more attributes
-                        existing = entity_map[ent_name]
-                        existing_conf = existing.get("attributes", {}).get("confidence", 0.5)
-                        new_conf = ent.get("attributes", {}).get("confidence", 0.5)
-                        
-                        if new_conf > existing_conf or len(ent.get("attributes", {})) > len(existing.get("attributes", {})):
-                            entity_map[ent_name] = ent
-                            # Update in all_entities
-                            for i, e in enumerate(all_entities):
-                                if e.get("name") == ent_name:
-                                    all_entities[i] = ent
-                                    break
-                    else:
+                    if new_conf > existing_conf or len(ent.get("attributes", {})) > len(existing.get("attributes", {})):
                         entity_map[ent_name] = ent
-                        all_entities.append(ent)
+                        all_entities[entity_index[ent_name]] = ent
+                else:
+                    entity_map[ent_name] = ent
+                    entity_index[ent_name] = len(all_entities)
+                    all_entities.append(ent)
+            
+            # Merge relationships
+            for rel in result.get("relationships", []):
+                source = rel.get("source")
+                target = rel.get("target")
+                metaedge = rel.get("metaedge", "GiG")
+                key = (source, target, metaedge)
                 
-                # Merge relationships
-                for rel in result.get("relationships", []):
-                    source = rel.get("source")
-                    target = rel.get("target")
-                    metaedge = rel.get("metaedge", "GiG")
-                    key = (source, target, metaedge)
+                if key in relationship_map:
+                    # Merge: combine attributes, increase confidence
+                    existing = relationship_map[key]
+                    existing_weight = existing.get("attributes", {}).get("weight", 1.0)
+                    new_weight = rel.get("attributes", {}).get("weight", 1.0)
                     
-                    if key in relationship_map:
-                        # Merge: combine attributes, increase confidence
-                        existing = relationship_map[key]
-                        existing_weight = existing.get("attributes", {}).get("weight", 1.0)
-                        new_weight = rel.get("attributes", {}).get("weight", 1.0)
-                        
-                        # Combine descriptions
-                        existing_desc = existing.get("attributes", {}).get("description", "")
-                        new_desc = rel.get("attributes", {}).get("description", "")
-                        if new_desc and new_desc not in existing_desc:
-                            existing.get("attributes", {})["description"] = f"{existing_desc}; {new_desc}"
-                        
-                        # Update weight
-                        existing.get("attributes", {})["weight"] = existing_weight + new_weight
-                        existing.get("attributes", {})["confidence"] = min(1.0, (existing.get("attributes", {}).get("confidence", 0.5) + 
-                                                                                rel.get("attributes", {}).get("confidence", 0.5)) / 2)
-                    else:
-                        relationship_map[key] = rel
-                        all_relationships.append(rel)
-                        
+                    # Combine descriptions
+                    existing_desc = existing.get("attributes", {}).get("description", "")
+                    new_desc = rel.get("attributes", {}).get("description", "")
+                    if new_desc and new_desc not in existing_desc:
+                        existing.get("attributes", {})["description"] = f"{existing_desc}; {new_desc}"
+                    
+                    # Update weight
+                    existing.get("attributes", {})["weight"] = existing_weight + new_weight
+                    existing.get("attributes", {})["confidence"] = min(1.0, (existing.get("attributes", {}).get("confidence", 0.5) + 
+                                                                            rel.get("attributes", {}).get("confidence", 0.5)) / 2)
+                else:
+                    relationship_map[key] = rel
+                    all_relationships.append(rel)
+        
+        runnable = []
+        for method in methods:
+            if method in HYBRID_CPU_METHODS or method in HYBRID_LLM_METHODS:
+                runnable.append(method)
+            else:
+                logging.warning(f"Unknown method: {method}, skipping")
+        
+        # Run methods concurrently: CPU methods in one worker, each LLM method in its own thread
+        num_llm = sum(1 for method in runnable if method in HYBRID_LLM_METHODS)
+        cpu_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hybrid-cpu")
+        llm_pool = ThreadPoolExecutor(max_workers=num_llm, thread_name_prefix="hybrid-llm") if num_llm else None
+        futures = {(llm_pool if method in HYBRID_LLM_METHODS else cpu_pool).submit(run, method): rank
+                   for rank, method in enumerate(runnable)}
+        pending = set(futures)
+        # نتیجه روش‌های تمام‌شده (None برای روش ناموفق) تا ادغام به ترتیب methods
+        finished = {}
+        next_rank = 0
+        timed_out_ranks = []
+        
+        def merge_ready():
+            # ادغام به ترتیب methods (همان ترتیب اجرای ترتیبی)؛ تقدم در confidence برابر، ترتیب
+            # توضیحات روابط و برش max_entities به ترتیب پایان روش‌ها بستگی ندارد
+            nonlocal next_rank
+            while next_rank in finished:
+                if finished[next_rank] is not None:
+                    merge(finished[next_rank])
+                next_rank += 1
+        
+        def collect(future):
+            rank = futures[future]
+            pending.discard(future)
+            try:
+                finished[rank] = future.result()
             except Exception as e:
-                logging.warning(f"Error in hybrid extraction with method {method}: {e}")
+                logging.warning(f"Error in hybrid extraction with method {runnable[rank]}: {e}")
+                finished[rank] = None
+            merge_ready()
+        
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                collect(future)
+        except FuturesTimeoutError:
+            # روش‌هایی که در همین فاصله تمام شده‌اند هنوز (به ترتیب methods) ادغام می‌شوند
+            for future in [f for f in futures if f in pending and f.done()]:
+                collect(future)
+            timed_out_ranks = sorted(futures[f] for f in pending)
+            for rank in timed_out_ranks:
+                finished[rank] = None
+            merge_ready()
+            logging.warning(f"Hybrid extraction deadline ({deadline}s) reached; "
+                            f"skipped methods: {[runnable[rank] for rank in timed_out_ranks]}")
+        finally:
+            # روش‌های شروع‌نشده لغو می‌شوند؛ درخواست‌های LLM در حال اجرا منتظر نمی‌مانند
+            # (shutdown(cancel_futures=True) در Python 3.8 وجود ندارد)
+            for future in pending:
+                future.cancel()
+            for pool in (cpu_pool, llm_pool):
+                if pool is not None:
+                    pool.shutdown(wait=not timed_out_ranks)
+        
+        completed, failed, timed_out = [], [], []
+        for rank, method in enumerate(runnable):
+            method_result = finished.get(rank)
+            if rank in timed_out_ranks:
+                timed_out.append(method)
                 continue
+            # روشی که خطا را در نتیجه برمی‌گرداند (مثلاً timeout در extract_llm) هم ناموفق است
+            if method_result is None or method_result.get("error") or method_result.get("partial"):
+                failed.append(method)
+            else:
+                completed.append(method)
         
         # Filter by confidence
         if confidence_threshold > 0:
@@ -1740,15 +1832,22 @@ def extract_hybrid(self, text: str, max_entities: int = 100, max_relationships:
         all_entities = all_entities[:max_entities]
         all_relationships = all_relationships[:max_relationships]
         
-        return {
+        result = {
             "entities": all_entities,
             "relationships": all_relationships,
             "method": f"hybrid_{'+'.join(methods)}",
             "stats": {
                 "num_entities": len(all_entities),
-                "num_relationships": len(all_relationships)
+                "num_relationships": len(all_relationships),
+                "completed_methods": completed,
+                "failed_methods": failed,
+                "timed_out_methods": timed_out
             }
         }
+        # ادغام بدون روش‌های ناموفق یا دیرکرده جزئی است و در کش ذخیره نمی‌شود
+        if failed or timed_out:
+            result["partial"] = True
+        return result
     
     def build_graph(self, extraction_result: Dict[str, Any]) -> nx.MultiDiGraph:
         """
@@ -1788,21 +1887,8 @@ def build_graph(self, extraction_result: Dict[str, Any]) -> nx.MultiDiGraph:
                 logging.warning(f"Entity missing ID: {entity}")
                 continue
             
-            entity_name = entity.get("name", entity_id)
-            entity_type = entity.get("type", "Unknown")
-            attributes = entity.get("attributes", {})
-            
-            if not isinstance(attributes, dict):
-                attributes = {}
-            
             try:
-                G.add_node(
-                    entity_id,
-                    name=entity_name,
-                    kind=entity_type,
-                    type=entity_type,
-                    **attributes
-                )
+                G.add_node(entity_id, **node_attributes(entity))
             except Exception as e:
                 logging.warning(f"Error adding node {entity_id}: {e}")
                 continue
@@ -1820,42 +1906,13 @@ def build_graph(self, extraction_result: Dict[str, Any]) -> nx.MultiDiGraph:
             
             source = rel.get("source")
             target = rel.get("target")
-            metaedge = rel.get("metaedge", "related_to")
-            attributes = rel.get("attributes", {})
-            
             if not source or not target:
                 logging.warning(f"Relationship missing source or target: {rel}")
                 continue
             
-            if not isinstance(attributes, dict):
-                attributes = {}
-            
             if G.has_node(source) and G.has_node(target):
                 try:
-                    # استخراج نام رابطه از rel یا attributes
-                    relation_name = rel.get("relation")
-                    if not relation_name:
-                        # سعی کن از attributes استخراج کن
-                        relation_name = attributes.get("description") or attributes.get("verb") or attributes.get("pattern")
-                    if not relation_name:
-                        # Fallback: استفاده از metaedge
-                        relation_name = metaedge
-                    
-                    # Add edge with both metaedge and relation
-                    # Store relation meaning for display
-                    relation_meaning = relation_name
-                    if metaedge and metaedge != relation_name:
-                        # If we have a metaedge code, add it as context
-                        relation_meaning = f"{relation_name} ({metaedge})"
-                    
-                    G.add_edge(
-                        source,
-                        target,
-                        metaedge=metaedge,  # Hetionet code
-                        relation=relation_name,  # نام واقعی رابطه از متن
-                        relation_meaning=relation_meaning,  # مفهوم رابطه برای نمایش
-                        **attributes
-                    )
+                    G.add_edge(source, target, **edge_attributes(rel))
                     edges_added += 1
                 except Exception as e:
                     logging.warning(f"Error adding edge {source} -> {target}: {e}")
@@ -2430,7 +2487,8 @@ def extract_with_coreference(self, text: str, base_method: str = "spacy",
     def extract_long_text(self, text: str, method: str = "spacy", 
                          chunking_strategy: str = "smart", chunk_overlap: float = 0.2,
                          max_tokens: int = 512, max_entities: int = 100, 
-                         max_relationships: int = 200, **kwargs) -> Dict[str, Any]:
+                         max_relationships: int = 200, max_workers: Optional[int] = None,
+                         **kwargs) -> Dict[str, Any]:
         """
         استخراج از متن‌های طولانی با chunking
         
@@ -2442,12 +2500,13 @@ def extract_long_text(self, text: str, method: str = "spacy",
             max_tokens: حداکثر توکن در هر chunk
             max_entities: حداکثر تعداد موجودیت‌ها
             max_relationships: حداکثر تعداد روابط
+            max_workers: تعداد فرایندهای استخراج موازی chunkها (1 = ترتیبی؛ ChunkExtractionExecutor)
             **kwargs: پارامترهای اضافی
             
         Returns:
-            Dictionary containing entities and relationships
+            Dictionary containing entities and relationships (زمان هر chunk در stats.chunk_timings)
         """
-        if not NEW_MODULES_AVAILABLE:
+        if not CHUNKING_AVAILABLE:
             raise ValueError("ماژول‌های chunking در دسترس نیستند.")
         
         language = self._detect_text_language(text)
@@ -2464,7 +2523,8 @@ def extract_long_text(self, text: str, method: str = "spacy",
             strategy=strategy_map.get(chunking_strategy, ChunkingStrategy.SMART),
             max_tokens=max_tokens,
             overlap_ratio=chunk_overlap,
-            language=language
+            language=language,
+            doc_pipeline=self.doc_pipeline if language != "fa" else None
         )
         
         # Chunk text
@@ -2475,46 +2535,63 @@ def extract_long_text(self, text: str, method: str = "spacy",
             return self.extract(text, method=method, max_entities=max_entities, 
                               max_relationships=max_relationships, **kwargs)
         
-        # Process each chunk
-        chunk_results = []
-        for chunk_data in chunks:
-            chunk_text = chunk_data.get("text", "")
-            if not chunk_text:
-                continue
-            
-            try:
-                result = self.extract(chunk_text, method=method, max_entities=max_entities, 
-                                     max_relationships=max_relationships, **kwargs)
-                result["chunk_metadata"] = chunk_data
-                chunk_results.append(result)
-            except Exception as e:
-                logging.warning(f"Error processing chunk: {e}")
-                continue
+        executor = ChunkExtractionExecutor(self, max_workers=max_workers)
+        
+        # پردازش دسته‌ای همه chunkها با nlp.pipe پیش از استخراج؛ extract_spacy هر chunk Doc را از
+        # کش DocPipeline برمی‌دارد (workerهای process pool مدل و کش Doc خودشان را دارند)
+        if (self.nlp and uses_spacy(method, kwargs) and not kwargs.get("enable_preprocessing")
+                and executor.in_process(method, kwargs, len(chunks))):
+            self.doc_pipeline.parse(chunk["text"] for chunk in chunks[:self.doc_pipeline.docs.max_entries])
         
-        # Merge results hierarchically
+        # Merge results hierarchically (هر chunk به محض آماده شدن و به ترتیب افزوده می‌شود)
         merger = HierarchicalMerger(
             weight_by_frequency=True,
             min_confidence=kwargs.get("min_confidence", 0.5)
         )
         
-        merged_result = merger.merge_chunk_results(chunk_results)
+        # Process chunks in parallel
+        chunk_timings = []
+        failed_chunks = []
+        for outcome in executor.map(chunks, method, max_entities=max_entities,
+                                    max_relationships=max_relationships, **kwargs):
+            chunk_timings.append(outcome.timing())
+            if outcome.failed:
+                failed_chunks.append(outcome.index)
+            if outcome.error is not None:
+                logging.warning(f"Error processing chunk: {outcome.error}")
+                continue
+            result = outcome.result
+            result["chunk_metadata"] = outcome.chunk
+            merger.add_chunk_result(result)
         
-        return {
+        merged_result = merger.merged()
+        
+        result = {
             "entities": merged_result.get("entities", [])[:max_entities],
             "relationships": merged_result.get("relationships", [])[:max_relationships],
             "method": f"{method}_long_text_{chunking_strategy}",
             "stats": {
                 "num_entities": len(merged_result.get("entities", [])),
                 "num_relationships": len(merged_result.get("relationships", [])),
-                "num_chunks": len(chunks)
+                "num_chunks": len(chunks),
+                "chunk_timings": chunk_timings
             }
         }
+        # نتیجه بدون chunk های ناموفق جزئی است و در کش سند ذخیره نمی‌شود
+        if failed_chunks:
+            result["partial"] = True
+            result["failed_chunks"] = failed_chunks
+        return result
     
     def extract(self, text: str, method: str = "simple", enable_preprocessing: bool = False, 
-                language: str = "auto", **kwargs) -> Dict[str, Any]:
+                language: str = "auto", use_cache: bool = True, **kwargs) -> Dict[str, Any]:
         """
         استخراج موجودیت‌ها و روابط با روش انتخابی
         
+        نتیجه در کش استخراج (extraction_cache) با کلیدی از متن نرمال‌شده، روش، مدل‌ها،
+        پرچم‌های پیش‌پردازش و سایر پارامترها ذخیره می‌شود. روش‌های long_text و incremental
+        هر chunk را هم با extract استخراج می‌کنند، پس chunk های تغییرنکرده از کش خوانده می‌شوند.
+        
         نکته مهم در مورد پیش‌پردازش:
         - برای مدل‌های زبانی (LLM): متن اصلی استفاده می‌شود تا معنی کامل حفظ شود
         - برای روش‌های rule-based و spaCy: می‌توان از متن پیش‌پردازش شده استفاده کرد
@@ -2525,11 +2602,41 @@ def extract(self, text: str, method: str = "simple", enable_preprocessing: bool
             method: روش استخراج (simple, spacy, spacy_svo_enhanced, llm, llm_multipass, hybrid)
             enable_preprocessing: فعال‌سازی پیش‌پردازش (حذف stop words از گراف)
             language: زبان متن برای پیش‌پردازش (auto/fa/en)
+            use_cache: استفاده از کش استخراج (برای این سند و chunk های آن)
             **kwargs: پارامترهای اضافی
             
         Returns:
             Dictionary containing entities and relationships
         """
+        cache = self.extraction_cache if use_cache else None
+        if cache is None or not text or not text.strip():
+            if method in ("long_text", "incremental"):
+                kwargs["use_cache"] = use_cache
+            return self._extract(text, method, enable_preprocessing, language, **kwargs)
+        
+        key = extraction_key(text, method, self._extraction_cache_params(enable_preprocessing, language, kwargs))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        result = self._extract(text, method, enable_preprocessing, language, **kwargs)
+        # نتایج خالی، ناموفق (مثلاً خطای موقت LLM) یا جزئی (روش یا chunk ناموفق، deadline در hybrid)
+        # ذخیره نمی‌شوند؛ chunk های موفق در کش خودشان مانده‌اند و فقط بقیه دوباره استخراج می‌شوند
+        if isinstance(result, dict) and result.get("entities") and not result.get("error") and not result.get("partial"):
+            cache.set(key, {k: v for k, v in result.items() if k != "graph"}, method)
+        return result
+    
+    def _extraction_cache_params(self, enable_preprocessing: bool, language: str,
+                                 kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """اجزای کلید کش استخراج به جز متن و روش"""
+        params = {k: v for k, v in kwargs.items() if k not in ("max_workers", "return_graph", "deadline")}
+        meta = getattr(self.nlp, "meta", None) or {}
+        params.update(enable_preprocessing=enable_preprocessing, language=language,
+                      spacy_model=f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}" if self.nlp else None)
+        return params
+    
+    def _extract(self, text: str, method: str, enable_preprocessing: bool = False, language: str = "auto",
+                 **kwargs) -> Dict[str, Any]:
+        """استخراج بدون کش (بدنه extract)"""
         if not text or not text.strip():
             raise ValueError("متن ورودی نمی‌تواند خالی باشد")
         
@@ -2766,6 +2873,8 @@ def process_text_to_graph(self, text: str, method: str = "simple",
         """
         try:
             # Extract entities and relationships
+            if method == "incremental":
+                kwargs.setdefault("return_graph", True)
             extraction_result = self.extract(text, method=method, 
                                             enable_preprocessing=enable_preprocessing,
                                             language=language, **kwargs)
@@ -2780,8 +2889,10 @@ def process_text_to_graph(self, text: str, method: str = "simple",
             if "relationships" not in extraction_result:
                 extraction_result["relationships"] = []
             
-            # Build graph
-            graph = self.build_graph(extraction_result)
+            # Build graph (روش incremental گراف را حین ادغام chunkها می‌سازد)
+            graph = extraction_result.pop("graph", None)
+            if graph is None:
+                graph = self.build_graph(extraction_result)
             
             # Validate graph
             if graph.number_of_nodes() == 0:
@@ -2938,7 +3049,7 @@ def extract_joint_er(self, text: str, max_entities: int = 100, max_relationships
         # استخراج با spaCy برای موجودیت‌ها
         if self.nlp:
             try:
-                doc = self.nlp(text)
+                doc = self.doc_pipeline.doc(text)
                 entity_map = {}
                 for ent in doc.ents:
                     if ent.label_ not in ["CARDINAL", "ORDINAL", "QUANTITY", "PERCENT", "MONEY", "DATE", "TIME"]:
@@ -2956,7 +3067,7 @@ def extract_joint_er(self, text: str, max_entities: int = 100, max_relationships
         # استخراج روابط با استفاده از dependency parsing
         if self.nlp and initial_entities:
             try:
-                doc = self.nlp(text)
+                doc = self.doc_pipeline.doc(text)
                 entity_spans = {ent["name"]: ent for ent in initial_entities}
                 
                 for sent in doc.sents:
@@ -3314,7 +3425,8 @@ def extract_edc(self, text: str, max_entities: int = 100, max_relationships: int
     
     def extract_incremental(self, text: str, chunk_size: int = 500, overlap: int = 100,
                           base_method: str = "spacy", max_entities: int = 100,
-                          max_relationships: int = 200, **kwargs) -> Dict[str, Any]:
+                          max_relationships: int = 200, max_workers: Optional[int] = None,
+                          return_graph: bool = False, **kwargs) -> Dict[str, Any]:
         """
         Incremental Knowledge Graph Construction
         
@@ -3328,10 +3440,12 @@ def extract_incremental(self, text: str, chunk_size: int = 500, overlap: int = 1
             base_method: روش پایه برای استخراج
             max_entities: حداکثر تعداد موجودیت‌ها
             max_relationships: حداکثر تعداد روابط
+            max_workers: تعداد فرایندهای استخراج موازی chunkها (1 = ترتیبی؛ ChunkExtractionExecutor)
+            return_graph: افزودن گراف ساخته‌شده حین ادغام (nx.MultiDiGraph) در کلید graph
             **kwargs: پارامترهای اضافی
             
         Returns:
-            Dictionary containing entities and relationships
+            Dictionary containing entities and relationships (زمان هر chunk در stats.chunk_timings)
         """
         if not text or not text.strip():
             raise ValueError("متن ورودی نمی‌تواند خالی باشد")
@@ -3357,94 +3471,36 @@ def extract_incremental(self, text: str, chunk_size: int = 500, overlap: int = 1
                 "end": end
             })
             
+            if end >= text_length:
+                break
             start = end - overlap if overlap > 0 else end
         
-        # پردازش incremental
-        all_entities = []
-        all_relationships = []
-        entity_map = {}  # name -> entity_id
-        relationship_set = set()
-        
-        for i, chunk in enumerate(chunks):
-            logging.info(f"Processing chunk {i+1}/{len(chunks)}")
-            
-            try:
-                # استخراج از chunk
-                chunk_result = self.extract(
-                    chunk["text"],
-                    method=base_method,
-                    max_entities=max_entities,
-                    max_relationships=max_relationships,
-                    **kwargs
-                )
-                
-                chunk_entities = chunk_result.get("entities", [])
-                chunk_relationships = chunk_result.get("relationships", [])
-                
-                # ادغام موجودیت‌ها
-                for entity in chunk_entities:
-                    entity_name = entity.get("name", "").strip().lower()
-                    
-                    if entity_name in entity_map:
-                        # موجودیت تکراری - merge attributes
-                        entity_id = entity_map[entity_name]
-                        for e in all_entities:
-                            if e["id"] == entity_id:
-                                # Merge attributes
-                                existing_attrs = e.get("attributes", {})
-                                new_attrs = entity.get("attributes", {})
-                                
-                                # Track chunk appearances
-                                if "chunks" not in existing_attrs:
-                                    existing_attrs["chunks"] = []
-                                existing_attrs["chunks"].append(i)
-                                existing_attrs.update(new_attrs)
-                                break
-                    else:
-                        # موجودیت جدید
-                        entity_id = f"ENT_{len(all_entities)}"
-                        entity_map[entity_name] = entity_id
-                        entity["id"] = entity_id
-                        entity["attributes"]["chunks"] = [i]
-                        all_entities.append(entity)
-                
-                # ادغام روابط
-                for rel in chunk_relationships:
-                    source_name = rel.get("source", "").strip().lower()
-                    target_name = rel.get("target", "").strip().lower()
-                    relation = rel.get("relation", "").strip()
-                    
-                    # Map to entity IDs
-                    source_id = entity_map.get(source_name)
-                    target_id = entity_map.get(target_name)
-                    
-                    if source_id and target_id:
-                        rel_key = (source_id, target_id, relation)
-                        if rel_key not in relationship_set:
-                            relationship_set.add(rel_key)
-                            rel["source"] = source_id
-                            rel["target"] = target_id
-                            rel["attributes"]["chunk"] = i
-                            all_relationships.append(rel)
-                        else:
-                            # Update confidence/frequency
-                            for r in all_relationships:
-                                if (r["source"], r["target"], r["relation"]) == rel_key:
-                                    r["attributes"]["frequency"] = r["attributes"].get("frequency", 1) + 1
-                                    break
-                
-            except Exception as e:
-                logging.warning(f"Error processing chunk {i+1}: {e}")
-                continue
-        
-        return {
-            "entities": all_entities[:max_entities],
-            "relationships": all_relationships[:max_relationships],
-            "method": f"incremental_{base_method}",
-            "stats": {
-                "num_entities": len(all_entities),
-                "num_relationships": len(all_relationships),
-                "num_chunks": len(chunks)
-            }
-        }
+        # استخراج موازی chunkها؛ نتایج به ترتیب chunkها و به صورت جریان در گراف ادغام می‌شوند
+        executor = ChunkExtractionExecutor(self, max_workers=max_workers)
+        builder = IncrementalGraphBuilder(max_entities=max_entities, max_relationships=max_relationships)
+        chunk_timings = []
+        failed_chunks = []
+        
+        def chunk_results():
+            for outcome in executor.map(chunks, base_method, max_entities=max_entities,
+                                        max_relationships=max_relationships, **kwargs):
+                chunk_timings.append(outcome.timing())
+                logging.info(f"Processing chunk {outcome.index+1}/{len(chunks)} ({outcome.seconds:.2f}s)")
+                if outcome.failed:
+                    failed_chunks.append(outcome.index)
+                if outcome.error is not None:
+                    logging.warning(f"Error processing chunk {outcome.index+1}: {outcome.error}")
+                    continue
+                yield outcome.index, outcome.result
+        
+        builder.consume(chunk_results())
+        
+        result = builder.result(f"incremental_{base_method}", num_chunks=len(chunks), chunk_timings=chunk_timings)
+        # نتیجه بدون chunk های ناموفق جزئی است و در کش سند ذخیره نمی‌شود
+        if failed_chunks:
+            result["partial"] = True
+            result["failed_chunks"] = failed_chunks
+        if return_graph:
+            result["graph"] = builder.graph
+        return result
 
@@ -1,9 +1,30 @@
 # -*- coding: utf-8 -*-
 """
 GraphRAG Web Application - رابط وب تعاملی
+
+منابع سنگین (مدل‌های spaCy/sentence-transformers، sklearn، SDK های LLM، اتصال Redis و
+NodeLookupSystem) در اولین استفاده بارگذاری می‌شوند؛ هزینه راه‌اندازی هر جزء با
+python web_app.py --profile-startup گزارش می‌شود.
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for
+import math
+import sys
+import time
+_BOOT_STARTED = time.perf_counter()
+
+if __name__ == '__main__' and '--profile-startup' in sys.argv:
+    # گزارش در فرایند تازه ساخته می‌شود؛ این فرایند سرویس‌ها را راه‌اندازی نمی‌کند
+    from startup_profile import main as _profile_startup
+    sys.exit(_profile_startup(sys.argv[1:]))
+
+if __name__ == '__main__':
+    # پیام‌های راه‌اندازی سرویس‌ها از همین ابتدا؛ با GRAPHRAG_LOG_LEVEL=DEBUG و تنظیم
+    # enable_verbose_logging ردگیری مراحل هر پرسش هم نمایش داده می‌شود
+    import logging
+    import os
+    logging.basicConfig(level=os.environ.get('GRAPHRAG_LOG_LEVEL', 'INFO').upper())
+
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, redirect, url_for, stream_with_context
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -12,23 +33,31 @@
 from graphrag_service import GraphRAGService, RetrievalMethod, GenerationModel
 from enhanced_graphrag_service import EnhancedGraphRAGService, TokenExtractionMethod, RetrievalAlgorithm, CommunityDetectionMethod
 from text_to_graph_service import TextToGraphService
+from graph_snapshot import SNAPSHOT_EXTENSION
+from graph_registry import GraphRegistry
+from retrieval_cache import RetrievalResultCache
+from hf_model_pool import get_hf_model_pool
+from llm_gateway import get_llm_gateway
+from llm_cache import get_llm_cache
+from extraction_cache import get_extraction_cache
+from nlp_models import get_sentence_transformer, model_stats
+from pipeline_metrics import get_pipeline_metrics
 import json
 import os
 import shutil
 import logging
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import importlib.util
 import numpy as np
 import re
 from difflib import SequenceMatcher
 
-# OpenAI import for GPT-4o comparison
-try:
-    import openai
-except ImportError:
-    openai = None
+# زمان مراحل راه‌اندازی (ثانیه از شروع import)؛ در /api/startup_profile و --profile-startup
+STARTUP_TIMINGS = {'imports': round(time.perf_counter() - _BOOT_STARTED, 4)}
+
+# OpenAI (GPT-4o comparison) از طریق llm_gateway و در صورت نیاز import می‌شود
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 
 # Simple text processing functions without external dependencies
 def simple_tokenize(text):
@@ -40,13 +69,7 @@ def simple_remove_punctuation(text):
     import string
     return text.translate(str.maketrans('', '', string.punctuation))
 
-# Initialize sentence transformer for semantic similarity (optional)
-sentence_transformer = None
-try:
-    from sentence_transformers import SentenceTransformer
-    sentence_transformer = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-except:
-    pass
+# sentence transformer برای شباهت معنایی (اختیاری) در اولین استفاده از nlp_models بارگذاری می‌شود
 
 app = Flask(__name__)
 
@@ -72,7 +95,7 @@ def handle_exception(e):
 
 # تنظیمات آپلود فایل
 UPLOAD_FOLDER = 'uploaded_graphs'
-ALLOWED_EXTENSIONS = {'pkl', 'sif', 'tsv', 'csv', 'txt', 'gz'}
+ALLOWED_EXTENSIONS = {'pkl', 'sif', 'tsv', 'csv', 'txt', 'gz', 'graphsnap'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # ایجاد پوشه آپلود اگر وجود ندارد
@@ -85,17 +108,31 @@ def allowed_file(filename):
 
 # راه‌اندازی سرویس GraphRAG با گراف Hetionet
 # ابتدا بررسی می‌کنیم که آیا فایل گراف Hetionet وجود دارد
-graph_files = [f for f in os.listdir('.') if f.startswith('hetionet_graph_') and f.endswith('.pkl')]
+# فایل‌های .pkl در صورت وجود snapshot هم‌نام (.graphsnap) از طریق mmap بارگذاری می‌شوند
+graph_registry = GraphRegistry()
+# کش نتایج بازیابی: با GRAPHRAG_RESULT_CACHE=redis بین فرایندها (Redis) مشترک می‌شود
+result_cache = None
+if os.environ.get("GRAPHRAG_RESULT_CACHE", "").lower() == "redis":
+    try:
+        from rag_new.utils.redis_conn import REDIS_CONN
+        result_cache = RetrievalResultCache(backend=REDIS_CONN)
+    except Exception as e:
+        logging.warning(f"Redis result cache unavailable, using local cache: {e}")
+graph_files = [f for f in os.listdir('.') if f.startswith('hetionet_graph_') and f.endswith(('.pkl', SNAPSHOT_EXTENSION))]
 if graph_files:
     # استفاده از جدیدترین فایل گراف
     latest_graph_file = max(graph_files)
     print(f"🔧 استفاده از گراف Hetionet: {latest_graph_file}")
-    graphrag_service = GraphRAGService(graph_data_path=latest_graph_file)
-    enhanced_graphrag_service = EnhancedGraphRAGService(graph_data_path=latest_graph_file)
+    # گراف و ایندکس‌های آن یک‌بار بارگذاری و بین هر دو سرویس به اشتراک گذاشته می‌شود
+    graph_registry.swap(latest_graph_file)
+    graphrag_service = GraphRAGService(graph_data_path=latest_graph_file, graph_registry=graph_registry,
+                                       result_cache=result_cache)
+    enhanced_graphrag_service = EnhancedGraphRAGService(graph_data_path=latest_graph_file, graph_registry=graph_registry)
 else:
     print("⚠️ فایل گراف Hetionet یافت نشد، استفاده از گراف نمونه")
-    graphrag_service = GraphRAGService()
-    enhanced_graphrag_service = EnhancedGraphRAGService()
+    graphrag_service = GraphRAGService(graph_registry=graph_registry, result_cache=result_cache)
+    enhanced_graphrag_service = EnhancedGraphRAGService(graph_registry=graph_registry)
+STARTUP_TIMINGS['services'] = round(time.perf_counter() - _BOOT_STARTED, 4)
 
 # تنظیم API Key های OpenAI (از متغیر محیطی یا secrets.json)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
@@ -208,7 +245,7 @@ def upload_graph():
         else:
             return jsonify({
                 'success': False,
-                'error': 'نوع فایل مجاز نیست. فایل‌های مجاز: pkl, sif, tsv, csv, txt, gz'
+                'error': 'نوع فایل مجاز نیست. فایل‌های مجاز: pkl, sif, tsv, csv, txt, gz, graphsnap'
             }), 400
     
     except Exception as e:
@@ -220,9 +257,12 @@ def upload_graph():
 @app.route('/api/text_to_graph', methods=['POST'])
 def text_to_graph():
     """تبدیل متن به گراف دانش"""
+    payload, status = text_to_graph_payload(request.get_json())
+    return jsonify(payload), status
+
+def text_to_graph_payload(data):
+    """بدنه /api/text_to_graph (مشترک بین Flask و ASGI): (پاسخ JSON، کد وضعیت)"""
     try:
-        data = request.get_json()
-        
         # Import URL extractor
         try:
             from url_extractor import extract_text_from_url, is_valid_url
@@ -241,10 +281,10 @@ def text_to_graph():
         
         # Validate input - check for text or URL
         if not data:
-            return jsonify({
+            return {
                 'success': False,
                 'error': 'متن یا URL ورودی الزامی است'
-            }), 400
+            }, 400
         
         text = data.get('text', '').strip()
         url = data.get('url', '').strip()
@@ -253,16 +293,16 @@ def text_to_graph():
         # اگر URL داده شده، متن را از URL استخراج کن
         if url:
             if not URL_EXTRACTOR_AVAILABLE:
-                return jsonify({
+                return {
                     'success': False,
                     'error': 'استخراج از URL در دسترس نیست. لطفاً متن را مستقیماً وارد کنید.'
-                }), 400
+                }, 400
             
             if not is_valid_url(url):
-                return jsonify({
+                return {
                     'success': False,
                     'error': 'URL نامعتبر است'
-                }), 400
+                }, 400
             
             # بررسی اینکه آیا URL ویکی‌پدیا است
             is_wikipedia = 'wikipedia.org' in url.lower()
@@ -277,10 +317,10 @@ def text_to_graph():
                         # Fallback به استخراج عادی با clean_content
                         extracted_text = extract_text_from_url(url, clean_content=True, max_length=10000)
                         if not extracted_text:
-                            return jsonify({
+                            return {
                                 'success': False,
                                 'error': wiki_data.get("error", "خطا در استخراج از ویکی‌پدیا")
-                            }), 400
+                            }, 400
                         text = extracted_text
                     else:
                         # استفاده از داده‌های استخراج شده از ویکی‌پدیا
@@ -306,29 +346,29 @@ def text_to_graph():
                     logging.warning(f"Wikipedia extraction failed, falling back to regular extraction: {e}")
                     extracted_text = extract_text_from_url(url, clean_content=True, max_length=10000)
                     if not extracted_text:
-                        return jsonify({
+                        return {
                             'success': False,
                             'error': f'خطا در استخراج از URL: {str(e)}'
-                        }), 400
+                        }, 400
                     text = extracted_text
             else:
                 # استخراج عادی از URL با clean_content=True برای حذف محتوای غیرضروری
                 extracted_text = extract_text_from_url(url, clean_content=True, max_length=10000)
                 if not extracted_text:
-                    return jsonify({
+                    return {
                         'success': False,
                         'error': 'خطا در استخراج متن از URL. لطفاً URL را بررسی کنید.'
-                    }), 400
+                    }, 400
                 
                 text = extracted_text
                 logging.info(f"Text extracted from URL: {url} ({len(text)} characters)")
         
         # بررسی اینکه متن وجود دارد
         if not text:
-            return jsonify({
+            return {
                 'success': False,
                 'error': 'متن نمی‌تواند خالی باشد'
-            }), 400
+            }, 400
         
         # Get extraction parameters
         method = data.get('method', 'simple')
@@ -343,6 +383,7 @@ def text_to_graph():
         min_relationship_weight = data.get('min_relationship_weight', 0.0)
         remove_isolated_nodes = data.get('remove_isolated_nodes', False)
         hybrid_methods = data.get('hybrid_methods', ['spacy', 'llm'])
+        hybrid_deadline = data.get('hybrid_deadline')
         
         # New parameters for Persian and advanced features
         language = data.get('language', 'auto')  # auto/fa/en
@@ -358,10 +399,22 @@ def text_to_graph():
                         'persian', 'span_based', 'with_coreference', 'long_text',
                         'joint_er', 'autoregressive', 'edc', 'incremental']
         if method not in valid_methods:
-            return jsonify({
+            return {
                 'success': False,
                 'error': f'روش استخراج نامعتبر است. روش‌های مجاز: {", ".join(valid_methods)}'
-            }), 400
+            }, 400
+        
+        # Validate hybrid deadline (ثانیه؛ عدد مثبت و متناهی)
+        if hybrid_deadline is not None:
+            try:
+                hybrid_deadline = float(hybrid_deadline)
+            except (TypeError, ValueError):
+                hybrid_deadline = None
+            if hybrid_deadline is None or not math.isfinite(hybrid_deadline) or hybrid_deadline <= 0:
+                return {
+                    'success': False,
+                    'error': 'hybrid_deadline باید عددی مثبت (ثانیه) باشد'
+                }, 400
         
         # Initialize text to graph service
         try:
@@ -383,10 +436,10 @@ def text_to_graph():
                 hf_token=hf_token  # Pass token directly to service
             )
         except Exception as e:
-            return jsonify({
+            return {
                 'success': False,
                 'error': f'خطا در راه‌اندازی سرویس: {str(e)}'
-            }), 500
+            }, 500
         
         # Prepare extraction parameters
         extraction_params = {
@@ -404,6 +457,9 @@ def text_to_graph():
         if method == 'hybrid':
             extraction_params['methods'] = hybrid_methods
             extraction_params['confidence_threshold'] = confidence_threshold
+            # حداکثر زمان انتظار (ثانیه)؛ روش‌های کندتر کنار گذاشته می‌شوند
+            if hybrid_deadline is not None:
+                extraction_params['deadline'] = hybrid_deadline
         
         # New method-specific parameters
         if method == 'joint_er':
@@ -630,7 +686,7 @@ def text_to_graph():
             extraction_entities = extraction_result.get('entities', [])
             extraction_relationships = extraction_result.get('relationships', [])
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': 'گراف با موفقیت ساخته شد',
                 'filename': filename,
@@ -644,7 +700,7 @@ def text_to_graph():
                     'entities': extraction_entities,
                     'relationships': extraction_relationships
                 }
-            })
+            }, 200
             
         except ValueError as e:
             # Handle validation errors - include more details
@@ -657,12 +713,12 @@ def text_to_graph():
             error_trace = traceback.format_exc()
             logging.error(f"Error traceback: {error_trace}")
             
-            return jsonify({
+            return {
                 'success': False,
                 'error': error_msg,
                 'error_type': 'validation_error',
                 'method': method
-            }), 400
+            }, 400
         except Exception as e:
             # Handle other errors - include full traceback
             import traceback
@@ -672,20 +728,20 @@ def text_to_graph():
             logging.error(f"Error type: {type(e).__name__}")
             logging.error(f"Full traceback: {error_trace}")
             
-            return jsonify({
+            return {
                 'success': False,
                 'error': f'خطا در تبدیل متن به گراف: {error_msg}',
                 'error_type': 'server_error',
                 'method': method,
                 'details': error_trace[-500:] if len(error_trace) > 500 else error_trace  # Last 500 chars
-            }), 500
+            }, 500
     
     except Exception as e:
         logging.error(f"Unexpected error in text_to_graph endpoint: {e}")
-        return jsonify({
+        return {
             'success': False,
             'error': f'خطای غیرمنتظره: {str(e)}'
-        }), 500
+        }, 500
 
 @app.route('/api/list_graphs')
 def list_graphs():
@@ -710,7 +766,7 @@ def list_graphs():
         
         # گراف‌های موجود در پوشه اصلی
         for filename in os.listdir('.'):
-            if filename.endswith('.pkl') and filename.startswith('hetionet_graph_'):
+            if filename.endswith(('.pkl', SNAPSHOT_EXTENSION)) and filename.startswith('hetionet_graph_'):
                 filepath = os.path.join('.', filename)
                 file_size = os.path.getsize(filepath)
                 file_date = datetime.fromtimestamp(os.path.getctime(filepath))
@@ -749,11 +805,9 @@ def load_graph():
                 'error': 'مسیر گراف نامعتبر است'
             }), 400
         
-        # بارگذاری گراف جدید
-        global graphrag_service
-        graphrag_service = GraphRAGService(graph_data_path=graph_path)
-        if OPENAI_API_KEY:
-            graphrag_service.set_openai_api_key(OPENAI_API_KEY)
+        # بارگذاری گراف جدید و جایگزینی اتمیک آن برای هر دو سرویس؛
+        # درخواست‌های در حال اجرا تا پایان با گراف قبلی کار می‌کنند
+        graph_registry.swap(graph_path)
         
         return jsonify({
             'success': True,
@@ -961,64 +1015,68 @@ def graph_view_data():
             'error': str(e)
         }), 500
 
+def process_query_request(data):
+    """پارامترهای /api/process_query: (آرگومان‌های process_query، تنظیمات پیشرفته)"""
+    query = data.get('query', '')
+    retrieval_method = data.get('retrieval_method', 'BFS')
+    generation_model = data.get('generation_model', 'GPT_SIMULATION')
+    text_generation_type = data.get('text_generation_type', 'INTELLIGENT')
+    max_depth = data.get('max_depth', 2)
+    
+    # تنظیمات پیشرفته (اختیاری)
+    max_nodes = data.get('max_nodes', 20)
+    max_edges = data.get('max_edges', 40)
+    similarity_threshold = data.get('similarity_threshold', 0.3)
+    community_detection_method = data.get('community_detection_method', 'louvain')
+    advanced_retrieval_algorithm = data.get('advanced_retrieval_algorithm', 'hybrid')
+    advanced_token_extraction_method = data.get('advanced_token_extraction_method', 'llm_based')
+    
+    # تبدیل رشته به enum
+    retrieval_enum = RetrievalMethod[retrieval_method]
+    generation_enum = GenerationModel[generation_model.replace(' ', '_')]
+    
+    # تنظیمات پیشرفته فقط برای همین درخواست (config مشترک سرویس تغییر نمی‌کند)
+    options = None
+    if any([max_nodes != 20, max_edges != 40, similarity_threshold != 0.3]):
+        options = graphrag_service.request_options(
+            max_nodes=max_nodes,
+            max_edges=max_edges
+        )
+    
+    query_args = {
+        'query': query,
+        'retrieval_method': retrieval_enum,
+        'generation_model': generation_enum,
+        'text_generation_type': text_generation_type,
+        'max_depth': max_depth,
+        'options': options
+    }
+    advanced_settings = {
+        'max_nodes': max_nodes,
+        'max_edges': max_edges,
+        'similarity_threshold': similarity_threshold,
+        'community_detection_method': community_detection_method,
+        'advanced_retrieval_algorithm': advanced_retrieval_algorithm,
+        'advanced_token_extraction_method': advanced_token_extraction_method
+    }
+    return query_args, advanced_settings
+
+def process_query_response(result, advanced_settings):
+    """پاسخ موفق /api/process_query (با timestamp و تنظیمات استفاده شده)"""
+    result['timestamp'] = datetime.now().isoformat()
+    result['advanced_settings'] = advanced_settings
+    return {
+        'success': True,
+        'result': result
+    }
+
 @app.route('/api/process_query', methods=['POST'])
 def process_query():
     """پردازش سوال و برگرداندن نتیجه"""
     try:
-        data = request.get_json()
-        query = data.get('query', '')
-        retrieval_method = data.get('retrieval_method', 'BFS')
-        generation_model = data.get('generation_model', 'GPT_SIMULATION')
-        text_generation_type = data.get('text_generation_type', 'INTELLIGENT')
-        max_depth = data.get('max_depth', 2)
-        
-        # تنظیمات پیشرفته (اختیاری)
-        max_nodes = data.get('max_nodes', 20)
-        max_edges = data.get('max_edges', 40)
-        similarity_threshold = data.get('similarity_threshold', 0.3)
-        community_detection_method = data.get('community_detection_method', 'louvain')
-        advanced_retrieval_algorithm = data.get('advanced_retrieval_algorithm', 'hybrid')
-        advanced_token_extraction_method = data.get('advanced_token_extraction_method', 'llm_based')
-        
-        # تبدیل رشته به enum
-        retrieval_enum = RetrievalMethod[retrieval_method]
-        generation_enum = GenerationModel[generation_model.replace(' ', '_')]
-        
-        # تنظیم پیکربندی پیشرفته اگر ارائه شده باشد
-        if any([max_nodes != 20, max_edges != 40, similarity_threshold != 0.3]):
-            graphrag_service.set_config(
-                max_nodes=max_nodes,
-                max_edges=max_edges,
-                similarity_threshold=similarity_threshold,
-                community_detection_method=community_detection_method,
-                advanced_retrieval_algorithm=advanced_retrieval_algorithm,
-                advanced_token_extraction_method=advanced_token_extraction_method
-            )
-        
-        # پردازش سوال
-        result = graphrag_service.process_query(
-            query=query,
-            retrieval_method=retrieval_enum,
-            generation_model=generation_enum,
-            text_generation_type=text_generation_type,
-            max_depth=max_depth
-        )
-        
-        # اضافه کردن timestamp و تنظیمات استفاده شده
-        result['timestamp'] = datetime.now().isoformat()
-        result['advanced_settings'] = {
-            'max_nodes': max_nodes,
-            'max_edges': max_edges,
-            'similarity_threshold': similarity_threshold,
-            'community_detection_method': community_detection_method,
-            'advanced_retrieval_algorithm': advanced_retrieval_algorithm,
-            'advanced_token_extraction_method': advanced_token_extraction_method
-        }
-        
-        return jsonify({
-            'success': True,
-            'result': result
-        })
+        query_args, advanced_settings = process_query_request(request.get_json())
+        result = graphrag_service.process_query(**query_args)
+        return jsonify(process_query_response(result, advanced_settings))
     
     except Exception as e:
         return jsonify({
@@ -1026,11 +1084,99 @@ def process_query():
             'error': str(e)
         }), 500
 
+def sse_event(event, payload):
+    """یک رویداد server-sent events با داده JSON"""
+    return f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+
+def process_query_events(query_args, advanced_settings):
+    """
+    رویدادهای SSE پردازش جریانی سوال (مشترک بین Flask و ASGI)
+
+    retrieval → context → token (چندین بار) → done (همان پاسخ /api/process_query) یا error
+    """
+    try:
+        for event, payload in graphrag_service.iter_process_query_events(**query_args):
+            if event == 'done':
+                payload = process_query_response(payload, advanced_settings)
+            yield sse_event(event, payload)
+    except Exception as e:
+        logging.error(f"Error in streaming query: {e}")
+        yield sse_event('error', {
+            'success': False,
+            'error': str(e)
+        })
+
+# هدرهای پاسخ جریانی (جلوگیری از بافر شدن در proxy)
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+@app.route('/api/process_query_stream', methods=['POST'])
+def process_query_stream():
+    """پردازش سوال با پاسخ جریانی (text/event-stream): نتایج بازیابی، متن زمینه و سپس تکه‌های پاسخ"""
+    try:
+        query_args, advanced_settings = process_query_request(request.get_json())
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    return Response(stream_with_context(process_query_events(query_args, advanced_settings)),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/api/process_queries_batch', methods=['POST'])
+def process_queries_batch():
+    """
+    پردازش دسته‌ای سوال‌ها با پاسخ جریانی (NDJSON)
+
+    بدنه: {"queries": [سوال یا {"query": ..., تنظیمات مخصوص همان سوال}], تنظیمات مشترک مانند /api/process_query}
+    هر خط پاسخ نتیجه یک سوال است به محض آماده شدن: {"index", "success", "result" یا "error"}
+    """
+    data = request.get_json() or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({
+            'success': False,
+            'error': 'فهرست سوال‌ها (queries) الزامی است'
+        }), 400
+    max_workers = data.get('max_workers')
+    if max_workers is not None:
+        if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 1:
+            return jsonify({
+                'success': False,
+                'error': 'max_workers باید عدد صحیح مثبت باشد'
+            }), 400
+        # سقف thread های هم‌زمان را تنظیمات سرور تعیین می‌کند نه کلاینت
+        max_workers = min(max_workers, graphrag_service.config['batch_max_workers'])
+    shared = {k: v for k, v in data.items() if k not in ('queries', 'max_workers')}
+    try:
+        parsed = [process_query_request({**shared, **(q if isinstance(q, dict) else {'query': q})})
+                     for q in queries]
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    def generate():
+        results = graphrag_service.iter_process_queries([query_args for query_args, _ in parsed],
+                                                        max_workers=max_workers)
+        for index, result, error in results:
+            if error is not None:
+                line = {'index': index, 'success': False, 'error': str(error)}
+            else:
+                line = {'index': index, **process_query_response(result, parsed[index][1])}
+            yield app.json.dumps(line) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/enhanced_process_query', methods=['POST'])
 def enhanced_process_query():
     """پردازش سوال با سرویس پیشرفته GraphRAG"""
+    payload, status = enhanced_process_query_payload(request.get_json())
+    return jsonify(payload), status
+
+def enhanced_process_query_payload(data):
+    """بدنه /api/enhanced_process_query (مشترک بین Flask و ASGI): (پاسخ JSON، کد وضعیت)"""
     try:
-        data = request.get_json()
         query = data.get('query', '')
         token_extraction_method = data.get('token_extraction_method', 'llm_based')
         retrieval_algorithm = data.get('retrieval_algorithm', 'hybrid')
@@ -1040,34 +1186,34 @@ def enhanced_process_query():
         max_edges = data.get('max_edges', 40)
         similarity_threshold = data.get('similarity_threshold', 0.3)
         
-        # تنظیم پیکربندی سرویس پیشرفته
-        enhanced_graphrag_service.set_config(
-            token_extraction_method=token_extraction_method,
-            retrieval_algorithm=retrieval_algorithm,
-            community_detection_method=community_detection_method,
-            max_depth=max_depth,
-            max_nodes=max_nodes,
-            max_edges=max_edges,
-            similarity_threshold=similarity_threshold
-        )
+        # پیکربندی همین درخواست (پیکربندی مشترک سرویس پیشرفته تغییر نمی‌کند)
+        options = {
+            'token_extraction_method': token_extraction_method,
+            'retrieval_algorithm': retrieval_algorithm,
+            'community_detection_method': community_detection_method,
+            'max_depth': max_depth,
+            'max_nodes': max_nodes,
+            'max_edges': max_edges,
+            'similarity_threshold': similarity_threshold
+        }
         
         # پردازش سوال
-        result = enhanced_graphrag_service.process_query(query)
+        result = enhanced_graphrag_service.process_query(query, options=options)
         
         # اضافه کردن timestamp
         result['timestamp'] = datetime.now().isoformat()
-        result['config'] = enhanced_graphrag_service.get_config()
+        result['config'] = enhanced_graphrag_service.get_config(options)
         
-        return jsonify({
+        return {
             'success': True,
             'result': result
-        })
+        }, 200
     
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
 @app.route('/api/graph_info')
 def graph_info():
@@ -1118,6 +1264,79 @@ def enhanced_graph_info():
             'error': str(e)
         })
 
+@app.route('/api/cache_stats')
+def cache_stats():
+    """آمار کش‌های سرویس‌ها (hit/miss/eviction)، صرفه‌جویی توکن کش پاسخ‌های LLM و کش استخراج"""
+    try:
+        llm_cache = get_llm_cache()
+        extraction_cache = get_extraction_cache()
+        return jsonify({
+            'success': True,
+            'graphrag': graphrag_service.get_cache_stats(),
+            'enhanced': enhanced_graphrag_service.get_cache_stats(),
+            'llm': llm_cache.stats() if llm_cache is not None else None,
+            'extraction': extraction_cache.stats() if extraction_cache is not None else None
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/hf_model_stats')
+def hf_model_stats():
+    """وضعیت بارگذاری مدل HuggingFace، طول صف و آمار تولید دسته‌ای"""
+    return jsonify({
+        'success': True,
+        'stats': get_hf_model_pool().stats()
+    })
+
+@app.route('/api/startup_profile')
+def startup_profile():
+    """زمان مراحل راه‌اندازی این فرایند و مدل‌های NLP که تاکنون (به صورت lazy) بارگذاری شده‌اند"""
+    return jsonify({
+        'success': True,
+        'stages': STARTUP_TIMINGS,
+        'models': model_stats()
+    })
+
+@app.route('/metrics')
+def metrics():
+    """هیستوگرام زمان مراحل پایپ‌لاین پرسش به تفکیک روش بازیابی (قالب متنی Prometheus)"""
+    return Response(get_pipeline_metrics().render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/pipeline_metrics')
+def pipeline_metrics():
+    """همان آمار /metrics به صورت JSON"""
+    return jsonify({
+        'success': True,
+        'methods': get_pipeline_metrics().snapshot()
+    })
+
+@app.route('/api/llm_gateway_stats')
+def llm_gateway_stats():
+    """درخواست‌های در جریان، retry ها و درخواست‌های یکی‌شده هر سرویس‌دهنده LLM"""
+    return jsonify({
+        'success': True,
+        'stats': get_llm_gateway().stats()
+    })
+
+@app.route('/api/cache_invalidate', methods=['POST'])
+def cache_invalidate():
+    """حذف نتایج کش‌شده یک پرسش (یا همه نتایج در صورت نبود query)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        removed = graphrag_service.invalidate_result_cache(data.get('query'))
+        return jsonify({
+            'success': True,
+            'removed': removed
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/api/token_extraction_methods')
 def token_extraction_methods():
     """دریافت روش‌های استخراج توکن"""
@@ -1442,14 +1661,18 @@ def config_presets():
 
 @app.route('/api/compare_texts', methods=['POST'])
 def compare_texts():
+    payload, status = compare_texts_payload(request.get_json())
+    return jsonify(payload), status
+
+def compare_texts_payload(data):
+    """بدنه /api/compare_texts (مشترک بین Flask و ASGI): (پاسخ JSON، کد وضعیت)"""
     try:
-        data = request.get_json()
         text1 = data.get('text1', '')
         text2 = data.get('text2', '')
         method = data.get('method', 'cosine_tfidf')
         
         if not text1 or not text2:
-            return jsonify({'error': 'هر دو متن باید وارد شوند'}), 400
+            return {'error': 'هر دو متن باید وارد شوند'}, 400
         
         # Preprocess texts
         text1_processed = preprocess_text(text1)
@@ -1478,68 +1701,82 @@ def compare_texts():
             similarity_score = word_overlap_similarity(text1_processed, text2_processed)
             method_name = "شباهت همپوشانی کلمات"
         else:
-            return jsonify({'error': 'روش مقایسه نامعتبر است'}), 400
+            return {'error': 'روش مقایسه نامعتبر است'}, 400
         
         # Determine quality level
         quality_level = get_quality_level(similarity_score)
         
-        return jsonify({
+        return {
             'similarity_score': round(similarity_score, 4),
             'method_name': method_name,
             'quality_level': quality_level,
             'text1_processed': text1_processed,
             'text2_processed': text2_processed
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({'error': f'خطا در مقایسه: {str(e)}'}), 500
+        return {'error': f'خطا در مقایسه: {str(e)}'}, 500
+
+GPT_COMPARISON_SYSTEM_PROMPT = "شما یک متخصص ارزیابی کیفیت متن در حوزه زیست‌پزشکی، ژنتیک و پزشکی شخصی هستید. وظیفه شما مقایسه دو متن از نظر سطح علمی، ساختار تحلیلی، عمق مفهومی و کاربردپذیری بالینی است.\n\nپاسخی که دارای ویژگی‌های زیر باشد، باید امتیاز بالاتری بگیرد:\n- تحلیل دقیق مسیرهای زیستی و سیگنالینگ \n- اشاره به ژن‌های خاص با نقش بالینی \n- پیوند واضح بین عملکرد ژن و بیماری\n- توضیح در مورد کاربردهای درمانی یا تشخیصی (مانند داروهای هدفمند، بیومارکرها، مهارکننده‌ها)\n- ساختار تحلیلی منظم شامل بخش‌بندی (مثلاً: اهمیت زیستی، اهمیت بالینی، کاربردها، نتیجه‌گیری)\n\nدر مقابل، پاسخ‌هایی که فقط اطلاعات کلی، عمومی یا غیرتحلیلی می‌دهند یا صرفاً فهرستی از اسامی هستند، باید امتیاز کمتری بگیرند.\n\nارزیابی باید دقیق، تحلیلی و با تمرکز بر کیفیت علمی، عمق محتوا و ارزش کاربردی انجام شود. هدف انتخاب پاسخی است که بیشترین ارزش را برای پژوهشگر یا متخصص حوزه زیست‌پزشکی داشته باشد."
+
+def gpt_comparison_request(data):
+    """
+    پارامترهای /api/compare_with_gpt (مشترک بین Flask و ASGI)
+
+    Returns:
+        (آرگومان‌های chat.completions، اطلاعات تجزیه پاسخ، خطا)؛ در صورت ورودی نامعتبر
+        فقط خطا به‌صورت (پاسخ JSON، کد وضعیت) مقدار دارد
+    """
+    text1 = data.get('text1', '')
+    text2 = data.get('text2', '')
+    label1 = data.get('label1', 'روش اول')
+    label2 = data.get('label2', 'روش دوم')
+    comparison_type = data.get('comparison_type', 'comprehensive')
+    gpt_model = data.get('gpt_model', 'gpt-4o')
+    
+    if not text1 or not text2:
+        return None, None, ({'error': 'هر دو متن باید وارد شوند'}, 400)
+    
+    # Create a comprehensive prompt for GPT
+    prompt = create_gpt_comparison_prompt(text1, text2, label1, label2, comparison_type)
+    
+    # Check if OpenAI is available
+    if not OPENAI_AVAILABLE:
+        return None, None, ({'error': 'OpenAI کتابخانه نصب نشده است. لطفاً با دستور pip install openai آن را نصب کنید.'}, 500)
+    
+    chat_args = {
+        'model': gpt_model,
+        'messages': [
+            {"role": "system", "content": GPT_COMPARISON_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        'temperature': 0.3,
+        'max_tokens': 2000
+    }
+    comparison = {'label1': label1, 'label2': label2, 'comparison_type': comparison_type, 'gpt_model': gpt_model}
+    return chat_args, comparison, None
+
+def gpt_comparison_response(gpt_response, comparison):
+    """پاسخ موفق /api/compare_with_gpt از متن پاسخ GPT"""
+    parsed_result = parse_gpt_comparison_response(gpt_response, comparison['label1'], comparison['label2'],
+                                                  comparison['comparison_type'])
+    parsed_result['gpt_model'] = comparison['gpt_model']
+    return parsed_result
 
 @app.route('/api/compare_with_gpt', methods=['POST'])
 def compare_with_gpt():
     try:
-        data = request.get_json()
-        text1 = data.get('text1', '')
-        text2 = data.get('text2', '')
-        label1 = data.get('label1', 'روش اول')
-        label2 = data.get('label2', 'روش دوم')
-        comparison_type = data.get('comparison_type', 'comprehensive')
-        gpt_model = data.get('gpt_model', 'gpt-4o')
+        chat_args, comparison, error = gpt_comparison_request(request.get_json())
+        if error:
+            return jsonify(error[0]), error[1]
         
-        if not text1 or not text2:
-            return jsonify({'error': 'هر دو متن باید وارد شوند'}), 400
-        
-        # Create a comprehensive prompt for GPT
-        prompt = create_gpt_comparison_prompt(text1, text2, label1, label2, comparison_type)
-        
-        # Check if OpenAI is available
-        if openai is None:
-            return jsonify({'error': 'OpenAI کتابخانه نصب نشده است. لطفاً با دستور pip install openai آن را نصب کنید.'}), 500
-        
-        # Call OpenAI API
+        # Call OpenAI API (کلاینت و اتصال‌های مشترک درگاه LLM)
         try:
-            # Set the API key for this request
-            openai.api_key = OPENAI_API_KEY
-            
-            response = openai.chat.completions.create(
-                model=gpt_model,
-                messages=[
-                    {"role": "system", "content": "شما یک متخصص ارزیابی کیفیت متن در حوزه زیست‌پزشکی، ژنتیک و پزشکی شخصی هستید. وظیفه شما مقایسه دو متن از نظر سطح علمی، ساختار تحلیلی، عمق مفهومی و کاربردپذیری بالینی است.\n\nپاسخی که دارای ویژگی‌های زیر باشد، باید امتیاز بالاتری بگیرد:\n- تحلیل دقیق مسیرهای زیستی و سیگنالینگ \n- اشاره به ژن‌های خاص با نقش بالینی \n- پیوند واضح بین عملکرد ژن و بیماری\n- توضیح در مورد کاربردهای درمانی یا تشخیصی (مانند داروهای هدفمند، بیومارکرها، مهارکننده‌ها)\n- ساختار تحلیلی منظم شامل بخش‌بندی (مثلاً: اهمیت زیستی، اهمیت بالینی، کاربردها، نتیجه‌گیری)\n\nدر مقابل، پاسخ‌هایی که فقط اطلاعات کلی، عمومی یا غیرتحلیلی می‌دهند یا صرفاً فهرستی از اسامی هستند، باید امتیاز کمتری بگیرند.\n\nارزیابی باید دقیق، تحلیلی و با تمرکز بر کیفیت علمی، عمق محتوا و ارزش کاربردی انجام شود. هدف انتخاب پاسخی است که بیشترین ارزش را برای پژوهشگر یا متخصص حوزه زیست‌پزشکی داشته باشد."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            gpt_response = response.choices[0].message.content
-            
-            # Parse the GPT response
-            parsed_result = parse_gpt_comparison_response(gpt_response, label1, label2, comparison_type)
-            parsed_result['gpt_model'] = gpt_model
-            
-            return jsonify(parsed_result)
+            gpt_response = get_llm_gateway().openai_chat(OPENAI_API_KEY, chat_args)
+            return jsonify(gpt_comparison_response(gpt_response, comparison))
             
         except Exception as e:
-            return jsonify({'error': f'خطا در ارتباط با {gpt_model}: {str(e)}'}), 500
+            return jsonify({'error': f'خطا در ارتباط با {comparison["gpt_model"]}: {str(e)}'}), 500
         
     except Exception as e:
         return jsonify({'error': f'خطا در مقایسه: {str(e)}'}), 500
@@ -1672,6 +1909,9 @@ def preprocess_text(text):
 def cosine_similarity_tfidf(text1, text2):
     """محاسبه شباهت کسینوسی با TF-IDF"""
     try:
+        # sklearn (~1s import) فقط در اولین محاسبه شباهت import می‌شود
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.metrics.pairwise import cosine_similarity
         vectorizer = TfidfVectorizer()
         tfidf_matrix = vectorizer.fit_transform([text1, text2])
         similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
@@ -1682,9 +1922,11 @@ def cosine_similarity_tfidf(text1, text2):
 def cosine_similarity_sbert(text1, text2):
     """محاسبه شباهت کسینوسی با SBERT"""
     try:
+        sentence_transformer = get_sentence_transformer()
         if sentence_transformer is None:
             return 0.0
         
+        from sklearn.metrics.pairwise import cosine_similarity
         embeddings = sentence_transformer.encode([text1, text2])
         similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
         return float(similarity)
@@ -1782,6 +2024,8 @@ def get_quality_level(similarity_score):
     else:
         return "خیلی ضعیف"
 
+STARTUP_TIMINGS['ready'] = round(time.perf_counter() - _BOOT_STARTED, 4)
+
 if __name__ == '__main__':
     # ایجاد پوشه templates اگر وجود ندارد
     os.makedirs('templates', exist_ok=True)